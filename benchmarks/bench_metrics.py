@@ -0,0 +1,112 @@
+"""
+เครื่องมือเก็บและเปรียบเทียบผล benchmark
+ผลลัพธ์เป็น dict ที่ serialize เป็น JSON ได้: {"meta": {...}, "stages": {"ingest/parse": {...}, ...}, "peak_rss_mb": {...}}
+แต่ละ stage มี count, items, total_s, throughput (items/วินาที) และ latency p50/p95/p99/mean/max (ms)
+"""
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+RESULTS_VERSION = 1
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms") # ยิ่งน้อยยิ่งดี
+THROUGHPUT_KEY = "throughput" # ยิ่งมากยิ่งดี
+
+
+def percentile(values: List[float], q: float) -> float:
+    """percentile แบบ linear interpolation (เหมือน numpy.percentile ค่า default) q อยู่ในช่วง 0-100."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(durations: List[float], items: Optional[int] = None) -> dict:
+    """สรุป latency (วินาทีต่อครั้ง) ของ stage หนึ่ง; items = จำนวนหน่วยงานทั้งหมด (default = จำนวนครั้ง)."""
+    total = sum(durations)
+    items = len(durations) if items is None else items
+    return {
+        "count": len(durations),
+        "items": items,
+        "total_s": round(total, 6),
+        THROUGHPUT_KEY: round(items / total, 3) if total else 0.0,
+        "mean_ms": round(total / len(durations) * 1000, 3) if durations else 0.0,
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+        "p99_ms": round(percentile(durations, 99) * 1000, 3),
+        "max_ms": round(max(durations) * 1000, 3) if durations else 0.0,
+    }
+
+
+class StageRecorder:
+    """เก็บเวลาของแต่ละครั้งและจำนวนหน่วยงานแยกตาม stage."""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.items: Dict[str, int] = defaultdict(int)
+
+    def record(self, stage: str, seconds: float, items: int = 1):
+        self.durations[stage].append(seconds)
+        self.items[stage] += items
+
+    def summary(self) -> Dict[str, dict]:
+        return {stage: summarize(durations, self.items[stage]) for stage, durations in self.durations.items()}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """peak RSS ของ process นี้ (MB) ตั้งแต่เริ่มรัน (None บน platform ที่ไม่มี module resource เช่น Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux รายงานเป็น KiB, macOS เป็น bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def environment_info() -> dict:
+    """ข้อมูลเครื่องและ commit ที่ใช้รัน (ผลจากเครื่องต่างกันไม่ควรนำมาเทียบกันโดยตรง)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare_results(baseline: dict, candidate: dict, threshold: float = 0.10, min_ms: float = 0.0) -> List[dict]:
+    """
+    เทียบผลสองรอบราย stage/metric: change = สัดส่วนที่เปลี่ยน (บวก = แย่ลง ทั้ง latency และ throughput)
+    regression = แย่ลงเกิน threshold (เช่น 0.10 = 10%) คืน list ของแถวเรียงตามชื่อ stage
+    latency ที่ต่ำกว่า min_ms ทั้งสองรอบไม่ถูกนับเป็น regression (stage ที่เร็วมากมี noise สูงเมื่อคิดเป็น %)
+    """
+    rows = []
+    base_stages, new_stages = baseline.get("stages", {}), candidate.get("stages", {})
+    for stage in sorted(set(base_stages) & set(new_stages)):
+        for metric in LATENCY_KEYS + (THROUGHPUT_KEY,):
+            before, after = base_stages[stage].get(metric), new_stages[stage].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if metric == THROUGHPUT_KEY:
+                change = -change
+            if metric == THROUGHPUT_KEY: # throughput ของ stage ที่เร็วมากก็ noise สูงเหมือนกัน
+                negligible = max(base_stages[stage].get("p50_ms", 0), new_stages[stage].get("p50_ms", 0)) < min_ms
+            else:
+                negligible = max(before, after) < min_ms
+            rows.append({"stage": stage, "metric": metric, "baseline": before, "candidate": after,
+                         "change": round(change, 4), "regression": change > threshold and not negligible})
+    return rows
@@ -0,0 +1,113 @@
+"""
+ส่วนประกอบจำลองสำหรับรัน benchmark แบบ offline บน CPU (ไม่ต้องโหลด model หรือเรียก Ollama)
+- HashingEmbeddings: embedding แบบ feature hashing (deterministic, ค้นหาด้วยคำที่ตรงกันได้จริง)
+- TimedEmbeddings: ห่อ Embeddings ตัวใดก็ได้เพื่อนับเวลาที่ใช้ embed (แยกเวลา embed ออกจากเวลา upsert/search)
+- TimedVectorStore: ห่อ vector store เพื่อจับเวลา add_documents ทีละ batch
+- StubLLM: LLM ที่ตอบข้อความคงที่ มี invoke/stream เหมือน Ollama ของ LangChain และจำลอง latency ได้
+"""
+import re
+import threading
+import time
+import zlib
+from typing import Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """vector = histogram ของ hash ของคำ (normalize แล้ว) ข้อความที่มีคำร่วมกันมากจะอยู่ใกล้กัน."""
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            vector[zlib.crc32(token.encode("utf-8")) % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class TimedEmbeddings(Embeddings):
+    """นับเวลารวม (seconds) และจำนวนข้อความที่ถูก embed (thread-safe เพราะ QueryBatcher embed ใน thread ของตัวเอง)."""
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+        self.seconds = 0.0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _timed(self, fn, texts: int):
+        start = time.perf_counter()
+        result = fn()
+        with self._lock:
+            self.seconds += time.perf_counter() - start
+            self.texts += texts
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._timed(lambda: self.inner.embed_documents(texts), len(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._timed(lambda: self.inner.embed_query(text), 1)
+
+
+class TimedVectorStore:
+    """
+    ส่งต่อทุก attribute ไปยัง vector store จริง แต่จับเวลา add_documents แต่ละครั้ง
+    แยกเป็นเวลา embed (จาก TimedEmbeddings) และเวลาที่เหลือ (เขียนลง Chroma)
+    """
+
+    def __init__(self, inner, embeddings: TimedEmbeddings, recorder, embed_stage: str, upsert_stage: str):
+        self._inner = inner
+        self._embeddings = embeddings
+        self._recorder = recorder
+        self._embed_stage = embed_stage
+        self._upsert_stage = upsert_stage
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def add_documents(self, documents, **kwargs):
+        embed_before = self._embeddings.seconds
+        start = time.perf_counter()
+        result = self._inner.add_documents(documents, **kwargs)
+        elapsed = time.perf_counter() - start
+        embed_seconds = self._embeddings.seconds - embed_before
+        self._recorder.record(self._embed_stage, embed_seconds, len(documents))
+        self._recorder.record(self._upsert_stage, elapsed - embed_seconds, len(documents))
+        return result
+
+
+class StubLLM:
+    """
+    LLM จำลอง: ตอบด้วย answer_tokens คำ โดยใช้เวลา latency_ms ก่อน token แรก
+    และ 1/tokens_per_second ต่อ token (0 = ไม่หน่วง วัดเฉพาะ overhead ของ pipeline)
+    """
+
+    def __init__(self, answer_tokens: int = 64, latency_ms: float = 0.0, tokens_per_second: float = 0.0):
+        self.answer_tokens = answer_tokens
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.prompt_chars = 0
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        self.prompt_chars += len(prompt)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        for i in range(self.answer_tokens):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            yield f"token{i} "
+
+    def invoke(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
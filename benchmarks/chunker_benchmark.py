@@ -0,0 +1,82 @@
+"""
+เปรียบเทียบ TextChunker (text_chunker.py) กับ RecursiveCharacterTextSplitter ของ LangChain
+วัด chunks/sec (perf_counter) และการจอง memory (tracemalloc: peak และจำนวน block) แยกรอบกัน
+เพราะ tracemalloc ทำให้โค้ดช้าลงมากจนตัวเลขความเร็วใช้ไม่ได้
+
+รัน: poe bench-chunker  หรือ  python benchmarks/chunker_benchmark.py --pages 2000 --pdf-dir src/temp
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# โค้ดใน src/ import กันเองแบบไม่มี package prefix (เหมือน tests/conftest.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from text_chunker import TextChunker
+from synthetic_corpus import synthetic_pages
+
+
+def pdf_pages(pdf_dir: str):
+    """ข้อความรายหน้าจาก PDF จริงในโฟลเดอร์ (extract ก่อนเริ่มจับเวลา)."""
+    from pdf_processing import load_pdf
+    pages = []
+    for name in sorted(os.listdir(pdf_dir)):
+        if name.lower().endswith(".pdf"):
+            pages.extend(load_pdf(os.path.join(pdf_dir, name)))
+    return pages
+
+
+def langchain_chunks(pages, chunk_size, chunk_overlap):
+    # แบบเดิมใน chunk_documents: สร้าง splitter ใหม่ต่อการเรียกแต่ละครั้ง
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              length_function=len, add_start_index=True)
+    return splitter.split_documents(pages)
+
+
+def native_chunks(pages, chunk_size, chunk_overlap):
+    return list(TextChunker(chunk_size, chunk_overlap).split_documents(pages))
+
+
+def measure(split, pages, chunk_size, chunk_overlap, repeat):
+    best, count = float("inf"), 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = len(split(pages, chunk_size, chunk_overlap))
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    chunks = split(pages, chunk_size, chunk_overlap) # เก็บผลไว้เพื่อนับ block ของ chunks ที่ยังมีชีวิตอยู่
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del chunks
+    return {"chunks": count, "seconds": best, "chunks_per_sec": count / best if best else 0.0,
+            "peak_kib": peak / 1024, "live_blocks": blocks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TextChunker against RecursiveCharacterTextSplitter")
+    parser.add_argument("--pages", type=int, default=2000, help="number of synthetic pages")
+    parser.add_argument("--pdf-dir", help="use pages extracted from the PDFs in this folder instead")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per splitter (best is reported)")
+    args = parser.parse_args()
+
+    pages = pdf_pages(args.pdf_dir) if args.pdf_dir else synthetic_pages(args.pages)
+    characters = sum(len(page.page_content) for page in pages)
+    print(f"corpus: {len(pages)} pages, {characters / 1e6:.1f}M characters, "
+          f"chunk_size={args.chunk_size}, chunk_overlap={args.chunk_overlap}")
+    print(f"{'splitter':<18}{'chunks':>9}{'seconds':>10}{'chunks/s':>12}{'peak KiB':>12}{'live blocks':>13}")
+    for name, split in (("langchain", langchain_chunks), ("native", native_chunks)):
+        result = measure(split, pages, args.chunk_size, args.chunk_overlap, args.repeat)
+        print(f"{name:<18}{result['chunks']:>9}{result['seconds']:>10.3f}{result['chunks_per_sec']:>12.0f}"
+              f"{result['peak_kib']:>12.0f}{result['live_blocks']:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Benchmark ของ ingestion (parse -> chunk -> embed -> upsert) และ query path (embed -> search -> prompt -> generate)
+รันแบบ offline บน CPU: ใช้ corpus PDF จำลอง (synthetic_corpus.py), embedding แบบ hashing และ LLM จำลอง
+(bench_stubs.py) แต่ส่วนที่เหลือเป็นโค้ดจริงของระบบ: iter_parsed_pdfs, run_ingest_pipeline, Chroma, BM25, dedup และ RAGSystem
+
+ผลลัพธ์เป็น JSON (throughput, latency p50/p95/p99 ราย stage และ peak RSS) ใช้เทียบกันระหว่างรอบได้:
+    python benchmarks/run_benchmarks.py run --files 50 --pages-per-file 20 --queries 200 --output before.json
+    python benchmarks/run_benchmarks.py run ... --output after.json
+    python benchmarks/run_benchmarks.py compare before.json after.json --threshold 0.1
+
+ทุกอย่างที่ระบบเขียนลงดิสก์ (chroma_db, .cache) อยู่ใน --workdir ซึ่งถูกล้างก่อน ingest ทุกครั้ง
+peak RSS เป็นค่าสะสมของ process (ค่าของ query จึงรวมช่วง ingest ถ้ารันต่อกันใน process เดียว)
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# โค้ดใน src/ import กันเองแบบไม่มี package prefix (เหมือน tests/conftest.py)
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+
+import resources
+from bench_metrics import RESULTS_VERSION, StageRecorder, compare_results, environment_info, peak_rss_mb
+from bench_stubs import HashingEmbeddings, StubLLM, TimedEmbeddings, TimedVectorStore
+from synthetic_corpus import SyntheticCorpus
+from parallel_ingest import DEFAULT_INGEST_WORKERS
+from utils.constant import CHROMA_PERSIST_DIR, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_LENGTH_UNIT, DEDUP_ENABLED
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKDIR = os.path.join(REPO_ROOT, ".cache", "bench")
+
+
+def create_embeddings(kind: str):
+    if kind == "hashing":
+        return HashingEmbeddings()
+    # model จริง (ต้องมี model อยู่ใน cache ของ Hugging Face แล้วถ้าจะรัน offline)
+    return resources.create_embedding_model(use_cache=False)
+
+
+def run_ingest(paths, embeddings: TimedEmbeddings, recorder: StageRecorder, batch_size: int, use_lexical: bool,
+               workers: int):
+    """
+    ingest ผ่าน path เดียวกับ vector_store_builder: job พร้อม file_hash (ใช้ page cache และ chunk ID แบบ deterministic),
+    parse + chunk ขนานด้วย iter_parsed_pdfs, manifest checkpoint, dedup index ตาม DEDUP_ENABLED และ build_ann_index
+    เวลา parse + chunk เป็นเวลาต่อไฟล์ใน worker (ทำขนานไปกับ embed เมื่อ workers > 1)
+    """
+    from index_manifest import IndexManifest, MANIFEST_FILE_NAME, compute_file_hash
+    from ingest_pipeline import PendingFile, run_ingest_pipeline
+    from parallel_ingest import PdfJob, iter_parsed_pdfs
+    from vector_store_builder import build_ann_index, get_index_settings, open_dedup_index, open_lexical_index
+
+    inner = resources.get_vector_store()
+    vector_store = TimedVectorStore(inner, embeddings, recorder, "ingest/embed", "ingest/upsert")
+    lexical_index = open_lexical_index(inner, batch_size) if use_lexical else None
+    dedup_index = open_dedup_index()
+    manifest = IndexManifest.load(os.path.join(CHROMA_PERSIST_DIR, MANIFEST_FILE_NAME),
+                                  get_index_settings(CHUNK_SIZE, CHUNK_OVERLAP))
+
+    start = time.perf_counter()
+    jobs, pending_files = [], {}
+    ingested_at = int(time.time())
+    for path in paths:
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        content_hash = compute_file_hash(path)
+        jobs.append(PdfJob(source_key=name, file_path=path,
+                           metadata={"source_pdf": name, "file_hash": content_hash, "ingested_at": ingested_at},
+                           chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, chunk_length_unit=CHUNK_LENGTH_UNIT))
+        pending_files[name] = PendingFile(path, stat.st_size, stat.st_mtime, content_hash)
+
+    def results():
+        for result in iter_parsed_pdfs(jobs, workers=workers):
+            recorder.record("ingest/parse_chunk", result.elapsed, len(result.chunks))
+            yield result
+
+    stats = run_ingest_pipeline(vector_store, results(), manifest=manifest, pending_files=pending_files,
+                                batch_size=batch_size, lexical_index=lexical_index, dedup_index=dedup_index)
+    if lexical_index is not None:
+        lexical_index.close()
+    ann_start = time.perf_counter()
+    build_ann_index(inner)
+    recorder.record("ingest/ann_index", time.perf_counter() - ann_start)
+    recorder.record("ingest/total", time.perf_counter() - start, stats.chunks_upserted)
+    if dedup_index is not None:
+        dedup_index.close()
+    return stats
+
+
+def run_queries(queries, embeddings: TimedEmbeddings, recorder: StageRecorder, warmup: int):
+    from qa_system import RAGSystem
+
+    rag = RAGSystem()
+    rag.answer_cache = None # วัด path เต็มทุกครั้ง (คำถามซ้ำจะไม่ถูกตอบจาก cache)
+    for query in queries[:warmup]:
+        rag.llm.invoke(rag.build_prompt(query, rag.retrieve(query)))
+
+    for query in queries[warmup:]:
+        embed_before = embeddings.seconds
+        start = time.perf_counter()
+        docs = rag.retrieve(query)
+        retrieved = time.perf_counter()
+        prompt = rag.build_prompt(query, docs)
+        prompted = time.perf_counter()
+        rag.llm.invoke(prompt)
+        done = time.perf_counter()
+
+        embed_seconds = embeddings.seconds - embed_before
+        recorder.record("query/embed", embed_seconds)
+        recorder.record("query/search", retrieved - start - embed_seconds)
+        recorder.record("query/prompt", prompted - retrieved)
+        recorder.record("query/generate", done - prompted)
+        recorder.record("query/total", done - start)
+
+
+def run(args) -> dict:
+    corpus = SyntheticCorpus(args.files, args.pages_per_file, args.seed)
+    workdir = os.path.abspath(args.workdir)
+    run_dir = os.path.join(workdir, "run")
+    paths = corpus.generate(os.path.join(workdir, "corpus"))
+
+    # ค่าคงที่ของระบบเป็น path แบบ relative (chroma_db, .cache/...) จึงรันใน run_dir เพื่อไม่ให้ไปแตะ index จริง
+    if "ingest" in args.stages and os.path.exists(run_dir):
+        shutil.rmtree(run_dir)
+    os.makedirs(run_dir, exist_ok=True)
+    os.chdir(run_dir)
+    if "ingest" not in args.stages and not os.path.exists(CHROMA_PERSIST_DIR):
+        raise SystemExit(f"No benchmark index in {run_dir}; run with --stages ingest first")
+
+    embeddings = TimedEmbeddings(create_embeddings(args.embedder))
+    resources.register("embedding_model", embeddings)
+    resources.register("llm", StubLLM(args.answer_tokens, args.llm_latency_ms, args.llm_tokens_per_second))
+
+    recorder = StageRecorder()
+    peak_rss = {}
+    ingest_stats = None
+    if "ingest" in args.stages:
+        ingest_stats = run_ingest(paths, embeddings, recorder, args.batch_size, not args.no_lexical, args.workers)
+        peak_rss["ingest"] = peak_rss_mb()
+        log.info(f"Ingested {ingest_stats.chunks_upserted} chunks from {ingest_stats.files_indexed} files "
+                 f"in {ingest_stats.elapsed:.2f}s")
+    if "query" in args.stages:
+        run_queries(corpus.queries(args.queries + args.warmup), embeddings, recorder, args.warmup)
+        peak_rss["query"] = peak_rss_mb()
+
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "corpus": corpus.params,
+            "queries": args.queries,
+            "embedder": args.embedder,
+            "batch_size": args.batch_size,
+            "lexical_index": not args.no_lexical,
+            "workers": args.workers,
+            "dedup": DEDUP_ENABLED,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "chunk_length_unit": CHUNK_LENGTH_UNIT,
+            "environment": environment_info(),
+        },
+        "stages": recorder.summary(),
+        "peak_rss_mb": peak_rss,
+        "ingest": None if ingest_stats is None else {
+            "files_indexed": ingest_stats.files_indexed, "files_failed": ingest_stats.files_failed,
+            "chunks": ingest_stats.chunks_upserted,
+        },
+    }
+
+
+def print_results(results: dict):
+    print(f"{'stage':<18}{'count':>8}{'throughput/s':>14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, summary in results["stages"].items():
+        print(f"{stage:<18}{summary['count']:>8}{summary['throughput']:>14.1f}"
+              f"{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}{summary['p99_ms']:>10.2f}")
+    for phase, rss in results["peak_rss_mb"].items():
+        print(f"peak RSS after {phase}: {rss} MB")
+
+
+def print_comparison(rows, threshold: float) -> bool:
+    print(f"{'stage':<18}{'metric':<12}{'baseline':>12}{'candidate':>12}{'change':>9}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['stage']:<18}{row['metric']:<12}{row['baseline']:>12.2f}{row['candidate']:>12.2f}"
+              f"{row['change']:>+9.1%}{flag}")
+    regressions = [row for row in rows if row["regression"]]
+    print(f"{len(regressions)} regression(s) worse than {threshold:.0%} (change: + = worse, - = better)")
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingestion and query benchmarks on a synthetic PDF corpus")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate the corpus (if needed) and run the benchmarks")
+    run_parser.add_argument("--stages", nargs="+", choices=("ingest", "query"), default=["ingest", "query"])
+    run_parser.add_argument("--files", type=int, default=50)
+    run_parser.add_argument("--pages-per-file", type=int, default=20)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--queries", type=int, default=200)
+    run_parser.add_argument("--warmup", type=int, default=5, help="queries run before measuring")
+    run_parser.add_argument("--batch-size", type=int, default=256, help="chunks per embed + upsert batch")
+    run_parser.add_argument("--workers", type=int, default=DEFAULT_INGEST_WORKERS,
+                            help="processes that parse + chunk PDFs in parallel (as vector_store_builder)")
+    run_parser.add_argument("--embedder", choices=("hashing", "model"), default="hashing",
+                            help="'model' uses the real embedding model from utils/constant.py")
+    run_parser.add_argument("--no-lexical", action="store_true", help="skip building the BM25 index")
+    run_parser.add_argument("--answer-tokens", type=int, default=64)
+    run_parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated time to first token")
+    run_parser.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="0 = no simulated decoding")
+    run_parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    run_parser.add_argument("--output", help="write results as JSON to this file")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as regression")
+    compare_parser.add_argument("--min-ms", type=float, default=0.5,
+                                help="ignore latency changes when both runs are below this many milliseconds")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.candidate, encoding="utf-8") as f:
+            candidate = json.load(f)
+        ok = print_comparison(compare_results(baseline, candidate, args.threshold, args.min_ms), args.threshold)
+        sys.exit(0 if ok else 1)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    if args.output:
+        args.output = os.path.abspath(args.output) # run() เปลี่ยน working directory
+    results = run(args)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+สร้าง corpus จำลองแบบ reproducible สำหรับ benchmark (seed เดียวกัน = ไฟล์ PDF ไบต์ต่อไบต์เหมือนกัน)
+- generate_corpus: เขียน PDF จริง (ข้อความหลายบรรทัดต่อหน้า) ให้ pdf_processing แกะข้อความได้ตามปกติ
+- synthetic_queries: คำถามที่สร้างจากข้อความในหน้าของ corpus เดียวกัน (จึงมีคำตอบอยู่ใน index เสมอ)
+- synthetic_pages: หน้าข้อความภาษาอังกฤษ/ไทยแบบไม่ต้องผ่าน PDF (สำหรับวัด chunker อย่างเดียว)
+คำศัพท์ถูกสุ่มจาก vocabulary ที่สร้างจากพยางค์ และเลือกด้วยความถี่แบบ Zipf ให้ BM25/embedding
+ทำงานใกล้เคียงกับข้อความจริง (ฟอนต์มาตรฐานของ PDF มีแค่ Latin จึงมีภาษาไทยเฉพาะใน synthetic_pages)
+"""
+import json
+import os
+import random
+from itertools import accumulate
+from typing import List, Sequence
+
+from langchain_core.documents import Document
+
+CORPUS_FORMAT_VERSION = 1 # เปลี่ยนเมื่อรูปแบบของ corpus เปลี่ยน (corpus เดิมในโฟลเดอร์จะถูกสร้างใหม่)
+SYLLABLES = ("ka", "ro", "mi", "ten", "sa", "lu", "vor", "in", "de", "qua", "pel", "an", "tor", "el", "shi",
+             "nu", "ber", "ox", "ga", "ry", "zen", "pa", "lo", "ex", "ti", "mar", "do", "vi", "sun", "ke")
+VOCABULARY_SIZE = 4000
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 11
+
+ENGLISH_WORDS = ("retrieval", "augmented", "generation", "vector", "store", "embedding", "chunk", "document",
+                 "summary", "model", "latency", "throughput", "index", "query", "the", "of", "and", "a", "to")
+# ข้อความไทยไม่เว้นวรรคระหว่างคำ จึงเป็นกรณีที่ splitter ต้องหา fallback เอง
+THAI_WORDS = ("การ", "ค้นหา", "เอกสาร", "ข้อมูล", "ระบบ", "สรุป", "ความ", "รู้", "แบบ", "จำลอง", "ภาษา", "ไทย",
+              "ที่", "และ", "ใน", "ของ", "เป็น", "ได้", "ให้", "ไม่")
+
+
+def build_vocabulary(seed: int = 0, size: int = VOCABULARY_SIZE) -> List[str]:
+    """คำศัพท์ที่ไม่ซ้ำกัน size คำ เรียงจากคำที่พบบ่อยที่สุด (อันดับใช้กับ Zipf weights)."""
+    rng = random.Random(f"vocabulary:{seed}")
+    words, seen = [], set()
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+class SyntheticCorpus:
+    """ข้อความของแต่ละหน้าคำนวณได้จาก (seed, ไฟล์, หน้า) โดยตรง จึงไม่ต้องเก็บข้อความทั้ง corpus ไว้."""
+
+    def __init__(self, files: int = 50, pages_per_file: int = 20, seed: int = 0):
+        self.files = files
+        self.pages_per_file = pages_per_file
+        self.seed = seed
+        self.vocabulary = build_vocabulary(seed)
+        self.cum_weights = list(accumulate(1.0 / rank for rank in range(1, len(self.vocabulary) + 1)))
+
+    @property
+    def params(self) -> dict:
+        return {"format": CORPUS_FORMAT_VERSION, "files": self.files, "pages_per_file": self.pages_per_file,
+                "seed": self.seed}
+
+    def file_name(self, file_index: int) -> str:
+        return f"synthetic_{file_index:05d}.pdf"
+
+    def page_lines(self, file_index: int, page: int) -> List[str]:
+        """บรรทัดข้อความของหน้า (มีรหัสเอกสารเฉพาะของไฟล์ปนอยู่ เพื่อให้มีคำที่ BM25 จับได้แม่นยำ)."""
+        rng = random.Random(f"page:{self.seed}:{file_index}:{page}")
+        code = f"doc{file_index:05d}"
+        lines = []
+        for _ in range(LINES_PER_PAGE):
+            words = rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=WORDS_PER_LINE)
+            if rng.random() < 0.1:
+                words[rng.randrange(WORDS_PER_LINE)] = code
+            lines.append(" ".join(words) + ("." if rng.random() < 0.3 else ""))
+        return lines
+
+    def generate(self, out_dir: str) -> List[str]:
+        """
+        เขียน PDF ทั้ง corpus ลง out_dir แล้วคืน path ทั้งหมด
+        ถ้าโฟลเดอร์มี corpus ที่สร้างด้วยค่าเดียวกันอยู่แล้วจะใช้ของเดิม (corpus.json เก็บค่าที่ใช้สร้าง)
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        paths = [os.path.join(out_dir, self.file_name(i)) for i in range(self.files)]
+        info_path = os.path.join(out_dir, "corpus.json")
+        if os.path.exists(info_path) and all(os.path.exists(path) for path in paths):
+            with open(info_path, encoding="utf-8") as f:
+                if json.load(f) == self.params:
+                    return paths
+
+        for file_index, path in enumerate(paths):
+            pages = [self.page_lines(file_index, page) for page in range(self.pages_per_file)]
+            with open(path, "wb") as f:
+                f.write(make_pdf(pages))
+        with open(info_path, "w", encoding="utf-8") as f:
+            json.dump(self.params, f)
+        return paths
+
+    def queries(self, count: int, words: int = 6) -> List[str]:
+        """คำถามจากช่วงข้อความสุ่มในหน้าสุ่มของ corpus (สุ่มด้วย seed เดียวกัน)."""
+        rng = random.Random(f"queries:{self.seed}")
+        queries = []
+        for _ in range(count):
+            lines = self.page_lines(rng.randrange(self.files), rng.randrange(self.pages_per_file))
+            tokens = " ".join(lines).replace(".", "").split()
+            start = rng.randrange(len(tokens) - words)
+            queries.append(f"What does the document say about {' '.join(tokens[start:start + words])}?")
+        return queries
+
+
+def _pdf_string(text: str) -> str:
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def make_pdf(pages: Sequence[Sequence[str]]) -> bytes:
+    """PDF 1.4 แบบไม่บีบอัด: แต่ละหน้ามีหลายบรรทัด (Helvetica, ข้อความ Latin-1 เท่านั้น) พร้อม xref ที่ถูกต้อง."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        body = " Tj T* ".join(_pdf_string(line) for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 760 Td {body} Tj ET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode()
+    return bytes(out)
+
+
+def synthetic_pages(count: int, seed: int = 0, words_per_page: int = 450) -> List[Document]:
+    """หน้าข้อความแบบ reproducible: สลับหน้าภาษาอังกฤษกับภาษาไทย มีย่อหน้าและบรรทัดใหม่ปน."""
+    rng = random.Random(seed)
+    pages = []
+    for number in range(count):
+        thai = number % 2 == 1
+        vocabulary, joiner = (THAI_WORDS, "") if thai else (ENGLISH_WORDS, " ")
+        sentences = []
+        remaining = words_per_page
+        while remaining > 0:
+            length = min(remaining, rng.randint(6, 24))
+            sentences.append(joiner.join(rng.choice(vocabulary) for _ in range(length)))
+            remaining -= length
+        separator = " " if thai else ". "
+        text = "\n\n".join(separator.join(sentences[i:i + 5]) for i in range(0, len(sentences), 5))
+        pages.append(Document(page_content=text, metadata={"source": "synthetic.pdf", "page": number}))
+    return pages
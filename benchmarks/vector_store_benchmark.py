@@ -0,0 +1,144 @@
+"""
+รายงาน recall เทียบกับ memory ของ compact vector store (compact_store.py)
+สร้าง collection แบบ int8 และ pq จาก embeddings ชุดเดียวกัน แล้ววัด recall@k เทียบกับ exact search (float32)
+latency ต่อ query และขนาดส่วนที่ต้องอยู่ใน RAM ตอนค้นหา ที่ค่า ivf_probes / rescore_candidates ต่างๆ
+
+embeddings มาจาก (เลือกอย่างใดอย่างหนึ่ง):
+- ค่าเริ่มต้น: embeddings จำลองแบบ clustered + low-rank (ใกล้เคียงการกระจายตัวของ sentence embeddings)
+- --embeddings file.npy: array (N, dim) float32 เช่น export จาก collection จริง
+- --from-index: ดึง embeddings จาก vector store ปัจจุบัน (ตาม VECTOR_STORE_BACKEND) ไม่เกิน --rows แถว
+
+รัน: poe bench-vectors  หรือ  python benchmarks/vector_store_benchmark.py --rows 200000 --output vectors.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# โค้ดใน src/ import กันเองแบบไม่มี package prefix (เหมือน tests/conftest.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from bench_metrics import summarize
+from compact_store import CompactCollection
+
+
+def synthetic_embeddings(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """embeddings จำลอง: กลุ่มหัวข้อ (clusters) บน subspace มิติต่ำ + noise เล็กน้อยทุกมิติ."""
+    rng = np.random.default_rng(seed)
+    latent_dim = min(48, dim)
+    projection = rng.normal(size=(latent_dim, dim)).astype(np.float32) / np.sqrt(latent_dim)
+    centers = rng.normal(size=(clusters, latent_dim)).astype(np.float32)
+    latent = centers[rng.integers(0, clusters, rows)] + 0.5 * rng.normal(size=(rows, latent_dim)).astype(np.float32)
+    return latent @ projection + 0.05 * rng.normal(size=(rows, dim)).astype(np.float32)
+
+
+def index_embeddings(limit: int) -> np.ndarray:
+    import resources
+    collection = resources.create_vector_store(embedding_model=None)._collection
+    vectors, page_size = [], 5000
+    for offset in range(0, min(collection.count(), limit), page_size):
+        page = collection.get(include=["embeddings"], limit=min(page_size, limit - offset), offset=offset)
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    norms = (vectors ** 2).sum(axis=1)
+    return np.stack([np.argsort(norms - 2.0 * (vectors @ query))[:k] for query in queries])
+
+
+def build(directory: str, vectors: np.ndarray, quantization: str, args) -> CompactCollection:
+    collection = CompactCollection(directory, quantization=quantization, pq_subvectors=args.pq_subvectors,
+                                   ivf_min_rows=args.ivf_min_rows)
+    ids = [str(i) for i in range(len(vectors))]
+    for start in range(0, len(vectors), args.batch_size):
+        end = start + args.batch_size
+        collection.upsert(ids[start:end], vectors[start:end], [""] * len(ids[start:end]))
+    collection.build_index()
+    return collection
+
+
+def evaluate(collection: CompactCollection, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    durations, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = collection.query([query], n_results=k, include=[])["ids"][0]
+        durations.append(time.perf_counter() - started)
+        recalls.append(len({int(chunk_id) for chunk_id in found} & set(expected.tolist())) / k)
+    latency = summarize(durations)
+    return {"recall": round(float(np.mean(recalls)), 4), "p50_ms": latency["p50_ms"], "p95_ms": latency["p95_ms"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs memory report for the compact vector store")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384, help="dimension of synthetic embeddings")
+    parser.add_argument("--clusters", type=int, default=200, help="topics in the synthetic embeddings")
+    parser.add_argument("--embeddings", help="load embeddings from this .npy file instead")
+    parser.add_argument("--from-index", action="store_true", help="use embeddings from the current vector store")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--pq-subvectors", type=int, default=48)
+    parser.add_argument("--ivf-min-rows", type=int, default=20000)
+    parser.add_argument("--probes", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)[:args.rows]
+    elif args.from_index:
+        vectors = index_embeddings(args.rows)
+    else:
+        vectors = synthetic_embeddings(args.rows, args.dim, args.clusters, args.seed)
+    if len(vectors) == 0:
+        print("No embeddings to benchmark.")
+        return
+    rng = np.random.default_rng(args.seed + 1)
+    # query = จุดในข้อมูลที่ถูกขยับเล็กน้อย (คำถามที่ใกล้กับ chunk แต่ไม่ตรงกันพอดี)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.1 * queries.std() * rng.normal(size=queries.shape).astype(np.float32)
+    truth = exact_top_k(vectors, queries, args.k)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, recall@{args.k}; "
+          f"float32 baseline: {vectors.nbytes / 1e6:.1f} MB")
+
+    report = {"rows": len(vectors), "dim": int(vectors.shape[1]), "k": args.k, "float32_mb": vectors.nbytes / 1e6,
+              "results": []}
+    print(f"{'quantization':<13}{'probes':>7}{'rescore':>9}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'RAM MB':>9}{'B/vector':>10}{'x smaller':>10}")
+    workdir = tempfile.mkdtemp(prefix="compact_bench_")
+    try:
+        for quantization in ("int8", "pq"):
+            started = time.perf_counter()
+            collection = build(os.path.join(workdir, quantization), vectors, quantization, args)
+            build_seconds = time.perf_counter() - started
+            memory = collection.memory_report()
+            for probes in args.probes if memory["ivf_lists"] else [0]:
+                for rescore in args.rescore:
+                    collection.ivf_probes, collection.rescore_candidates = probes, rescore
+                    result = evaluate(collection, queries, truth, args.k)
+                    result.update(quantization=quantization, probes=probes, rescore=rescore,
+                                  build_s=round(build_seconds, 2), **{key: memory[key] for key in (
+                                      "resident_mb", "bytes_per_vector", "compression", "ivf_lists")})
+                    report["results"].append(result)
+                    print(f"{quantization:<13}{probes or '-':>7}{rescore:>9}{result['recall']:>8.3f}"
+                          f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{memory['resident_mb']:>9.1f}"
+                          f"{memory['bytes_per_vector']:>10.1f}{memory['compression']:>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from embedding_cache import normalize_text
+
+log = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize คำถามสำหรับ exact match: ยุบ whitespace, ตัวพิมพ์เล็ก, ตัดเครื่องหมายท้ายประโยค."""
+    return normalize_text(query).lower().rstrip(" ?.!？")
+
+
+class AnswerCache:
+    """
+    Cache คำตอบของ RAGSystem เก็บใน SQLite (อยู่รอดข้ามการ restart)
+    - exact match: ใช้คำถามที่ normalize แล้ว
+    - semantic match (ถ้ากำหนด similarity_threshold): ใช้ cosine similarity ของ query embedding
+    - TTL: คำตอบที่เก่ากว่า ttl_seconds ถือว่าหมดอายุ
+    - LRU: เก็บไม่เกิน max_entries รายการ ลบรายการที่ไม่ได้ใช้นานที่สุดก่อน
+    - คำตอบผูกกับ index version ถ้า vector store ถูก index ใหม่ cache เดิมจะถูกล้างอัตโนมัติ
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = 24 * 3600, max_entries: int = 1000,
+                 similarity_threshold: Optional[float] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index_version: Optional[str] = None
+        self._semantic_keys: List[str] = [] # in-memory matrix ของ query embeddings สำหรับ semantic match
+        self._semantic_positions: Dict[str, int] = {} # key -> แถวใน _semantic_matrix
+        self._semantic_matrix: Optional[np.ndarray] = None # จองแถวเผื่อไว้ ใช้จริงแค่ len(_semantic_keys) แถวแรก
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                embedding BLOB,
+                answer TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                index_version TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self._load_semantic_matrix()
+
+    @staticmethod
+    def _key(normalized_query: str) -> str:
+        return hashlib.sha256(normalized_query.encode("utf-8")).hexdigest()
+
+    def _sync_index_version(self, index_version: Optional[str]):
+        """ถ้า index version เปลี่ยน (builder index ข้อมูลใหม่) คำตอบเดิมทั้งหมดใช้ไม่ได้แล้ว."""
+        if index_version == self._index_version:
+            return
+        deleted = self._conn.execute(
+            "DELETE FROM answers WHERE index_version IS NOT ?", (index_version,)
+        ).rowcount
+        self._conn.commit()
+        if deleted:
+            log.info(f"Answer cache invalidated: index version changed, dropped {deleted} cached answer(s).")
+        self._index_version = index_version
+        self._load_semantic_matrix()
+
+    def _load_semantic_matrix(self):
+        """อ่าน query embeddings ทั้งหมดจาก SQLite ใหม่ (เฉพาะตอนเปิด, clear และเมื่อ index version เปลี่ยน)."""
+        self._semantic_keys, self._semantic_positions, self._semantic_matrix = [], {}, None
+        if self.similarity_threshold is None:
+            return
+        for key, blob in self._conn.execute("SELECT key, embedding FROM answers WHERE embedding IS NOT NULL"):
+            self._set_semantic_row(key, np.frombuffer(blob, dtype=np.float32))
+
+    def _set_semantic_row(self, key: str, vector: np.ndarray):
+        """เพิ่มหรือแทนที่แถวของ key ใน matrix (ขยายความจุทีละสองเท่า จึงเฉลี่ย O(1) ต่อคำตอบ)."""
+        position = self._semantic_positions.get(key)
+        if position is None:
+            position = len(self._semantic_keys)
+            if self._semantic_matrix is None or position == len(self._semantic_matrix):
+                grown = np.empty((max(16, 2 * position), vector.shape[0]), dtype=np.float32)
+                if position:
+                    grown[:position] = self._semantic_matrix[:position]
+                self._semantic_matrix = grown
+            self._semantic_keys.append(key)
+            self._semantic_positions[key] = position
+        self._semantic_matrix[position] = vector
+
+    def _drop_semantic_rows(self, keys: Iterable[str]):
+        """ลบแถวของ keys โดยย้ายแถวสุดท้ายมาแทนที่ (ไม่ต้องสร้าง matrix ใหม่)."""
+        for key in keys:
+            position = self._semantic_positions.pop(key, None)
+            if position is None:
+                continue
+            last_key = self._semantic_keys.pop()
+            if last_key != key:
+                self._semantic_matrix[position] = self._semantic_matrix[len(self._semantic_keys)]
+                self._semantic_keys[position] = last_key
+                self._semantic_positions[last_key] = position
+
+    def _find_similar(self, query_embedding: List[float]) -> Optional[str]:
+        if not self._semantic_keys or query_embedding is None:
+            return None
+        matrix = self._semantic_matrix[:len(self._semantic_keys)]
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        similarities = matrix @ query_vector / np.where(norms == 0, 1.0, norms)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return self._semantic_keys[best]
+        return None
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, query: str, index_version: Optional[str] = None,
+            query_embedding: Optional[List[float]] = None) -> Optional[dict]:
+        """คืนค่า {"query", "result", "source_documents" (list of dict), "cached": True} หรือ None ถ้าไม่เจอ."""
+        now = time.time()
+        with self._lock:
+            self._sync_index_version(index_version)
+            key = self._key(normalize_query(query))
+            row = self._conn.execute(
+                "SELECT key, answer, sources, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None and self.similarity_threshold is not None:
+                similar_key = self._find_similar(query_embedding)
+                if similar_key:
+                    row = self._conn.execute(
+                        "SELECT key, answer, sources, created_at FROM answers WHERE key = ?", (similar_key,)
+                    ).fetchone()
+
+            if row is None or self._is_expired(row[3], now):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, row[0]))
+            self._conn.commit()
+            self.hits += 1
+        return {"query": query, "result": row[1], "source_documents": json.loads(row[2]), "cached": True}
+
+    def put(self, query: str, answer: str, sources: List[dict], index_version: Optional[str] = None,
+            query_embedding: Optional[List[float]] = None):
+        """เก็บคำตอบ (sources คือ list ของ {"page_content": ..., "metadata": {...}})."""
+        now = time.time()
+        key = self._key(normalize_query(query))
+        vector = np.asarray(query_embedding, dtype=np.float32) if query_embedding is not None else None
+        with self._lock:
+            self._sync_index_version(index_version)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, query, embedding, answer, sources, index_version, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, query, vector.tobytes() if vector is not None else None, answer,
+                 json.dumps(sources, ensure_ascii=False), index_version, now, now)
+            )
+            evicted = self._evict(now)
+            self._conn.commit()
+            if self.similarity_threshold is not None:
+                # อัปเดต matrix เฉพาะแถวที่เปลี่ยน (ไม่อ่าน embeddings ทั้งหมดจาก SQLite ใหม่ทุกครั้งที่ตอบ)
+                self._drop_semantic_rows(evicted)
+                if vector is not None and key not in evicted:
+                    self._set_semantic_row(key, vector)
+                else:
+                    self._drop_semantic_rows([key])
+
+    def _evict(self, now: float) -> List[str]:
+        """ลบคำตอบที่หมดอายุและที่เกิน max_entries (LRU) คืน keys ที่ถูกลบ."""
+        evicted = []
+        if self.ttl_seconds is not None:
+            cutoff = now - self.ttl_seconds
+            evicted += [key for (key,) in self._conn.execute("SELECT key FROM answers WHERE created_at < ?", (cutoff,))]
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (cutoff,))
+        count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count > self.max_entries:
+            oldest = [key for (key,) in self._conn.execute(
+                "SELECT key FROM answers ORDER BY last_access ASC LIMIT ?", (count - self.max_entries,)
+            )]
+            self._conn.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in oldest])
+            evicted += oldest
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._load_semantic_matrix()
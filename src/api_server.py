@@ -0,0 +1,313 @@
+import json
+import time
+import asyncio
+import logging
+import contextvars
+from contextlib import aclosing, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, List, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+import metrics
+
+from context_assembly import estimate_tokens
+from retrieval_filters import RetrievalFilters
+from logger_config import setup_logger
+from utils.constant import (
+    OLLAMA_BASE_URL, OLLAMA_MODEL_NAME, OLLAMA_TEMPERATURE, API_HOST, API_PORT,
+    API_RETRIEVAL_WORKERS, API_MAX_CONCURRENT_RETRIEVALS, API_MAX_CONCURRENT_GENERATIONS,
+    API_MAX_PENDING_REQUESTS, API_REQUEST_TIMEOUT, API_OLLAMA_MAX_CONNECTIONS,
+)
+
+log = logging.getLogger(__name__)
+
+
+class ServiceOverloaded(Exception):
+    """มีคำถามรอคิวเกิน API_MAX_PENDING_REQUESTS แล้ว."""
+
+
+class AsyncOllamaClient:
+    """
+    Client แบบ non-blocking สำหรับ Ollama HTTP API (/api/generate) ที่ใช้ connection pool ร่วมกัน
+    ส่ง transport เข้ามาได้ (เช่น httpx.MockTransport) เพื่อทดสอบกับ stub LLM server
+    """
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = OLLAMA_MODEL_NAME,
+                 temperature: float = OLLAMA_TEMPERATURE, max_connections: int = API_OLLAMA_MAX_CONNECTIONS,
+                 timeout: float = API_REQUEST_TIMEOUT, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.model = model
+        self.temperature = temperature
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    def _payload(self, prompt: str, stream: bool) -> dict:
+        return {"model": self.model, "prompt": prompt, "stream": stream, "options": {"temperature": self.temperature}}
+
+    async def generate(self, prompt: str) -> str:
+        response = await self._client.post("/api/generate", json=self._payload(prompt, stream=False))
+        response.raise_for_status()
+        return response.json().get("response", "")
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        async with self._client.stream("POST", "/api/generate", json=self._payload(prompt, stream=True)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def _serialize_docs(docs: list) -> list:
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+
+
+class QueryService:
+    """
+    ชั้น async ที่ครอบ RAGSystem สำหรับให้บริการหลายคำถามพร้อมกัน
+    - งาน retrieval (embedding + Chroma เป็น blocking) รันใน thread pool
+    - เรียก Ollama แบบ non-blocking ผ่าน AsyncOllamaClient
+    - จำกัดจำนวนงานพร้อมกันของแต่ละ backend ด้วย semaphore
+    - จำกัดจำนวนคำถามที่รอคิว (backpressure) และมี timeout ต่อคำถาม
+    """
+
+    def __init__(self, rag_system, llm_client: AsyncOllamaClient,
+                 retrieval_workers: int = API_RETRIEVAL_WORKERS,
+                 max_concurrent_retrievals: int = API_MAX_CONCURRENT_RETRIEVALS,
+                 max_concurrent_generations: int = API_MAX_CONCURRENT_GENERATIONS,
+                 max_pending_requests: int = API_MAX_PENDING_REQUESTS,
+                 request_timeout: float = API_REQUEST_TIMEOUT):
+        self.rag_system = rag_system
+        self.llm_client = llm_client
+        self.max_pending_requests = max_pending_requests
+        self.request_timeout = request_timeout
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=retrieval_workers, thread_name_prefix="retrieval")
+        self._retrieval_slots = asyncio.Semaphore(max_concurrent_retrievals)
+        self._generation_slots = asyncio.Semaphore(max_concurrent_generations)
+
+    async def _run_blocking(self, func, *args):
+        # copy_context: ให้ span() ที่เรียกใน thread pool บันทึกลง trace ของคำถามนี้
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, func, *args)
+
+    def admit(self) -> Callable[[], None]:
+        """
+        จองที่ในคิว (raise ServiceOverloaded ถ้าเต็ม) แล้วคืนฟังก์ชันคืนที่ซึ่งเรียกซ้ำได้
+        endpoint แบบ stream ต้อง admit ก่อนสร้าง response เพื่อให้ตอบ 503 ได้ก่อนส่ง status 200
+        """
+        if self.pending >= self.max_pending_requests:
+            raise ServiceOverloaded(f"{self.pending} requests already pending")
+        self.pending += 1
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.pending -= 1
+
+        return release
+
+    async def _prepare(self, query: str, filters: Optional[RetrievalFilters]):
+        """
+        คืนค่า (คำตอบจาก cache หรือ None, docs, prompt, ข้อมูลสำหรับ cache)
+        อ่านชุด index ครั้งเดียว: cache lookup, retrieval และ version stamp ของคำตอบมาจาก index เดียวกันเสมอ
+        """
+        components = self.rag_system.current_index()
+        index_version = self.rag_system.current_index_version(components)
+        cached, query_embedding = await self._run_blocking(
+            self.rag_system.get_cached_answer, query, index_version, filters, components
+        )
+        if cached:
+            return cached, None, None, (index_version, query_embedding, filters)
+        async with self._retrieval_slots:
+            docs = await self._run_blocking(self.rag_system.retrieve, query, filters, components)
+        prompt = self.rag_system.build_prompt(query, docs)
+        return None, docs, prompt, (index_version, query_embedding, filters)
+
+    async def _answer(self, query: str, filters: Optional[RetrievalFilters]) -> dict:
+        trace = metrics.start_trace("api_answer")
+        try:
+            with metrics.use_trace(trace):
+                cached, docs, prompt, cache_info = await self._prepare(query, filters)
+                if cached:
+                    cached["source_documents"] = _serialize_docs(cached["source_documents"])
+                    cached["timings"] = trace.finish()
+                    return cached
+                async with self._generation_slots:
+                    with trace.span("generate"):
+                        answer = await self.llm_client.generate(prompt)
+                trace.count("completion_tokens", estimate_tokens(answer))
+                await self._run_blocking(self.rag_system.cache_answer, query, answer, docs, *cache_info)
+        except BaseException:
+            trace.count("errors")
+            trace.finish("error")
+            raise
+        timings = trace.finish()
+        log.info(f"Answered '{query}' ({metrics.format_timings(timings)})")
+        return {"query": query, "result": answer, "source_documents": _serialize_docs(docs), "timings": timings}
+
+    async def answer(self, query: str, filters: Optional[RetrievalFilters] = None) -> dict:
+        release = self.admit()
+        try:
+            return await asyncio.wait_for(self._answer(query, filters), timeout=self.request_timeout)
+        finally:
+            release()
+
+    async def stream(self, query: str, filters: Optional[RetrievalFilters] = None,
+                     release: Optional[Callable[[], None]] = None) -> AsyncIterator[dict]:
+        """
+        เหมือน RAGSystem.stream_answer แต่เป็น async generator (sources -> token... -> done)
+        release คือค่าที่ได้จาก admit() ถ้าจองคิวไว้แล้ว (ไม่ส่งมา = admit ตอนเริ่มอ่าน generator)
+        """
+        release = release or self.admit()
+        trace = metrics.start_trace("api_stream")
+        try:
+            deadline = time.monotonic() + self.request_timeout
+            # use_trace ครอบเฉพาะช่วงที่ไม่มี yield เพื่อไม่ให้ ContextVar รั่วไปยังผู้เรียก generator
+            with metrics.use_trace(trace):
+                cached, docs, prompt, cache_info = await asyncio.wait_for(self._prepare(query, filters),
+                                                                          self.request_timeout)
+            if cached:
+                yield {"type": "sources", "source_documents": _serialize_docs(cached["source_documents"])}
+                yield {"type": "token", "text": cached["result"]}
+                yield {"type": "done", "result": cached["result"], "cached": True, "timings": trace.finish()}
+                return
+
+            yield {"type": "sources", "source_documents": _serialize_docs(docs)}
+            parts = []
+            async with self._generation_slots:
+                generate_start = time.perf_counter()
+                async for token in self.llm_client.stream(prompt):
+                    if time.monotonic() > deadline:
+                        raise asyncio.TimeoutError()
+                    if not parts:
+                        trace.mark("first_token", "rag_time_to_first_token_seconds")
+                    parts.append(token)
+                    yield {"type": "token", "text": token}
+                trace.add("generate", time.perf_counter() - generate_start)
+            trace.count("completion_tokens", len(parts))
+            answer = "".join(parts)
+            with metrics.use_trace(trace):
+                await self._run_blocking(self.rag_system.cache_answer, query, answer, docs, *cache_info)
+            yield {"type": "done", "result": answer, "timings": trace.finish()}
+        except asyncio.TimeoutError:
+            trace.count("errors")
+            trace.finish("timeout")
+            yield {"type": "error", "error": f"timed out after {self.request_timeout}s"}
+        except Exception as e:
+            log.error(f"An error occurred while streaming the answer: {e}", exc_info=True)
+            trace.count("errors")
+            trace.finish("error")
+            yield {"type": "error", "error": str(e)}
+        finally:
+            # client ตัดการเชื่อมต่อระหว่าง stream (GeneratorExit / CancelledError) ยังต้องปิด trace
+            if not trace.finished:
+                trace.finish("cancelled")
+            release()
+
+    async def aclose(self):
+        await self.llm_client.aclose()
+        self._executor.shutdown(wait=False)
+
+
+class FilterRequest(BaseModel):
+    source_pdfs: Optional[List[str]] = None
+    gdrive_file_ids: Optional[List[str]] = None
+    page_min: Optional[int] = None
+    page_max: Optional[int] = None
+    ingested_after: Optional[float] = None
+    ingested_before: Optional[float] = None
+
+
+class AskRequest(BaseModel):
+    query: str
+    filters: Optional[FilterRequest] = None
+
+    def retrieval_filters(self) -> Optional[RetrievalFilters]:
+        return RetrievalFilters(**self.filters.model_dump()) if self.filters else None
+
+
+def create_app(rag_system=None, llm_client: Optional[AsyncOllamaClient] = None, **service_kwargs) -> FastAPI:
+    """
+    สร้าง FastAPI app ถ้าไม่ส่ง rag_system มาจะสร้าง RAGSystem ตอน startup
+    (ส่ง rag_system / llm_client ปลอมเข้ามาได้สำหรับการทดสอบ)
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        system = rag_system
+        if system is None:
+            from qa_system import RAGSystem
+            system = await asyncio.to_thread(RAGSystem)
+        app.state.service = QueryService(system, llm_client or AsyncOllamaClient(), **service_kwargs)
+        yield
+        await app.state.service.aclose()
+
+    app = FastAPI(title="PDF Q&A API", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "pending_requests": app.state.service.pending}
+
+    @app.get("/metrics")
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.REGISTRY.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.post("/ask")
+    async def ask(request: AskRequest):
+        if not request.query.strip():
+            raise HTTPException(status_code=400, detail="Query cannot be empty.")
+        try:
+            return await app.state.service.answer(request.query, request.retrieval_filters())
+        except ServiceOverloaded as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Timed out while answering the question.")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"LLM backend error: {e}")
+
+    @app.post("/ask/stream")
+    async def ask_stream(request: AskRequest):
+        if not request.query.strip():
+            raise HTTPException(status_code=400, detail="Query cannot be empty.")
+        service = app.state.service
+        try:
+            release = service.admit()
+        except ServiceOverloaded as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+        async def ndjson():
+            # aclosing: ปิด stream ของ service ทันทีเมื่อ client ตัดการเชื่อมต่อ (ไม่รอ garbage collector)
+            async with aclosing(service.stream(request.query, request.retrieval_filters(), release)) as events:
+                async for event in events:
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+
+        # background: คืนที่ในคิวแม้ body จะไม่ถูกอ่านเลย (release เรียกซ้ำได้)
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson", background=BackgroundTask(release))
+
+    return app
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    setup_logger()
+    log.info(f"Starting API server on {API_HOST}:{API_PORT} (Ollama at {OLLAMA_BASE_URL})")
+    uvicorn.run(create_app(), host=API_HOST, port=API_PORT)
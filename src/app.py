@@ -1,5 +1,8 @@
 import streamlit as st
 from qa_system import RAGSystem # Import คลาสระบบ Q&A ที่เราสร้างไว้
+from metrics import format_timings
+from resources import format_startup_timings
+from retrieval_filters import RetrievalFilters
 from logger_config import setup_logger
 
 # ตั้งค่า Logger (เพื่อให้ log แสดงผลใน terminal ที่รัน streamlit)
@@ -29,6 +32,26 @@ def load_rag_system():
 # เรียกใช้ฟังก์ชันเพื่อโหลดระบบ (Streamlit จะจัดการ cache ให้เอง)
 rag_system = load_rag_system()
 
+# แสดงเวลาที่ใช้โหลดแต่ละส่วนตอนเริ่มระบบ (ดูว่าส่วนไหนทำให้ตอบคำถามแรกได้ช้า)
+with st.sidebar.expander("⏱️ เวลาที่ใช้เริ่มระบบ"):
+    st.text(format_startup_timings())
+
+# เลือกเอกสารที่ต้องการถาม (ไม่เลือก = ค้นหาจากทุกเอกสาร)
+# index_dir เป็นส่วนหนึ่งของ cache key: เมื่อ RAGSystem สลับไป index version ใหม่ (ดู index_worker.py) รายชื่อจะถูกโหลดใหม่
+@st.cache_data(ttl=300)
+def list_documents(index_dir: str):
+    return rag_system.list_documents()
+
+selected_documents = st.sidebar.multiselect(
+    "📄 ถามเฉพาะเอกสาร",
+    options=list_documents(rag_system.index_dir),
+    help="ค้นหาเฉพาะใน PDF ที่เลือก (ไม่เลือก = ค้นหาจากทุกเอกสาร)",
+)
+filters = RetrievalFilters(source_pdfs=selected_documents) if selected_documents else None
+
+# แสดงเวลาของแต่ละขั้นตอน (retrieve, prompt, generate, ...) ใต้คำตอบ
+show_timings = st.sidebar.checkbox("⏱️ แสดงเวลาของแต่ละขั้นตอน", value=False)
+
 # --- ส่วนของ User Interface ---
 
 # สร้าง session state สำหรับเก็บประวัติการแชท (ถ้ายังไม่มี)
@@ -47,30 +70,43 @@ if prompt := st.chat_input("ถามอะไรเกี่ยวกับเ
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # สร้างคำตอบจาก RAG system
+    # สร้างคำตอบจาก RAG system แบบ streaming (แสดง token ทันทีที่ LLM สร้างออกมา)
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
-        with st.spinner("กำลังค้นหาข้อมูลและสร้างคำตอบ..."):
-            response = rag_system.answer_question(prompt)
-
-            if "error" in response:
-                answer = f"เกิดข้อผิดพลาด: {response['error']}"
+        message_placeholder.markdown("⏳ กำลังค้นหาข้อมูลและสร้างคำตอบ...")
+        answer = ""
+        sources = []
+        timings = None
+        for event in rag_system.stream_answer(prompt, filters):
+            if event["type"] == "sources":
+                sources = event["source_documents"]
+            elif event["type"] == "token":
+                answer += event["text"]
+                message_placeholder.markdown(answer + "▌")
+            elif event["type"] == "done":
+                timings = event.get("timings")
+            elif event["type"] == "error":
+                answer = f"เกิดข้อผิดพลาด: {event['error']}"
+                message_placeholder.empty()
                 st.error(answer)
-            else:
-                answer = response.get("result", "ไม่พบคำตอบ")
-                message_placeholder.markdown(answer)
-
-                # (Optional) แสดงเอกสารอ้างอิงใน expander
-                sources = response.get("source_documents", [])
-                if sources:
-                    with st.expander("ดูแหล่งข้อมูลอ้างอิง"):
-                        for doc in sources:
-                            source_pdf = doc.metadata.get('source_pdf', 'N/A')
-                            page = doc.metadata.get('page', 'N/A')
-                            st.write(f"- **ไฟล์:** {source_pdf} (หน้า: {page})")
-
-                            cleaned_content = doc.page_content[:200].strip().replace('\n', ' ')
-                            st.caption(f"> {cleaned_content}...")
+                sources = []
+                break
+        else:
+            answer = answer or "ไม่พบคำตอบ"
+            message_placeholder.markdown(answer)
+            if show_timings:
+                st.caption(format_timings(timings))
+
+        # (Optional) แสดงเอกสารอ้างอิงใน expander
+        if sources:
+            with st.expander("ดูแหล่งข้อมูลอ้างอิง"):
+                for doc in sources:
+                    source_pdf = doc.metadata.get('source_pdf', 'N/A')
+                    page = doc.metadata.get('page', 'N/A')
+                    st.write(f"- **ไฟล์:** {source_pdf} (หน้า: {page})")
+
+                    cleaned_content = doc.page_content[:200].strip().replace('\n', ' ')
+                    st.caption(f"> {cleaned_content}...")
 
 
     # เพิ่มคำตอบของ assistant ไปยังประวัติการแชท
@@ -0,0 +1,674 @@
+# Vector store แบบกะทัดรัดสำหรับ collection ขนาดใหญ่ (ใช้แทน Chroma เมื่อ VECTOR_STORE_BACKEND = "compact")
+# - vector ที่ใช้ค้นหาถูก quantize เป็น int8 (1 byte/มิติ + scale ต่อแถว) หรือ product quantization (PQ: M bytes/vector)
+#   และเก็บใน memory-mapped array (codes.bin) ให้ OS จัดการว่าส่วนไหนอยู่ใน RAM
+# - IVF (inverted file): จัดกลุ่ม vectors ด้วย k-means แล้วค้นหาเฉพาะ ivf_probes กลุ่มที่ใกล้ query ที่สุด
+# - candidates จากการค้นหาแบบประมาณถูก re-score ด้วย vector float32 (vectors.f32 บนดิสก์ อ่านเฉพาะแถวที่ต้องใช้)
+# - ข้อความและ metadata ของ chunk อยู่ใน SQLite แยกต่างหาก และถูกอ่านเฉพาะ hits สุดท้าย
+# CompactCollection มี method ชุดเดียวกับ Chroma collection ที่โค้ดส่วนอื่นใช้ (query, get, count)
+# ส่วน CompactVectorStore เป็น LangChain VectorStore ที่มี _collection เหมือน langchain Chroma
+# จึงใช้กับ QueryBatcher, HybridRetriever, ingest_pipeline และ RAGSystem ได้โดยไม่ต้องแก้โค้ดเหล่านั้น
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from embedding_cache import SQLITE_MAX_VARIABLES
+
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+META_FILE_NAME = "meta.json"
+QUANTIZATIONS = ("int8", "pq")
+TRAIN_SAMPLE_SIZE = 50000 # จำนวน vectors สูงสุดที่ใช้ train IVF centroids
+PQ_TRAIN_SAMPLE_SIZE = 20000 # จำนวน vectors สูงสุดที่ใช้ train PQ codebooks (train ทีละ subvector จึงต้องการน้อยกว่า)
+BLOCK_ROWS = 65536 # จำนวนแถวต่อ block ตอน scan/encode (จำกัด memory ชั่วคราว)
+PQ_CENTROIDS = 256 # centroids ต่อ subvector (code 1 byte)
+
+_KEY_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+_COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def nearest_centroids(data: np.ndarray, centroids: np.ndarray, count: int = 1) -> np.ndarray:
+    """index ของ centroid ที่ใกล้ที่สุด (L2) ของแต่ละแถว (count > 1 = คืน count อันดับแรก เรียงใกล้ -> ไกล)."""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    result = []
+    for start in range(0, len(data), BLOCK_ROWS):
+        distances = centroid_norms - 2.0 * (data[start:start + BLOCK_ROWS] @ centroids.T)
+        if count == 1:
+            result.append(distances.argmin(axis=1))
+            continue
+        top = np.argpartition(distances, count - 1, axis=1)[:, :count]
+        order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+        result.append(np.take_along_axis(top, order, axis=1))
+    return np.concatenate(result) if result else np.empty(0, dtype=np.int64)
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """k-means แบบ Lloyd ด้วย numpy (ใช้ train IVF centroids และ PQ codebooks)."""
+    rng = np.random.default_rng(seed)
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_centroids(data, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        order = np.argsort(assignment, kind="stable")
+        filled = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(data[order], starts, axis=0) / counts[filled, None]
+        if not filled.all(): # cluster ว่าง -> สุ่มจุดใหม่จากข้อมูล
+            centroids[~filled] = data[rng.choice(len(data), int((~filled).sum()), replace=False)]
+    return centroids
+
+
+class ProductQuantizer:
+    """แบ่ง vector เป็น M subvectors แล้วแทนแต่ละส่วนด้วย index ของ centroid ที่ใกล้ที่สุด (1 byte)."""
+
+    def __init__(self, codebooks: np.ndarray):
+        self.codebooks = codebooks.astype(np.float32) # (M, centroids, dim / M)
+        self.subvectors, _, self.sub_dim = codebooks.shape
+
+    @classmethod
+    def train(cls, data: np.ndarray, subvectors: int, seed: int = 0) -> "ProductQuantizer":
+        dim = data.shape[1]
+        if dim % subvectors:
+            raise ValueError(f"Embedding dimension {dim} is not divisible by {subvectors} PQ subvectors")
+        sub_dim = dim // subvectors
+        codebooks = np.zeros((subvectors, PQ_CENTROIDS, sub_dim), dtype=np.float32)
+        for m in range(subvectors):
+            trained = kmeans(data[:, m * sub_dim:(m + 1) * sub_dim], PQ_CENTROIDS, seed=seed + m)
+            codebooks[m, :len(trained)] = trained
+            codebooks[m, len(trained):] = trained[0] # ข้อมูลน้อยกว่า 256 แถว: centroid ที่เหลือไม่ถูกเลือก
+        return cls(codebooks)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for m in range(self.subvectors):
+            sub = vectors[:, m * self.sub_dim:(m + 1) * self.sub_dim]
+            codes[:, m] = nearest_centroids(sub, self.codebooks[m])
+        return codes
+
+    def dot_table(self, query: np.ndarray) -> np.ndarray:
+        """dot product ระหว่างแต่ละ subvector ของ query กับทุก centroid: (M, 256)."""
+        return np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.subvectors, self.sub_dim))
+
+
+def encode_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """quantize แบบ symmetric ต่อแถว: vector ~= codes * scale."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def where_to_sql(where: dict) -> Tuple[str, list]:
+    """แปลง where clause แบบ Chroma ($and, $or, $in, $nin, $eq, $gte, ...) เป็นเงื่อนไข SQL บน metadata (JSON)."""
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(item) for item in condition]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params.extend(value for _, part_params in parts for value in part_params)
+            continue
+        if not _KEY_RE.match(key):
+            raise ValueError(f"Unsupported metadata key in filter: {key!r}")
+        field = f"json_extract(metadata, '$.\"{key}\"')"
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator in ("$in", "$nin"):
+                values = list(value)
+                placeholders = ",".join("?" * len(values)) or "NULL"
+                clauses.append(f"{field} {'NOT IN' if operator == '$nin' else 'IN'} ({placeholders})")
+                params.extend(values)
+            elif operator in _COMPARISONS:
+                clauses.append(f"{field} {_COMPARISONS[operator]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+    return " AND ".join(clauses) or "1", params
+
+
+class CompactCollection:
+    """
+    Collection ที่เก็บ vectors แบบ quantized + IVF index บน memory-mapped arrays และข้อความใน SQLite
+    แถวที่ถูกลบ/ถูก upsert ทับจะถูก mark ว่าตายแล้ว (ไม่ถูกย้าย) และหายไปเมื่อ rebuild
+    ค่าตั้งค่า quantization ที่ต่างจากที่เก็บไว้จะถูกใช้เมื่อมีการเขียนครั้งถัดไป (encode ใหม่จาก vectors float32 ได้เลย
+    โดยไม่ต้อง embed ใหม่)
+    """
+
+    def __init__(self, directory: str, quantization: str = "int8", pq_subvectors: int = 48,
+                 ivf_lists: Optional[int] = None, ivf_probes: int = 16, ivf_min_rows: int = 20000,
+                 rescore_candidates: int = 200, name: str = "compact"):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (expected one of {QUANTIZATIONS})")
+        self.directory = directory
+        self.name = name
+        self.quantization = quantization
+        self.pq_subvectors = pq_subvectors
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.ivf_min_rows = ivf_min_rows
+        self.rescore_candidates = rescore_candidates
+        self._lock = threading.RLock()
+        self._writable = False
+        self._arrays = None # cache ของ arrays ที่ใช้ค้นหา (โหลดใหม่เมื่อ meta.json เปลี่ยน)
+        self._meta_mtime = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "chunks.sqlite"), check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            """
+        )
+        self.meta = self._read_meta()
+
+    # --- ไฟล์และ meta ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self) -> dict:
+        path = self._path(META_FILE_NAME)
+        if not os.path.exists(path):
+            return {"format_version": FORMAT_VERSION, "dim": None, "rows": 0, "count": 0,
+                    "quantization": self.quantization, "pq_subvectors": self.pq_subvectors,
+                    "pq_trained_rows": 0, "ivf_trained_rows": 0}
+        self._meta_mtime = os.stat(path).st_mtime_ns
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        path = self._path(META_FILE_NAME)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(f"{path}.tmp", path)
+        self._meta_mtime = os.stat(path).st_mtime_ns
+        self._arrays = None
+
+    def _refresh(self):
+        """โหลด meta ใหม่ถ้า process อื่น (เช่น builder) เขียน collection นี้ไปแล้ว."""
+        path = self._path(META_FILE_NAME)
+        if os.path.exists(path) and os.stat(path).st_mtime_ns != self._meta_mtime:
+            self.meta = self._read_meta()
+            self._arrays = None
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.meta["dim"]
+
+    @property
+    def code_size(self) -> int:
+        return self.dim if self.meta["quantization"] == "int8" else self.meta["pq_subvectors"]
+
+    def _code_dtype(self):
+        return np.int8 if self.meta["quantization"] == "int8" else np.uint8
+
+    def _load_index(self) -> Tuple[Optional[np.ndarray], Optional[ProductQuantizer]]:
+        path = self._path("index.npz")
+        if not os.path.exists(path):
+            return None, None
+        with np.load(path) as data:
+            centroids = data["centroids"] if "centroids" in data else None
+            quantizer = ProductQuantizer(data["codebooks"]) if "codebooks" in data else None
+        return centroids, quantizer
+
+    def _save_index(self, centroids: Optional[np.ndarray], quantizer: Optional[ProductQuantizer]):
+        arrays = {}
+        if centroids is not None:
+            arrays["centroids"] = centroids
+        if quantizer is not None:
+            arrays["codebooks"] = quantizer.codebooks
+        with open(self._path("index.npz.tmp"), "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(self._path("index.npz.tmp"), self._path("index.npz"))
+
+    def _memmap(self, name: str, dtype, columns: Optional[int] = None):
+        rows = self.meta["rows"]
+        shape = (rows, columns) if columns else (rows,)
+        if rows == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=shape)
+
+    def _load_arrays(self) -> dict:
+        """arrays ที่ใช้ตอนค้นหา: codes และ vectors เป็น memmap, ค่าต่อแถว (norm, scale, alive, list) อยู่ใน RAM."""
+        with self._lock:
+            self._refresh()
+            if self._arrays is not None:
+                return self._arrays
+            rows = self.meta["rows"]
+            centroids, quantizer = self._load_index()
+            arrays = {
+                "vectors": self._memmap("vectors.f32", np.float32, self.dim),
+                "codes": self._memmap("codes.bin", self._code_dtype(), self.code_size),
+                "norms": np.fromfile(self._path("norms.f32"), dtype=np.float32, count=rows) if rows else None,
+                "scales": (np.fromfile(self._path("scales.f32"), dtype=np.float32, count=rows)
+                           if rows and self.meta["quantization"] == "int8" else None),
+                "alive_rows": self._alive_rows(),
+                "centroids": centroids,
+                "quantizer": quantizer,
+                "inverted": None,
+            }
+            if centroids is not None and rows:
+                lists = np.fromfile(self._path("lists.i32"), dtype=np.int32, count=rows)[arrays["alive_rows"]]
+                order = np.argsort(lists, kind="stable")
+                offsets = np.searchsorted(lists[order], np.arange(len(centroids) + 1))
+                arrays["inverted"] = (arrays["alive_rows"][order], offsets)
+            self._arrays = arrays
+            return arrays
+
+    def _alive_rows(self) -> np.ndarray:
+        rows = self.meta["rows"]
+        if rows == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(np.fromfile(self._path("alive.u8"), dtype=np.uint8, count=rows))
+
+    # --- การเขียน ---
+
+    def _ensure_writable(self):
+        """
+        ก่อนเขียนครั้งแรก: ตัดข้อมูลที่เขียนค้างจากการรันที่ถูกขัดจังหวะ (เกินจำนวนแถวใน meta)
+        และ encode ใหม่ถ้าค่าตั้งค่า quantization ต่างจากที่เก็บไว้
+        """
+        if self._writable:
+            return
+        self._refresh()
+        rows = self.meta["rows"]
+        if self.dim:
+            for name, row_bytes in self._row_files().items():
+                path = self._path(name)
+                if os.path.exists(path) and os.path.getsize(path) > rows * row_bytes:
+                    os.truncate(path, rows * row_bytes)
+        self._conn.execute("DELETE FROM chunks WHERE row >= ?", (rows,))
+        self._conn.commit()
+        self._writable = True
+        if (self.meta["quantization"], self.meta["pq_subvectors"]) != (self.quantization, self.pq_subvectors):
+            if self.meta["count"] == 0:
+                self._reset()
+            else:
+                log.info(f"Re-encoding compact store as {self.quantization} (was {self.meta['quantization']}).")
+                self.meta["quantization"] = self.quantization
+                self.meta["pq_subvectors"] = self.pq_subvectors
+                self._reencode()
+            self._write_meta()
+
+    def _reset(self):
+        """ล้าง collection ที่ไม่มีแถวที่มีชีวิตเหลืออยู่ (เริ่มใหม่ด้วยค่าตั้งค่าปัจจุบัน)."""
+        for name in ("vectors.f32", "codes.bin", "norms.f32", "alive.u8", "lists.i32", "scales.f32", "index.npz"):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+        self._conn.execute("DELETE FROM chunks")
+        self._conn.commit()
+        self.meta.update(dim=None, rows=0, count=0, quantization=self.quantization,
+                         pq_subvectors=self.pq_subvectors, pq_trained_rows=0, ivf_trained_rows=0)
+
+    def _row_files(self) -> Dict[str, int]:
+        files = {"vectors.f32": self.dim * 4, "codes.bin": self.code_size, "norms.f32": 4, "alive.u8": 1,
+                 "lists.i32": 4}
+        if self.meta["quantization"] == "int8":
+            files["scales.f32"] = 4
+        return files
+
+    def _sample(self, vectors: np.ndarray, alive_rows: np.ndarray, size: int = TRAIN_SAMPLE_SIZE) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        rows = alive_rows if len(alive_rows) <= size else np.sort(rng.choice(alive_rows, size, replace=False))
+        return np.asarray(vectors[rows], dtype=np.float32)
+
+    def _reencode(self):
+        """train PQ codebooks ใหม่ (โหมด pq) แล้ว encode ทุกแถวจาก vectors float32 ใหม่ทั้งหมด."""
+        vectors = self._memmap("vectors.f32", np.float32, self.dim)
+        centroids, quantizer = self._load_index()
+        if self.meta["quantization"] == "pq":
+            alive_rows = self._alive_rows()
+            quantizer = ProductQuantizer.train(self._sample(vectors, alive_rows, PQ_TRAIN_SAMPLE_SIZE),
+                                               self.meta["pq_subvectors"])
+            self.meta["pq_trained_rows"] = int(len(alive_rows))
+        else:
+            quantizer = None
+        with open(self._path("codes.bin.tmp"), "wb") as codes_file, \
+                open(self._path("scales.f32.tmp"), "wb") as scales_file:
+            for start in range(0, len(vectors), BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+                codes, scales = self._encode(block, quantizer)
+                codes_file.write(codes.tobytes())
+                if scales is not None:
+                    scales_file.write(scales.tobytes())
+        os.replace(self._path("codes.bin.tmp"), self._path("codes.bin"))
+        if self.meta["quantization"] == "int8":
+            os.replace(self._path("scales.f32.tmp"), self._path("scales.f32"))
+        else:
+            os.remove(self._path("scales.f32.tmp"))
+        self._save_index(centroids, quantizer)
+        self._arrays = None
+
+    def _encode(self, vectors: np.ndarray, quantizer: Optional[ProductQuantizer]):
+        if self.meta["quantization"] == "int8":
+            return encode_int8(vectors)
+        return quantizer.encode(vectors), None
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+               metadatas: Optional[List[dict]] = None):
+        """เพิ่มหรือแทนที่ chunks ตาม ID (ID เดิมถูก mark ว่าตายแล้วเพิ่มแถวใหม่ต่อท้าย)."""
+        if not ids:
+            return
+        metadatas = metadatas or [{} for _ in ids]
+        latest = {chunk_id: i for i, chunk_id in enumerate(ids)} # ID ซ้ำใน batch เดียวกัน: ใช้ตัวสุดท้าย
+        positions = sorted(latest.values())
+        vectors = np.asarray([embeddings[i] for i in positions], dtype=np.float32)
+        with self._lock:
+            self._ensure_writable()
+            if self.dim is None:
+                self.meta["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection ({self.dim})")
+            self._delete_rows(self._rows_for_ids([ids[i] for i in positions]))
+
+            centroids, quantizer = self._load_index()
+            if self.meta["quantization"] == "pq" and quantizer is None:
+                # ยังไม่มี codebooks: train จาก batch แรก (build_index จะ train ใหม่จากข้อมูลที่มากขึ้น)
+                quantizer = ProductQuantizer.train(vectors, self.meta["pq_subvectors"])
+                self.meta["pq_trained_rows"] = len(vectors)
+                self._save_index(centroids, quantizer)
+            codes, scales = self._encode(vectors, quantizer)
+            lists = nearest_centroids(vectors, centroids).astype(np.int32) if centroids is not None else \
+                np.full(len(vectors), -1, dtype=np.int32)
+            start = self.meta["rows"]
+            appends = {"vectors.f32": vectors, "codes.bin": codes, "norms.f32": (vectors ** 2).sum(axis=1),
+                       "alive.u8": np.ones(len(vectors), dtype=np.uint8), "lists.i32": lists}
+            if scales is not None:
+                appends["scales.f32"] = scales
+            for name, array in appends.items():
+                with open(self._path(name), "ab") as f:
+                    f.write(np.ascontiguousarray(array).tobytes())
+            self._conn.executemany(
+                "INSERT INTO chunks (row, chunk_id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(start + n, ids[i], documents[i], json.dumps(metadatas[i] or {}, ensure_ascii=False))
+                 for n, i in enumerate(positions)],
+            )
+            self._conn.commit()
+            self.meta["rows"] = start + len(positions)
+            self.meta["count"] += len(positions)
+            self._write_meta()
+
+    add = upsert
+
+    def _rows_for_ids(self, ids: List[str]) -> List[int]:
+        rows = []
+        for i in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            part = ids[i:i + SQLITE_MAX_VARIABLES]
+            cursor = self._conn.execute(
+                f"SELECT row FROM chunks WHERE chunk_id IN ({','.join('?' * len(part))})", part
+            )
+            rows.extend(row for row, in cursor)
+        return rows
+
+    def _delete_rows(self, rows: List[int]):
+        if not rows:
+            return
+        for i in range(0, len(rows), SQLITE_MAX_VARIABLES):
+            part = rows[i:i + SQLITE_MAX_VARIABLES]
+            self._conn.execute(f"DELETE FROM chunks WHERE row IN ({','.join('?' * len(part))})", part)
+        self._conn.commit()
+        with open(self._path("alive.u8"), "r+b") as f:
+            for row in sorted(rows):
+                f.seek(row)
+                f.write(b"\x00")
+        self.meta["count"] -= len(rows)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None):
+        with self._lock:
+            self._ensure_writable()
+            rows = self._rows_for_ids(list(ids)) if ids else []
+            if where:
+                sql, params = where_to_sql(where)
+                rows.extend(row for row, in self._conn.execute(f"SELECT row FROM chunks WHERE {sql}", params))
+            if rows:
+                self._delete_rows(sorted(set(rows)))
+                self._write_meta()
+
+    def build_index(self, force: bool = False):
+        """
+        train PQ codebooks และ IVF centroids ใหม่เมื่อข้อมูลโตขึ้นเกิน 2 เท่าของตอน train ครั้งล่าสุด (หรือ force)
+        แถวที่เพิ่มหลังจากนั้นถูก encode/assign ด้วย index เดิมตอน upsert (เรียกหลัง ingest จบทุกครั้ง)
+        """
+        with self._lock:
+            self._ensure_writable()
+            count = self.meta["count"]
+            if count == 0:
+                return
+            if self.meta["quantization"] == "pq" and (force or count > 2 * self.meta["pq_trained_rows"]):
+                log.info(f"Training PQ codebooks on {min(count, PQ_TRAIN_SAMPLE_SIZE)} of {count} vectors...")
+                self._reencode()
+            if count >= self.ivf_min_rows and (force or count > 2 * self.meta["ivf_trained_rows"]):
+                vectors = self._memmap("vectors.f32", np.float32, self.dim)
+                lists = self.ivf_lists or int(4 * np.sqrt(count))
+                log.info(f"Training IVF index with {lists} lists on {count} vectors...")
+                centroids = kmeans(self._sample(vectors, self._alive_rows()), lists)
+                with open(self._path("lists.i32.tmp"), "wb") as f:
+                    for start in range(0, len(vectors), BLOCK_ROWS):
+                        block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+                        f.write(nearest_centroids(block, centroids).astype(np.int32).tobytes())
+                os.replace(self._path("lists.i32.tmp"), self._path("lists.i32"))
+                self._save_index(centroids, self._load_index()[1])
+                self.meta["ivf_trained_rows"] = count
+            self._write_meta()
+
+    # --- การค้นหา ---
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self.meta["count"]
+
+    def _approximate(self, arrays: dict, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """ระยะ L2^2 โดยประมาณ (ไม่รวม |q|^2) จาก codes: |x|^2 - 2 q.x~"""
+        distances = np.empty(len(rows), dtype=np.float32)
+        table = arrays["quantizer"].dot_table(query) if self.meta["quantization"] == "pq" else None
+        for start in range(0, len(rows), BLOCK_ROWS):
+            block = rows[start:start + BLOCK_ROWS]
+            codes = arrays["codes"][block]
+            if table is None:
+                dots = (codes.astype(np.float32) @ query) * arrays["scales"][block]
+            else:
+                dots = table[np.arange(table.shape[0]), codes].sum(axis=1)
+            distances[start:start + len(block)] = arrays["norms"][block] - 2.0 * dots
+        return distances
+
+    def _candidate_rows(self, arrays: dict, query: np.ndarray) -> np.ndarray:
+        if arrays["inverted"] is None:
+            return arrays["alive_rows"]
+        members, offsets = arrays["inverted"]
+        probes = nearest_centroids(query[None, :], arrays["centroids"], min(self.ivf_probes, len(offsets) - 1))[0]
+        return np.concatenate([members[offsets[probe]:offsets[probe + 1]] for probe in probes])
+
+    def _search(self, arrays: dict, query: np.ndarray, k: int, rows: Optional[np.ndarray]) -> List[Tuple[int, float]]:
+        if rows is None:
+            rows = self._candidate_rows(arrays, query)
+        if len(rows) == 0:
+            return []
+        candidates = max(self.rescore_candidates, k)
+        if len(rows) > candidates:
+            approximate = self._approximate(arrays, query, rows)
+            rows = rows[np.argpartition(approximate, candidates - 1)[:candidates]]
+        rows = np.sort(rows) # อ่าน vectors float32 จากดิสก์ตามลำดับ
+        exact = ((np.asarray(arrays["vectors"][rows], dtype=np.float32) - query) ** 2).sum(axis=1)
+        best = np.argsort(exact)[:k]
+        return [(int(rows[i]), float(exact[i])) for i in best]
+
+    def _filter_rows(self, where: dict) -> np.ndarray:
+        sql, params = where_to_sql(where)
+        with self._lock:
+            rows = [row for row, in self._conn.execute(f"SELECT row FROM chunks WHERE {sql} ORDER BY row", params)]
+        return np.asarray(rows, dtype=np.int64)
+
+    def _fetch(self, rows: Iterable[int], include: Iterable[str]) -> Dict[int, tuple]:
+        rows = list(rows)
+        columns = ["row", "chunk_id"] + [column for column, key in (("document", "documents"),
+                                                                   ("metadata", "metadatas")) if key in include]
+        found = {}
+        with self._lock:
+            for i in range(0, len(rows), SQLITE_MAX_VARIABLES):
+                part = rows[i:i + SQLITE_MAX_VARIABLES]
+                cursor = self._conn.execute(
+                    f"SELECT {', '.join(columns)} FROM chunks WHERE row IN ({','.join('?' * len(part))})", part
+                )
+                for record in cursor:
+                    found[record[0]] = dict(zip(columns[1:], record[1:]))
+        for record in found.values():
+            if "metadata" in record:
+                record["metadata"] = json.loads(record["metadata"])
+        return found
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Optional[dict] = None,
+              include: Iterable[str] = ("documents", "metadatas", "distances")) -> dict:
+        """เหมือน Chroma collection.query: ผลลัพธ์เป็น list ต่อ query (distance = L2^2 แบบ exact)."""
+        include = set(include)
+        arrays = self._load_arrays()
+        rows = self._filter_rows(where) if where else None
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        hits = [self._search(arrays, query, n_results, rows) if self.dim else [] for query in queries]
+        records = self._fetch({row for query_hits in hits for row, _ in query_hits}, include)
+        # แถวที่ถูกลบไปแล้วระหว่างค้นหา (ไม่มีใน SQLite) จะถูกข้าม
+        hits = [[(row, distance) for row, distance in query_hits if row in records] for query_hits in hits]
+        result = {"ids": [[records[row]["chunk_id"] for row, _ in query_hits] for query_hits in hits]}
+        result["documents"] = ([[records[row]["document"] for row, _ in query_hits] for query_hits in hits]
+                               if "documents" in include else None)
+        result["metadatas"] = ([[records[row]["metadata"] for row, _ in query_hits] for query_hits in hits]
+                               if "metadatas" in include else None)
+        result["distances"] = ([[distance for _, distance in query_hits] for query_hits in hits]
+                               if "distances" in include else None)
+        result["embeddings"] = ([[arrays["vectors"][row].tolist() for row, _ in query_hits] for query_hits in hits]
+                                if "embeddings" in include else None)
+        return result
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Iterable[str] = ("documents", "metadatas")) -> dict:
+        """เหมือน Chroma collection.get: ดึงตาม ID และ/หรือ metadata filter เรียงตามลำดับที่เพิ่ม."""
+        include = set(include)
+        sql, params = where_to_sql(where) if where else ("1", [])
+        with self._lock:
+            if ids is not None:
+                ids = list(ids)
+                rows = []
+                for i in range(0, len(ids), SQLITE_MAX_VARIABLES):
+                    part = ids[i:i + SQLITE_MAX_VARIABLES]
+                    rows.extend(row for row, in self._conn.execute(
+                        f"SELECT row FROM chunks WHERE chunk_id IN ({','.join('?' * len(part))}) AND {sql}",
+                        part + params,
+                    ))
+                rows.sort()
+                rows = rows[offset or 0:(offset or 0) + limit if limit is not None else None]
+            else:
+                page = " LIMIT ? OFFSET ?" if limit is not None or offset else ""
+                page_params = [-1 if limit is None else limit, offset or 0] if page else []
+                rows = [row for row, in self._conn.execute(
+                    f"SELECT row FROM chunks WHERE {sql} ORDER BY row{page}", params + page_params
+                )]
+        records = self._fetch(rows, include)
+        rows = [row for row in rows if row in records]
+        result = {
+            "ids": [records[row]["chunk_id"] for row in rows],
+            "documents": [records[row]["document"] for row in rows] if "documents" in include else None,
+            "metadatas": [records[row]["metadata"] for row in rows] if "metadatas" in include else None,
+            "embeddings": None,
+        }
+        if "embeddings" in include:
+            vectors = self._load_arrays()["vectors"]
+            result["embeddings"] = np.asarray(vectors[rows], dtype=np.float32) if rows else \
+                np.zeros((0, self.dim or 0), dtype=np.float32)
+        return result
+
+    def memory_report(self) -> dict:
+        """ขนาดของส่วนที่ต้องอยู่ใน RAM ตอนค้นหา เทียบกับ vectors float32 (ที่อยู่บนดิสก์และอ่านเฉพาะตอน re-score)."""
+        arrays = self._load_arrays()
+        rows, count, dim = self.meta["rows"], self.meta["count"], self.dim or 0
+        per_row = self.code_size + 4 + 1 + 4 + (4 if self.meta["quantization"] == "int8" else 0) if dim else 0
+        index_bytes = sum(array.nbytes for array in (arrays["centroids"], arrays["quantizer"] and
+                                                     arrays["quantizer"].codebooks) if array is not None)
+        resident = rows * per_row + index_bytes
+        return {
+            "quantization": self.meta["quantization"],
+            "rows": rows,
+            "live_rows": count,
+            "dim": dim,
+            "ivf_lists": 0 if arrays["centroids"] is None else len(arrays["centroids"]),
+            "resident_mb": round(resident / 1e6, 2),
+            "bytes_per_vector": round(resident / rows, 1) if rows else 0.0,
+            "float32_mb": round(rows * dim * 4 / 1e6, 2),
+            "compression": round(dim * 4 / (resident / rows), 2) if rows else 0.0,
+            "text_mb": round(os.path.getsize(self._path("chunks.sqlite")) / 1e6, 2),
+        }
+
+
+class CompactVectorStore(VectorStore):
+    """LangChain VectorStore บน CompactCollection (_collection และ embeddings เหมือน langchain Chroma)."""
+
+    def __init__(self, directory: str, embedding_function: Optional[Embeddings] = None, **collection_kwargs):
+        self._embedding_function = embedding_function
+        self._collection = CompactCollection(directory, **collection_kwargs)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            import uuid
+            ids = [str(uuid.uuid4()) for _ in texts]
+        self._collection.upsert(ids=list(ids), embeddings=self._embedding_function.embed_documents(texts),
+                                documents=texts, metadatas=metadatas)
+        return list(ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        self._collection.delete(ids=ids)
+        return True
+
+    def get(self, **kwargs) -> dict:
+        return self._collection.get(**kwargs)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        results = self._collection.query(query_embeddings=[self._embedding_function.embed_query(query)],
+                                         n_results=k, where=filter)
+        return [(Document(id=chunk_id, page_content=text, metadata=metadata), distance)
+                for chunk_id, text, metadata, distance in zip(results["ids"][0], results["documents"][0],
+                                                              results["metadatas"][0], results["distances"][0])]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def build_index(self, force: bool = False):
+        self._collection.build_index(force=force)
+
+    def persist(self):
+        """ข้อมูลถูกเขียนลงดิสก์ทุกครั้งที่ add/delete อยู่แล้ว (มีไว้ให้เรียกได้เหมือน Chroma)."""
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, directory: str = "compact_store",
+                   **kwargs: Any) -> "CompactVectorStore":
+        store = cls(directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.build_index()
+        return store
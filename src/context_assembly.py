@@ -0,0 +1,114 @@
+import re
+import logging
+from typing import List, Optional, Set
+
+from langchain_core.documents import Document
+
+log = logging.getLogger(__name__)
+
+_THAI_CHAR_RE = re.compile(r"[\u0e00-\u0e7f]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    ประมาณจำนวน tokens โดยไม่ต้องโหลด tokenizer ของ LLM
+    ภาษาอังกฤษเฉลี่ย ~4 ตัวอักษรต่อ token ส่วนภาษาไทย ~2 ตัวอักษรต่อ token
+    """
+    thai_chars = len(_THAI_CHAR_RE.findall(text))
+    return (len(text) - thai_chars + 3) // 4 + (thai_chars + 1) // 2
+
+
+def _source_key(doc: Document) -> str:
+    meta = doc.metadata
+    return str(meta.get("gdrive_file_id") or meta.get("source_pdf") or meta.get("source", ""))
+
+
+def merge_overlapping_chunks(docs: List[Document]) -> List[Document]:
+    """
+    รวม chunks ที่มาจากไฟล์และหน้าเดียวกันและมีช่วงข้อความ (start_index) ซ้อนทับหรือต่อกัน เป็น chunk เดียว
+    ส่วนที่ซ้ำกันจาก chunk_overlap จะเหลือแค่ครั้งเดียว ผลลัพธ์เรียงตามอันดับที่ดีที่สุดของ chunks ที่ถูกรวม
+    """
+    groups = {}
+    merged = [] # [(rank, Document)]
+    for rank, doc in enumerate(docs):
+        if doc.metadata.get("start_index") is None:
+            merged.append((rank, doc))
+            continue
+        groups.setdefault((_source_key(doc), doc.metadata.get("page")), []).append((rank, doc))
+
+    for members in groups.values():
+        members.sort(key=lambda member: member[1].metadata["start_index"])
+        best_rank, first = members[0]
+        start = first.metadata["start_index"]
+        text = first.page_content
+        for rank, doc in members[1:]:
+            doc_start = doc.metadata["start_index"]
+            end = start + len(text)
+            if doc_start <= end:
+                text += doc.page_content[end - doc_start:]
+                best_rank = min(best_rank, rank)
+                continue
+            merged.append((best_rank, Document(page_content=text, metadata={**first.metadata, "start_index": start})))
+            best_rank, first, start, text = rank, doc, doc_start, doc.page_content
+        merged.append((best_rank, Document(page_content=text, metadata={**first.metadata, "start_index": start})))
+
+    merged.sort(key=lambda member: member[0])
+    return [doc for _, doc in merged]
+
+
+def _shingles(text: str, size: int = 8) -> Set[str]:
+    normalized = _WHITESPACE_RE.sub(" ", text).strip().lower()
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def drop_near_duplicates(docs: List[Document], threshold: float = 0.85) -> List[Document]:
+    """
+    ข้าม chunk ที่ซ้ำกับ chunk ที่อันดับดีกว่า วัดด้วย overlap coefficient ของ character 8-grams
+    (|A ∩ B| / min(|A|, |B|)) จึงจับได้ทั้งข้อความที่เกือบเหมือนกัน และข้อความที่ถูกครอบอยู่ใน chunk อื่น
+    """
+    kept, kept_shingles = [], []
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / min(len(shingles), len(other)) >= threshold for other in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def fit_token_budget(docs: List[Document], max_tokens: int, min_partial_tokens: int = 50) -> List[Document]:
+    """เลือก chunks ตามอันดับจนเต็ม max_tokens ถ้า chunk ถัดไปใส่ไม่พอ จะตัดให้พอดี (ถ้าเหลือที่อย่างน้อย min_partial_tokens)."""
+    selected, used = [], 0
+    for doc in docs:
+        tokens = estimate_tokens(doc.page_content)
+        if used + tokens <= max_tokens:
+            selected.append(doc)
+            used += tokens
+            continue
+        remaining = max_tokens - used
+        if remaining >= min_partial_tokens or not selected:
+            ratio = remaining / tokens
+            selected.append(Document(page_content=doc.page_content[:int(len(doc.page_content) * ratio)],
+                                     metadata=doc.metadata))
+        break
+    return selected
+
+
+def assemble_context(docs: List[Document], max_tokens: Optional[int] = 1500,
+                     duplicate_threshold: float = 0.85) -> List[Document]:
+    """
+    เตรียม chunks ก่อนยัดลง prompt: รวมช่วงที่ซ้อนทับ/ต่อกัน -> ตัด near-duplicates -> จำกัดจำนวน tokens
+    (max_tokens=None = ไม่จำกัด)
+    """
+    before = sum(estimate_tokens(doc.page_content) for doc in docs)
+    assembled = drop_near_duplicates(merge_overlapping_chunks(docs), duplicate_threshold)
+    if max_tokens is not None:
+        assembled = fit_token_budget(assembled, max_tokens)
+    after = sum(estimate_tokens(doc.page_content) for doc in assembled)
+    if before:
+        log.debug(f"Context assembled: {len(docs)} -> {len(assembled)} chunks, "
+                  f"~{before} -> ~{after} tokens ({1 - after / before:.0%} saved)")
+    return assembled
@@ -0,0 +1,319 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.constant import (
+    DEDUP_INDEX_PATH, DEDUP_CHUNK_THRESHOLD, DEDUP_DOCUMENT_THRESHOLD, DEDUP_SHINGLE_SIZE, DEDUP_NUM_PERM,
+    DEDUP_BANDS,
+)
+
+log = logging.getLogger(__name__)
+
+_PRIME = np.uint64(4294967291) # prime ที่ใหญ่ที่สุดที่ < 2^32 (a * h + b ไม่ล้น uint64 เมื่อ a < 2^31, h < 2^32)
+_SHINGLE_BASE = np.uint64(1000003)
+_SEED = 1 # ค่าคงที่: signature ต้องเหมือนเดิมทุกครั้งที่รัน เพื่อเทียบกับ signatures ที่เก็บไว้แล้ว
+_SQL_BATCH = 500 # จำนวน parameters ต่อ query (ไม่ให้เกิน limit ของ SQLite)
+_SOURCE_NAME_SQL = "COALESCE(json_extract(metadata, '$.source_pdf'), json_extract(metadata, '$.source_gdrive_pdf'))"
+
+
+def shingle_hashes(text: str, size: int = DEDUP_SHINGLE_SIZE) -> np.ndarray:
+    """
+    hash (uint32) ของ character shingles ยาว size ตัวอักษร (ไม่ซ้ำกัน) หลังแปลงเป็นตัวพิมพ์เล็กและยุบ whitespace
+    คำนวณแบบ polynomial rolling hash ด้วย numpy ทั้ง chunk ในครั้งเดียว (ไม่วน loop ทีละ shingle ใน Python)
+    """
+    normalized = " ".join(text.lower().split())
+    codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    size = max(1, min(size, len(codes)))
+    count = len(codes) - size + 1
+    if count <= 0:
+        return np.zeros(1, dtype=np.uint64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * _SHINGLE_BASE + codes[offset:offset + count] # ล้นแบบ mod 2^64 โดยตั้งใจ
+    return np.unique((hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+
+
+class MinHasher:
+    """
+    MinHash signature ของข้อความ: ค่าต่ำสุดของ num_perm hash functions (a * h + b) mod p บน shingles
+    สัดส่วนของตำแหน่งที่ signature สองอันตรงกันคือค่าประมาณ Jaccard similarity ของ shingles
+    LSH แบ่ง signature เป็น bands เอกสารที่ similarity สูงจะมีอย่างน้อยหนึ่ง band ตรงกันด้วยความน่าจะเป็นสูง
+    จึงหา candidates ได้จาก bucket ของแต่ละ band แทนการเทียบกับทุก chunk
+    """
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS,
+                 shingle_size: int = DEDUP_SHINGLE_SIZE):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(_SEED)
+        self._a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)[:, None]
+
+    @property
+    def config(self) -> str:
+        return f"minhash:{self.num_perm}:{self.bands}:{self.shingle_size}:{_SEED}"
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text, self.shingle_size)[None, :]
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def buckets(self, signature: np.ndarray) -> List[int]:
+        """key (int64) ของแต่ละ band รวมเลข band ไว้ใน hash แล้ว จึงเก็บทุก band ในตารางเดียวกันได้."""
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(band.to_bytes(2, "little") + rows, digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        return float(np.mean(first == second))
+
+
+class DedupIndex:
+    """
+    ตรวจ near-duplicate chunks และเอกสารตอน ingest ด้วย MinHash + LSH เก็บใน SQLite คู่กับ vector store
+    - chunk แรกที่เห็นเป็น canonical (ถูก embed และเก็บใน vector store ตามปกติ)
+    - chunk ที่ similarity กับ canonical ตั้งแต่ threshold ขึ้นไปเป็น duplicate: ไม่ถูก embed/เก็บใน vector store
+      แต่เก็บข้อความ + metadata (มี canonical_chunk_id) ไว้ที่นี่ ถ้า canonical ถูกลบ duplicate ตัวแรกจะถูก promote
+      ขึ้นมาเป็น canonical แทน (ดู remove) เนื้อหาจึงไม่หายไปจาก index เมื่อลบไฟล์ต้นฉบับ
+    - ระดับเอกสาร: signature ของข้อความทั้งไฟล์ ใช้รายงานไฟล์ที่เป็น revision ของไฟล์อื่น
+    การเขียนจะยังไม่ commit จนกว่าจะเรียก commit() (หลัง upsert batch ลง vector store แล้ว) เหมือน checkpoint ของ manifest
+    ตอนตอบคำถาม (read_only=True) ใช้หา chunks ของไฟล์ที่ถูกเก็บเป็น duplicate (ดู duplicates_from_sources)
+    """
+
+    def __init__(self, path: str = DEDUP_INDEX_PATH, threshold: float = DEDUP_CHUNK_THRESHOLD,
+                 document_threshold: float = DEDUP_DOCUMENT_THRESHOLD, hasher: Optional[MinHasher] = None,
+                 read_only: bool = False):
+        self.path = path
+        self.threshold = threshold
+        self.document_threshold = document_threshold
+        self.hasher = hasher or MinHasher()
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._create_tables()
+
+    def _create_tables(self):
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                source_key TEXT NOT NULL,
+                canonical_id TEXT,
+                signature BLOB NOT NULL,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE INDEX IF NOT EXISTS chunks_by_canonical ON chunks (canonical_id);
+            CREATE INDEX IF NOT EXISTS chunks_by_source ON chunks (source_key);
+            CREATE TABLE IF NOT EXISTS chunk_buckets (bucket INTEGER NOT NULL, chunk_id TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS chunk_buckets_by_bucket ON chunk_buckets (bucket);
+            CREATE INDEX IF NOT EXISTS chunk_buckets_by_chunk ON chunk_buckets (chunk_id);
+            CREATE TABLE IF NOT EXISTS documents (source_key TEXT PRIMARY KEY, signature BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS document_buckets (bucket INTEGER NOT NULL, source_key TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS document_buckets_by_bucket ON document_buckets (bucket);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        if row is not None and row[0] != self.hasher.config:
+            # signatures ที่สร้างด้วยค่าตั้งค่าอื่นเทียบกันไม่ได้
+            log.warning(f"Dedup index was built with {row[0]}, clearing it for {self.hasher.config}")
+            self._clear_locked()
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('config', ?)", (self.hasher.config,))
+        self._conn.commit()
+
+    def _best_match(self, signature: np.ndarray, table: str, key: str,
+                    exclude: Iterable[str] = ()) -> Tuple[Optional[str], float]:
+        buckets = self.hasher.buckets(signature)
+        candidates = {
+            row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT {key} FROM {table}_buckets WHERE bucket IN ({','.join('?' * len(buckets))})",
+                buckets
+            )
+        }
+        candidates.difference_update(exclude)
+        best, best_similarity = None, 0.0
+        for candidate in sorted(candidates):
+            row = self._conn.execute(f"SELECT signature FROM {table}s WHERE {key} = ?", (candidate,)).fetchone()
+            similarity = self.hasher.similarity(signature, np.frombuffer(row[0], dtype=np.uint32))
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        return best, best_similarity
+
+    def register_chunk(self, chunk: Document, chunk_id: str, source_key: str,
+                       exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        บันทึก chunk แล้วคืนค่า chunk ID ของ canonical ถ้า chunk นี้เป็น near-duplicate (None = เป็น canonical เอง)
+        exclude คือ chunk IDs ที่กำลังจะถูกลบ (chunks เก่าของไฟล์ที่ถูกแก้ไข) ซึ่งห้ามใช้เป็น canonical
+        chunk ID ที่บันทึกไว้แล้ว (รันต่อหลังถูกขัดจังหวะ) จะได้ผลเหมือนเดิม
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT canonical_id FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is not None:
+                return row[0]
+            signature = self.hasher.signature(chunk.page_content)
+            canonical_id, similarity = self._best_match(signature, "chunk", "chunk_id", exclude)
+            if canonical_id is not None and similarity >= self.threshold:
+                metadata = {**chunk.metadata, "canonical_chunk_id": canonical_id}
+                self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, source_key, canonical_id, signature, document, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (chunk_id, source_key, canonical_id, signature.tobytes(), chunk.page_content,
+                     json.dumps(metadata, ensure_ascii=False))
+                )
+                return canonical_id
+            self._insert_canonical(chunk_id, source_key, signature)
+            return None
+
+    def _insert_canonical(self, chunk_id: str, source_key: str, signature: np.ndarray):
+        self._conn.execute("INSERT OR REPLACE INTO chunks (chunk_id, source_key, signature) VALUES (?, ?, ?)",
+                           (chunk_id, source_key, signature.tobytes()))
+        self._conn.executemany("INSERT INTO chunk_buckets (bucket, chunk_id) VALUES (?, ?)",
+                               ((bucket, chunk_id) for bucket in self.hasher.buckets(signature)))
+
+    def register_document(self, source_key: str, texts: List[str]) -> Optional[str]:
+        """
+        บันทึก signature ของทั้งเอกสาร (แทนที่ของเดิมถ้าไฟล์ถูกแก้ไข) แล้วคืนค่า source_key ของเอกสารอื่น
+        ที่เนื้อหาเกือบเหมือนกัน (similarity >= document_threshold) หรือ None
+        """
+        signature = self.hasher.signature("\n".join(texts))
+        with self._lock:
+            match, similarity = self._best_match(signature, "document", "source_key", exclude=(source_key,))
+            self._conn.execute("DELETE FROM document_buckets WHERE source_key = ?", (source_key,))
+            self._conn.execute("INSERT OR REPLACE INTO documents (source_key, signature) VALUES (?, ?)",
+                               (source_key, signature.tobytes()))
+            self._conn.executemany("INSERT INTO document_buckets (bucket, source_key) VALUES (?, ?)",
+                                   ((bucket, source_key) for bucket in self.hasher.buckets(signature)))
+        return match if match is not None and similarity >= self.document_threshold else None
+
+    def remove(self, chunk_ids: List[str]) -> List[Tuple[str, Document]]:
+        """
+        ลบ chunks (ทั้ง canonical และ duplicate) คืนค่า [(chunk ID, Document)] ของ duplicates ที่ถูก promote
+        เป็น canonical แทน canonical ที่ถูกลบ ซึ่งผู้เรียกต้อง upsert ลง vector store
+        """
+        removing = set(chunk_ids)
+        promoted = []
+        with self._lock:
+            sources = set()
+            orphaned = {} # canonical ID ที่ถูกลบ -> duplicates ที่ยังอยู่ (เรียงตามลำดับที่ถูกบันทึก)
+            for start in range(0, len(chunk_ids), _SQL_BATCH):
+                batch = chunk_ids[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                sources.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT source_key FROM chunks WHERE chunk_id IN ({placeholders})", batch))
+                for chunk_id, canonical_id in self._conn.execute(
+                        f"SELECT chunk_id, canonical_id FROM chunks WHERE canonical_id IN ({placeholders}) "
+                        f"ORDER BY rowid", batch):
+                    if chunk_id not in removing:
+                        orphaned.setdefault(canonical_id, []).append(chunk_id)
+                self._conn.execute(f"DELETE FROM chunk_buckets WHERE chunk_id IN ({placeholders})", batch)
+                self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+
+            for duplicates in orphaned.values():
+                new_canonical, rest = duplicates[0], duplicates[1:]
+                source_key, signature, text, metadata = self._conn.execute(
+                    "SELECT source_key, signature, document, metadata FROM chunks WHERE chunk_id = ?",
+                    (new_canonical,)
+                ).fetchone()
+                metadata = json.loads(metadata)
+                metadata.pop("canonical_chunk_id", None)
+                self._insert_canonical(new_canonical, source_key, np.frombuffer(signature, dtype=np.uint32))
+                for chunk_id in rest:
+                    row = self._conn.execute("SELECT metadata FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                    self._conn.execute("UPDATE chunks SET canonical_id = ?, metadata = ? WHERE chunk_id = ?",
+                                       (new_canonical, json.dumps({**json.loads(row[0]),
+                                                                   "canonical_chunk_id": new_canonical},
+                                                                  ensure_ascii=False), chunk_id))
+                promoted.append((new_canonical, Document(page_content=text, metadata=metadata)))
+
+            # เอกสารที่ไม่เหลือ chunk แล้ว (ไฟล์ถูกลบ) ไม่ต้องใช้เทียบอีกต่อไป
+            for source_key in sources:
+                if self._conn.execute("SELECT 1 FROM chunks WHERE source_key = ? LIMIT 1", (source_key,)).fetchone():
+                    continue
+                self._conn.execute("DELETE FROM documents WHERE source_key = ?", (source_key,))
+                self._conn.execute("DELETE FROM document_buckets WHERE source_key = ?", (source_key,))
+        return promoted
+
+    def duplicates_of(self, chunk_ids: List[str]) -> dict:
+        """คืนค่า {canonical chunk ID: [metadata ของ duplicates]} เช่น ใช้แสดงว่าข้อความเดียวกันอยู่ในไฟล์ใดบ้าง."""
+        result = {}
+        with self._lock:
+            for start in range(0, len(chunk_ids), _SQL_BATCH):
+                batch = chunk_ids[start:start + _SQL_BATCH]
+                for canonical_id, metadata in self._conn.execute(
+                        f"SELECT canonical_id, metadata FROM chunks WHERE canonical_id IN ({','.join('?' * len(batch))}) "
+                        f"ORDER BY rowid", batch):
+                    result.setdefault(canonical_id, []).append(json.loads(metadata))
+        return result
+
+    def duplicate_sources(self) -> List[str]:
+        """ชื่อไฟล์ (source_pdf / source_gdrive_pdf) ที่มี duplicates ซึ่งไม่อยู่ใน vector store ในชื่อของตัวเอง."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT {_SOURCE_NAME_SQL} FROM chunks WHERE canonical_id IS NOT NULL ORDER BY 1"
+            ) if row[0]]
+
+    def duplicates_from_sources(self, sources: List[str]) -> dict:
+        """
+        คืนค่า {canonical chunk ID: [metadata ของ duplicates]} เฉพาะ duplicates ของไฟล์ใน sources
+        (ชื่อไฟล์ตรงกับ source_pdf หรือ source_gdrive_pdf เหมือน RetrievalFilters.source_pdfs)
+        """
+        names = json.dumps(list(sources), ensure_ascii=False)
+        result = {}
+        with self._lock:
+            for canonical_id, metadata in self._conn.execute(
+                    "SELECT canonical_id, metadata FROM chunks WHERE canonical_id IS NOT NULL "
+                    "AND (json_extract(metadata, '$.source_pdf') IN (SELECT value FROM json_each(?)) "
+                    "OR json_extract(metadata, '$.source_gdrive_pdf') IN (SELECT value FROM json_each(?))) "
+                    "ORDER BY rowid", (names, names)):
+                result.setdefault(canonical_id, []).append(json.loads(metadata))
+        return result
+
+    def stats(self) -> dict:
+        """จำนวน canonical / duplicate chunks ทั้ง index และสัดส่วนที่ไม่ต้อง embed/เก็บ (dedup ratio)."""
+        with self._lock:
+            canonical, duplicates = self._conn.execute(
+                "SELECT COUNT(*) - COUNT(canonical_id), COUNT(canonical_id) FROM chunks"
+            ).fetchone()
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        total = canonical + duplicates
+        return {"canonical_chunks": canonical, "duplicate_chunks": duplicates, "documents": documents,
+                "dedup_ratio": duplicates / total if total else 0.0}
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def _clear_locked(self):
+        self._conn.executescript(
+            "DELETE FROM chunks; DELETE FROM chunk_buckets; DELETE FROM documents; DELETE FROM document_buckets;"
+        )
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+            self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
+
+from utils.constant import (
+    DRIVE_CACHE_DIR, DRIVE_PAGE_SIZE, DRIVE_DOWNLOAD_WORKERS, DRIVE_DOWNLOAD_CHUNK_SIZE,
+    DRIVE_MAX_RETRIES, DRIVE_RETRY_BACKOFF_SECONDS,
+)
+
+log = logging.getLogger(__name__)
+
+SYNC_STATE_FORMAT_VERSION = 1
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+FILE_FIELDS = "id, name, md5Checksum, modifiedTime, size"
+
+
+@dataclass
+class DriveFile:
+    """metadata ของ PDF 1 ไฟล์ใน Google Drive (ใช้ตรวจว่าไฟล์เปลี่ยนหรือไม่โดยไม่ต้องดาวน์โหลด)."""
+    id: str
+    name: str
+    md5_checksum: Optional[str] = None
+    modified_time: Optional[str] = None
+    size: int = 0
+
+    @classmethod
+    def from_api(cls, item: dict) -> "DriveFile":
+        return cls(
+            id=item["id"],
+            name=item["name"],
+            md5_checksum=item.get("md5Checksum"),
+            modified_time=item.get("modifiedTime"),
+            size=int(item.get("size") or 0),
+        )
+
+    @property
+    def version(self) -> str:
+        """ค่าที่เปลี่ยนเมื่อเนื้อหาไฟล์เปลี่ยน (md5 ของ Drive ถ้ามี ไม่งั้นใช้ modifiedTime + size)."""
+        return self.md5_checksum or f"{self.modified_time}:{self.size}"
+
+
+@dataclass
+class SyncResult:
+    """
+    ผลการ sync 1 ครั้ง
+    - files: ไฟล์ทั้งหมดที่อยู่ในโฟลเดอร์ตอนนี้ (รวมไฟล์ที่ดาวน์โหลดไม่สำเร็จ)
+    - local_paths: file ID -> path ของไฟล์ใน cache (เฉพาะไฟล์ที่มีสำเนาล่าสุดอยู่ในเครื่อง)
+    - downloaded / removed / failed: file IDs ที่ถูกดาวน์โหลดใหม่, ถูกลบออกจากโฟลเดอร์ และดาวน์โหลดไม่สำเร็จ
+    """
+    files: List[DriveFile] = field(default_factory=list)
+    local_paths: Dict[str, str] = field(default_factory=dict)
+    downloaded: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+def list_folder_pdfs(service, folder_id: str, page_size: int = DRIVE_PAGE_SIZE) -> List[DriveFile]:
+    """ลิสต์ PDF ทั้งหมดในโฟลเดอร์ (ไล่ตาม nextPageToken จนครบทุกหน้า)."""
+    query = f"'{folder_id}' in parents and mimeType='application/pdf' and trashed=false"
+    files, page_token = [], None
+    while True:
+        response = service.files().list(
+            q=query,
+            pageSize=page_size,
+            fields=f"nextPageToken, files({FILE_FIELDS})",
+            pageToken=page_token,
+        ).execute()
+        files.extend(DriveFile.from_api(item) for item in response.get("files", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def is_retryable(error: Exception) -> bool:
+    """error ชั่วคราว (rate limit, 5xx, network) ที่ควรลองใหม่."""
+    if isinstance(error, HttpError):
+        status = getattr(error.resp, "status", None)
+        return status in RETRYABLE_STATUS_CODES or (status == 403 and b"RateLimitExceeded" in (error.content or b""))
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+def compute_md5(file_path: str, block_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class DriveSync:
+    """
+    Sync PDF จากโฟลเดอร์ Google Drive ลง cache ในเครื่อง (ดาวน์โหลดเฉพาะไฟล์ใหม่/ที่เปลี่ยน)
+    - เทียบ md5Checksum / modifiedTime กับ state ของการ sync ครั้งก่อน ไฟล์ที่ไม่เปลี่ยนจะไม่ถูกดาวน์โหลดซ้ำ
+    - ถ้า Drive changes API บอกว่าไม่มีอะไรเปลี่ยนตั้งแต่ครั้งก่อน จะข้ามการลิสต์โฟลเดอร์ไปเลย
+    - ดาวน์โหลดหลายไฟล์พร้อมกัน (service แยกต่อ thread เพราะ http client ของ googleapiclient ไม่ thread-safe)
+      เขียน bytes ลงดิสก์ตรงๆ ทีละ chunk และ retry แบบ exponential backoff เมื่อเจอ error ชั่วคราว
+    - state ถูกบันทึกหลังดาวน์โหลดเสร็จแต่ละไฟล์ ถ้าถูกขัดจังหวะ รันครั้งถัดไปจะดาวน์โหลดต่อเฉพาะไฟล์ที่เหลือ
+    service_factory คือฟังก์ชันที่สร้าง Drive service (เช่น authenticate_google_drive หรือ fake service ใน test)
+    """
+
+    def __init__(self, service_factory: Callable[[], object], folder_id: str, cache_dir: str = DRIVE_CACHE_DIR,
+                 workers: int = DRIVE_DOWNLOAD_WORKERS, chunk_size: int = DRIVE_DOWNLOAD_CHUNK_SIZE,
+                 max_retries: int = DRIVE_MAX_RETRIES, backoff_seconds: float = DRIVE_RETRY_BACKOFF_SECONDS):
+        self.service_factory = service_factory
+        self.folder_id = folder_id
+        self.folder_dir = os.path.join(cache_dir, folder_id)
+        self.state_path = os.path.join(self.folder_dir, "sync_state.json")
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._local = threading.local()
+        self._state_lock = threading.Lock()
+        self._state = self._load_state()
+
+    # --- state ---
+
+    def _load_state(self) -> dict:
+        empty = {"format_version": SYNC_STATE_FORMAT_VERSION, "start_page_token": None, "files": {}}
+        if not os.path.exists(self.state_path):
+            return empty
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not read Drive sync state at {self.state_path}: {e}. Starting a full sync.")
+            return empty
+        return state if state.get("format_version") == SYNC_STATE_FORMAT_VERSION else empty
+
+    def _save_state(self):
+        os.makedirs(self.folder_dir, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def local_path(self, file_id: str) -> str:
+        return os.path.join(self.folder_dir, f"{file_id}.pdf")
+
+    def _cached_files(self) -> List[DriveFile]:
+        return [DriveFile(**entry) for entry in self._state["files"].values()]
+
+    def _is_cached(self, drive_file: DriveFile) -> bool:
+        entry = self._state["files"].get(drive_file.id)
+        return (bool(entry) and DriveFile(**entry).version == drive_file.version
+                and os.path.exists(self.local_path(drive_file.id)))
+
+    # --- Drive API ---
+
+    def _service(self):
+        """Drive service ของ thread ปัจจุบัน (สร้างครั้งเดียวต่อ thread แล้วใช้ซ้ำ)."""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self.service_factory()
+            if service is None:
+                raise RuntimeError("Could not create a Google Drive service.")
+        return service
+
+    def _with_retries(self, description: str, fn: Callable):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random())
+                log.warning(f"{description} failed ({e}), retrying in {delay:.1f}s "
+                            f"(attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    def _start_page_token(self) -> Optional[str]:
+        try:
+            response = self._with_retries(
+                "getStartPageToken", lambda: self._service().changes().getStartPageToken().execute()
+            )
+            return response.get("startPageToken")
+        except HttpError as e:
+            log.warning(f"Could not read Drive start page token: {e}")
+            return None
+
+    def _has_changes_since(self, page_token: str) -> bool:
+        """มีไฟล์ใดใน Drive เปลี่ยนตั้งแต่ page_token หรือไม่ (ถ้าถามไม่ได้ ถือว่าเปลี่ยน)."""
+        try:
+            while page_token:
+                response = self._with_retries("changes.list", lambda: self._service().changes().list(
+                    pageToken=page_token, spaces="drive", fields="nextPageToken, newStartPageToken, changes(fileId)"
+                ).execute())
+                if response.get("changes"):
+                    return True
+                page_token = response.get("nextPageToken")
+            return False
+        except HttpError as e:
+            log.warning(f"Could not read Drive changes: {e}. Falling back to a full folder listing.")
+            return True
+
+    def _download(self, drive_file: DriveFile) -> str:
+        """ดาวน์โหลดไฟล์ลง cache โดยเขียนลง .part ก่อนแล้วค่อย rename (ไฟล์ใน cache จึงครบเสมอ)."""
+        path = self.local_path(drive_file.id)
+        part_path = path + ".part"
+
+        def attempt():
+            request = self._service().files().get_media(fileId=drive_file.id)
+            with open(part_path, "wb") as fh:
+                downloader = MediaIoBaseDownload(fh, request, chunksize=self.chunk_size)
+                done = False
+                while not done:
+                    _, done = downloader.next_chunk(num_retries=self.max_retries)
+            if drive_file.md5_checksum and compute_md5(part_path) != drive_file.md5_checksum:
+                raise IOError(f"checksum mismatch for {drive_file.name}")
+
+        try:
+            self._with_retries(f"Download of {drive_file.name}", attempt)
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        os.replace(part_path, path)
+        return path
+
+    # --- sync ---
+
+    def plan(self) -> SyncResult:
+        """
+        ลิสต์โฟลเดอร์อย่างเดียว (ไม่ดาวน์โหลด ไม่ลบไฟล์ใน cache และไม่แก้ state) ใช้กับ --dry-run
+        local_paths มีเฉพาะไฟล์ที่สำเนาใน cache เป็น version ล่าสุดแล้ว ไฟล์อื่นใน files คือไฟล์ที่ sync จะดาวน์โหลด
+        """
+        start = time.perf_counter()
+        remote = self._with_retries("files.list", lambda: list_folder_pdfs(self._service(), self.folder_id))
+        remote_ids = {f.id for f in remote}
+        return SyncResult(
+            files=remote,
+            local_paths={f.id: self.local_path(f.id) for f in remote if self._is_cached(f)},
+            removed=[file_id for file_id in self._state["files"] if file_id not in remote_ids],
+            elapsed=time.perf_counter() - start,
+        )
+
+    def sync(self) -> SyncResult:
+        """
+        ทำให้ cache ตรงกับโฟลเดอร์ใน Drive และคืนค่า SyncResult
+        error ของการลิสต์โฟลเดอร์ (HttpError) จะถูก raise ต่อ ส่วน error ของการดาวน์โหลดจะถูกเก็บไว้ใน failed
+        """
+        start = time.perf_counter()
+        os.makedirs(self.folder_dir, exist_ok=True)
+        previous_token = self._state.get("start_page_token")
+        cached = self._cached_files()
+        if previous_token and all(self._is_cached(f) for f in cached) and not self._has_changes_since(previous_token):
+            log.info(f"No Drive changes since the last sync; {len(cached)} cached PDF(s) are up to date.")
+            return SyncResult(files=cached, local_paths={f.id: self.local_path(f.id) for f in cached},
+                              elapsed=time.perf_counter() - start)
+
+        # อ่าน token ก่อนลิสต์ เพื่อให้การเปลี่ยนแปลงระหว่าง sync ถูกเห็นในครั้งถัดไป
+        new_token = self._start_page_token()
+        remote = self._with_retries("files.list", lambda: list_folder_pdfs(self._service(), self.folder_id))
+        result = SyncResult(files=remote)
+
+        remote_ids = {f.id for f in remote}
+        for file_id in [file_id for file_id in self._state["files"] if file_id not in remote_ids]:
+            del self._state["files"][file_id]
+            if os.path.exists(self.local_path(file_id)):
+                os.remove(self.local_path(file_id))
+            result.removed.append(file_id)
+        if result.removed:
+            self._save_state()
+
+        to_download = []
+        for drive_file in remote:
+            if self._is_cached(drive_file):
+                result.local_paths[drive_file.id] = self.local_path(drive_file.id)
+            else:
+                to_download.append(drive_file)
+        log.info(f"Drive folder has {len(remote)} PDF(s): {len(to_download)} to download, "
+                 f"{len(remote) - len(to_download)} cached, {len(result.removed)} removed.")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._download, drive_file): drive_file for drive_file in to_download}
+            for future in as_completed(futures):
+                drive_file = futures[future]
+                try:
+                    path = future.result()
+                except Exception as e:
+                    log.error(f"Failed to download {drive_file.name} (ID: {drive_file.id}): {e}")
+                    result.failed.append(drive_file.id)
+                    continue
+                with self._state_lock:
+                    self._state["files"][drive_file.id] = asdict(drive_file)
+                    self._save_state()
+                result.local_paths[drive_file.id] = path
+                result.downloaded.append(drive_file.id)
+
+        # เก็บ token เฉพาะเมื่อ sync ครบ ไม่งั้นรอบหน้าจะข้ามไฟล์ที่ดาวน์โหลดไม่สำเร็จ
+        self._state["start_page_token"] = new_token if not result.failed else None
+        self._save_state()
+        result.elapsed = time.perf_counter() - start
+        log.info(f"Drive sync finished in {result.elapsed:.1f}s: {len(result.downloaded)} downloaded, "
+                 f"{len(result.failed)} failed.")
+        return result
@@ -0,0 +1,126 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils.constant import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_DTYPE
+
+log = logging.getLogger(__name__)
+
+SQLITE_MAX_VARIABLES = 900 # จำนวน key สูงสุดต่อ query (SQLite จำกัดจำนวน ? ไว้)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize ข้อความก่อนทำ hash: Unicode NFC + ยุบ whitespace ซ้ำ (ไทย/อังกฤษ ให้ผลเหมือนกัน)."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    ห่อ Embeddings model เดิมด้วย cache บนดิสก์แบบ content-addressed (SQLite)
+    key = hash(model signature + ข้อความที่ normalize แล้ว) -> vector
+    ข้อความที่เคย embed แล้ว (ทั้งจากการ index รอบก่อน และ chunk ที่ซ้ำกันข้ามเอกสาร) จะไม่ถูกส่งเข้า model อีก
+    """
+
+    def __init__(self, inner: Embeddings, model_signature: str, cache_path: str = EMBEDDING_CACHE_PATH,
+                 dtype: str = EMBEDDING_CACHE_DTYPE, batch_size: int = 64):
+        self.inner = inner
+        self.model_signature = model_signature
+        self.cache_path = cache_path
+        self.dtype = np.dtype(dtype)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.embedded = 0
+        self.embed_seconds = 0.0
+
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.model_signature}\0{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                part = keys[i:i + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, dtype, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        rows = [(key, self.dtype.name, np.asarray(vector, dtype=self.dtype).tobytes()) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, dtype, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+
+        # embed เฉพาะข้อความที่ยังไม่มีใน cache (ข้อความซ้ำใน batch เดียวกันจะถูก embed ครั้งเดียว)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            missing_keys = list(missing.keys())
+            start = time.perf_counter()
+            new_vectors = {}
+            for i in range(0, len(missing_keys), self.batch_size):
+                batch_keys = missing_keys[i:i + self.batch_size]
+                vectors = self.inner.embed_documents([missing[key] for key in batch_keys])
+                new_vectors.update(zip(batch_keys, vectors))
+            self.embed_seconds += time.perf_counter() - start
+            self.embedded += len(new_vectors)
+            self._store(new_vectors)
+            cached.update(new_vectors)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        # query ส่งตรงเข้า model (บาง model ใช้ prompt/instruction สำหรับ query ต่างจาก document)
+        return self.inner.embed_query(text)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def embeddings_per_second(self) -> float:
+        return self.embedded / self.embed_seconds if self.embed_seconds else 0.0
+
+    def log_stats(self):
+        log.info(
+            f"Embedding cache: {self.hits} hit(s), {self.misses} miss(es) "
+            f"(hit rate {self.hit_rate:.1%}), model throughput {self.embeddings_per_second:.1f} embeddings/sec",
+            extra={"markup": True}
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,125 @@
+import time
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import metrics
+from lexical_index import LexicalIndex
+from retrieval_filters import RetrievalFilters
+
+log = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[str]], weights: Optional[Sequence[float]] = None,
+                           rrf_k: int = 60) -> List[Tuple[str, float]]:
+    """รวมหลายอันดับด้วย Reciprocal Rank Fusion: score = sum(weight / (rrf_k + rank))."""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += weight / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def weighted_score_fusion(scored_lists: Sequence[List[Tuple[str, float]]],
+                          weights: Sequence[float]) -> List[Tuple[str, float]]:
+    """รวมคะแนนแบบถ่วงน้ำหนัก หลังจาก min-max normalize คะแนนของแต่ละรายการให้อยู่ในช่วง 0-1."""
+    scores: Dict[str, float] = defaultdict(float)
+    for scored, weight in zip(scored_lists, weights):
+        if not scored:
+            continue
+        values = [score for _, score in scored]
+        low, high = min(values), max(values)
+        for item, score in scored:
+            scores[item] += weight * ((score - low) / (high - low) if high > low else 1.0)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def merge_hits(hit_lists: Sequence[list], k: int) -> list:
+    """รวม [(Document, distance)] หลายรายการเป็น k อันที่ distance น้อยที่สุด (chunk ID ซ้ำเก็บเฉพาะอันแรก)."""
+    merged, seen = [], set()
+    for doc, distance in sorted((hit for hits in hit_lists for hit in hits), key=lambda hit: hit[1]):
+        if doc.id in seen:
+            continue
+        seen.add(doc.id)
+        merged.append((doc, distance))
+        if len(merged) == k:
+            break
+    return merged
+
+
+class HybridRetriever:
+    """
+    Retriever ที่รวมผลจาก vector search (cosine) กับ BM25 (LexicalIndex)
+    - vector_search(query, where) ต้องคืนค่า [(Document ที่มี id เป็น chunk ID, distance)]
+    - fusion="rrf" ใช้ Reciprocal Rank Fusion, fusion="weighted" ใช้คะแนนที่ normalize แล้วถ่วงด้วย lexical_weight
+    - chunks ที่เจอเฉพาะจาก BM25 จะถูกดึงเนื้อหาจาก Chroma collection ด้วย collection.get(ids=...)
+    - ถ้ามี filters: vector search กรองด้วย where ของ Chroma, BM25 กรองตามไฟล์ใน lexical index
+      แล้วตรวจเงื่อนไขที่เหลือ (หน้า, วันที่, Drive ID) ตอนดึงเนื้อหาจาก collection
+    - duplicates = [(Document, distance)] ของ chunks ในไฟล์ที่เลือกซึ่งถูกเก็บเป็น near-duplicate (ดู dedup.py)
+      ถูกรวมเข้ากับ vector hits (ตัดที่ vector_k) และ BM25 ค้นใน canonical chunks ของมันด้วย
+    """
+
+    def __init__(self, vector_search: Callable[[str, Optional[dict]], list], lexical_index: LexicalIndex, collection,
+                 k: int, lexical_k: int, fusion: str = "rrf", rrf_k: int = 60, lexical_weight: float = 0.5,
+                 vector_k: Optional[int] = None):
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"Unknown fusion method: {fusion}")
+        self.vector_search = vector_search
+        self.lexical_index = lexical_index
+        self.collection = collection
+        self.k = k
+        self.lexical_k = lexical_k
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.lexical_weight = lexical_weight
+        self.vector_k = vector_k
+
+    def _fuse(self, vector_hits: list, lexical_hits: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        weights = [1.0 - self.lexical_weight, self.lexical_weight]
+        if self.fusion == "rrf":
+            rankings = [[doc.id for doc, _ in vector_hits], [chunk_id for chunk_id, _ in lexical_hits]]
+            return reciprocal_rank_fusion(rankings, weights, self.rrf_k)
+        vector_scored = [(doc.id, -distance) for doc, distance in vector_hits]
+        return weighted_score_fusion([vector_scored, lexical_hits], weights)
+
+    def _fetch_documents(self, chunk_ids: List[str], where: Optional[dict] = None) -> dict:
+        from langchain_core.documents import Document
+
+        with metrics.span("fetch_documents"):
+            results = self.collection.get(ids=chunk_ids, where=where, include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+
+    def invoke(self, query: str, filters: Optional[RetrievalFilters] = None,
+               duplicates: Optional[list] = None) -> list:
+        start = time.perf_counter()
+        where = filters.to_chroma_where() if filters else None
+        vector_hits = self.vector_search(query, where)
+        duplicate_docs = {doc.id: doc for doc, _ in duplicates or []}
+        if duplicates:
+            vector_hits = merge_hits([vector_hits, duplicates], self.vector_k or len(vector_hits) + len(duplicates))
+        with metrics.span("lexical_search"):
+            lexical_hits = self.lexical_index.search(query, self.lexical_k, filters.source_pdfs if filters else None,
+                                                     chunk_ids=list(duplicate_docs) or None)
+        docs_by_id = {doc.id: doc for doc, _ in vector_hits}
+        if where and lexical_hits:
+            # ตัด BM25 hits ที่ไม่ตรงเงื่อนไขทิ้งก่อน fusion (และได้เนื้อหาของ chunks ที่ผ่านมาในครั้งเดียว)
+            # duplicates ผ่านเงื่อนไขแล้วตอนค้นหา (ใช้ metadata ของ duplicate ไม่ใช่ของ canonical)
+            allowed = {chunk_id: duplicate_docs[chunk_id] for chunk_id, _ in lexical_hits if chunk_id in duplicate_docs}
+            remaining = [chunk_id for chunk_id, _ in lexical_hits if chunk_id not in allowed]
+            if remaining:
+                allowed.update(self._fetch_documents(remaining, where))
+            lexical_hits = [(chunk_id, score) for chunk_id, score in lexical_hits if chunk_id in allowed]
+            docs_by_id.update(allowed)
+        top_ids = [chunk_id for chunk_id, _ in self._fuse(vector_hits, lexical_hits)[:self.k]]
+
+        missing = [chunk_id for chunk_id in top_ids if chunk_id not in docs_by_id]
+        if missing:
+            docs_by_id.update(self._fetch_documents(missing))
+        log.debug(f"Hybrid retrieval: {len(vector_hits)} vector + {len(lexical_hits)} lexical hits "
+                  f"fused to {len(top_ids)} in {time.perf_counter() - start:.3f}s")
+        # chunk ที่ยังค้างอยู่ใน lexical index แต่ถูกลบออกจาก collection แล้วจะถูกข้าม
+        return [docs_by_id[chunk_id] for chunk_id in top_ids if chunk_id in docs_by_id]
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = "index_manifest.json"
+INDEX_VERSION_FILE_NAME = "index_version.json" # เปลี่ยนทุกครั้งที่เนื้อหาใน collection เปลี่ยน
+MANIFEST_FORMAT_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024 # อ่านไฟล์ทีละ 1MB ตอนคำนวณ hash
+
+
+def compute_file_hash(file_path: str) -> str:
+    """คำนวณ SHA-256 ของเนื้อหาไฟล์ (อ่านทีละ block เพื่อไม่ให้กิน RAM)."""
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def write_index_version(persist_dir: str) -> str:
+    """
+    เขียน version stamp ใหม่ของ index (เรียกหลังจาก builder เปลี่ยนข้อมูลใน collection)
+    ส่วนอื่นๆ เช่น answer cache ใช้ค่านี้ตรวจว่าข้อมูลที่ cache ไว้ยังตรงกับ index ปัจจุบันหรือไม่
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(persist_dir, INDEX_VERSION_FILE_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+    return version
+
+
+def read_index_version(persist_dir: str) -> Optional[str]:
+    """อ่าน version stamp ปัจจุบันของ index (None ถ้ายังไม่เคยถูกเขียน)."""
+    try:
+        with open(os.path.join(persist_dir, INDEX_VERSION_FILE_NAME), "r", encoding="utf-8") as f:
+            return json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+
+
+def read_manifest_settings(path: str) -> Optional[dict]:
+    """ค่าตั้งค่าที่ index ปัจจุบันถูกสร้างไว้ตาม manifest (None ถ้ายังไม่มี manifest, อ่านไม่ได้ หรือเป็น format เก่า)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data.get("settings") if data.get("format_version") == MANIFEST_FORMAT_VERSION else None
+
+
+def make_chunk_id(source_key: str, content_hash: str, chunk_index: int) -> str:
+    """
+    สร้าง ID ของ chunk แบบ deterministic จากชื่อไฟล์, hash ของไฟล์ และลำดับ chunk
+    ไฟล์เดิมที่เนื้อหาไม่เปลี่ยนจะได้ ID เดิมทุกครั้ง ทำให้ upsert ทับของเก่าแทนการเพิ่มซ้ำ
+    """
+    raw = f"{source_key}\0{content_hash}\0{chunk_index}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class IndexManifest:
+    """
+    เก็บสถานะของไฟล์ PDF ที่ถูก index แล้ว (path, size, mtime, content hash -> chunk IDs)
+    พร้อมค่าตั้งค่าที่ใช้สร้าง index (chunk_size, chunk_overlap, embedding model)
+    ถ้าค่าตั้งค่าเปลี่ยน chunk เดิมทั้งหมดจะใช้ไม่ได้และต้อง index ใหม่
+    """
+
+    def __init__(self, path: str, settings: dict, entries: Optional[Dict[str, dict]] = None,
+                 settings_changed: bool = False):
+        self.path = path
+        self.settings = settings
+        self.entries: Dict[str, dict] = entries or {}
+        self.settings_changed = settings_changed
+
+    @classmethod
+    def load(cls, path: str, settings: dict) -> "IndexManifest":
+        """โหลด manifest จากไฟล์ ถ้าไม่มีไฟล์หรืออ่านไม่ได้จะคืนค่า manifest ว่าง."""
+        if not os.path.exists(path):
+            return cls(path, settings)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not read index manifest at {path}: {e}. Starting with an empty manifest.")
+            return cls(path, settings)
+
+        entries = data.get("files", {})
+        stored_settings = data.get("settings", {})
+        settings_changed = (
+            data.get("format_version") != MANIFEST_FORMAT_VERSION or stored_settings != settings
+        )
+        if settings_changed:
+            log.warning(f"Index settings changed ({stored_settings} -> {settings}). All files will be re-indexed.")
+        return cls(path, settings, entries=entries, settings_changed=settings_changed)
+
+    def save(self):
+        """บันทึก manifest ลงไฟล์แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename ทับ)."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "format_version": MANIFEST_FORMAT_VERSION,
+            "settings": self.settings,
+            "files": self.entries,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self.settings_changed = False
+
+    def keys(self) -> List[str]:
+        return list(self.entries.keys())
+
+    def get(self, source_key: str) -> Optional[dict]:
+        return self.entries.get(source_key)
+
+    def is_unchanged(self, source_key: str, size: int, mtime: float) -> bool:
+        """เช็คแบบเร็วจาก size + mtime โดยไม่ต้องอ่านเนื้อหาไฟล์ (ไฟล์ที่ index ไม่เสร็จถือว่าเปลี่ยน)."""
+        entry = self.entries.get(source_key)
+        return (bool(entry) and entry.get("complete", True)
+                and entry.get("size") == size and entry.get("mtime") == mtime)
+
+    def update(self, source_key: str, path: str, size: int, mtime: float, content_hash: str,
+               chunk_ids: List[str], complete: bool = True):
+        """
+        บันทึกสถานะของไฟล์ ถ้า complete=False หมายถึง index ไปได้บางส่วน (chunk_ids คือส่วนที่ commit แล้ว)
+        """
+        self.entries[source_key] = {
+            "path": path,
+            "size": size,
+            "mtime": mtime,
+            "content_hash": content_hash,
+            "chunk_ids": chunk_ids,
+            "complete": complete,
+        }
+
+    def remove(self, source_key: str) -> List[str]:
+        """ลบไฟล์ออกจาก manifest และคืนค่า chunk IDs เดิมเพื่อให้ไปลบออกจาก vector store ต่อ."""
+        entry = self.entries.pop(source_key, None)
+        return entry.get("chunk_ids", []) if entry else []
+
+    def all_chunk_ids(self) -> List[str]:
+        return [chunk_id for entry in self.entries.values() for chunk_id in entry.get("chunk_ids", [])]
+
+    def clear(self):
+        self.entries = {}
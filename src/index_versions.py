@@ -0,0 +1,97 @@
+# โฟลเดอร์ index แบบมีหลาย version สำหรับ index ใหม่ระหว่างที่ app ยังตอบคำถามอยู่ (zero downtime)
+# - แต่ละ version คือโฟลเดอร์ใน INDEX_VERSIONS_DIR ที่มีโครงสร้างเหมือน CHROMA_PERSIST_DIR (Chroma/compact/shards,
+#   manifest, lexical index, dedup index, index_version.json)
+# - version ที่ใช้งานอยู่ถูกระบุด้วย pointer (CURRENT_FILE_NAME) ซึ่งเขียนแบบ atomic (tmp + os.replace)
+# - version ที่ active แล้วจะไม่ถูกเขียนทับอีก (worker สร้าง version ใหม่จากสำเนาเสมอ) ผู้อ่านจึงไม่ต้อง lock
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+from typing import List, Optional
+
+from utils.constant import CHROMA_PERSIST_DIR, INDEX_VERSIONS_DIR, INDEX_KEEP_VERSIONS
+
+log = logging.getLogger(__name__)
+
+CURRENT_FILE_NAME = "current.json"
+
+
+def read_active_version(versions_dir: str = INDEX_VERSIONS_DIR) -> Optional[str]:
+    """ชื่อ version ที่ active อยู่ (None ถ้ายังไม่เคยมี version หรือโฟลเดอร์ของ version นั้นหายไป)."""
+    try:
+        with open(os.path.join(versions_dir, CURRENT_FILE_NAME), "r", encoding="utf-8") as f:
+            version = json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+    if version and os.path.isdir(os.path.join(versions_dir, version)):
+        return version
+    return None
+
+
+def active_index_dir(versions_dir: str = INDEX_VERSIONS_DIR, default: str = CHROMA_PERSIST_DIR) -> str:
+    """โฟลเดอร์ index ที่ควรใช้ตอบคำถาม: version ที่ active ถ้ามี ไม่งั้น default (index เดิมที่ builder เขียนตรงๆ)."""
+    version = read_active_version(versions_dir)
+    return os.path.join(versions_dir, version) if version else default
+
+
+def list_versions(versions_dir: str = INDEX_VERSIONS_DIR) -> List[str]:
+    """ชื่อ version ทั้งหมด เรียงจากเก่าไปใหม่ (ชื่อขึ้นต้นด้วยเวลาที่สร้าง)."""
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir) if os.path.isdir(os.path.join(versions_dir, name)))
+
+
+def create_version_dir(versions_dir: str = INDEX_VERSIONS_DIR, copy_from: Optional[str] = None) -> str:
+    """
+    สร้างโฟลเดอร์ version ใหม่ (ว่าง หรือสำเนาของ copy_from เพื่อ index เฉพาะส่วนที่เปลี่ยนต่อจาก version เดิม)
+    copy_from ต้องไม่มีใครเขียนอยู่ (version ที่ active แล้วไม่ถูกเขียนอีก) สำเนาจึงสอดคล้องกันทั้งโฟลเดอร์
+    """
+    os.makedirs(versions_dir, exist_ok=True)
+    now = time.time()
+    name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1e6) % 1000000:06d}-{uuid.uuid4().hex[:6]}"
+    path = os.path.join(versions_dir, name)
+    if copy_from and os.path.isdir(copy_from):
+        start = time.perf_counter()
+        shutil.copytree(copy_from, path)
+        log.info(f"Copied index {copy_from} -> {path} in {time.perf_counter() - start:.1f}s")
+    else:
+        os.makedirs(path)
+    return path
+
+
+def activate_version(path: str, versions_dir: str = INDEX_VERSIONS_DIR) -> str:
+    """ตั้ง version ที่ path เป็น version ที่ active (เปลี่ยน pointer แบบ atomic) คืนค่าชื่อ version."""
+    version = os.path.basename(os.path.normpath(path))
+    if not os.path.isdir(os.path.join(versions_dir, version)):
+        raise ValueError(f"{path} is not a version directory of {versions_dir}")
+    pointer = os.path.join(versions_dir, CURRENT_FILE_NAME)
+    tmp_path = pointer + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "activated_at": time.time()}, f)
+    os.replace(tmp_path, pointer)
+    log.info(f"Activated index version [cyan]{version}[/cyan]", extra={"markup": True})
+    return version
+
+
+def prune_versions(versions_dir: str = INDEX_VERSIONS_DIR, keep: int = INDEX_KEEP_VERSIONS) -> List[str]:
+    """
+    ลบ version เก่า เหลือ version ที่ active กับ version ก่อนหน้าที่ใหม่ที่สุดรวมกันไม่เกิน keep
+    (version ก่อนหน้ายังอาจถูกใช้อยู่ใน process ที่ยังไม่ได้สลับ) ไฟล์ที่ลบไม่ได้ (เช่นยังเปิดอยู่บน Windows) จะลองใหม่รอบหน้า
+    โฟลเดอร์ที่ใหม่กว่า version ที่ active คือ build ที่ไม่สำเร็จ จึงถูกลบด้วย (ห้ามเรียกระหว่างที่กำลัง build)
+    """
+    active = read_active_version(versions_dir)
+    if active is None:
+        return []
+    versions = list_versions(versions_dir)
+    older = [name for name in versions if name < active]
+    kept = {active, *older[-(keep - 1):]} if keep > 1 else {active}
+    removed = []
+    for name in versions:
+        if name not in kept:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+            removed.append(name)
+    if removed:
+        log.info(f"Removed {len(removed)} old index version(s): {removed}")
+    return removed
@@ -0,0 +1,195 @@
+# Background indexing worker: ตรวจ src/temp และ/หรือ Google Drive folder เป็นระยะ เมื่อพบไฟล์ใหม่ แก้ไข หรือถูกลบ
+# จะสร้าง index version ใหม่ (สำเนาของ version ที่ active แล้ว index เฉพาะส่วนที่เปลี่ยนด้วย builder เดิม)
+# แล้วสลับ pointer แบบ atomic (ดู index_versions.py) ไม่มีการเขียนลง version ที่ app กำลังใช้อยู่เลย
+# app ที่รันอยู่ (RAGSystem) ตอบคำถามจาก version เดิมระหว่าง build และสลับไป version ใหม่เองเมื่อพร้อม
+# รันเป็น process แยก (poe index-worker) เพื่อไม่ให้งาน parse/embed แย่ง GIL และ CPU กับการตอบคำถาม
+import os
+import time
+import shutil
+import logging
+import argparse
+import threading
+from typing import List, Optional
+
+from metrics import REGISTRY as METRICS
+from drive_sync import DriveSync, SyncResult
+from pdf_processing import authenticate_google_drive
+from parallel_ingest import DEFAULT_INGEST_WORKERS
+from index_manifest import IndexManifest, MANIFEST_FILE_NAME, write_index_version
+from index_versions import active_index_dir, activate_version, create_version_dir, prune_versions
+from vector_store_builder import (
+    PDF_SOURCE_DIR, GDRIVE_MANIFEST_FILE_NAME, get_embedding_model, get_index_settings, plan_drive_files,
+    plan_local_files, process_gdrive_pdfs_and_build_store, process_local_pdfs_and_build_store,
+)
+from utils.constant import (
+    INDEX_VERSIONS_DIR, INDEX_KEEP_VERSIONS, INDEX_WORKER_POLL_SECONDS, INDEX_WORKER_NICE, UPSERT_BATCH_SIZE,
+    DRIVE_DOWNLOAD_WORKERS,
+)
+from logger_config import setup_logger
+
+log = logging.getLogger(__name__)
+
+
+def _describe_changes(changed: List[str], removed: List[str]) -> Optional[str]:
+    if not changed and not removed:
+        return None
+    return f"{len(changed)} new/modified and {len(removed)} removed file(s)"
+
+
+def detect_local_changes(pdf_directory: str, persist_dir: str) -> Optional[str]:
+    """
+    เทียบ PDF ใน pdf_directory กับ manifest ของ index ใน persist_dir แบบเดียวกับ builder (ดู plan_local_files)
+    คืนค่าคำอธิบายการเปลี่ยนแปลง (None ถ้า index ตรงกับไฟล์อยู่แล้ว)
+    ไฟล์ที่ mtime เปลี่ยนแต่เนื้อหาเหมือนเดิมไม่นับว่าเปลี่ยน (ถูกอ่านเพื่อคำนวณ hash ทุกรอบจนกว่าจะมี build ใหม่)
+    """
+    manifest = IndexManifest.load(os.path.join(persist_dir, MANIFEST_FILE_NAME), get_index_settings())
+    if manifest.settings_changed:
+        return "index settings changed"
+    return _describe_changes(*plan_local_files(pdf_directory, manifest))
+
+
+def detect_drive_changes(sync_result: SyncResult, persist_dir: str) -> Optional[str]:
+    """เหมือน detect_local_changes แต่เทียบผล sync ของ Drive folder กับ manifest ของ Drive (key = file ID)."""
+    manifest = IndexManifest.load(os.path.join(persist_dir, GDRIVE_MANIFEST_FILE_NAME), get_index_settings())
+    if manifest.settings_changed:
+        return "index settings changed"
+    return _describe_changes(*plan_drive_files(sync_result, manifest))
+
+
+def release_chroma_clients():
+    """ปิด Chroma clients ที่ cache ไว้ใน process (แต่ละ version เปิด client ใหม่ worker ที่รันนานจึงต้องคืน resource)."""
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+    except ImportError:
+        return
+    SharedSystemClient.clear_system_cache()
+
+
+class IndexWorker:
+    """
+    สร้าง index version ใหม่เมื่อแหล่ง PDF เปลี่ยน (run_once = ตรวจ 1 รอบ, run = ตรวจทุก poll_seconds จนกว่าจะสั่งหยุด)
+    - pdf_directory: โฟลเดอร์ PDF ในเครื่อง (None หรือโฟลเดอร์ไม่มีอยู่ = ไม่ตรวจ ไม่ใช่ "ไฟล์ถูกลบทั้งหมด")
+    - gdrive_folder_id: Drive folder ที่ sync ด้วย DriveSync ทุกรอบ (ถ้าไม่มีอะไรเปลี่ยน sync แทบไม่มีค่าใช้จ่าย)
+    version ใหม่เป็นสำเนาของ version ที่ active (copy ทั้งโฟลเดอร์ แลกกับการไม่ต้อง embed ใหม่ทั้ง corpus)
+    ถ้า build ล้มเหลว โฟลเดอร์ของ version ใหม่จะถูกลบ และ app ยังใช้ version เดิมต่อไป
+    release_clients=True ใช้เฉพาะเมื่อ worker อยู่คนละ process กับ RAGSystem (ปิด Chroma clients ทั้ง process)
+    """
+
+    def __init__(self, pdf_directory: Optional[str] = PDF_SOURCE_DIR, gdrive_folder_id: Optional[str] = None,
+                 versions_dir: str = INDEX_VERSIONS_DIR, poll_seconds: float = INDEX_WORKER_POLL_SECONDS,
+                 keep_versions: int = INDEX_KEEP_VERSIONS, workers: int = DEFAULT_INGEST_WORKERS,
+                 batch_size: int = UPSERT_BATCH_SIZE, download_workers: int = DRIVE_DOWNLOAD_WORKERS,
+                 embedding_model=None, release_clients: bool = False):
+        self.pdf_directory = pdf_directory
+        self.gdrive_folder_id = gdrive_folder_id
+        self.versions_dir = versions_dir
+        self.poll_seconds = poll_seconds
+        self.keep_versions = keep_versions
+        self.workers = workers
+        self.batch_size = batch_size
+        self.download_workers = download_workers
+        self.embedding_model = embedding_model
+        self.release_clients = release_clients
+        self.builds = 0
+
+    def _watch_local(self) -> bool:
+        return bool(self.pdf_directory) and os.path.isdir(self.pdf_directory)
+
+    def run_once(self, force_rebuild: bool = False) -> Optional[str]:
+        """
+        ตรวจแหล่ง PDF 1 รอบ ถ้ามีการเปลี่ยนแปลง (หรือ force_rebuild) สร้างและ activate version ใหม่
+        คืนค่า path ของ version ใหม่ (None ถ้าไม่มีอะไรเปลี่ยน) force_rebuild สร้างจากโฟลเดอร์ว่างแทนสำเนา
+        """
+        active_dir = active_index_dir(self.versions_dir)
+        local_changes = detect_local_changes(self.pdf_directory, active_dir) if self._watch_local() else None
+        sync_result, drive_changes = None, None
+        if self.gdrive_folder_id:
+            sync_result = DriveSync(authenticate_google_drive, self.gdrive_folder_id,
+                                    workers=self.download_workers).sync()
+            drive_changes = detect_drive_changes(sync_result, active_dir)
+        if not (force_rebuild or local_changes or drive_changes):
+            log.debug("Index is up to date with the PDF sources.")
+            return None
+
+        log.info(f"Building a new index version (local: {local_changes or 'unchanged'}, "
+                 f"drive: {drive_changes or 'unchanged'}{', force rebuild' if force_rebuild else ''}); "
+                 f"queries keep using {active_dir}.", extra={"markup": True})
+        start = time.perf_counter()
+        if self.embedding_model is None:
+            self.embedding_model = get_embedding_model()
+        path = create_version_dir(self.versions_dir, copy_from=None if force_rebuild else active_dir)
+        try:
+            if self._watch_local() and (local_changes or force_rebuild):
+                process_local_pdfs_and_build_store(self.pdf_directory, workers=self.workers,
+                                                   batch_size=self.batch_size, persist_dir=path,
+                                                   embedding_model=self.embedding_model)
+            if sync_result is not None and (drive_changes or force_rebuild):
+                process_gdrive_pdfs_and_build_store(self.gdrive_folder_id, workers=self.workers,
+                                                    batch_size=self.batch_size, persist_dir=path,
+                                                    sync_result=sync_result, embedding_model=self.embedding_model)
+            # version stamp ใหม่เสมอ: answer cache ของ version เดิมจะไม่ถูกใช้กับ version นี้
+            write_index_version(path)
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        finally:
+            if self.release_clients:
+                release_chroma_clients()
+
+        activate_version(path, self.versions_dir)
+        prune_versions(self.versions_dir, self.keep_versions)
+        self.builds += 1
+        elapsed = time.perf_counter() - start
+        METRICS.observe("index_build_seconds", elapsed)
+        METRICS.inc("index_versions_total")
+        log.info(f"[bold green]Index version ready in {elapsed:.1f}s:[/bold green] {path}", extra={"markup": True})
+        return path
+
+    def run(self, stop_event: Optional[threading.Event] = None):
+        """ตรวจและ build ทุก poll_seconds จนกว่า stop_event จะถูก set (error ของรอบหนึ่งไม่ทำให้ worker หยุด)."""
+        stop_event = stop_event or threading.Event()
+        log.info(f"Index worker watching {self.pdf_directory if self._watch_local() else '-'} "
+                 f"(Drive folder: {self.gdrive_folder_id or '-'}) every {self.poll_seconds}s, "
+                 f"versions in {self.versions_dir}", extra={"markup": True})
+        while not stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                METRICS.inc("index_build_errors_total")
+                log.error(f"Index build failed, queries keep using the current version: {e}", exc_info=True)
+            stop_event.wait(self.poll_seconds)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build new index versions in the background and hot-swap them.")
+    parser.add_argument("--pdf-dir", default=PDF_SOURCE_DIR, help="local PDF folder to watch")
+    parser.add_argument("--no-local", action="store_true", help="do not watch a local PDF folder")
+    parser.add_argument("--gdrive-folder-id", help="Google Drive folder to watch")
+    parser.add_argument("--once", action="store_true", help="build at most one version and exit")
+    parser.add_argument("--force-rebuild", action="store_true",
+                        help="build the next version from scratch instead of a copy of the active one")
+    parser.add_argument("--poll-seconds", type=float, default=INDEX_WORKER_POLL_SECONDS)
+    parser.add_argument("--workers", type=int, default=DEFAULT_INGEST_WORKERS, help="PDF parse/chunk processes")
+    parser.add_argument("--keep-versions", type=int, default=INDEX_KEEP_VERSIONS)
+    args = parser.parse_args(argv)
+
+    setup_logger()
+    if INDEX_WORKER_NICE and hasattr(os, "nice"):
+        os.nice(INDEX_WORKER_NICE)
+    worker = IndexWorker(
+        pdf_directory=None if args.no_local else args.pdf_dir, gdrive_folder_id=args.gdrive_folder_id,
+        poll_seconds=args.poll_seconds, keep_versions=args.keep_versions, workers=args.workers,
+        release_clients=True,
+    )
+    if args.once or args.force_rebuild:
+        worker.run_once(force_rebuild=args.force_rebuild)
+        if args.once:
+            return
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        log.info("Index worker stopped.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+import time
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+import metrics
+from dedup import DedupIndex
+from index_manifest import IndexManifest, make_chunk_id
+from lexical_index import LexicalIndex
+from retrieval_filters import source_name
+from parallel_ingest import PdfResult
+from utils.constant import UPSERT_BATCH_SIZE
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_EVERY_BATCHES = 10 # บันทึก manifest ทุกๆ N batch
+
+
+@dataclass
+class PendingFile:
+    """สถานะของไฟล์ที่กำลังจะถูก index (ใช้บันทึกลง manifest หลัง commit)."""
+    path: str
+    size: int
+    mtime: float
+    content_hash: str
+
+
+@dataclass
+class ChunkBatch:
+    chunks: List[Document] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+    owners: List[str] = field(default_factory=list) # source_key ของแต่ละ chunk
+    stale_ids: List[str] = field(default_factory=list) # chunk IDs เก่าที่ต้องลบก่อน upsert batch นี้
+    duplicate_ids: List[str] = field(default_factory=list) # near-duplicate chunks (ไม่ embed, ดู dedup.py)
+    duplicate_owners: List[str] = field(default_factory=list)
+    completed_files: List[str] = field(default_factory=list) # ไฟล์ที่ chunk สุดท้ายอยู่ใน batch นี้
+
+
+@dataclass
+class IngestStats:
+    files_indexed: int = 0
+    files_failed: int = 0
+    chunks_upserted: int = 0
+    chunks_resumed: int = 0 # chunks ที่ commit ไปแล้วจากการรันครั้งก่อนที่ถูกขัดจังหวะ
+    chunks_duplicate: int = 0 # near-duplicate chunks ที่ไม่ถูก embed/upsert (อ้างอิง canonical chunk แทน)
+    documents_duplicate: int = 0 # ไฟล์ที่เนื้อหาเกือบเหมือนกับไฟล์ที่ index ไว้แล้ว
+    batches: int = 0
+    elapsed: float = 0.0
+    failed_files: List[str] = field(default_factory=list)
+
+    @property
+    def dedup_ratio(self) -> float:
+        """สัดส่วนของ chunks ใหม่ที่เป็น near-duplicate (ไม่ต้อง embed และไม่เพิ่มขนาด index)."""
+        total = self.chunks_upserted + self.chunks_duplicate
+        return self.chunks_duplicate / total if total else 0.0
+
+
+def chunk_ids_from_content(chunks: List[Document]) -> List[str]:
+    """
+    สร้าง ID แบบ deterministic สำหรับ chunks ที่ไม่ได้มาจาก manifest (เช่นจาก Google Drive)
+    โดยใช้ไฟล์ต้นทาง, หน้า, ตำแหน่งเริ่มต้น และเนื้อหา ของแต่ละ chunk
+    """
+    chunk_ids = []
+    for chk in chunks:
+        meta = chk.metadata
+        source_key = meta.get("gdrive_file_id") or meta.get("source_pdf") or meta.get("source", "")
+        raw = f"{source_key}\0{meta.get('page')}\0{meta.get('start_index')}\0{chk.page_content}"
+        chunk_ids.append(hashlib.sha1(raw.encode("utf-8")).hexdigest())
+    return chunk_ids
+
+
+def delete_chunk_ids(vector_store, chunk_ids: List[str], batch_size: int = UPSERT_BATCH_SIZE,
+                     lexical_index: Optional[LexicalIndex] = None, dedup_index: Optional[DedupIndex] = None):
+    """
+    ลบ chunks ตาม ID ออกจาก vector store (แบ่งเป็น batch เพื่อไม่ให้เกิน limit ของ Chroma) และจาก lexical index
+    ถ้ามี dedup_index: duplicates ของ canonical chunks ที่ถูกลบจะถูก promote และ upsert แทน (เนื้อหาไม่หายจาก index)
+    """
+    promoted = dedup_index.remove(chunk_ids) if dedup_index is not None else []
+    for i in range(0, len(chunk_ids), batch_size):
+        vector_store.delete(ids=chunk_ids[i:i + batch_size])
+        if lexical_index is not None:
+            lexical_index.delete(chunk_ids[i:i + batch_size])
+    if promoted:
+        upsert_chunks(vector_store, [doc for _, doc in promoted], [chunk_id for chunk_id, _ in promoted],
+                      batch_size, lexical_index)
+        log.info(f"Promoted {len(promoted)} duplicate chunk(s) whose canonical chunk was deleted",
+                 extra={"markup": True})
+    if dedup_index is not None:
+        dedup_index.commit()
+
+
+def upsert_chunks(vector_store, chunks: List[Document], chunk_ids: List[str], batch_size: int = UPSERT_BATCH_SIZE,
+                  lexical_index: Optional[LexicalIndex] = None):
+    """เพิ่ม/ทับ chunks ลง vector store (และ lexical index ถ้ามี) ด้วย ID ที่กำหนด (แบ่งเป็น batch)."""
+    for i in range(0, len(chunks), batch_size):
+        vector_store.add_documents(documents=chunks[i:i + batch_size], ids=chunk_ids[i:i + batch_size])
+        if lexical_index is not None:
+            batch = chunks[i:i + batch_size]
+            lexical_index.add(chunk_ids[i:i + batch_size], [chunk.page_content for chunk in batch],
+                              [source_name(chunk.metadata) for chunk in batch])
+
+
+def iter_chunk_batches(results: Iterable[PdfResult], stats: IngestStats,
+                       manifest: Optional[IndexManifest] = None,
+                       batch_size: int = UPSERT_BATCH_SIZE,
+                       dedup_index: Optional[DedupIndex] = None) -> Iterator[ChunkBatch]:
+    """
+    แปลง stream ของผลลัพธ์รายไฟล์ ให้เป็น stream ของ batch ขนาดคงที่ (ไม่เก็บ chunks ของทั้ง corpus ไว้ใน RAM)
+    ถ้ามี manifest: ใช้ ID แบบ deterministic, ข้าม chunks ที่ commit ไปแล้วในการรันครั้งก่อน,
+    และแนบ chunk IDs เก่าของไฟล์ที่ถูกแก้ไขไปกับ batch เพื่อให้ลบก่อน upsert
+    ถ้ามี dedup_index: near-duplicate chunks ถูกแยกไปไว้ใน duplicate_ids (ไม่นับรวมใน batch_size)
+    """
+    batch = ChunkBatch()
+    stale = set() # stale_ids ของ batch ปัจจุบัน (ยังไม่ถูกลบ จึงห้ามใช้เป็น canonical)
+    for result in results:
+        source_key = result.job.source_key
+        # load + chunk รันใน worker process จึงใช้เวลาที่ worker วัดไว้ใน PdfResult
+        metrics.REGISTRY.observe("ingest_stage_seconds", result.elapsed, stage="parse_chunk")
+        metrics.REGISTRY.inc("ingest_files_total", status="failed" if result.error else "ok")
+        if result.error:
+            log.error(f"Skipping [red]{source_key}[/red]: {result.error}", extra={"markup": True})
+            stats.files_failed += 1
+            stats.failed_files.append(source_key)
+            continue
+
+        if manifest is not None:
+            content_hash = result.job.metadata["file_hash"]
+            chunk_ids = [make_chunk_id(source_key, content_hash, i) for i in range(len(result.chunks))]
+            entry = manifest.get(source_key)
+            already_committed = set()
+            if entry and not entry.get("complete", True) and entry.get("content_hash") == content_hash:
+                # รันครั้งก่อนถูกขัดจังหวะระหว่างไฟล์นี้ -> ทำต่อจาก batch สุดท้ายที่ commit แล้ว
+                already_committed = set(entry.get("chunk_ids", []))
+            elif entry:
+                batch.stale_ids.extend(entry.get("chunk_ids", []))
+                stale.update(entry.get("chunk_ids", []))
+        else:
+            chunk_ids = chunk_ids_from_content(result.chunks)
+            already_committed = set()
+
+        if dedup_index is not None and result.chunks:
+            duplicate_of = dedup_index.register_document(source_key, [chunk.page_content for chunk in result.chunks])
+            if duplicate_of is not None:
+                stats.documents_duplicate += 1
+                log.info(f"[yellow]{source_key}[/yellow] is a near-duplicate of [yellow]{duplicate_of}[/yellow]",
+                         extra={"markup": True})
+                for chunk in result.chunks:
+                    chunk.metadata["duplicate_of_document"] = duplicate_of
+
+        for chunk, chunk_id in zip(result.chunks, chunk_ids):
+            if chunk_id in already_committed:
+                stats.chunks_resumed += 1
+                continue
+            if dedup_index is not None and dedup_index.register_chunk(chunk, chunk_id, source_key, stale):
+                batch.duplicate_ids.append(chunk_id)
+                batch.duplicate_owners.append(source_key)
+                continue
+            batch.chunks.append(chunk)
+            batch.ids.append(chunk_id)
+            batch.owners.append(source_key)
+            if len(batch.chunks) >= batch_size:
+                yield batch
+                batch = ChunkBatch()
+                stale = set()
+        batch.completed_files.append(source_key)
+
+    if batch.chunks or batch.stale_ids or batch.duplicate_ids or batch.completed_files:
+        yield batch
+
+
+def run_ingest_pipeline(vector_store, results: Iterable[PdfResult],
+                        manifest: Optional[IndexManifest] = None,
+                        pending_files: Optional[Dict[str, PendingFile]] = None,
+                        batch_size: int = UPSERT_BATCH_SIZE,
+                        checkpoint_every: int = CHECKPOINT_EVERY_BATCHES,
+                        lexical_index: Optional[LexicalIndex] = None,
+                        dedup_index: Optional[DedupIndex] = None) -> IngestStats:
+    """
+    Pipeline แบบ streaming: (load -> chunk) -> embed batch -> upsert batch -> checkpoint
+    chunks ถูก embed และ upsert ทีละ batch ทันทีที่ครบ และ manifest ถูกบันทึกทุกๆ checkpoint_every batch
+    ถ้ารันถูกขัดจังหวะ การรันครั้งถัดไปจะข้ามไฟล์ที่ commit ครบแล้ว และทำต่อจาก batch สุดท้ายของไฟล์ที่ค้างอยู่
+    ถ้าส่ง lexical_index มา BM25 index จะถูกอัปเดตไปพร้อมกับ vector store ทุก batch
+    ถ้าส่ง dedup_index มา near-duplicate chunks จะไม่ถูก embed/upsert (ดู dedup.py) แต่ยังถูกบันทึกใน manifest
+    ของไฟล์ตามปกติ เพื่อให้ลบออกจาก dedup index ได้เมื่อไฟล์ถูกแก้ไขหรือลบ
+    """
+    stats = IngestStats()
+    pending_files = pending_files or {}
+    committed_ids: Dict[str, List[str]] = {}
+    start = time.perf_counter()
+
+    def checkpoint(completed: List[str]):
+        if manifest is None:
+            return
+        for source_key, ids in committed_ids.items():
+            state = pending_files[source_key]
+            done = source_key in completed
+            manifest.update(source_key, state.path, state.size, state.mtime, state.content_hash, ids, complete=done)
+        manifest.save()
+        for source_key in completed:
+            committed_ids.pop(source_key, None)
+
+    def seed(source_key: str):
+        # เริ่มนับ chunks ที่ commit แล้วของไฟล์นี้ (รวมส่วนที่ commit ไปแล้วจากการรันครั้งก่อนที่ถูกขัดจังหวะ)
+        if source_key in committed_ids:
+            return
+        entry = manifest.get(source_key)
+        resumable = (entry and not entry.get("complete", True)
+                     and entry.get("content_hash") == pending_files[source_key].content_hash)
+        committed_ids[source_key] = list(entry.get("chunk_ids", [])) if resumable else []
+
+    completed_since_checkpoint: List[str] = []
+    for batch in iter_chunk_batches(results, stats, manifest=manifest, batch_size=batch_size,
+                                    dedup_index=dedup_index):
+        if batch.stale_ids:
+            with metrics.span("delete", "ingest_stage_seconds"):
+                delete_chunk_ids(vector_store, batch.stale_ids, batch_size, lexical_index, dedup_index)
+        if batch.chunks:
+            batch_start = time.perf_counter()
+            embed_before = getattr(vector_store.embeddings, "embed_seconds", None) # มีเมื่อห่อด้วย CachedEmbeddings
+            upsert_chunks(vector_store, batch.chunks, batch.ids, batch_size, lexical_index)
+            batch_elapsed = time.perf_counter() - batch_start
+            metrics.REGISTRY.observe("ingest_stage_seconds", batch_elapsed, stage="embed_upsert")
+            if embed_before is not None:
+                metrics.REGISTRY.observe("ingest_stage_seconds", vector_store.embeddings.embed_seconds - embed_before,
+                                         stage="embed")
+            metrics.REGISTRY.inc("ingest_chunks_total", len(batch.chunks))
+            log.info(
+                f"Upserted batch {stats.batches + 1}: {len(batch.chunks)} chunks "
+                f"in {batch_elapsed:.2f}s ({len(batch.chunks) / max(batch_elapsed, 1e-9):.1f} chunks/sec)",
+                extra={"markup": True}
+            )
+        if dedup_index is not None:
+            # commit หลัง upsert: ถ้าถูกขัดจังหวะก่อนหน้านี้ รันครั้งถัดไปจะจัดกลุ่ม chunks ของ batch นี้ใหม่
+            dedup_index.commit()
+            metrics.REGISTRY.inc("ingest_duplicate_chunks_total", len(batch.duplicate_ids))
+        stats.batches += 1
+        stats.chunks_upserted += len(batch.chunks)
+        stats.chunks_duplicate += len(batch.duplicate_ids)
+
+        if manifest is not None:
+            for source_key, chunk_id in zip(batch.owners + batch.duplicate_owners, batch.ids + batch.duplicate_ids):
+                seed(source_key)
+                committed_ids[source_key].append(chunk_id)
+            for source_key in batch.completed_files:
+                seed(source_key)
+        completed_since_checkpoint.extend(batch.completed_files)
+        stats.files_indexed += len(batch.completed_files)
+
+        if stats.batches % checkpoint_every == 0:
+            with metrics.span("checkpoint", "ingest_stage_seconds"):
+                checkpoint(completed_since_checkpoint)
+            completed_since_checkpoint = []
+
+    with metrics.span("checkpoint", "ingest_stage_seconds"):
+        checkpoint(completed_since_checkpoint)
+    stats.elapsed = time.perf_counter() - start
+    return stats
@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+from utils.constant import LEXICAL_MAX_DF_RATIO
+
+log = logging.getLogger(__name__)
+
+# คำภาษาอังกฤษ/ตัวเลข/รหัส (เช่น "ab-1234", "v2.1") หรือข้อความภาษาไทยต่อเนื่องกัน
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*|[\u0e00-\u0e7f]+")
+_PART_RE = re.compile(r"[a-z0-9]+")
+_THAI_RE = re.compile(r"[\u0e00-\u0e7f]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    แบ่ง text เป็น terms สำหรับ BM25
+    - ภาษาอังกฤษ/ตัวเลข: ตัวพิมพ์เล็ก, รหัสที่มี - _ . / (เช่น part number) ถูกเก็บทั้งก้อนและแยกเป็นส่วนย่อย
+    - ภาษาไทย (ไม่มีช่องว่างระหว่างคำ): ใช้ character bigrams เพื่อไม่ต้องพึ่ง word segmenter
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if _THAI_RE.match(token):
+            terms.extend(token[i:i + 2] for i in range(max(len(token) - 1, 1)))
+            continue
+        terms.append(token)
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class LexicalIndex:
+    """
+    Inverted index (BM25) ของ chunks ที่เก็บใน SQLite คู่กับ Chroma collection
+    - postings เก็บเป็นตาราง WITHOUT ROWID เรียงตาม (term, doc_id) จึงกะทัดรัดและ lookup ทีละ term ได้เร็ว
+    - ตอน query เปิดแบบ read-only และใช้ mmap (PRAGMA mmap_size) แทนการอ่านผ่าน page cache ของ SQLite
+    - add/delete ใช้ chunk ID เดียวกับ Chroma จึงอัปเดตแบบ incremental ไปพร้อมกับ vector store ได้
+    - คำที่อยู่ในเกิน max_df_ratio ของ chunks ทั้งหมดไม่ถูกใช้คิดคะแนน (posting list ยาวแต่ idf ต่ำ)
+    """
+
+    def __init__(self, path: str, read_only: bool = False, mmap_bytes: int = 256 * 1024 * 1024,
+                 k1: float = 1.5, b: float = 0.75, max_df_ratio: float = LEXICAL_MAX_DF_RATIO):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_df_ratio = max_df_ratio
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._create_tables()
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+
+    def _create_tables(self):
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                length INTEGER NOT NULL,
+                source TEXT
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_by_doc ON postings (doc_id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('doc_count', 0), ('total_length', 0);
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(docs)")}
+        if "source" not in columns: # index ที่สร้างก่อนมีคอลัมน์ source
+            self._conn.execute("ALTER TABLE docs ADD COLUMN source TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS docs_by_source ON docs (source)")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return int(self._meta("doc_count"))
+
+    def _meta(self, key: str) -> float:
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _delete_locked(self, chunk_ids: Iterable[str]):
+        for chunk_id in chunk_ids:
+            row = self._conn.execute("SELECT doc_id, length FROM docs WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is None:
+                continue
+            doc_id, length = row
+            self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("UPDATE meta SET value = value - 1 WHERE key = 'doc_count'")
+            self._conn.execute("UPDATE meta SET value = value - ? WHERE key = 'total_length'", (length,))
+
+    def add(self, chunk_ids: List[str], texts: List[str], sources: Optional[List[str]] = None):
+        """
+        เพิ่มหรือทับ (upsert) chunks ตาม chunk ID
+        sources คือชื่อไฟล์ต้นทางของแต่ละ chunk ใช้ pre-filter ตอนค้นหาและแสดงรายการเอกสาร
+        """
+        sources = sources or [None] * len(chunk_ids)
+        with self._lock:
+            self._delete_locked(chunk_ids)
+            total_length = 0
+            for chunk_id, text, source in zip(chunk_ids, texts, sources):
+                term_counts = Counter(tokenize(text))
+                length = sum(term_counts.values())
+                doc_id = self._conn.execute(
+                    "INSERT INTO docs (chunk_id, length, source) VALUES (?, ?, ?)", (chunk_id, length, source)
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    ((term, doc_id, tf) for term, tf in term_counts.items())
+                )
+                total_length += length
+            self._conn.execute("UPDATE meta SET value = value + ? WHERE key = 'doc_count'", (len(chunk_ids),))
+            self._conn.execute("UPDATE meta SET value = value + ? WHERE key = 'total_length'", (total_length,))
+            self._conn.commit()
+
+    def delete(self, chunk_ids: List[str]):
+        with self._lock:
+            self._delete_locked(chunk_ids)
+            self._conn.commit()
+
+    def search(self, query: str, k: int = 10, sources: Optional[List[str]] = None,
+               chunk_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """
+        คืนค่า [(chunk_id, BM25 score)] เรียงจากคะแนนมากไปน้อย
+        ถ้าระบุ sources และ/หรือ chunk_ids จะคิดคะแนนเฉพาะ chunks ของไฟล์เหล่านั้นหรือที่มี ID ตรง
+        (ค่า idf ยังคิดจากทั้ง collection)
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        conditions, source_params = [], []
+        if sources:
+            conditions.append(f"d.source IN ({','.join('?' * len(sources))})")
+            source_params.extend(sources)
+        if chunk_ids:
+            conditions.append("d.chunk_id IN (SELECT value FROM json_each(?))")
+            source_params.append(json.dumps(list(chunk_ids)))
+        source_clause = f" AND ({' OR '.join(conditions)})" if conditions else ""
+        with self._lock:
+            doc_count = self._meta("doc_count")
+            if not doc_count:
+                return []
+            avg_length = self._meta("total_length") / doc_count
+            frequencies = self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({','.join('?' * len(terms))}) GROUP BY term",
+                list(terms)
+            ).fetchall()
+            if not frequencies:
+                return []
+            # คำที่อยู่ในเกือบทุก chunk (เช่น "the", "และ") มี posting list ยาวที่สุดแต่แทบไม่ช่วยจัดอันดับ จึงข้ามไป
+            # ถ้าทุกคำในคำถามเป็นแบบนั้น ใช้คำที่พบน้อยที่สุดคำเดียว
+            selected = [(term, df) for term, df in frequencies if df <= self.max_df_ratio * doc_count]
+            selected = selected or [min(frequencies, key=lambda item: item[1])]
+            idf_values = []
+            for term, document_frequency in selected:
+                idf_values.extend([term, math.log(1 + (doc_count - document_frequency + 0.5)
+                                                  / (document_frequency + 0.5))])
+            # คิดคะแนน BM25 และเลือก top-k ใน SQLite (ไม่ดึง posting lists ทั้งหมดขึ้นมาใน Python)
+            rows = self._conn.execute(
+                f"WITH query_terms (term, idf) AS (VALUES {','.join(['(?, ?)'] * len(selected))}) "
+                "SELECT d.chunk_id, SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * d.length / ?))) AS score "
+                "FROM query_terms q JOIN postings p ON p.term = q.term JOIN docs d ON d.doc_id = p.doc_id "
+                f"WHERE 1{source_clause} GROUP BY p.doc_id ORDER BY score DESC, p.doc_id LIMIT ?",
+                idf_values + [self.k1, self.k1, self.b, self.b, avg_length] + source_params + [k]
+            ).fetchall()
+        return [(chunk_id, score) for chunk_id, score in rows]
+
+    def list_sources(self) -> List[Tuple[str, int]]:
+        """รายชื่อไฟล์ต้นทางทั้งหมดใน index พร้อมจำนวน chunks (ใช้ทำตัวเลือกเอกสาร)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT source, COUNT(*) FROM docs WHERE source IS NOT NULL GROUP BY source ORDER BY source"
+            ).fetchall()
+
+    def clear(self):
+        with self._lock:
+            self._conn.executescript(
+                "DELETE FROM postings; DELETE FROM docs; UPDATE meta SET value = 0;"
+            )
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,306 @@
+# Metrics และ tracing ของ query path / ingestion แบบไม่ต้องพึ่ง library ภายนอก
+# - MetricsRegistry เก็บ counters และ histograms (เวลาเป็นวินาที) แล้ว export เป็น Prometheus text format
+#   (GET /metrics ใน api_server.py หรือเขียนเป็นไฟล์ให้ node_exporter textfile collector อ่าน)
+# - Trace จับเวลาแต่ละขั้นของคำถามหนึ่งข้อ (embed, vector_search, prompt, generate, ...) แล้วแนบไปกับคำตอบ
+#   trace ที่ active อยู่ถูกเก็บใน ContextVar ทำให้โค้ดชั้นล่าง (QueryBatcher, HybridRetriever) เรียก span()
+#   ได้โดยไม่ต้องส่ง trace ผ่านทุกฟังก์ชัน
+# เมื่อปิด METRICS_ENABLED: start_trace คืน trace ว่างตัวเดียวกันทุกครั้ง และ span คืน context manager ที่ไม่ทำอะไร
+# overhead จึงเหลือแค่การเรียกฟังก์ชันไม่กี่ครั้งต่อคำถาม
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from utils.constant import METRICS_ENABLED, METRICS_BUCKETS
+
+# ชื่อ metric -> (ชนิด, คำอธิบาย) สำหรับ # HELP / # TYPE (metric ที่ไม่อยู่ในนี้ใช้ชื่อเป็นคำอธิบาย)
+METRIC_HELP = {
+    "rag_stage_seconds": ("histogram", "Time spent in each stage of answering a question"),
+    "rag_request_seconds": ("histogram", "End-to-end time to answer a question"),
+    "rag_time_to_first_token_seconds": ("histogram", "Time from receiving a question to the first streamed token"),
+    "rag_queries_total": ("counter", "Questions received"),
+    "rag_errors_total": ("counter", "Questions that failed"),
+    "rag_cache_hits_total": ("counter", "Questions answered from the answer cache"),
+    "rag_cache_misses_total": ("counter", "Questions not found in the answer cache"),
+    "rag_chunks_retrieved_total": ("counter", "Chunks passed to the prompt"),
+    "rag_prompt_tokens_total": ("counter", "Estimated tokens sent to the LLM"),
+    "rag_completion_tokens_total": ("counter", "Tokens generated by the LLM (estimated when not streamed)"),
+    "ingest_stage_seconds": ("histogram", "Time spent in each ingestion stage"),
+    "ingest_files_total": ("counter", "PDF files processed by ingestion"),
+    "ingest_chunks_total": ("counter", "Chunks upserted by ingestion"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """histogram แบบ cumulative buckets เหมือน Prometheus (bucket สุดท้ายคือ +Inf)."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[Tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            yield ("+Inf" if bound == float("inf") else repr(float(bound))), total
+
+
+class MetricsRegistry:
+    """counters และ histograms แยกตาม labels (thread-safe)."""
+
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = METRICS_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: str):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(tuple(sorted(labels.items())), 0.0)
+
+    def histogram_count(self, name: str, **labels: str) -> int:
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(tuple(sorted(labels.items())))
+            return histogram.count if histogram else 0
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """ค่าทั้งหมดใน Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines.extend(_header(name, "counter"))
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_labels(key)} {_number(value)}")
+            for name in sorted(self._histograms):
+                lines.extend(_header(name, "histogram"))
+                for key, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_labels(key + (('le', bound),))} {count}")
+                    lines.append(f"{name}_sum{_labels(key)} {_number(histogram.sum)}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """เขียนเป็นไฟล์ .prom แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename) สำหรับ textfile collector."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+
+def _header(name: str, kind: str):
+    kind, description = METRIC_HELP.get(name, (kind, name))
+    return [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+
+
+def _labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(key, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+REGISTRY = MetricsRegistry(enabled=METRICS_ENABLED)
+_NOOP_SPAN = nullcontext()
+
+
+class Trace:
+    """
+    เวลาของแต่ละขั้นตอนของคำถามหนึ่งข้อ (ขั้นที่ถูกเรียกหลายครั้งจะถูกรวมกัน) และตัวนับของคำถามนั้น
+    ทุก span ถูกบันทึกลง histogram {histogram}{stage=...} ของ registry ด้วย
+    """
+
+    def __init__(self, operation: str, registry: MetricsRegistry = None, histogram: str = "rag_stage_seconds"):
+        self.operation = operation
+        self.registry = registry or REGISTRY
+        self.histogram = histogram
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, float] = {}
+        self.finished = False
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage: str, seconds: float):
+        """บันทึกเวลาของขั้นตอนที่จับเวลามาจากที่อื่น (เช่นใน thread ของ QueryBatcher)."""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.registry.observe(self.histogram, seconds, stage=stage)
+
+    def count(self, name: str, value: float = 1.0):
+        """เพิ่มตัวนับของคำถามนี้ และ counter rag_{name}_total ของ registry."""
+        self.counts[name] = self.counts.get(name, 0.0) + value
+        self.registry.inc(f"rag_{name}_total", value)
+
+    def mark(self, name: str, histogram: Optional[str] = None) -> float:
+        """บันทึกเวลาที่ผ่านไปตั้งแต่เริ่ม trace ณ จุดนี้ (เช่น time to first token)."""
+        elapsed = time.perf_counter() - self.started
+        self.stages[name] = elapsed
+        if histogram:
+            self.registry.observe(histogram, elapsed)
+        return elapsed
+
+    def finish(self, status: str = "ok") -> dict:
+        """ปิด trace แล้วคืนเวลาเป็น ms สำหรับแนบไปกับคำตอบ (key "timings")."""
+        self.finished = True
+        total = time.perf_counter() - self.started
+        self.registry.observe("rag_request_seconds", total, operation=self.operation, status=status)
+        timings = {"total_ms": round(total * 1000, 2)}
+        timings.update({f"{stage}_ms": round(seconds * 1000, 2) for stage, seconds in self.stages.items()})
+        timings.update({name: int(value) if float(value).is_integer() else value for name, value in self.counts.items()})
+        return timings
+
+
+class _NoopTrace:
+    """trace ที่ใช้ตอนปิด metrics: ไม่จับเวลาและไม่เก็บอะไรเลย."""
+
+    finished = False
+
+    def span(self, stage: str):
+        return _NOOP_SPAN
+
+    def add(self, stage: str, seconds: float):
+        pass
+
+    def count(self, name: str, value: float = 1.0):
+        pass
+
+    def mark(self, name: str, histogram: Optional[str] = None) -> float:
+        return 0.0
+
+    def finish(self, status: str = "ok") -> None:
+        return None
+
+
+NOOP_TRACE = _NoopTrace()
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def start_trace(operation: str) -> Trace:
+    """เริ่ม trace ของคำถามหนึ่งข้อ (คืน NOOP_TRACE ถ้าปิด metrics) และนับคำถามใน rag_queries_total."""
+    if not REGISTRY.enabled:
+        return NOOP_TRACE
+    REGISTRY.inc("rag_queries_total", operation=operation)
+    return Trace(operation)
+
+
+@contextmanager
+def use_trace(trace):
+    """ทำให้ trace เป็น trace ปัจจุบันภายใน block (span() ที่เรียกจากโค้ดชั้นล่างจะถูกบันทึกลง trace นี้)."""
+    if trace is NOOP_TRACE:
+        yield trace
+        return
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get() or NOOP_TRACE
+
+
+def span(stage: str, histogram: str = "rag_stage_seconds"):
+    """
+    จับเวลาขั้นตอน: บันทึกลง trace ปัจจุบัน (ถ้ามี) ถ้าไม่มี trace บันทึกลง histogram ของ registry อย่างเดียว
+    """
+    if not REGISTRY.enabled:
+        return _NOOP_SPAN
+    trace = _current_trace.get()
+    if trace is not None:
+        return trace.span(stage)
+    return _registry_span(stage, histogram)
+
+
+@contextmanager
+def _registry_span(stage: str, histogram: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(histogram, time.perf_counter() - start, stage=stage)
+
+
+def count(name: str, value: float = 1.0):
+    """เพิ่มตัวนับ rag_{name}_total (และตัวนับของ trace ปัจจุบันถ้ามี)."""
+    if not REGISTRY.enabled:
+        return
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, value)
+    else:
+        REGISTRY.inc(f"rag_{name}_total", value)
+
+
+def format_timings(timings: Optional[dict]) -> str:
+    """สรุป timings ของคำตอบเป็นบรรทัดเดียว เช่น "total 812.4ms: retrieve 40.1ms, ..." (สำหรับ log และ app.py)."""
+    if not timings:
+        return "timings unavailable (METRICS_ENABLED is off)"
+    stages = ", ".join(f"{key[:-3]} {value:.1f}ms" for key, value in timings.items()
+                       if key.endswith("_ms") and key != "total_ms")
+    counts = ", ".join(f"{key}={value}" for key, value in timings.items() if not key.endswith("_ms"))
+    return f"total {timings['total_ms']:.1f}ms: {stages}" + (f" | {counts}" if counts else "")
+
+
+def record_stages(timings: Dict[str, float]):
+    """บันทึกเวลาหลายขั้นตอน (วินาที) ที่จับมาจาก thread อื่นลงใน trace ปัจจุบันหรือ registry."""
+    if not REGISTRY.enabled:
+        return
+    trace = _current_trace.get()
+    for stage, seconds in timings.items():
+        if trace is not None:
+            trace.add(stage, seconds)
+        else:
+            REGISTRY.observe("rag_stage_seconds", seconds, stage=stage)
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import logging
+import threading
+from typing import Iterator, Optional, Tuple
+
+from utils.constant import PAGE_CACHE_PATH
+
+log = logging.getLogger(__name__)
+
+READ_BATCH_SIZE = 64 # จำนวนหน้าที่อ่านจาก SQLite ต่อครั้งตอน iterate (ไม่โหลดทั้งไฟล์เข้า RAM)
+WRITE_BATCH_SIZE = 64 # จำนวนหน้าที่เขียนลง SQLite ต่อ transaction
+
+
+class PageTextCache:
+    """
+    cache ข้อความที่ extract จาก PDF แล้วรายหน้า บนดิสก์ (SQLite) key = (hash ของไฟล์, เลขหน้า)
+    ข้อความของหน้าไม่ขึ้นกับ chunk_size/chunk_overlap จึงเปลี่ยนค่าการ chunk แล้ว index ใหม่ได้โดยไม่ต้องรัน pypdf ซ้ำ
+    ไฟล์ถูกนับว่าอยู่ใน cache เมื่อเก็บครบทุกหน้าแล้วเท่านั้น (ตาราง files) ไฟล์ที่ extract ค้างครึ่งทางจะถูก extract ใหม่
+    และเขียนทับหน้าเดิม
+    เปิดจากหลาย process พร้อมกันได้ (WAL + busy timeout) เพราะ worker ของ parallel_ingest ใช้ cache เดียวกัน
+    """
+
+    def __init__(self, cache_path: str = PAGE_CACHE_PATH, write_batch_size: int = WRITE_BATCH_SIZE):
+        self.cache_path = cache_path
+        self.write_batch_size = write_batch_size
+        self._pending = []
+        self._lock = threading.Lock()
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                file_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                page_label TEXT,
+                text TEXT NOT NULL,
+                PRIMARY KEY (file_hash, page)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS files (
+                file_hash TEXT PRIMARY KEY,
+                total_pages INTEGER NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def total_pages(self, file_hash: str) -> Optional[int]:
+        """จำนวนหน้าของไฟล์ที่เก็บครบแล้ว (None = ยังไม่มีใน cache หรือเก็บไม่ครบ)."""
+        with self._lock:
+            row = self._conn.execute("SELECT total_pages FROM files WHERE file_hash = ?", (file_hash,)).fetchone()
+        return row[0] if row else None
+
+    def iter_pages(self, file_hash: str) -> Iterator[Tuple[int, Optional[str], str]]:
+        """yield (เลขหน้า, page label, ข้อความ) เรียงตามหน้า โดยอ่านจาก SQLite ทีละ READ_BATCH_SIZE หน้า."""
+        next_page = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT page, page_label, text FROM pages WHERE file_hash = ? AND page >= ? ORDER BY page LIMIT ?",
+                    (file_hash, next_page, READ_BATCH_SIZE),
+                ).fetchall()
+            yield from rows
+            if len(rows) < READ_BATCH_SIZE:
+                return
+            next_page = rows[-1][0] + 1
+
+    def put_page(self, file_hash: str, page: int, page_label: Optional[str], text: str):
+        """
+        เก็บข้อความของหน้า (เขียนลง SQLite ทีละ write_batch_size หน้า เพื่อไม่ให้ต้อง commit ทุกหน้า
+        และไม่ถือ write lock ตลอดการ extract ไฟล์ใหญ่ซึ่งจะทำให้ worker อื่นรอ)
+        """
+        with self._lock:
+            self._pending.append((file_hash, page, page_label, text))
+            if len(self._pending) >= self.write_batch_size:
+                self._flush_locked()
+
+    def mark_complete(self, file_hash: str, total_pages: int):
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (file_hash, total_pages) VALUES (?, ?)", (file_hash, total_pages)
+            )
+            self._conn.commit()
+
+    def _flush_locked(self):
+        if self._pending:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (file_hash, page, page_label, text) VALUES (?, ?, ?, ?)", self._pending
+            )
+            self._conn.commit()
+            self._pending = []
+
+    def close(self):
+        with self._lock:
+            self._pending = []
+            self._conn.close()
@@ -0,0 +1,174 @@
+import os
+import time
+import logging
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from langchain_core.documents import Document
+import resources
+from pdf_processing import iter_pdf_pages, iter_chunks
+from utils.constant import PAGE_CACHE_ENABLED
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INGEST_WORKERS = os.cpu_count() or 1
+DEFAULT_FILE_TIMEOUT = 300 # วินาที ต่อไฟล์ ก่อนถือว่าไฟล์นั้นค้าง
+MAX_POOL_RESTARTS_PER_FILE = 2 # ไฟล์ที่ทำให้ worker ล่มซ้ำเกินจำนวนนี้จะถูกข้าม
+
+
+@dataclass
+class PdfJob:
+    """งาน 1 ชิ้น = PDF 1 ไฟล์ ที่ต้อง load + chunk."""
+    source_key: str
+    file_path: str
+    metadata: Dict[str, str] = field(default_factory=dict) # metadata ที่จะใส่ให้ทุกหน้าก่อน chunk
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    chunk_length_unit: str = "chars" # "chars" หรือ "tokens" (ดู text_chunker.py)
+
+
+@dataclass
+class PdfResult:
+    job: PdfJob
+    chunks: List[Document] = field(default_factory=list)
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+def parse_and_chunk_pdf(job: PdfJob) -> PdfResult:
+    """
+    โหลดและแบ่ง chunks ของ PDF 1 ไฟล์ (ถูกเรียกใน worker process จึงต้องเป็นฟังก์ชันระดับ module)
+    หน้าถูกส่งเข้า splitter ทีละหน้าตามที่ extract ได้ และถ้า job มี file_hash จะใช้ page cache
+    (ไฟล์ที่เคย extract แล้วจะไม่ถูกเปิดด้วย pypdf อีก แม้ chunk_size/chunk_overlap จะเปลี่ยน)
+    """
+    start = time.perf_counter()
+    file_hash = job.metadata.get("file_hash")
+    page_cache = resources.get_page_cache() if PAGE_CACHE_ENABLED and file_hash else None
+    pages_loaded = 0
+
+    def pages():
+        nonlocal pages_loaded
+        for doc in iter_pdf_pages(job.file_path, file_hash=file_hash, page_cache=page_cache):
+            doc.metadata.update(job.metadata)
+            pages_loaded += 1
+            yield doc
+
+    chunks = [chk for chk in iter_chunks(pages(), job.chunk_size, job.chunk_overlap, job.chunk_length_unit) if chk.page_content]
+    error = None if pages_loaded else "no pages could be loaded"
+    return PdfResult(job=job, chunks=chunks, error=error, elapsed=time.perf_counter() - start)
+
+
+def _iter_serial(jobs: Iterable[PdfJob]) -> Iterator[PdfResult]:
+    for job in jobs:
+        try:
+            yield parse_and_chunk_pdf(job)
+        except Exception as e:
+            log.error(f"Failed to process {job.source_key}: {e}")
+            yield PdfResult(job=job, error=str(e))
+
+
+def _terminate_pool(executor: ProcessPoolExecutor):
+    """
+    ปิด pool ทันทีรวมถึง worker ที่ค้างอยู่
+    (ProcessPoolExecutor ไม่มี API สำหรับ kill worker ก่อน Python 3.14 จึงต้องใช้ _processes)
+    """
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_parsed_pdfs(jobs: Iterable[PdfJob], workers: int = DEFAULT_INGEST_WORKERS,
+                     max_in_flight: Optional[int] = None,
+                     file_timeout: float = DEFAULT_FILE_TIMEOUT) -> Iterator[PdfResult]:
+    """
+    load + chunk PDF หลายไฟล์พร้อมกันด้วย process pool และ yield ผลลัพธ์กลับมาทีละไฟล์ตามลำดับที่เสร็จ
+    - ส่งงานเข้า pool ไม่เกิน max_in_flight ไฟล์ในเวลาเดียวกัน เพื่อไม่ให้ผลลัพธ์ค้างใน RAM
+    - ไฟล์ที่ error, ใช้เวลาเกิน file_timeout หรือทำให้ worker ล่ม จะถูกคืนค่าเป็น PdfResult ที่มี error
+      โดยไม่ทำให้ไฟล์อื่นหยุดทำงาน
+    - เมื่อ worker ล่มระหว่างมีหลายไฟล์อยู่ใน pool จะไม่รู้ว่าไฟล์ไหนเป็นสาเหตุ ไฟล์เหล่านั้นจึงถูกรันใหม่ทีละไฟล์
+      และนับจำนวนครั้งที่ล่มเฉพาะตอนที่ไฟล์นั้นอยู่ใน pool เพียงไฟล์เดียว
+    """
+    if workers <= 1:
+        yield from _iter_serial(jobs)
+        return
+
+    # ใช้ spawn เพราะ process หลักอาจโหลด torch/embedding model ไว้แล้ว (fork หลังจากนั้นเสี่ยง deadlock)
+    mp_context = multiprocessing.get_context("spawn")
+    max_in_flight = max_in_flight or workers
+    pending_jobs = iter(jobs)
+    retry_queue: List[PdfJob] = []
+    restarts: Dict[str, int] = {}
+    suspects: Set[str] = set() # source_key ของไฟล์ที่อยู่ใน pool ตอน worker ล่ม (รันทีละไฟล์)
+    in_flight = {} # future -> (job, submitted_at)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+
+    def next_job() -> Optional[PdfJob]:
+        if any(job.source_key in suspects for job, _ in in_flight.values()):
+            return None
+        if retry_queue and retry_queue[0].source_key in suspects:
+            return None if in_flight else retry_queue.pop(0)
+        if retry_queue:
+            return retry_queue.pop(0)
+        return next(pending_jobs, None)
+
+    def fill():
+        while len(in_flight) < max_in_flight:
+            job = next_job()
+            if job is None:
+                return
+            in_flight[executor.submit(parse_and_chunk_pdf, job)] = (job, time.monotonic())
+
+    try:
+        fill()
+        while in_flight:
+            done, _ = wait(list(in_flight), timeout=1.0, return_when=FIRST_COMPLETED)
+            pool_broken = False
+            for future in done:
+                job, _ = in_flight.pop(future)
+                try:
+                    result = future.result()
+                    suspects.discard(job.source_key)
+                    yield result
+                except BrokenProcessPool:
+                    in_flight[future] = (job, time.monotonic())
+                    pool_broken = True
+                except Exception as e:
+                    suspects.discard(job.source_key)
+                    log.error(f"Failed to process {job.source_key}: {e}")
+                    yield PdfResult(job=job, error=str(e))
+
+            now = time.monotonic()
+            timed_out = [f for f, (_, submitted) in in_flight.items()
+                         if not f.done() and now - submitted > file_timeout]
+            if not pool_broken and not timed_out:
+                fill()
+                continue
+
+            # worker ล่มหรือค้าง -> ปิด pool ทิ้ง แล้วส่งงานที่ยังไม่เสร็จเข้า pool ใหม่
+            for future in timed_out:
+                job, _ = in_flight.pop(future)
+                log.error(f"Timed out after {file_timeout}s while processing {job.source_key}")
+                yield PdfResult(job=job, error=f"timed out after {file_timeout}s")
+            alone = len(in_flight) == 1
+            for future, (job, _) in list(in_flight.items()):
+                if pool_broken:
+                    suspects.add(job.source_key)
+                    if alone:
+                        restarts[job.source_key] = restarts.get(job.source_key, 0) + 1
+                if restarts.get(job.source_key, 0) > MAX_POOL_RESTARTS_PER_FILE:
+                    log.error(f"Worker crashed repeatedly while processing {job.source_key}. Skipping it.")
+                    yield PdfResult(job=job, error="worker process crashed")
+                else:
+                    retry_queue.append(job)
+            in_flight.clear()
+            _terminate_pool(executor)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+            fill()
+    finally:
+        if in_flight: # consumer หยุดกลางทาง หรือเกิด exception
+            _terminate_pool(executor)
+        else:
+            executor.shutdown(wait=True)
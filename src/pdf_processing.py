@@ -1,9 +1,13 @@
 import os
 import io
-from typing import List, Tuple # เพิ่ม Tuple
+import mmap
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union # เพิ่ม Tuple
 from langchain.schema.document import Document # ตรวจสอบว่า import นี้ยังอยู่
-from langchain_community.document_loaders import PyPDFLoader # PyPDFLoader ใช้ path ของไฟล์
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+import resources
+from text_chunker import TextChunker, tokenizer_offsets
 
 # Imports for Google Drive
 from google.auth.transport.requests import Request
@@ -14,10 +18,14 @@ from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 
 # If modifying these SCOPES, delete the file token.json.
-SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
-CREDENTIALS_FILE = 'credentials.json' # Path to your credentials.json
-TOKEN_FILE = 'token.json' # Will be created automatically
-TEMP_PDF_DIR = "temp_pdfs" # โฟลเดอร์สำหรับเก็บ PDF ที่ดาวน์โหลดชั่วคราว
+from utils.constant import (
+    SCOPES, CREDENTIALS_FILE, TOKEN_FILE, TEMP_PDF_DIR, DRIVE_DOWNLOAD_CHUNK_SIZE, DRIVE_MAX_RETRIES,
+    CHUNK_LENGTH_UNIT,
+)
+from drive_sync import DriveSync, list_folder_pdfs
+
+# PDF รับได้ทั้ง path, bytes, file object ที่ seek ได้ (เช่น BytesIO, SpooledTemporaryFile) หรือ mmap
+PdfSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO, mmap.mmap]
 
 def authenticate_google_drive():
     """Authenticates with Google Drive API and returns the service object."""
@@ -41,23 +49,15 @@ def authenticate_google_drive():
         return None
 
 def list_pdfs_from_drive_folder(service, folder_id: str) -> List[Tuple[str, str]]: # คืนค่าเป็น List of (id, name)
-    """Lists PDF files from a specific Google Drive folder."""
+    """Lists all PDF files from a specific Google Drive folder (follows nextPageToken across pages)."""
     pdf_files = []
     if not service:
         return pdf_files
     try:
-        query = f"'{folder_id}' in parents and mimeType='application/pdf' and trashed=false"
-        results = service.files().list(
-            q=query,
-            pageSize=100, # ปรับขนาดได้ตามต้องการ
-            fields="nextPageToken, files(id, name)"
-        ).execute()
-        items = results.get('files', [])
-        if not items:
+        pdf_files = [(drive_file.id, drive_file.name) for drive_file in list_folder_pdfs(service, folder_id)]
+        if not pdf_files:
             print(f'No PDF files found in Google Drive folder ID: {folder_id}')
         else:
-            for item in items:
-                pdf_files.append((item['id'], item['name']))
             print(f"Found {len(pdf_files)} PDF(s) in Google Drive folder: {folder_id}")
     except HttpError as error:
         print(f'An error occurred while listing PDF files from Google Drive: {error}')
@@ -73,18 +73,14 @@ def download_pdf_from_drive(service, file_id: str, file_name: str) -> str | None
 
         local_file_path = os.path.join(TEMP_PDF_DIR, file_name)
         request = service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
         print(f"Downloading {file_name} from Google Drive...", end=" ")
-        while done is False:
-            status, done = downloader.next_chunk()
-            # print(F'Download {int(status.progress() * 100)}.') # แสดง % progress ถ้าต้องการ
+        with open(local_file_path, 'wb') as fh: # เขียนลงดิสก์ทีละ chunk แทนการพักทั้งไฟล์ไว้ใน RAM
+            downloader = MediaIoBaseDownload(fh, request, chunksize=DRIVE_DOWNLOAD_CHUNK_SIZE)
+            done = False
+            while done is False:
+                status, done = downloader.next_chunk(num_retries=DRIVE_MAX_RETRIES)
+                # print(F'Download {int(status.progress() * 100)}.') # แสดง % progress ถ้าต้องการ
         print("Done.")
-
-        with open(local_file_path, 'wb') as f:
-            fh.seek(0)
-            f.write(fh.read())
         print(f"File '{file_name}' downloaded to '{local_file_path}'")
         return local_file_path
     except HttpError as error:
@@ -104,72 +100,160 @@ def cleanup_temp_pdfs():
         except Exception as e:
             print(f"Error cleaning up temporary PDF directory: {e}")
 
-def load_pdf(file_path: str) -> List[Document]: # ฟังก์ชันนี้ยังคงเดิม แต่จะใช้กับไฟล์ที่ดาวน์โหลดมา
-    """โหลดข้อมูลจากไฟล์ PDF และคืนค่าเป็น List ของ Document."""
-    if not os.path.exists(file_path):
-        print(f"Error: Local PDF file not found at {file_path}")
+@contextmanager
+def open_pdf_stream(source: PdfSource) -> Iterator[BinaryIO]:
+    """
+    เปิด PDF เป็น binary stream ที่ seek ได้ โดยไม่อ่านทั้งไฟล์เข้า RAM
+    - path: map ไฟล์ด้วย mmap (OS โหลดเฉพาะส่วนที่ pypdf อ่านจริง และไม่ต้อง copy ไปไว้ใน buffer ของ Python)
+    - bytes / bytearray / memoryview: ห่อด้วย BytesIO
+    - file object หรือ mmap: ใช้ตรงๆ (ผู้เรียกเป็นคนปิด)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0: # mmap ใช้กับไฟล์ว่างไม่ได้
+                yield f
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    else:
+        yield source
+
+def _default_source_name(source: PdfSource) -> Optional[str]:
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    name = getattr(source, "name", None)
+    return name if isinstance(name, str) else None
+
+def iter_pdf_pages(source: PdfSource, source_name: Optional[str] = None, file_hash: Optional[str] = None,
+                   page_cache=None) -> Iterator[Document]:
+    """
+    yield Document ทีละหน้า (pypdf อ่าน object ของแต่ละหน้าเมื่อถูกขอเท่านั้น)
+    metadata เหมือนกับที่ PyPDFLoader ใส่ให้: source, page (เริ่มที่ 0), page_label, total_pages
+    ถ้าส่ง file_hash และ page_cache (PageTextCache) มา: ไฟล์ที่เคย extract ครบแล้วจะอ่านข้อความจาก cache
+    โดยไม่เปิด PDF เลย ส่วนไฟล์ใหม่จะถูกเก็บลง cache ไปพร้อมกับการ yield
+    """
+    source_name = source_name or _default_source_name(source)
+    use_cache = page_cache is not None and file_hash is not None
+    if use_cache:
+        total_pages = page_cache.total_pages(file_hash)
+        if total_pages is not None:
+            for page_number, page_label, text in page_cache.iter_pages(file_hash):
+                yield _page_document(text, source_name, page_number, page_label, total_pages)
+            return
+
+    with open_pdf_stream(source) as stream:
+        reader = PdfReader(stream)
+        total_pages = len(reader.pages)
+        page_labels = reader.page_labels
+        for page_number, page in enumerate(reader.pages):
+            text = page.extract_text() or ""
+            page_label = page_labels[page_number] if page_number < len(page_labels) else str(page_number + 1)
+            if use_cache:
+                page_cache.put_page(file_hash, page_number, page_label, text)
+            yield _page_document(text, source_name, page_number, page_label, total_pages)
+    if use_cache:
+        page_cache.mark_complete(file_hash, total_pages)
+
+def _page_document(text: str, source_name: Optional[str], page_number: int, page_label: Optional[str],
+                   total_pages: int) -> Document:
+    return Document(
+        page_content=text,
+        metadata={"source": source_name, "page": page_number, "page_label": page_label, "total_pages": total_pages},
+    )
+
+def load_pdf(source: PdfSource, source_name: Optional[str] = None) -> List[Document]:
+    """
+    โหลดข้อมูลจาก PDF และคืนค่าเป็น List ของ Document (1 หน้าต่อ 1 Document)
+    source เป็น path, bytes, file object หรือ mmap ก็ได้ (ดู open_pdf_stream) จึงไม่ต้องเขียน PDF ลงดิสก์ก่อน
+    """
+    if isinstance(source, (str, os.PathLike)) and not os.path.exists(source):
+        print(f"Error: Local PDF file not found at {source}")
         return []
+    name = source_name or _default_source_name(source)
+    display_name = os.path.basename(name) if name else "<buffer>"
     try:
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
-        print(f"Loaded {len(documents)} page(s) from local file: {os.path.basename(file_path)}")
+        documents = list(iter_pdf_pages(source, source_name))
+        print(f"Loaded {len(documents)} page(s) from: {display_name}")
         return documents
     except Exception as e:
-        print(f"Error loading PDF {os.path.basename(file_path)}: {e}")
+        print(f"Error loading PDF {display_name}: {e}")
         return []
 
-def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
+def get_text_chunker(chunk_size: int = 1000, chunk_overlap: int = 200,
+                     length_unit: str = CHUNK_LENGTH_UNIT) -> TextChunker:
+    """สร้าง TextChunker ตามหน่วยความยาวที่กำหนด ("chars" หรือ "tokens" ของ tokenizer ของ embedding model)."""
+    if length_unit == "chars":
+        return TextChunker(chunk_size, chunk_overlap)
+    if length_unit == "tokens":
+        return TextChunker(chunk_size, chunk_overlap, token_offsets=tokenizer_offsets(resources.get_tokenizer()))
+    raise ValueError(f"Unknown chunk length unit: {length_unit}")
+
+def iter_chunks(documents: Iterable[Document], chunk_size: int = 1000, chunk_overlap: int = 200,
+                length_unit: str = CHUNK_LENGTH_UNIT) -> Iterator[Document]:
+    """
+    แบ่ง Document ออกเป็น Chunks ทีละ Document ตามที่ได้รับมา (เช่นจาก iter_pdf_pages)
+    จึงไม่ต้องโหลดทุกหน้าของ PDF ไว้ใน RAM ก่อนเริ่ม chunk (start_index นับภายในแต่ละหน้าเหมือนเดิม)
+    """
+    yield from get_text_chunker(chunk_size, chunk_overlap, length_unit).split_documents(documents)
+
+def chunk_documents(documents: Iterable[Document], chunk_size: int = 1000, chunk_overlap: int = 200,
+                    length_unit: str = CHUNK_LENGTH_UNIT) -> List[Document]:
     """แบ่ง Document ออกเป็น Chunks เล็กๆ."""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        add_start_index=True,
-    )
-    chunks = text_splitter.split_documents(documents)
-    print(f"Split {len(documents)} document(s) into {len(chunks)} chunks.")
+    page_count = 0
+
+    def counted():
+        nonlocal page_count
+        for document in documents:
+            page_count += 1
+            yield document
+
+    chunks = list(iter_chunks(counted(), chunk_size, chunk_overlap, length_unit))
+    print(f"Split {page_count} document(s) into {len(chunks)} chunks.")
     return chunks
 
 # --- ฟังก์ชันใหม่สำหรับดึง PDF จาก GDrive และประมวลผล ---
-def get_all_document_chunks_from_gdrive(gdrive_folder_id: str) -> Tuple[List[Document], List[str]]:
+def get_all_document_chunks_from_gdrive(gdrive_folder_id: str, workers: int = 1) -> Tuple[List[Document], List[str]]:
     """
     ดึง PDF ทั้งหมดจาก Google Drive folder ที่ระบุ, โหลด, แบ่งเป็น chunks,
     และคืนค่าเป็น list ของ chunks และ list ของชื่อไฟล์ที่ประมวลผลสำเร็จ.
+    PDF ถูก sync ลง cache ของ DriveSync (ไฟล์ที่ไม่เปลี่ยนไม่ถูกดาวน์โหลดซ้ำ) แล้ว load + chunk จาก cache
+    ถ้า workers > 1 จะ load + chunk หลายไฟล์พร้อมกันด้วย process pool
     """
-    service = authenticate_google_drive()
-    if not service:
-        print("Failed to authenticate with Google Drive. Cannot process PDFs.")
-        return [], []
-
-    pdf_files_info = list_pdfs_from_drive_folder(service, gdrive_folder_id)
-    all_chunks = []
-    processed_file_names = []
-
-    if not pdf_files_info:
-        cleanup_temp_pdfs() # ลบ temp dir ถ้าไม่มีไฟล์เลย
-        return [], []
-
-    for file_id, file_name in pdf_files_info:
-        print(f"\n--- Processing: {file_name} (ID: {file_id}) from Google Drive ---")
-        local_pdf_path = download_pdf_from_drive(service, file_id, file_name)
-        if local_pdf_path:
-            loaded_docs = load_pdf(local_pdf_path)
-            if loaded_docs:
-                # เพิ่ม metadata ชื่อไฟล์ GDrive เข้าไปในแต่ละ document ก่อน chunk
-                for doc in loaded_docs:
-                    doc.metadata["source_gdrive_pdf"] = file_name # เก็บชื่อไฟล์ GDrive
-                    doc.metadata["gdrive_file_id"] = file_id # เก็บ ID ไฟล์ GDrive
-                document_chunks = chunk_documents(loaded_docs)
-                all_chunks.extend(document_chunks)
-                processed_file_names.append(file_name)
-            else:
-                print(f"Could not load documents from downloaded file: {file_name}")
-        else:
-            print(f"Failed to download: {file_name}")
-
-    cleanup_temp_pdfs() # ลบไฟล์ PDF ชั่วคราวหลังประมวลผลเสร็จ
+    all_chunks, processed_file_names = [], []
+    for result in _iter_parsed_drive_pdfs(gdrive_folder_id, workers):
+        if result.error:
+            print(f"Could not load documents from downloaded file: {result.job.source_key} ({result.error})")
+            continue
+        all_chunks.extend(result.chunks)
+        processed_file_names.append(result.job.source_key)
     return all_chunks, processed_file_names
 
+def _iter_parsed_drive_pdfs(gdrive_folder_id: str, workers: int):
+    """
+    sync PDF ในโฟลเดอร์ลง cache ของ DriveSync แล้ว load + chunk (workers > 1 ใช้ process pool)
+    worker แต่ละตัวเปิดไฟล์ใน cache ด้วย mmap เอง จึงไม่ต้องส่ง bytes ของ PDF ข้าม process
+    """
+    # import ตรงนี้เพื่อเลี่ยง circular import (parallel_ingest import load_pdf/chunk_documents จากไฟล์นี้)
+    from parallel_ingest import PdfJob, iter_parsed_pdfs
+
+    try:
+        sync_result = DriveSync(authenticate_google_drive, gdrive_folder_id).sync()
+    except Exception as e:
+        print(f"An error occurred while syncing Google Drive folder {gdrive_folder_id}: {e}")
+        return
+    ingested_at = int(time.time())
+    jobs = [
+        PdfJob(
+            source_key=drive_file.name,
+            file_path=sync_result.local_paths[drive_file.id],
+            metadata={"source_gdrive_pdf": drive_file.name, "gdrive_file_id": drive_file.id,
+                      "ingested_at": ingested_at},
+        )
+        for drive_file in sync_result.files if drive_file.id in sync_result.local_paths
+    ]
+    yield from iter_parsed_pdfs(jobs, workers=workers)
 
 if __name__ == '__main__':
     # --- ส่วนนี้สำหรับการทดสอบ ---
@@ -1,19 +1,114 @@
+import os
+import time
 import logging
-from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
-from langchain_community.llms import Ollama
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+import threading
+from dataclasses import dataclass
+from functools import partial
+from typing import List, Optional
+
+import numpy as np
+
+import resources
+import metrics
+from answer_cache import AnswerCache
+from query_batcher import QueryBatcher, query_collection
+from lexical_index import LexicalIndex
+from dedup import DedupIndex
+from hybrid_retrieval import HybridRetriever, merge_hits
+from context_assembly import assemble_context, estimate_tokens
+from reranker import CrossEncoderReranker
+from retrieval_filters import RetrievalFilters, source_name
+from index_manifest import read_index_version
+from index_versions import active_index_dir
+from utils.constant import (
+    CHROMA_PERSIST_DIR, OLLAMA_MODEL_NAME, RETRIEVER_K, ANSWER_CACHE_ENABLED, ANSWER_CACHE_PATH,
+    ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    QUERY_BATCHING_ENABLED, QUERY_BATCH_MAX_WAIT_MS, QUERY_BATCH_MAX_SIZE, RETRIEVAL_MODE, LEXICAL_INDEX_FILE_NAME,
+    LEXICAL_INDEX_MMAP_BYTES, HYBRID_FUSION, HYBRID_VECTOR_K, HYBRID_LEXICAL_K, HYBRID_K, HYBRID_RRF_K,
+    HYBRID_LEXICAL_WEIGHT, CONTEXT_COMPRESSION_ENABLED, CONTEXT_MAX_TOKENS, CONTEXT_DUPLICATE_THRESHOLD,
+    RERANK_ENABLED, RERANK_CANDIDATES, RERANK_BATCH_SIZE, RERANK_TOP_N, RERANK_MIN_SCORE, RERANK_RELATIVE_CUTOFF,
+    INDEX_HOT_SWAP_ENABLED, INDEX_SWAP_POLL_SECONDS, INDEX_SWAP_GRACE_SECONDS, DEDUP_ENABLED, DEDUP_INDEX_FILE_NAME,
+)
 from logger_config import setup_logger
 
 # สร้าง logger สำหรับไฟล์นี้
 log = logging.getLogger(__name__)
 
-# --- ค่าคงที่ (ต้องตรงกับไฟล์ vector_store_builder.py) ---
-CHROMA_PERSIST_DIR = "chroma_db"
-CHROMA_COLLECTION_NAME = "pdf_collection"
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
-OLLAMA_MODEL_NAME = "llama3" # หรือชื่อโมเดลที่คุณ pull มา เช่น mistral, gemma:2b
+# LangChain, Ollama, sentence-transformers และ Chroma ถูก import แบบ lazy ผ่าน resources.py
+# ค่าคงที่ทั้งหมดอยู่ใน utils/constant.py (ใช้ร่วมกับ vector_store_builder.py)
+
+
+def search_vectors(vector_store, query_batcher: Optional[QueryBatcher], k: int, query: str,
+                   where: Optional[dict] = None) -> list:
+    """Vector search ที่คืนค่า [(Document พร้อม chunk ID, distance)] (where = metadata filter ของ Chroma)."""
+    if query_batcher:
+        return query_batcher.search_with_scores(query, where)
+    with metrics.span("embed"):
+        query_embedding = vector_store.embeddings.embed_query(query)
+    with metrics.span("vector_search"):
+        return query_collection(vector_store._collection, [query_embedding], k, where)[0]
+
+
+def search_duplicates(vector_store, query_batcher: Optional[QueryBatcher], dedup_index: Optional[DedupIndex],
+                      query: str, filters: Optional[RetrievalFilters]) -> list:
+    """
+    [(Document, distance)] ของ chunks ในไฟล์ที่เลือก (filters.source_pdfs) ซึ่งถูกเก็บเป็น near-duplicate ตอน ingest
+    chunks เหล่านี้ไม่อยู่ใน vector store ในชื่อไฟล์ของตัวเอง จึงใช้ vector ของ canonical chunk คำนวณ distance
+    (L2^2 เหมือน Chroma) แต่คืน metadata ของ duplicate (ไฟล์/หน้าที่ผู้ใช้เลือก) เรียงจากใกล้ที่สุด
+    """
+    if dedup_index is None or filters is None or not filters.source_pdfs:
+        return []
+    duplicates = {}
+    for canonical_id, metadatas in dedup_index.duplicates_from_sources(filters.source_pdfs).items():
+        metadata = next((metadata for metadata in metadatas if filters.matches(metadata)), None)
+        if metadata is not None:
+            duplicates[canonical_id] = metadata
+    if not duplicates:
+        return []
+
+    from langchain_core.documents import Document
+
+    with metrics.span("embed"):
+        if query_batcher:
+            query_embedding = query_batcher.embed(query)
+        else:
+            query_embedding = vector_store.embeddings.embed_query(query)
+    with metrics.span("vector_search"):
+        found = vector_store._collection.get(ids=list(duplicates), include=["documents", "embeddings"])
+    if not len(found["ids"]):
+        return []
+    vectors = np.asarray(found["embeddings"], dtype=np.float32)
+    distances = ((vectors - np.asarray(query_embedding, dtype=np.float32)) ** 2).sum(axis=1)
+    hits = [
+        (Document(id=chunk_id, page_content=text, metadata=duplicates[chunk_id]), float(distance))
+        for chunk_id, text, distance in zip(found["ids"], found["documents"], distances)
+    ]
+    return sorted(hits, key=lambda hit: hit[1])
+
+
+@dataclass
+class IndexComponents:
+    """
+    ส่วนของ RAGSystem ที่ผูกกับ index ใน persist_dir หนึ่ง (vector store, retrievers, query batcher, dedup index)
+    ทุกส่วนอ้างถึงกันเองภายในชุด (เช่น hybrid retriever ใช้ vector search ของชุดเดียวกัน)
+    คำถามที่กำลังทำงานอยู่ตอนสลับ index จึงได้ผลจาก version ใดเพียง version เดียว
+    """
+    persist_dir: str
+    vector_store: object
+    retriever: object
+    hybrid_retriever: Optional[HybridRetriever]
+    query_batcher: Optional[QueryBatcher]
+    vector_k: int
+    dedup_index: Optional[DedupIndex] = None
+
+    def close(self):
+        if self.query_batcher:
+            self.query_batcher.close()
+        if self.hybrid_retriever:
+            self.hybrid_retriever.lexical_index.close()
+        if self.dedup_index:
+            self.dedup_index.close()
+
 
 class RAGSystem:
     def __init__(self):
@@ -22,29 +117,28 @@ class RAGSystem:
         retriever, and the QA chain.
         """
         log.info("Initializing RAG System...")
+        init_start = time.perf_counter()
 
-        # 1. ตั้งค่า LLM (Ollama)
-        log.info(f"Loading LLM: [cyan]{OLLAMA_MODEL_NAME}[/cyan]", extra={"markup": True})
-        self.llm = Ollama(model=OLLAMA_MODEL_NAME, temperature=0.1)
+        # 1. ตั้งค่า LLM (Ollama) ผ่าน registry กลาง (สร้างครั้งเดียวต่อ process)
+        self.llm = resources.get_llm()
         log.info("LLM loaded.")
 
-        # 2. โหลด Vector Store ที่มีอยู่
-        log.info("Loading vector store...")
-        embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-        self.vector_store = Chroma(
-            persist_directory=CHROMA_PERSIST_DIR,
-            embedding_function=embedding_model,
-            collection_name=CHROMA_COLLECTION_NAME
-        )
-        log.info(f"Vector store loaded with {self.vector_store._collection.count()} items.")
+        # Re-ranker (ถ้าเปิด): over-fetch RERANK_CANDIDATES candidates แล้วให้ cross-encoder เลือกเฉพาะอันที่เกี่ยวข้อง
+        self.reranker = None
+        if RERANK_ENABLED:
+            self.reranker = CrossEncoderReranker(
+                resources.get_reranker_model(), batch_size=RERANK_BATCH_SIZE, top_n=RERANK_TOP_N,
+                min_score=RERANK_MIN_SCORE, relative_cutoff=RERANK_RELATIVE_CUTOFF,
+            )
+            log.info(f"Re-ranker enabled ({RERANK_CANDIDATES} candidates -> up to {RERANK_TOP_N} chunks).")
 
-        # 3. สร้าง Retriever
-        # Retriever ทำหน้าที่ค้นหาข้อมูลที่เกี่ยวข้องจาก Vector Store
-        self.retriever = self.vector_store.as_retriever(
-            search_type="similarity", # ประเภทการค้นหา
-            search_kwargs={"k": 5}    # ดึงข้อมูลที่เกี่ยวข้องมา 5 chunks
-        )
-        log.info("Retriever created.")
+        # 2-3. โหลด Vector Store และสร้าง Retriever ของ index ที่ active (ดู _open_index)
+        self._index_lock = threading.Lock()
+        self._index_watcher = None
+        self._install_index(self._open_index(active_index_dir()))
+
+        chain_start = time.perf_counter()
+        from langchain.prompts import PromptTemplate
 
         # 4. สร้าง Prompt Template (สำคัญมาก!)
         # เราจะสร้าง template เพื่อบอกให้ LLM รู้ว่าต้องตอบคำถามโดยอิงจาก "context" ที่เราป้อนให้เท่านั้น
@@ -69,33 +163,364 @@ class RAGSystem:
         )
         log.info("Prompt template created.")
 
-        # 5. สร้าง RetrievalQA Chain
-        # Chain นี้จะรวมทุกอย่างเข้าด้วยกัน: retriever -> prompt -> llm
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff", # "stuff" คือการนำ chunks ทั้งหมดมายัดรวมกันใน prompt
-            retriever=self.retriever,
-            return_source_documents=True, # ให้แสดงเอกสารอ้างอิงด้วย
-            chain_type_kwargs={"prompt": self.prompt}
-        )
-        log.info("RetrievalQA chain created successfully.")
+        # 5. ขั้นตอน retriever -> prompt -> llm ถูกเรียกเองใน retrieve / build_prompt
+        # (แทน RetrievalQA chain) เพื่อให้ทั้ง answer_question และ stream_answer ใช้ขั้นตอนเดียวกัน
+        # และ stream token จาก LLM ได้
+
+        # 6. Cache คำตอบ (คำถามซ้ำๆ ตอบได้ทันทีโดยไม่ต้องค้นหาและเรียก LLM ใหม่)
+        self.answer_cache = None
+        if ANSWER_CACHE_ENABLED:
+            self.answer_cache = AnswerCache(
+                ANSWER_CACHE_PATH,
+                ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            )
+            log.info(f"Answer cache enabled at: {ANSWER_CACHE_PATH}")
+        resources.STARTUP_TIMINGS["qa_pipeline"] = time.perf_counter() - chain_start
+        self.init_seconds = time.perf_counter() - init_start
+        log.info(resources.format_startup_timings())
         log.info("[bold green]RAG System initialized and ready.[/bold green]", extra={"markup": True})
+        if INDEX_HOT_SWAP_ENABLED:
+            self.start_index_watcher()
+
+    def _open_index(self, persist_dir: str) -> IndexComponents:
+        """เปิด vector store, lexical index และสร้าง retrievers ของ index ใน persist_dir (ยังไม่ถูกใช้ตอบคำถาม)."""
+        log.info(f"Loading vector store from {persist_dir}...")
+        if persist_dir == CHROMA_PERSIST_DIR:
+            # embedding model + Chroma client ใช้ร่วมกับส่วนอื่นของ process
+            vector_store = resources.get_vector_store()
+        else:
+            vector_store = resources.create_vector_store(resources.get_embedding_model(),
+                                                         persist_directory=persist_dir)
+        log.info(f"Vector store loaded with {vector_store._collection.count()} items.")
+        if hasattr(vector_store._collection, "shards"):
+            # ShardedCollection: ทุกการค้นหา (รวมถึง QueryBatcher / HybridRetriever) ค้นทุก shard พร้อมกันแล้วรวม top-k
+            log.info(f"Searching {len(vector_store._collection.shards)} shard(s) in parallel: "
+                     f"{list(vector_store._collection.shards)}")
+
+        # Retriever ทำหน้าที่ค้นหาข้อมูลที่เกี่ยวข้องจาก Vector Store
+        vector_k = RERANK_CANDIDATES if self.reranker else RETRIEVER_K
+        retriever = vector_store.as_retriever(
+            search_type="similarity", # ประเภทการค้นหา
+            search_kwargs={"k": vector_k}    # ดึงข้อมูลที่เกี่ยวข้องมา RETRIEVER_K chunks (หรือ candidates สำหรับ re-ranker)
+        )
+
+        # Hybrid retrieval: รวม BM25 (จับรหัส/ชื่อเฉพาะได้ดี) กับ vector search
+        # ถ้ายังไม่มี lexical index (ยังไม่ได้รัน builder เวอร์ชันใหม่) จะใช้ vector search อย่างเดียว
+        use_hybrid = False
+        lexical_index_path = os.path.join(persist_dir, LEXICAL_INDEX_FILE_NAME)
+        if RETRIEVAL_MODE == "hybrid":
+            if os.path.exists(lexical_index_path):
+                use_hybrid = True
+                if not self.reranker:
+                    vector_k = HYBRID_VECTOR_K
+            else:
+                log.warning(f"Lexical index not found at {lexical_index_path}, using vector retrieval only. "
+                            "Re-run the vector store builder to create it.")
+
+        # เมื่อมีหลายคำถามเข้ามาพร้อมกัน (เช่นผ่าน api_server.py) ให้ embed และค้นหาเป็น batch เดียว
+        query_batcher = None
+        if QUERY_BATCHING_ENABLED:
+            query_batcher = QueryBatcher(
+                vector_store, k=vector_k, max_wait_ms=QUERY_BATCH_MAX_WAIT_MS, max_batch_size=QUERY_BATCH_MAX_SIZE,
+            )
+
+        hybrid_retriever = None
+        if use_hybrid:
+            hybrid_retriever = HybridRetriever(
+                partial(search_vectors, vector_store, query_batcher, vector_k),
+                LexicalIndex(lexical_index_path, read_only=True, mmap_bytes=LEXICAL_INDEX_MMAP_BYTES),
+                vector_store._collection,
+                k=RERANK_CANDIDATES if self.reranker else HYBRID_K,
+                lexical_k=RERANK_CANDIDATES if self.reranker else HYBRID_LEXICAL_K,
+                fusion=HYBRID_FUSION, rrf_k=HYBRID_RRF_K, lexical_weight=HYBRID_LEXICAL_WEIGHT, vector_k=vector_k,
+            )
+            log.info(f"Hybrid retriever created (BM25 + vector, fusion={HYBRID_FUSION}).")
+
+        # chunks ที่ซ้ำกับไฟล์อื่นถูกเก็บไว้ใน dedup index เท่านั้น (ดู dedup.py): ใช้ขยาย filters และรายชื่อเอกสาร
+        # ให้ไฟล์ที่เป็น duplicate ยังถูกเลือกและค้นหาได้
+        dedup_index = None
+        dedup_index_path = os.path.join(persist_dir, DEDUP_INDEX_FILE_NAME)
+        if DEDUP_ENABLED and os.path.exists(dedup_index_path):
+            dedup_index = DedupIndex(dedup_index_path, read_only=True)
+        return IndexComponents(persist_dir, vector_store, retriever, hybrid_retriever, query_batcher, vector_k,
+                               dedup_index)
+
+    def _install_index(self, components: IndexComponents) -> Optional[IndexComponents]:
+        """ตั้ง components เป็น index ที่ใช้ตอบคำถาม (เปลี่ยน reference เดียว จึงเป็น atomic) คืนค่าชุดเดิม."""
+        previous = getattr(self, "_index", None)
+        self._index = components
+        return previous
+
+    def current_index(self) -> IndexComponents:
+        """
+        ชุด index ที่ใช้ตอบคำถามอยู่ ณ ตอนนี้ คำถามหนึ่งข้อต้องอ่านค่านี้ครั้งเดียวแล้วส่งต่อให้ทุกขั้นตอน
+        (retrieve, vector_search, answer cache) ไม่ให้ขั้นตอนหนึ่งใช้ index เดิมและอีกขั้นใช้ index ใหม่ระหว่างสลับ
+        """
+        return self._index
+
+    @property
+    def index_dir(self) -> str:
+        """โฟลเดอร์ index ที่ใช้ตอบคำถามอยู่ (เปลี่ยนเมื่อสลับไป index version ใหม่)."""
+        return self._index.persist_dir
 
-    def answer_question(self, query: str) -> dict:
+    @staticmethod
+    def _warm_up(components: IndexComponents):
+        """ค้นหา 1 ครั้งก่อนสลับ เพื่อให้ไฟล์ index ถูกโหลดเข้า memory ก่อนคำถามจริงคำถามแรก (ไม่มี latency spike)."""
+        query = "warm up"
+        if components.hybrid_retriever:
+            components.hybrid_retriever.invoke(query)
+        else:
+            search_vectors(components.vector_store, components.query_batcher, components.vector_k, query)
+
+    def reload_index(self, persist_dir: Optional[str] = None) -> bool:
+        """
+        สลับไปใช้ index ใน persist_dir (ค่าเริ่มต้น = version ที่ active ตาม index_versions.py) โดยไม่หยุดตอบคำถาม:
+        เปิดและ warm up index ใหม่ระหว่างที่คำถามยังใช้ index เดิม แล้วจึงสลับ
+        resource ของ index เดิมถูกปิดหลัง INDEX_SWAP_GRACE_SECONDS (ให้คำถามที่ค้างอยู่ทำงานจนจบ)
+        คืนค่า True ถ้าสลับ index
         """
-        รับคำถามจากผู้ใช้, ส่งให้ QA chain, และคืนค่าผลลัพธ์
+        persist_dir = persist_dir or active_index_dir()
+        if persist_dir == self.index_dir:
+            return False
+        with self._index_lock:
+            if persist_dir == self.index_dir:
+                return False
+            start = time.perf_counter()
+            components = self._open_index(persist_dir)
+            self._warm_up(components)
+            previous = self._install_index(components)
+        if previous is not None:
+            timer = threading.Timer(INDEX_SWAP_GRACE_SECONDS, previous.close)
+            timer.daemon = True
+            timer.start()
+        metrics.REGISTRY.inc("index_swaps_total")
+        log.info(f"[bold green]Switched to index {persist_dir}[/bold green] "
+                 f"(loaded in {time.perf_counter() - start:.2f}s)", extra={"markup": True})
+        return True
+
+    def start_index_watcher(self, poll_seconds: float = INDEX_SWAP_POLL_SECONDS) -> threading.Thread:
+        """เริ่ม thread ที่ตรวจ index version ที่ active ทุก poll_seconds แล้วสลับไปใช้เมื่อเปลี่ยน (ดู index_worker.py)."""
+        if self._index_watcher is None:
+            self._index_watcher = threading.Thread(target=self._watch_index, args=(poll_seconds,),
+                                                   name="index-watcher", daemon=True)
+            self._index_watcher.start()
+        return self._index_watcher
+
+    def _watch_index(self, poll_seconds: float):
+        while True:
+            time.sleep(poll_seconds)
+            try:
+                self.reload_index()
+            except Exception as e:
+                metrics.REGISTRY.inc("index_swap_errors_total")
+                log.error(f"Could not switch to the new index version, still using {self.index_dir}: {e}",
+                          exc_info=True)
+
+    def current_index_version(self, components: Optional[IndexComponents] = None) -> Optional[str]:
+        """version stamp ของ index (ค่าเริ่มต้น = index ที่ใช้ตอบคำถามอยู่) ใช้เป็น key ของ answer cache."""
+        return read_index_version((components or self._index).persist_dir)
+
+    def retrieve(self, query: str, filters: Optional[RetrievalFilters] = None,
+                 components: Optional[IndexComponents] = None) -> list:
+        """
+        ค้นหา chunks ที่เกี่ยวข้องกับคำถามจาก Vector Store (และ BM25 index ถ้าใช้ hybrid retrieval)
+        ถ้าระบุ filters จะค้นเฉพาะ chunks ที่ตรงเงื่อนไข (Chroma กรองด้วย metadata ก่อนค้นหา vector)
+        รวมถึง chunks ของไฟล์ที่เลือกซึ่งถูกเก็บเป็น near-duplicate ของไฟล์อื่น (ดู search_duplicates)
+        ถ้าเปิด re-ranker จะจัดอันดับ candidates ใหม่และคืนเฉพาะ chunks ที่ผ่าน adaptive cut-off
+        components = ชุด index ของคำถามนี้ (ดู current_index) ไม่ระบุ = index ที่ใช้อยู่ตอนเรียก
+        """
+        components = components or self._index
+        if filters is not None and filters.is_empty():
+            filters = None
+        with metrics.span("retrieve"):
+            duplicates = search_duplicates(components.vector_store, components.query_batcher,
+                                           components.dedup_index, query, filters)
+            if components.hybrid_retriever:
+                docs = components.hybrid_retriever.invoke(query, filters, duplicates)
+            elif filters is not None:
+                hits = self.vector_search(query, filters.to_chroma_where(), components)
+                if duplicates:
+                    hits = merge_hits([hits, duplicates], components.vector_k)
+                docs = [doc for doc, _ in hits]
+            elif components.query_batcher:
+                docs = components.query_batcher.search(query)
+            else:
+                with metrics.span("vector_search"): # รวมเวลา embed ด้วย (LangChain retriever ทำทั้งสองขั้นในครั้งเดียว)
+                    docs = components.retriever.invoke(query)
+            if self.reranker:
+                with metrics.span("rerank"):
+                    docs = self.reranker.rerank(query, docs)
+        metrics.count("chunks_retrieved", len(docs))
+        return docs
+
+    def vector_search(self, query: str, where: Optional[dict] = None,
+                      components: Optional[IndexComponents] = None) -> list:
+        """Vector search ที่คืนค่า [(Document พร้อม chunk ID, distance)] (where = metadata filter ของ Chroma)."""
+        components = components or self._index
+        return search_vectors(components.vector_store, components.query_batcher, components.vector_k, query, where)
+
+    def list_documents(self, components: Optional[IndexComponents] = None) -> List[str]:
+        """รายชื่อไฟล์ทั้งหมดใน collection รวมไฟล์ที่ถูกเก็บเป็น near-duplicate (สำหรับตัวเลือกเอกสารใน app.py)."""
+        components = components or self._index
+        sources = set(components.dedup_index.duplicate_sources()) if components.dedup_index else set()
+        if components.hybrid_retriever:
+            # lexical index เก็บชื่อไฟล์ของทุก chunk พร้อม index จึงไม่ต้องอ่าน metadata ทั้ง collection
+            sources.update(source for source, _ in components.hybrid_retriever.lexical_index.list_sources())
+            return sorted(sources)
+        collection = components.vector_store._collection
+        page_size = 5000
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            sources.update(source_name(metadata or {}) for metadata in page["metadatas"])
+        return sorted(source for source in sources if source)
+
+    def build_prompt(self, query: str, docs: list) -> str:
+        """
+        นำ chunks มายัดรวมกันใน prompt (เหมือน chain_type="stuff")
+        ก่อนหน้านั้นรวมช่วงข้อความที่ซ้อนทับกัน ตัด chunk ที่ซ้ำ และจำกัดจำนวน tokens (ดู context_assembly.py)
+        เพื่อให้ prompt สั้นลง ซึ่งลดเวลาที่ LLM ใช้ประมวลผล prompt โดยตรง
+        """
+        with metrics.span("prompt"):
+            if CONTEXT_COMPRESSION_ENABLED:
+                docs = assemble_context(docs, CONTEXT_MAX_TOKENS, CONTEXT_DUPLICATE_THRESHOLD)
+            context = "\n\n".join(doc.page_content for doc in docs)
+            prompt = self.prompt.format(context=context, question=query)
+        if metrics.REGISTRY.enabled:
+            metrics.count("prompt_tokens", estimate_tokens(prompt))
+        return prompt
+
+    def get_cached_answer(self, query: str, index_version, filters: Optional[RetrievalFilters] = None,
+                          components: Optional[IndexComponents] = None):
+        """
+        คืนค่า (คำตอบจาก cache หรือ None, query embedding ที่ใช้ค้น cache)
+        คำถามที่จำกัดขอบเขตด้วย filters จะไม่ใช้ cache (คำตอบขึ้นกับเอกสารที่เลือก)
+        index_version ต้องมาจากชุด components เดียวกับที่ใช้ตอบคำถามนี้ (ดู current_index)
+        """
+        if not self.answer_cache or (filters is not None and not filters.is_empty()):
+            return None, None
+        components = components or self._index
+        with metrics.span("cache_lookup"):
+            query_embedding = None
+            if self.answer_cache.similarity_threshold is not None:
+                if components.query_batcher:
+                    query_embedding = components.query_batcher.embed(query)
+                else:
+                    query_embedding = components.vector_store.embeddings.embed_query(query)
+            cached = self.answer_cache.get(query, index_version, query_embedding)
+        metrics.count("cache_hits" if cached else "cache_misses")
+        if cached:
+            from langchain_core.documents import Document
+            log.info("Answer served from cache.")
+            cached["source_documents"] = [Document(**source) for source in cached["source_documents"]]
+        return cached, query_embedding
+
+    def cache_answer(self, query: str, answer: str, docs: list, index_version, query_embedding,
+                     filters: Optional[RetrievalFilters] = None):
+        if self.answer_cache and (filters is None or filters.is_empty()):
+            with metrics.span("cache_store"):
+                sources = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+                self.answer_cache.put(query, answer, sources, index_version, query_embedding)
+
+    def answer_question(self, query: str, filters: Optional[RetrievalFilters] = None) -> dict:
+        """
+        รับคำถามจากผู้ใช้, ค้นหา context, ส่งให้ LLM, และคืนค่าผลลัพธ์
+        filters (ถ้ามี) จำกัดการค้นหาเฉพาะไฟล์/หน้า/ช่วงวันที่ที่กำหนด (ดู retrieval_filters.py)
+        ผลลัพธ์มี "timings" = เวลาที่ใช้แต่ละขั้นตอน (ms) และตัวนับของคำถามนี้ (None ถ้าปิด METRICS_ENABLED)
         """
         if not query:
             return {"error": "Query cannot be empty."}
 
         log.info(f"Answering question: '[yellow]{query}[/yellow]'", extra={"markup": True})
+        trace = metrics.start_trace("answer")
+        # ทุกขั้นตอนของคำถามนี้ใช้ index ชุดเดียวกัน แม้ index จะถูกสลับระหว่างที่กำลังตอบ
+        components = self.current_index()
         try:
-            result = self.qa_chain.invoke({"query": query})
-            return result
+            with metrics.use_trace(trace):
+                index_version = self.current_index_version(components)
+                cached, query_embedding = self.get_cached_answer(query, index_version, filters, components)
+                if cached:
+                    cached["timings"] = trace.finish()
+                    return cached
+
+                docs = self.retrieve(query, filters, components)
+                prompt = self.build_prompt(query, docs)
+                with trace.span("generate"):
+                    answer = self.llm.invoke(prompt)
+                if metrics.REGISTRY.enabled:
+                    trace.count("completion_tokens", estimate_tokens(answer))
+                self.cache_answer(query, answer, docs, index_version, query_embedding, filters)
+            timings = trace.finish()
+            log.info(metrics.format_timings(timings))
+            return {"query": query, "result": answer, "source_documents": docs, "timings": timings}
         except Exception as e:
+            trace.count("errors")
+            trace.finish("error")
             log.error(f"An error occurred while answering the question: {e}", exc_info=True)
             return {"error": str(e)}
 
+    def stream_answer(self, query: str, filters: Optional[RetrievalFilters] = None):
+        """
+        เหมือน answer_question แต่เป็น generator ที่ส่งผลลัพธ์ออกมาทีละส่วน:
+        - {"type": "sources", "source_documents": [...]} ทันทีหลังค้นหาเสร็จ
+        - {"type": "token", "text": "..."} ทีละ token ระหว่างที่ LLM กำลังสร้างคำตอบ
+        - {"type": "done", "result": "<คำตอบทั้งหมด>", "timings": {...}} เมื่อจบ
+        - {"type": "error", "error": "..."} ถ้าเกิดข้อผิดพลาด
+        trace ถูกตั้งเป็น trace ปัจจุบันเฉพาะช่วงที่ไม่มี yield (generator ทำงานใน context ของผู้เรียก)
+        """
+        if not query:
+            yield {"type": "error", "error": "Query cannot be empty."}
+            return
+
+        log.info(f"Streaming answer for question: '[yellow]{query}[/yellow]'", extra={"markup": True})
+        trace = metrics.start_trace("stream")
+        components = self.current_index()
+        try:
+            start = time.perf_counter()
+            with metrics.use_trace(trace):
+                index_version = self.current_index_version(components)
+                cached, query_embedding = self.get_cached_answer(query, index_version, filters, components)
+            if cached:
+                yield {"type": "sources", "source_documents": cached["source_documents"]}
+                yield {"type": "token", "text": cached["result"]}
+                yield {"type": "done", "result": cached["result"], "cached": True, "timings": trace.finish()}
+                return
+
+            with metrics.use_trace(trace):
+                docs = self.retrieve(query, filters, components)
+                prompt = self.build_prompt(query, docs)
+            yield {"type": "sources", "source_documents": docs}
+
+            answer_parts = []
+            generate_start = time.perf_counter()
+            for token in self.llm.stream(prompt):
+                if not answer_parts:
+                    trace.mark("first_token", "rag_time_to_first_token_seconds")
+                    log.info(f"Time to first token: {time.perf_counter() - start:.2f}s")
+                answer_parts.append(token)
+                yield {"type": "token", "text": token}
+            # รวมเวลาที่ผู้เรียกใช้ประมวลผลแต่ละ token ด้วย (เช่น render ใน Streamlit)
+            trace.add("generate", time.perf_counter() - generate_start)
+            trace.count("completion_tokens", len(answer_parts))
+
+            answer = "".join(answer_parts)
+            with metrics.use_trace(trace):
+                self.cache_answer(query, answer, docs, index_version, query_embedding, filters)
+            log.info(f"Answer streamed in {time.perf_counter() - start:.2f}s")
+            timings = trace.finish()
+            log.info(metrics.format_timings(timings))
+            yield {"type": "done", "result": answer, "timings": timings}
+        except Exception as e:
+            trace.count("errors")
+            trace.finish("error")
+            log.error(f"An error occurred while streaming the answer: {e}", exc_info=True)
+            yield {"type": "error", "error": str(e)}
+        finally:
+            # ผู้เรียกหยุดอ่านก่อนจบ (เช่น close() generator) ยังต้องปิด trace ให้ถูกนับใน rag_request_seconds
+            if not trace.finished:
+                trace.finish("cancelled")
+
 if __name__ == '__main__':
     # --- ส่วนนี้สำหรับการทดสอบ ---
     setup_logger()
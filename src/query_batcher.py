@@ -0,0 +1,174 @@
+import json
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingQuery:
+    query: str
+    search: bool # False = ต้องการแค่ embedding (เช่นสำหรับ semantic answer cache)
+    where: Optional[dict] = None # metadata filter ของ Chroma (ดู retrieval_filters.py)
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    timings: Dict[str, float] = field(default_factory=dict) # เวลาที่ query นี้ใช้ในแต่ละขั้น (ส่งกลับไปให้ trace ของผู้เรียก)
+
+
+def query_collection(collection, vectors: List[List[float]], k: int,
+                     where: Optional[dict] = None) -> List[List[Tuple[object, float]]]:
+    """
+    ค้นหาหลาย query embeddings ใน Chroma collection ด้วย collection.query ครั้งเดียว
+    คืนค่า [(Document, distance)] ต่อ query โดย Document.id คือ chunk ID ใน collection
+    ถ้าระบุ where Chroma จะกรองด้วย metadata ก่อนค้นหา vector (ค้นเฉพาะ chunks ที่ตรงเงื่อนไข)
+    """
+    from langchain_core.documents import Document
+
+    results = collection.query(
+        query_embeddings=vectors, n_results=k, where=where, include=["documents", "metadatas", "distances"]
+    )
+    return [
+        [(Document(id=chunk_id, page_content=text, metadata=metadata or {}), distance)
+         for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances)]
+        for ids, texts, metadatas, distances in zip(
+            results["ids"], results["documents"], results["metadatas"], results["distances"]
+        )
+    ]
+
+
+class QueryBatcher:
+    """
+    รวม query ที่เข้ามาพร้อมกันจากหลาย thread เป็น batch เดียว (micro-batching)
+    - รอ query เพิ่มไม่เกิน max_wait_ms หรือจนครบ max_batch_size แล้ว embed ทั้ง batch ในครั้งเดียว
+    - ค้นหาใน Chroma ด้วย collection.query(query_embeddings=[...]) ครั้งเดียวสำหรับทั้ง batch
+    - ส่งผลลัพธ์กลับไปให้แต่ละ caller ผ่าน Future
+    ทำให้ forward pass ของ sentence-transformer ไม่เสียไปกับ batch ขนาด 1 เมื่อมีคำถามเข้ามาพร้อมกันจำนวนมาก
+    """
+
+    def __init__(self, vector_store, k: int, max_wait_ms: float = 5.0, max_batch_size: int = 32):
+        self.embeddings = vector_store.embeddings
+        self.collection = vector_store._collection
+        self.k = k
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.queries = 0
+        self._queue: "queue.Queue[_PendingQuery]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.queries / self.batches if self.batches else 0.0
+
+    def search(self, query: str, where: Optional[dict] = None) -> list:
+        """คืนค่า Documents ที่ใกล้เคียง query ที่สุด k อัน (block จนกว่า batch ของ query นี้จะเสร็จ)."""
+        return [doc for doc, _ in self.search_with_scores(query, where)]
+
+    def search_with_scores(self, query: str, where: Optional[dict] = None) -> List[Tuple[object, float]]:
+        """เหมือน search แต่คืนค่า [(Document, distance)] (distance ยิ่งน้อยยิ่งใกล้)."""
+        return self._submit(query, search=True, where=where)[1]
+
+    def embed(self, query: str) -> List[float]:
+        """Embed query เดียวโดยรวม batch กับ query อื่นที่เข้ามาพร้อมกัน."""
+        return self._submit(query, search=False)[0]
+
+    def _submit(self, query: str, search: bool, where: Optional[dict] = None):
+        pending = _PendingQuery(query, search, where)
+        # ตรวจ _closed และเข้าคิวภายใต้ lock เดียวกับ close(): query ที่เข้าคิวแล้วอยู่ก่อน sentinel เสมอจึงไม่ค้างในคิว
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                    self._worker.start()
+                self._queue.put(pending)
+        if closed:
+            # คำถามที่ยังถือ batcher ของ index เดิมหลังสลับ index: ประมวลผลเองใน thread นี้ ไม่เริ่ม worker ใหม่
+            self._process([pending])
+        result = pending.future.result()
+        # batch ถูกประมวลผลใน thread ของ batcher จึงบันทึกเวลาลง trace ของคำถามนี้ที่ thread ของผู้เรียก
+        metrics.record_stages(pending.timings)
+        return result
+
+    def close(self):
+        """
+        หยุด worker thread หลังประมวลผล query ที่อยู่ในคิวแล้ว (เช่นเมื่อ RAGSystem สลับไปใช้ index version ใหม่)
+        query ที่เข้ามาหลัง close จะถูกประมวลผลทีละข้อใน thread ของผู้เรียก
+        """
+        with self._lock:
+            self._closed = True
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker = None
+
+    def _collect_batch(self) -> Optional[List[_PendingQuery]]:
+        """query ชุดถัดไป หรือ None เมื่อถูก close (query ที่เข้าคิวก่อน close ยังถูกประมวลผลจนหมด)."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                self._queue.put(None)
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            try:
+                self._process(batch)
+            except Exception as e:
+                log.error(f"Batched retrieval failed for {len(batch)} queries: {e}", exc_info=True)
+                for pending in batch:
+                    pending.future.set_exception(e)
+
+    def _process(self, batch: List[_PendingQuery]):
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents([pending.query for pending in batch])
+        vectors = [list(map(float, vector)) for vector in vectors]
+        embed_seconds = time.perf_counter() - start
+        for pending in batch:
+            pending.timings["queue_wait"] = start - pending.enqueued_at
+            pending.timings["embed"] = embed_seconds
+
+        # collection.query รับ where ได้ค่าเดียว จึงค้นหาครั้งละกลุ่มของ query ที่ใช้ filter เดียวกัน
+        groups = {}
+        for i, pending in enumerate(batch):
+            if pending.search:
+                groups.setdefault(json.dumps(pending.where, sort_keys=True), []).append(i)
+        docs_per_query = {}
+        for indices in groups.values():
+            search_start = time.perf_counter()
+            results = query_collection(self.collection, [vectors[i] for i in indices], self.k, batch[indices[0]].where)
+            docs_per_query.update(zip(indices, results))
+            search_seconds = time.perf_counter() - search_start
+            for i in indices:
+                batch[i].timings["vector_search"] = search_seconds
+
+        self.batches += 1
+        self.queries += len(batch)
+        log.debug(f"Processed query batch of {len(batch)} in {time.perf_counter() - start:.3f}s "
+                  f"(average batch size {self.average_batch_size:.1f})")
+        for i, pending in enumerate(batch):
+            pending.future.set_result((vectors[i], docs_per_query.get(i)))
@@ -0,0 +1,72 @@
+import time
+import logging
+from typing import List, Sequence
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def adaptive_cutoff(scores: Sequence[float], top_n: int, min_score: float, relative_cutoff: float,
+                    min_keep: int = 1) -> int:
+    """
+    คืนค่าจำนวน candidates (เรียงคะแนนจากมากไปน้อยแล้ว) ที่ควรส่งให้ LLM
+    - ไม่เกิน top_n และคะแนนต้องไม่ต่ำกว่า min_score
+    - คะแนนต้องไม่ต่ำกว่า relative_cutoff * คะแนนสูงสุด: คำถามง่ายที่มี chunk เด่นชัดอันเดียวจะใช้ chunk น้อยลง
+    - เก็บอย่างน้อย min_keep อัน เพื่อให้ LLM ยังตอบได้ว่า "ไม่พบข้อมูล" จาก context ที่ใกล้ที่สุด
+    """
+    if not len(scores):
+        return 0
+    best = scores[0]
+    keep = 0
+    for score in scores[:top_n]:
+        if score < min_score or score < best * relative_cutoff:
+            break
+        keep += 1
+    return max(keep, min(min_keep, len(scores)))
+
+
+class CrossEncoderReranker:
+    """
+    จัดอันดับ candidates ใหม่ด้วย cross-encoder (เช่น ms-marco-MiniLM) ซึ่งแม่นกว่า bi-encoder
+    เพราะอ่านคำถามกับ chunk พร้อมกัน: ใช้ over-fetch candidates จาก retriever แล้วเลือกเฉพาะอันที่เกี่ยวข้องจริง
+    model คืออ็อบเจกต์ที่มีเมธอด predict(pairs, batch_size=...) เช่น sentence_transformers.CrossEncoder
+    """
+
+    def __init__(self, model, batch_size: int = 16, top_n: int = 5, min_score: float = 0.1,
+                 relative_cutoff: float = 0.3):
+        self.model = model
+        self.batch_size = batch_size
+        self.top_n = top_n
+        self.min_score = min_score
+        self.relative_cutoff = relative_cutoff
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.last_latency = 0.0
+
+    @property
+    def average_latency(self) -> float:
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+    def score(self, query: str, docs: list) -> np.ndarray:
+        """คะแนนความเกี่ยวข้อง 0-1 (sigmoid ของ logits) ของแต่ละ doc."""
+        logits = self.model.predict(
+            [(query, doc.page_content) for doc in docs], batch_size=self.batch_size, show_progress_bar=False
+        )
+        return 1.0 / (1.0 + np.exp(-np.asarray(logits, dtype=np.float32)))
+
+    def rerank(self, query: str, docs: list) -> List:
+        if not docs:
+            return []
+        start = time.perf_counter()
+        scores = self.score(query, docs)
+        order = np.argsort(-scores, kind="stable")
+        ranked_scores = scores[order]
+        keep = adaptive_cutoff(ranked_scores, self.top_n, self.min_score, self.relative_cutoff)
+
+        self.last_latency = time.perf_counter() - start
+        self.calls += 1
+        self.total_seconds += self.last_latency
+        log.info(f"Reranked {len(docs)} candidates in {self.last_latency * 1000:.0f}ms, kept {keep} "
+                 f"(top score {ranked_scores[0]:.2f}, average rerank latency {self.average_latency * 1000:.0f}ms)")
+        return [docs[i] for i in order[:keep]]
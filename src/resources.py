@@ -0,0 +1,183 @@
+# Registry กลางของ resource ที่โหลดช้า (embedding model, Chroma client/vector store, LLM)
+# ทุกตัวถูกสร้างครั้งแรกเมื่อมีคนเรียกใช้ (lazy) และใช้ร่วมกันทั้ง process
+# library ที่ import ช้า (langchain_huggingface, sentence-transformers, chromadb, Ollama) ถูก import ภายใน factory
+# เพื่อให้ Streamlit app และ CLI จ่ายเวลาเฉพาะส่วนที่ใช้จริง
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from utils.constant import (
+    CHROMA_PERSIST_DIR, CHROMA_COLLECTION_NAME, EMBEDDING_MODEL_NAME, EMBEDDING_DEVICE, EMBEDDING_BATCH_SIZE,
+    EMBEDDING_THREADS, EMBEDDING_NORMALIZE, EMBEDDING_MAX_SEQ_LENGTH, OLLAMA_MODEL_NAME, OLLAMA_TEMPERATURE,
+    RERANK_MODEL_NAME, RERANK_DEVICE, RERANK_MAX_LENGTH, VECTOR_STORE_BACKEND, COMPACT_STORE_SUBDIR, COMPACT_QUANTIZATION,
+    COMPACT_PQ_SUBVECTORS, COMPACT_IVF_MIN_ROWS, COMPACT_IVF_LISTS, COMPACT_IVF_PROBES, COMPACT_RESCORE_CANDIDATES,
+    SHARD_BY, SHARD_COUNT, SHARDS_SUBDIR, SHARD_SEARCH_WORKERS,
+)
+
+log = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_resources: Dict[str, object] = {}
+STARTUP_TIMINGS: Dict[str, float] = {} # ชื่อ resource -> เวลาที่ใช้สร้าง (วินาที) รวมเวลา import
+
+
+def _get_or_create(name: str, factory: Callable[[], object]):
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+    with _lock:
+        if name not in _resources:
+            start = time.perf_counter()
+            _resources[name] = factory()
+            STARTUP_TIMINGS[name] = time.perf_counter() - start
+            log.info(f"Initialized [cyan]{name}[/cyan] in {STARTUP_TIMINGS[name]:.2f}s", extra={"markup": True})
+        return _resources[name]
+
+
+def embedding_signature() -> str:
+    """ค่าที่มีผลต่อ vector ที่ได้ (ใช้เป็น key ของ embedding cache และใน index manifest)."""
+    return f"{EMBEDDING_MODEL_NAME}|normalize={EMBEDDING_NORMALIZE}|max_seq_length={EMBEDDING_MAX_SEQ_LENGTH}"
+
+
+def create_embedding_model(batch_size: int = EMBEDDING_BATCH_SIZE, num_threads: Optional[int] = EMBEDDING_THREADS,
+                           use_cache: bool = False):
+    """
+    สร้าง Embedding Model ใหม่ตามค่าตั้งค่า (batch size, จำนวน thread, normalize, max sequence length)
+    ถ้า use_cache=True จะห่อด้วย CachedEmbeddings (ดู embedding_cache.py) ซึ่งเหมาะกับตอน index
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    log.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}", extra={"markup": True})
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    embeddings = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={"device": EMBEDDING_DEVICE},
+        encode_kwargs={"batch_size": batch_size, "normalize_embeddings": EMBEDDING_NORMALIZE},
+    )
+    if EMBEDDING_MAX_SEQ_LENGTH:
+        embeddings._client.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+    log.info("Embedding model loaded.", extra={"markup": True})
+    if use_cache:
+        from embedding_cache import CachedEmbeddings
+        embeddings = CachedEmbeddings(embeddings, model_signature=embedding_signature(), batch_size=batch_size)
+        log.info(f"Embedding cache enabled at: {embeddings.cache_path}", extra={"markup": True})
+    return embeddings
+
+
+def create_vector_store(embedding_model, client=None, persist_directory: str = CHROMA_PERSIST_DIR,
+                        collection_name: str = CHROMA_COLLECTION_NAME, backend: str = VECTOR_STORE_BACKEND,
+                        shard_by: Optional[str] = SHARD_BY):
+    """
+    สร้าง vector store ใหม่ตาม backend: Chroma (ถ้าไม่ส่ง client จะเปิดจาก persist_directory)
+    หรือ CompactVectorStore (ดู compact_store.py) ในโฟลเดอร์ย่อย COMPACT_STORE_SUBDIR ของ persist_directory
+    ถ้าตั้ง shard_by จะได้ ShardedVectorStore (ดู sharded_store.py) ที่แต่ละ shard เป็น backend นี้
+    ในโฟลเดอร์ย่อยของ SHARDS_SUBDIR (client ไม่ถูกใช้ เพราะแต่ละ shard มี persist directory ของตัวเอง)
+    """
+    if shard_by:
+        from sharded_store import ShardedVectorStore
+
+        def open_shard(path: str):
+            return create_vector_store(embedding_model, persist_directory=path, collection_name=collection_name,
+                                       backend=backend, shard_by=None)
+        return ShardedVectorStore(os.path.join(persist_directory, SHARDS_SUBDIR), embedding_model, open_shard,
+                                  shard_by=shard_by, shard_count=SHARD_COUNT, workers=SHARD_SEARCH_WORKERS)
+    if backend == "compact":
+        from compact_store import CompactVectorStore
+        return CompactVectorStore(
+            os.path.join(persist_directory, COMPACT_STORE_SUBDIR), embedding_model, quantization=COMPACT_QUANTIZATION,
+            pq_subvectors=COMPACT_PQ_SUBVECTORS, ivf_lists=COMPACT_IVF_LISTS, ivf_probes=COMPACT_IVF_PROBES,
+            ivf_min_rows=COMPACT_IVF_MIN_ROWS, rescore_candidates=COMPACT_RESCORE_CANDIDATES,
+        )
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector store backend: {backend}")
+    from langchain_community.vectorstores import Chroma
+
+    if client is not None:
+        return Chroma(client=client, embedding_function=embedding_model, collection_name=collection_name)
+    return Chroma(persist_directory=persist_directory, embedding_function=embedding_model,
+                  collection_name=collection_name)
+
+
+def get_embedding_model():
+    """Embedding model ที่ใช้ร่วมกันตอน query (สร้างครั้งเดียวต่อ process)."""
+    return _get_or_create("embedding_model", create_embedding_model)
+
+
+def get_chroma_client():
+    def factory():
+        import chromadb
+        return chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
+    return _get_or_create("chroma_client", factory)
+
+
+def get_vector_store():
+    """Vector store (Chroma หรือ compact ตาม VECTOR_STORE_BACKEND) ที่ใช้ร่วมกันตอน query."""
+    # สร้าง dependency ก่อน เพื่อให้เวลาใน STARTUP_TIMINGS ของแต่ละตัวไม่ซ้อนกัน
+    embedding_model = get_embedding_model()
+    if VECTOR_STORE_BACKEND == "compact" or SHARD_BY:
+        return _get_or_create("vector_store", lambda: create_vector_store(embedding_model))
+    client = get_chroma_client()
+    return _get_or_create("vector_store", lambda: create_vector_store(embedding_model, client=client))
+
+
+def get_llm():
+    def factory():
+        from langchain_community.llms import Ollama
+        log.info(f"Loading LLM: [cyan]{OLLAMA_MODEL_NAME}[/cyan]", extra={"markup": True})
+        return Ollama(model=OLLAMA_MODEL_NAME, temperature=OLLAMA_TEMPERATURE)
+    return _get_or_create("llm", factory)
+
+
+def get_reranker_model():
+    """Cross-encoder สำหรับ re-ranking (โหลดเฉพาะเมื่อเปิด RERANK_ENABLED)."""
+    def factory():
+        from sentence_transformers import CrossEncoder
+        log.info(f"Loading re-ranker: [cyan]{RERANK_MODEL_NAME}[/cyan]", extra={"markup": True})
+        return CrossEncoder(RERANK_MODEL_NAME, device=RERANK_DEVICE, max_length=RERANK_MAX_LENGTH)
+    return _get_or_create("reranker", factory)
+
+
+def get_tokenizer():
+    """tokenizer ของ embedding model (ใช้นับความยาว chunk เป็น tokens เมื่อ CHUNK_LENGTH_UNIT = "tokens")."""
+    def factory():
+        from transformers import AutoTokenizer
+        name = EMBEDDING_MODEL_NAME if "/" in EMBEDDING_MODEL_NAME else f"sentence-transformers/{EMBEDDING_MODEL_NAME}"
+        return AutoTokenizer.from_pretrained(name)
+    return _get_or_create("tokenizer", factory)
+
+
+def get_page_cache():
+    """cache ข้อความรายหน้าของ PDF (ดู page_cache.py) ใช้ร่วมกันทั้ง process รวมถึงใน worker ของ parallel_ingest."""
+    def factory():
+        from page_cache import PageTextCache
+        return PageTextCache()
+    return _get_or_create("page_cache", factory)
+
+
+def register(name: str, resource: object):
+    """ใส่ resource ที่สร้างไว้แล้วลงใน registry แทนการสร้างจาก factory (เช่น embedding/LLM จำลองใน benchmark)."""
+    with _lock:
+        _resources[name] = resource
+        STARTUP_TIMINGS[name] = 0.0
+
+
+def reset(*names: str):
+    """ล้าง resource ที่สร้างไว้ (ทั้งหมดถ้าไม่ระบุชื่อ) เช่นหลังจากลบ chroma_db เพื่อ rebuild."""
+    with _lock:
+        for name in names or list(_resources):
+            _resources.pop(name, None)
+            STARTUP_TIMINGS.pop(name, None)
+
+
+def format_startup_timings() -> str:
+    """สรุปเวลาที่ใช้สร้างแต่ละ resource เรียงจากมากไปน้อย."""
+    total = sum(STARTUP_TIMINGS.values())
+    lines = [f"Startup timing breakdown (total {total:.2f}s):"]
+    for name, elapsed in sorted(STARTUP_TIMINGS.items(), key=lambda item: item[1], reverse=True):
+        share = elapsed / total if total else 0.0
+        lines.append(f"  - {name}: {elapsed:.2f}s ({share:.0%})")
+    return "\n".join(lines)
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+def source_name(metadata: dict) -> Optional[str]:
+    """ชื่อไฟล์ต้นทางของ chunk (local: source_pdf, Google Drive: source_gdrive_pdf)."""
+    return metadata.get("source_pdf") or metadata.get("source_gdrive_pdf")
+
+
+@dataclass
+class RetrievalFilters:
+    """
+    เงื่อนไขจำกัดขอบเขตการค้นหา (ทุกช่องเป็น optional และใช้ร่วมกันแบบ AND)
+    - source_pdfs: ชื่อไฟล์ (ตรงกับ metadata source_pdf หรือ source_gdrive_pdf)
+    - gdrive_file_ids: ID ไฟล์ใน Google Drive
+    - page_min / page_max: ช่วงหน้า (ตาม metadata page ซึ่งเริ่มที่ 0)
+    - ingested_after / ingested_before: ช่วงเวลาที่ index (unix timestamp ตาม metadata ingested_at)
+    """
+    source_pdfs: Optional[List[str]] = None
+    gdrive_file_ids: Optional[List[str]] = None
+    page_min: Optional[int] = None
+    page_max: Optional[int] = None
+    ingested_after: Optional[float] = None
+    ingested_before: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return self.to_chroma_where() is None
+
+    def matches(self, metadata: dict) -> bool:
+        """ตรวจเงื่อนไขเดียวกับ to_chroma_where กับ metadata ของ chunk ที่ไม่ได้อยู่ใน Chroma (เช่น near-duplicates)."""
+        if self.source_pdfs and metadata.get("source_pdf") not in self.source_pdfs \
+                and metadata.get("source_gdrive_pdf") not in self.source_pdfs:
+            return False
+        if self.gdrive_file_ids and metadata.get("gdrive_file_id") not in self.gdrive_file_ids:
+            return False
+        for key, low, high in (("page", self.page_min, self.page_max),
+                               ("ingested_at", self.ingested_after, self.ingested_before)):
+            value = metadata.get(key)
+            if (low is not None or high is not None) and value is None:
+                return False
+            if (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return True
+
+    def to_chroma_where(self) -> Optional[dict]:
+        """แปลงเป็น where clause ของ Chroma (ใช้ pre-filter ก่อน vector search)."""
+        conditions = []
+        if self.source_pdfs:
+            conditions.append({"$or": [
+                {"source_pdf": {"$in": list(self.source_pdfs)}},
+                {"source_gdrive_pdf": {"$in": list(self.source_pdfs)}},
+            ]})
+        if self.gdrive_file_ids:
+            conditions.append({"gdrive_file_id": {"$in": list(self.gdrive_file_ids)}})
+        if self.page_min is not None:
+            conditions.append({"page": {"$gte": self.page_min}})
+        if self.page_max is not None:
+            conditions.append({"page": {"$lte": self.page_max}})
+        if self.ingested_after is not None:
+            conditions.append({"ingested_at": {"$gte": self.ingested_after}})
+        if self.ingested_before is not None:
+            conditions.append({"ingested_at": {"$lte": self.ingested_before}})
+
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
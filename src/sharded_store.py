@@ -0,0 +1,239 @@
+# แบ่ง vector store เป็นหลาย shard (SHARD_BY ใน utils/constant.py) เพื่อไม่ให้ collection เดียวเป็นเพดานของระบบ
+# - ShardedVectorStore กระจาย chunks ไปยัง shard ตาม document ID (hash) หรือโฟลเดอร์ต้นทาง chunks ของไฟล์เดียวกัน
+#   จึงอยู่ shard เดียวกันเสมอ แต่ละ shard เป็น vector store ธรรมดา (Chroma หรือ compact) ในโฟลเดอร์ของตัวเอง
+# - ShardedCollection มี method ชุดเดียวกับ Chroma collection (query, get, count, delete) ที่ส่ง request ไปทุก shard
+#   พร้อมกันใน thread pool แล้วรวมผล: query เลือก top-k จาก distance ของทุก shard (ได้ผลเหมือนค้นใน collection เดียว)
+# โค้ดที่ใช้ vector_store._collection อยู่แล้ว (QueryBatcher, HybridRetriever, RAGSystem, ingest_pipeline,
+# open_lexical_index, visualize_db) จึงค้นหาแบบ fan-out ได้โดยไม่ต้องแก้
+import os
+import re
+import time
+import uuid
+import heapq
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+import metrics
+from utils.constant import SHARD_SEARCH_WORKERS
+
+log = logging.getLogger(__name__)
+
+SHARD_MODES = ("hash", "folder")
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def document_key(metadata: dict) -> str:
+    """ID ของเอกสารต้นทางของ chunk (Drive file ID หรือ path ของ PDF)."""
+    return str(metadata.get("gdrive_file_id") or metadata.get("source_pdf") or metadata.get("source", ""))
+
+
+def shard_name(metadata: dict, shard_by: str, shard_count: int) -> str:
+    """
+    ชื่อ shard (และชื่อโฟลเดอร์) ของ chunk
+    - "hash": shard-NN จาก md5 ของ document ID (กระจายเท่าๆ กัน และเหมือนเดิมทุกเครื่อง/ทุกครั้งที่รัน)
+    - "folder": โฟลเดอร์ของ source_pdf (path ที่สัมพันธ์กับโฟลเดอร์ PDF) ไฟล์ที่อยู่ชั้นบนสุดหรือจาก Drive อยู่ใน "root"
+    """
+    if shard_by == "hash":
+        digest = hashlib.md5(document_key(metadata).encode("utf-8")).digest()
+        return f"shard-{int.from_bytes(digest[:8], 'big') % shard_count:02d}"
+    if shard_by == "folder":
+        folder = os.path.dirname(str(metadata.get("source_pdf") or "")).replace(os.sep, "/")
+        return _UNSAFE_NAME_RE.sub("_", folder).strip("_") or "root"
+    raise ValueError(f"Unknown shard mode: {shard_by} (expected one of {', '.join(SHARD_MODES)})")
+
+
+class ShardedCollection:
+    """
+    Collection เสมือนที่รวมหลาย collection (Chroma หรือ CompactCollection) เข้าด้วยกัน
+    ทุก request ถูกส่งไปทุก shard พร้อมกัน (thread pool ขนาด workers) ยกเว้น get แบบแบ่งหน้า (limit/offset)
+    ที่อ่านเรียงทีละ shard ตามชื่อ เพื่อให้ลำดับของแถวคงที่เหมือน collection เดียว
+    """
+
+    def __init__(self, collections: Optional[Dict[str, Any]] = None, workers: int = SHARD_SEARCH_WORKERS):
+        self.shards: Dict[str, Any] = dict(sorted((collections or {}).items()))
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shard-search")
+
+    def add_shard(self, name: str, collection):
+        with self._lock:
+            self.shards = dict(sorted({**self.shards, name: collection}.items()))
+
+    def _map(self, func: Callable[[Any], Any], stage: Optional[str] = None) -> List[Any]:
+        """เรียก func กับทุก shard พร้อมกัน คืนผลตามลำดับชื่อ shard (stage = บันทึก latency ต่อ shard ลง metrics)."""
+        shards = list(self.shards.items())
+
+        def run(item):
+            name, collection = item
+            start = time.perf_counter()
+            result = func(collection)
+            if stage:
+                metrics.REGISTRY.observe("shard_request_seconds", time.perf_counter() - start, shard=name, stage=stage)
+            return result
+
+        if len(shards) <= 1:
+            return [run(item) for item in shards]
+        return list(self._executor.map(run, shards))
+
+    def count(self) -> int:
+        return sum(self._map(lambda collection: collection.count()))
+
+    def shard_counts(self) -> Dict[str, int]:
+        return dict(zip(self.shards, self._map(lambda collection: collection.count())))
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Optional[dict] = None,
+              include: Iterable[str] = ("metadatas", "documents", "distances")) -> dict:
+        """ค้นหา n_results ใน shard แล้วเลือก n_results ที่ distance น้อยที่สุดจากทุก shard (ต่อ query)."""
+        include = list(include)
+        shard_include = include if "distances" in include else include + ["distances"]
+        results = self._map(lambda collection: collection.query(
+            query_embeddings=query_embeddings, n_results=n_results, where=where, include=shard_include
+        ), stage="query")
+        merged = {key: [] for key in ["ids"] + include}
+        for query_index in range(len(query_embeddings)):
+            hits = [
+                (distance, shard_index, row)
+                for shard_index, result in enumerate(results)
+                for row, distance in enumerate(result["distances"][query_index])
+            ]
+            top = heapq.nsmallest(n_results, hits)
+            for key in merged:
+                merged[key].append([results[shard_index][key][query_index][row] for _, shard_index, row in top])
+        return merged
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Iterable[str] = ("metadatas", "documents")) -> dict:
+        """
+        เหมือน Chroma collection.get: ดึงตาม IDs / metadata filter จากทุก shard พร้อมกัน
+        ถ้าระบุ limit/offset จะนับแถวต่อกันตามลำดับ shard (ใช้แบ่งหน้าอ่านทั้ง collection ได้เหมือนเดิม)
+        """
+        include = list(include)
+        merged = {key: [] for key in ["ids"] + include}
+        if limit is None and not offset:
+            pages = self._map(lambda collection: collection.get(ids=ids, where=where, include=include), stage="get")
+        else:
+            pages, skip, remaining = [], offset or 0, limit
+            for collection in self.shards.values():
+                # นับแถวด้วยเงื่อนไขเดียวกับที่ใช้ดึงหน้า (ids และ where) ไม่เช่นนั้น offset จะข้ามแถวผิด
+                if ids is None and where is None:
+                    size = collection.count()
+                else:
+                    size = len(collection.get(ids=ids, where=where, include=[])["ids"])
+                if skip >= size:
+                    skip -= size
+                    continue
+                page = collection.get(ids=ids, where=where, limit=remaining, offset=skip, include=include)
+                pages.append(page)
+                skip = 0
+                if remaining is not None:
+                    remaining -= len(page["ids"])
+                    if remaining <= 0:
+                        break
+        for page in pages:
+            for key in merged:
+                merged[key].extend(page[key])
+        return merged
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None):
+        self._map(lambda collection: collection.delete(ids=ids, where=where), stage="delete")
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    LangChain VectorStore ที่กระจาย chunks ไปหลาย shard (มี _collection และ embeddings เหมือน langchain Chroma)
+    directory มีโฟลเดอร์ย่อย 1 โฟลเดอร์ต่อ shard ซึ่งเปิดด้วย open_shard(path) (เช่น resources.create_vector_store)
+    shard ใหม่ถูกสร้างตอนมี chunk แรกของ shard นั้น
+    """
+
+    def __init__(self, directory: str, embedding_function: Optional[Embeddings],
+                 open_shard: Callable[[str], VectorStore], shard_by: str = "hash", shard_count: int = 4,
+                 workers: int = SHARD_SEARCH_WORKERS):
+        if shard_by not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode: {shard_by} (expected one of {', '.join(SHARD_MODES)})")
+        self.directory = directory
+        self.shard_by = shard_by
+        self.shard_count = shard_count
+        self._embedding_function = embedding_function
+        self._open_shard = open_shard
+        self._lock = threading.Lock()
+        self.shards: Dict[str, VectorStore] = {}
+        existing = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+        for name in existing:
+            if os.path.isdir(os.path.join(directory, name)):
+                self.shards[name] = open_shard(os.path.join(directory, name))
+        self._collection = ShardedCollection({name: store._collection for name, store in self.shards.items()},
+                                             workers=workers)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+
+    def _shard(self, name: str) -> VectorStore:
+        with self._lock:
+            if name not in self.shards:
+                os.makedirs(self.directory, exist_ok=True)
+                self.shards[name] = self._open_shard(os.path.join(self.directory, name))
+                self._collection.add_shard(name, self.shards[name]._collection)
+                log.info(f"Created vector store shard: [cyan]{name}[/cyan]", extra={"markup": True})
+            return self.shards[name]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """embed ทั้ง batch ในครั้งเดียว แล้วแยก upsert ลงแต่ละ shard ตาม document ของ chunk."""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        ids = list(ids)
+        embeddings = self._embedding_function.embed_documents(texts)
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(shard_name(metadata, self.shard_by, self.shard_count), []).append(i)
+        for name, rows in groups.items():
+            self._shard(name)._collection.upsert(
+                ids=[ids[i] for i in rows], embeddings=[list(map(float, embeddings[i])) for i in rows],
+                documents=[texts[i] for i in rows], metadatas=[metadatas[i] for i in rows],
+            )
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """chunk IDs ไม่ได้บอกว่าอยู่ shard ไหน จึงลบจากทุก shard (ID ที่ไม่มีใน shard ถูกข้ามไป)."""
+        self._collection.delete(ids=ids)
+        return True
+
+    def get(self, **kwargs) -> dict:
+        return self._collection.get(**kwargs)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        results = self._collection.query(query_embeddings=[self._embedding_function.embed_query(query)],
+                                         n_results=k, where=filter)
+        return [(Document(id=chunk_id, page_content=text, metadata=metadata or {}), distance)
+                for chunk_id, text, metadata, distance in zip(results["ids"][0], results["documents"][0],
+                                                              results["metadatas"][0], results["distances"][0])]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def persist(self):
+        """แต่ละ shard เขียนข้อมูลลงดิสก์เองอยู่แล้ว (มีไว้ให้เรียกได้เหมือน Chroma)."""
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, directory: str = "shards",
+                   open_shard: Optional[Callable[[str], VectorStore]] = None, **kwargs: Any) -> "ShardedVectorStore":
+        if open_shard is None:
+            raise ValueError("ShardedVectorStore.from_texts requires open_shard (e.g. resources.create_vector_store)")
+        store = cls(directory, embedding, open_shard, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
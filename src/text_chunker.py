@@ -0,0 +1,128 @@
+from bisect import bisect_left
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+CHUNKER_VERSION = "native-1" # เปลี่ยนเมื่อวิธีตัด chunk เปลี่ยน (อยู่ใน index settings จึงทำให้ index ใหม่อัตโนมัติ)
+SEPARATORS = ("\n\n", "\n", ". ", " ") # จุดตัดที่ต้องการ เรียงจากดีที่สุด
+MIN_FILL = 0.5 # จุดตัดต้องอยู่หลังจากครึ่งหนึ่งของ chunk เป็นอย่างน้อย (กัน chunk สั้นเกินไป)
+
+# อักษรไทยที่ต้องอยู่ติดกับพยัญชนะหน้า (สระบน/ล่าง, วรรณยุกต์, การันต์) ห้ามตัดก่อนตัวเหล่านี้
+THAI_COMBINING = frozenset("ัิีึืฺุู็่้๊๋์ํ๎")
+# สระหน้า (เ แ โ ใ ไ) เป็นจุดเริ่มพยางค์ใหม่ จึงเป็นจุดตัดที่ดีเมื่อข้อความไทยไม่มีช่องว่าง และห้ามตัดหลังตัวเหล่านี้
+THAI_LEADING_VOWELS = "เแโใไ"
+
+
+class TextChunker:
+    """
+    แบ่งข้อความเป็น chunks ในรอบเดียว (linear) ด้วยการคำนวณ offset แทน RecursiveCharacterTextSplitter
+    - แต่ละ chunk ยาวไม่เกิน chunk_size และต่อจาก chunk ก่อนหน้าโดยซ้อนกันประมาณ chunk_overlap
+    - ตัดที่ย่อหน้า > บรรทัด > ประโยค > ช่องว่าง ที่อยู่ท้ายสุดของ chunk ถ้าไม่มีเลย (เช่นข้อความไทยที่ไม่เว้นวรรค)
+      จะตัดก่อนสระหน้าหรือระหว่างพยางค์ โดยไม่ตัดกลางสระบน/ล่าง/วรรณยุกต์
+    - start_index คือตำแหน่งตัวอักษรแรกของ chunk ในข้อความต้นฉบับ (เหมือน add_start_index=True)
+    - ถ้าส่ง token_offsets มา (ฟังก์ชันที่คืนตำแหน่งเริ่มของแต่ละ token) chunk_size/chunk_overlap จะนับเป็น tokens
+      ของ tokenizer นั้นแทนตัวอักษร เช่น tokenizer ของ embedding model เพื่อไม่ให้ chunk ยาวเกิน max_seq_length
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 token_offsets: Optional[Callable[[str], List[int]]] = None):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be >= 0 and smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.token_offsets = token_offsets
+
+    def split_text(self, text: str) -> Iterator[Tuple[int, str]]:
+        """yield (start_index, ข้อความของ chunk) ที่ตัด whitespace หัวท้ายแล้ว (chunk ว่างจะถูกข้าม)."""
+        length = len(text)
+        if self.token_offsets is None:
+            def advance(position: int, units: int) -> int:
+                return min(position + units, length)
+
+            def retreat(position: int, units: int) -> int:
+                return max(position - units, 0)
+        else:
+            starts = self.token_offsets(text)
+
+            def advance(position: int, units: int) -> int:
+                index = bisect_left(starts, position) + units
+                return starts[index] if index < len(starts) else length
+
+            def retreat(position: int, units: int) -> int:
+                return starts[max(bisect_left(starts, position) - units, 0)] if starts else 0
+
+        min_fill = max(1, int(self.chunk_size * MIN_FILL))
+        start = 0
+        while start < length:
+            limit = advance(start, self.chunk_size)
+            end = limit if limit >= length else _find_break(text, advance(start, min_fill), limit)
+
+            chunk = text[start:end]
+            stripped = chunk.strip()
+            if stripped:
+                yield start + len(chunk) - len(chunk.lstrip()), stripped
+            if end >= length:
+                return
+            start = self._next_start(text, start, end, retreat(end, self.chunk_overlap))
+
+    def _next_start(self, text: str, start: int, end: int, overlap_start: int) -> int:
+        """จุดเริ่มของ chunk ถัดไป: ย้อนกลับ chunk_overlap หน่วยจาก end แล้วเลื่อนไปต้นคำถัดไป."""
+        if not self.chunk_overlap or overlap_start <= start:
+            return end
+        if text[overlap_start - 1].isspace(): # อยู่ที่ต้นคำพอดีแล้ว (เช่นตำแหน่งเริ่มของ token)
+            return overlap_start
+        space = text.find(" ", overlap_start, end)
+        if space != -1:
+            return space + 1
+        leading = [position for position in (text.find(vowel, overlap_start, end) for vowel in THAI_LEADING_VOWELS)
+                   if position != -1]
+        return min(leading) if leading else _cluster_boundary(text, overlap_start, end)
+
+    def split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        แบ่งทีละ Document โดย copy metadata แบบตื้นครั้งเดียวต่อ chunk และเพิ่ม start_index
+        (ใช้ model_construct ข้ามการ validate ของ pydantic เพราะ field มาจาก Document ที่ validate แล้ว)
+        """
+        for document in documents:
+            metadata = document.metadata
+            for start_index, chunk in self.split_text(document.page_content):
+                yield Document.model_construct(page_content=chunk, metadata={**metadata, "start_index": start_index})
+
+
+def tokenizer_offsets(tokenizer) -> Callable[[str], List[int]]:
+    """แปลง Hugging Face tokenizer (fast) เป็นฟังก์ชันที่คืนตำแหน่งตัวอักษรเริ่มต้นของแต่ละ token."""
+    def offsets(text: str) -> List[int]:
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        return [start for start, _ in encoding["offset_mapping"]]
+    return offsets
+
+
+def _find_break(text: str, lo: int, hi: int) -> int:
+    """ตำแหน่งตัดที่ดีที่สุดในช่วง [lo, hi] (หลังตัวคั่น) ถ้าไม่มีตัวคั่นใช้ขอบพยางค์ไทย หรือ hi."""
+    for separator in SEPARATORS:
+        position = text.rfind(separator, lo, hi)
+        if position != -1:
+            return position + len(separator)
+    leading = max(text.rfind(vowel, lo, hi) for vowel in THAI_LEADING_VOWELS)
+    if leading > lo:
+        return leading
+    return _cluster_boundary(text, lo, hi, backwards=True)
+
+
+def _cluster_boundary(text: str, lo: int, hi: int, backwards: bool = False) -> int:
+    """ตำแหน่งที่ใกล้ที่สุด (จาก hi ย้อนลง หรือจาก lo ขึ้นไป) ที่ไม่ตัดกลางกลุ่มอักษรไทย."""
+    def splits_cluster(position: int) -> bool:
+        return (position < len(text) and text[position] in THAI_COMBINING) or (
+            position > 0 and text[position - 1] in THAI_LEADING_VOWELS)
+
+    if backwards:
+        position = hi
+        while position > lo and splits_cluster(position):
+            position -= 1
+        return position if position > lo else hi
+    position = lo
+    while position < hi and splits_cluster(position):
+        position += 1
+    return position
@@ -1,9 +1,158 @@
+import os
 
+# --- Vector store (ChromaDB) ---
 CHROMA_PERSIST_DIR = "chroma_db"
 CHROMA_COLLECTION_NAME = "pdf_collection"
+
+# --- Vector store backend ---
+# "chroma" หรือ "compact" (compact_store.py: int8/PQ + IVF บน memory-mapped arrays สำหรับ collection ขนาดใหญ่มาก)
+# เปลี่ยนค่านี้แล้วต้องรัน builder ใหม่ (manifest จะตรวจพบและ index ใหม่ให้เอง)
+VECTOR_STORE_BACKEND = "chroma"
+COMPACT_STORE_SUBDIR = "compact" # โฟลเดอร์ย่อยใน CHROMA_PERSIST_DIR (จึงถูกลบไปด้วยตอน rebuild)
+COMPACT_QUANTIZATION = "int8" # "int8" (~4x เล็กกว่า float32) หรือ "pq" (product quantization, ~30x เล็กกว่า)
+COMPACT_PQ_SUBVECTORS = 48 # bytes ต่อ vector ในโหมด pq (ต้องหาร embedding dim ลงตัว: 384 / 48 = 8)
+COMPACT_IVF_MIN_ROWS = 20000 # collection ที่เล็กกว่านี้ scan codes ทั้งหมด (เร็วพออยู่แล้ว)
+COMPACT_IVF_LISTS = None # None = 4 * sqrt(จำนวน chunks)
+COMPACT_IVF_PROBES = 16 # จำนวน lists ที่ค้นหาต่อ query (มากขึ้น = recall สูงขึ้นแต่ช้าลง)
+COMPACT_RESCORE_CANDIDATES = 200 # candidates ที่ re-score ด้วย vector float32 จากดิสก์ (pq ต้องการมากกว่า int8)
+
+# --- Sharding (ดู sharded_store.py) ---
+# แบ่ง corpus เป็นหลาย collection/โฟลเดอร์ใน CHROMA_PERSIST_DIR/SHARDS_SUBDIR แล้วค้นหาทุก shard พร้อมกัน
+# None = collection เดียว (ไม่ shard), "hash" = SHARD_COUNT shards ตาม hash ของ document ID,
+# "folder" = 1 shard ต่อโฟลเดอร์ย่อยของ PDF (เช่น src/temp/hr/*.pdf -> shard "hr")
+# แต่ละ shard เป็น vector store ที่สมบูรณ์ในตัว (ตาม VECTOR_STORE_BACKEND) จึงสร้างแยกเครื่องแล้วคัดลอกมารวมกันได้
+SHARD_BY = None
+SHARD_COUNT = 4 # ใช้เมื่อ SHARD_BY = "hash"
+SHARDS_SUBDIR = "shards"
+SHARD_SEARCH_WORKERS = 8 # จำนวน threads ที่ค้นหา shards พร้อมกัน
+
+# --- Index versions + hot swap (ดู index_versions.py และ index_worker.py) ---
+# index_worker.py สร้าง index ใหม่ในโฟลเดอร์ version ใหม่ของ INDEX_VERSIONS_DIR (แต่ละ version มีโครงสร้างเหมือน
+# CHROMA_PERSIST_DIR) แล้วสลับ pointer แบบ atomic ส่วน RAGSystem ที่รันอยู่จะเปิด version ใหม่แล้วสลับไปใช้เอง
+# ถ้ายังไม่เคยรัน worker (ไม่มี pointer) ทุกส่วนยังใช้ CHROMA_PERSIST_DIR เหมือนเดิม
+INDEX_VERSIONS_DIR = "chroma_db_versions"
+INDEX_KEEP_VERSIONS = 2 # จำนวน version ล่าสุดที่เก็บไว้ (รวม version ที่ใช้งานอยู่) ที่เหลือถูกลบ
+INDEX_WORKER_POLL_SECONDS = 30 # worker ตรวจ src/temp / Drive folder ทุกกี่วินาที
+INDEX_WORKER_NICE = 10 # ลด CPU priority ของ worker process (POSIX) เพื่อไม่ให้แย่ง CPU กับการตอบคำถาม
+INDEX_HOT_SWAP_ENABLED = True # RAGSystem ตรวจ pointer แล้วสลับไปใช้ version ใหม่ระหว่างรัน (ไม่ต้อง restart app)
+INDEX_SWAP_POLL_SECONDS = 5
+INDEX_SWAP_GRACE_SECONDS = 60 # ปิด resource ของ version เดิมหลังสลับแล้วกี่วินาที (ให้คำถามที่ค้างอยู่ทำงานจนจบ)
+
+# --- Embedding model ---
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_DEVICE = "cpu"
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_THREADS = None # None = ใช้ค่า default ของ torch (จำนวน core)
+EMBEDDING_NORMALIZE = False
+EMBEDDING_MAX_SEQ_LENGTH = None # None = ใช้ค่า default ของ model (all-MiniLM-L6-v2 = 256 tokens)
+EMBEDDING_CACHE_ENABLED = True # ใช้ cache ตอน index (ดู embedding_cache.py)
+EMBEDDING_CACHE_PATH = os.path.join(".cache", "embedding_cache.sqlite")
+EMBEDDING_CACHE_DTYPE = "float32" # หรือ "float16" เพื่อลดขนาดไฟล์ cache ลงครึ่งหนึ่ง
+
+# --- Chunking / Indexing ---
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# หน่วยของ CHUNK_SIZE/CHUNK_OVERLAP: "chars" (ตัวอักษร) หรือ "tokens" (tokenizer ของ embedding model
+# ต้องปรับ CHUNK_SIZE ให้ไม่เกิน max_seq_length ของ model เช่น 256/40 สำหรับ all-MiniLM-L6-v2)
+CHUNK_LENGTH_UNIT = "chars"
+UPSERT_BATCH_SIZE = 1000 # จำนวน chunks ต่อการ embed + upsert ลง Chroma หนึ่งครั้ง
+PAGE_CACHE_ENABLED = True # เก็บข้อความที่ extract แล้วรายหน้า (ดู page_cache.py) เปลี่ยนค่า chunk แล้วไม่ต้องรัน pypdf ซ้ำ
+PAGE_CACHE_PATH = os.path.join(".cache", "page_text_cache.sqlite")
+DRY_RUN_SAMPLE_FILES = 5 # จำนวน PDF ที่ parse จริงเพื่อประมาณจำนวน chunks และเวลา build (vector_store_builder.py --dry-run)
+DRY_RUN_EMBED_SAMPLE_CHUNKS = 256 # จำนวน chunks ตัวอย่างที่ embed จริงเพื่อวัดความเร็ว embedding
+
+# --- Near-duplicate detection ตอน ingest (ดู dedup.py) ---
+# chunk ที่เกือบเหมือนกับ chunk ที่ index ไว้แล้ว (เช่น PDF หลาย revision, หน้า boilerplate) จะไม่ถูก embed/เก็บซ้ำ
+# แต่เก็บ reference ไปยัง canonical chunk ไว้แทน (เปลี่ยนค่าในส่วนนี้แล้ว manifest จะ index ใหม่ให้เอง)
+DEDUP_ENABLED = False # เปิดเมื่อมี PDF หลาย revision หรือหน้า boilerplate จำนวนมาก
+DEDUP_INDEX_FILE_NAME = "dedup_index.sqlite"
+DEDUP_INDEX_PATH = os.path.join(CHROMA_PERSIST_DIR, DEDUP_INDEX_FILE_NAME) # ถูกลบไปพร้อมกับ Chroma ตอน rebuild
+DEDUP_CHUNK_THRESHOLD = 0.9 # Jaccard similarity (ประมาณด้วย MinHash) ขั้นต่ำที่นับว่า chunk ซ้ำ
+DEDUP_DOCUMENT_THRESHOLD = 0.8 # Jaccard similarity ขั้นต่ำที่นับว่าทั้งเอกสารเป็น near-duplicate ของเอกสารอื่น
+DEDUP_SHINGLE_SIZE = 5 # ความยาว character shingles (ใช้ตัวอักษรแทนคำเพราะภาษาไทยไม่เว้นวรรค)
+DEDUP_NUM_PERM = 128 # จำนวน hash functions ของ MinHash signature
+DEDUP_BANDS = 16 # จำนวน LSH bands (128 / 16 = 8 rows ต่อ band -> candidate เมื่อ similarity >~ 0.7)
+
+# --- LLM (Ollama) และการค้นหา ---
+OLLAMA_MODEL_NAME = "llama3" # หรือชื่อโมเดลที่คุณ pull มา เช่น mistral, gemma:2b
+OLLAMA_TEMPERATURE = 0.1
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+RETRIEVER_K = 5 # จำนวน chunks ที่ดึงมาใช้เป็น context
+
+# --- Hybrid retrieval: BM25 + vector (ดู lexical_index.py และ hybrid_retrieval.py) ---
+RETRIEVAL_MODE = "vector" # "vector" (cosine similarity อย่างเดียว, RETRIEVER_K chunks) หรือ "hybrid" (HYBRID_K chunks)
+LEXICAL_INDEX_FILE_NAME = "lexical_index.sqlite" # อยู่ใน persist_dir ของ index (ถูก build คู่กับ Chroma)
+LEXICAL_INDEX_MMAP_BYTES = 256 * 1024 * 1024
+LEXICAL_MAX_DF_RATIO = 0.5 # คำที่อยู่ในเกินสัดส่วนนี้ของ chunks ทั้งหมดจะไม่ถูกใช้คิดคะแนน BM25 (ค้นเร็วขึ้นมากกับ index ใหญ่)
+HYBRID_FUSION = "rrf" # "rrf" (reciprocal rank fusion) หรือ "weighted" (คะแนนที่ normalize แล้ว)
+HYBRID_VECTOR_K = 8 # จำนวน candidates จาก vector search
+HYBRID_LEXICAL_K = 8 # จำนวน candidates จาก BM25
+HYBRID_K = 4 # จำนวน chunks หลัง fusion ที่ส่งให้ LLM (น้อยกว่า RETRIEVER_K เพราะอันดับแม่นกว่า -> prompt สั้นลง)
+HYBRID_RRF_K = 60
+HYBRID_LEXICAL_WEIGHT = 0.5
+
+# --- Cross-encoder re-ranking (ดู reranker.py) ---
+RERANK_ENABLED = False # True = over-fetch candidates แล้วจัดอันดับใหม่ด้วย cross-encoder (รันบน CPU)
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_DEVICE = "cpu"
+RERANK_MAX_LENGTH = 512
+RERANK_CANDIDATES = 40 # จำนวน candidates ที่ดึงมาให้ re-ranker
+RERANK_BATCH_SIZE = 16
+RERANK_TOP_N = 5 # จำนวน chunks สูงสุดที่ส่งให้ LLM หลัง re-rank
+RERANK_MIN_SCORE = 0.1 # คะแนน (0-1) ขั้นต่ำของ chunk ที่ส่งให้ LLM
+RERANK_RELATIVE_CUTOFF = 0.3 # ตัด chunks ที่คะแนนต่ำกว่าสัดส่วนนี้ของคะแนนสูงสุด (adaptive cut-off)
+
+# --- Context assembly ก่อนส่งให้ LLM (ดู context_assembly.py) ---
+CONTEXT_COMPRESSION_ENABLED = False # True = รวม chunks ที่ซ้อนทับกัน, ตัด near-duplicates และจำกัดจำนวน tokens
+CONTEXT_MAX_TOKENS = 1500 # token budget ของ context ใน prompt (None = ไม่จำกัด)
+CONTEXT_DUPLICATE_THRESHOLD = 0.85 # chunk ที่ซ้ำกับ chunk อันดับดีกว่าเกินค่านี้จะถูกตัดออก
+
+# --- Query micro-batching (ดู query_batcher.py) ---
+QUERY_BATCHING_ENABLED = False # True = รวม query ที่เข้ามาพร้อมกันแล้ว embed/ค้นหาเป็น batch เดียว (คุ้มกับ api_server.py)
+QUERY_BATCH_MAX_WAIT_MS = 5 # เวลาสูงสุดที่ query แรกของ batch รอ query อื่น
+QUERY_BATCH_MAX_SIZE = 32
+
+# --- Visualization ของ vector store (ดู visualize_db.py) ---
+VISUALIZE_MAX_POINTS = 50000 # จำนวนจุดสูงสุดที่สุ่มมาลดมิติ/แสดง (สุ่มแบบ stratified ตามไฟล์ต้นทาง)
+VISUALIZE_MIN_PER_SOURCE = 20 # ทุกไฟล์ได้อย่างน้อยเท่านี้ (หรือทั้งหมดถ้ามีน้อยกว่า) แม้ไฟล์จะเล็กมาก
+VISUALIZE_METHOD = "tsne" # "tsne" (openTSNE ถ้าติดตั้งไว้ ไม่งั้น Barnes-Hut ของ scikit-learn), "umap" หรือ "pca"
+VISUALIZE_PCA_DIMS = 50 # ลดมิติด้วย PCA ก่อน t-SNE/UMAP
+VISUALIZE_PAGE_SIZE = 5000 # จำนวนแถวต่อการดึงข้อมูลจาก collection หนึ่งครั้ง
+VISUALIZE_CACHE_DIR = os.path.join(".cache", "visualize") # พิกัด 2D ที่คำนวณแล้ว (key = index version + ค่าตั้งค่า)
+VISUALIZE_OUTPUT_PATH = "vector_db_map.html" # .html (Plotly แบบ static), .parquet หรือ .csv
+
+# --- Answer cache (ดู answer_cache.py) ---
+ANSWER_CACHE_ENABLED = False # True = ตอบคำถามซ้ำจาก cache (คำตอบอาจไม่ตรงกับการตั้งค่า LLM/prompt ที่เปลี่ยนภายหลัง)
+ANSWER_CACHE_PATH = os.path.join(".cache", "answer_cache.sqlite")
+ANSWER_CACHE_TTL_SECONDS = 24 * 3600 # None = ไม่หมดอายุ (ยังถูกล้างเมื่อ index เปลี่ยน)
+ANSWER_CACHE_MAX_ENTRIES = 1000
+# None = exact match เท่านั้น, ถ้ากำหนด (เช่น 0.95) จะใช้คำตอบของคำถามที่ query embedding คล้ายกันเกินค่านี้ด้วย
+ANSWER_CACHE_SIMILARITY_THRESHOLD = None
+
+# --- Metrics / tracing (ดู metrics.py) ---
+METRICS_ENABLED = True # False = ไม่จับเวลาและไม่นับอะไรเลย (คำตอบจะไม่มี "timings")
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) # วินาที
+METRICS_TEXTFILE_PATH = None # เช่น "metrics/rag.prom" ให้ builder เขียน metrics ของการ index ไว้ให้ node_exporter อ่าน
+
+# --- HTTP API (ดู api_server.py) ---
+API_HOST = "0.0.0.0"
+API_PORT = 8000
+API_RETRIEVAL_WORKERS = 32 # thread pool สำหรับงาน retrieval (embedding + Chroma) ที่เป็น blocking
+API_MAX_CONCURRENT_RETRIEVALS = 32 # retrieval ที่เข้ามาพร้อมกันถูกรวมเป็น batch โดย QueryBatcher
+API_MAX_CONCURRENT_GENERATIONS = 2 # ควรเท่ากับ OLLAMA_NUM_PARALLEL ของ Ollama server
+API_MAX_PENDING_REQUESTS = 64 # เกินจำนวนนี้จะตอบ 503 ทันที (backpressure) แทนการต่อคิวไปเรื่อยๆ
+API_REQUEST_TIMEOUT = 120 # วินาที ต่อคำถาม (รวมเวลารอคิว)
+API_OLLAMA_MAX_CONNECTIONS = 8
 
+# --- Google Drive ---
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 CREDENTIALS_FILE = 'credentials.json' # Path to your credentials.json
 TOKEN_FILE = 'token.json' # Will be created automatically
-TEMP_PDF_DIR = "temp_pdfs" # โฟลเดอร์สำหรับเก็บ PDF ที่ดาวน์โหลดชั่วคราว
\ No newline at end of file
+TEMP_PDF_DIR = "temp_pdfs" # โฟลเดอร์สำหรับเก็บ PDF ที่ดาวน์โหลดชั่วคราว
+# Drive sync (ดู drive_sync.py): PDF ที่ sync มาจะถูกเก็บไว้ใน cache เพื่อไม่ต้องดาวน์โหลดซ้ำทุกครั้งที่ index
+DRIVE_CACHE_DIR = os.path.join(".cache", "gdrive")
+DRIVE_PAGE_SIZE = 1000 # จำนวนไฟล์ต่อหน้าตอนลิสต์โฟลเดอร์ (สูงสุดที่ Drive API รับ)
+DRIVE_DOWNLOAD_WORKERS = 4 # จำนวนไฟล์ที่ดาวน์โหลดพร้อมกัน
+DRIVE_DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024 # bytes ต่อ request ตอนดาวน์โหลด (เขียนลงดิสก์ทีละ chunk)
+DRIVE_MAX_RETRIES = 5
+DRIVE_RETRY_BACKOFF_SECONDS = 1.0 # เวลารอก่อน retry ครั้งแรก (เพิ่มเป็น 2 เท่าทุกครั้ง)
@@ -1,12 +1,37 @@
 import os
+import time
 import shutil
 import logging
-from typing import List # ไม่จำเป็นต้องใช้ Document ที่นี่แล้วถ้า all_chunks ถูกส่งมาโดยตรง
-from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+import argparse
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 # Import ฟังก์ชันใหม่จาก pdf_processor
-from pdf_processing import load_pdf, chunk_documents
+from pdf_processing import authenticate_google_drive
+from drive_sync import DriveSync
+from parallel_ingest import PdfJob, iter_parsed_pdfs, parse_and_chunk_pdf, DEFAULT_INGEST_WORKERS
+from index_manifest import (
+    IndexManifest, MANIFEST_FILE_NAME, compute_file_hash, read_manifest_settings, write_index_version
+)
+from ingest_pipeline import (
+    PendingFile, delete_chunk_ids, run_ingest_pipeline
+)
+from embedding_cache import CachedEmbeddings
+from compact_store import CompactVectorStore
+from sharded_store import ShardedVectorStore
+from dedup import DedupIndex
+from index_versions import read_active_version
+from metrics import REGISTRY as METRICS
+from lexical_index import LexicalIndex
+from text_chunker import CHUNKER_VERSION
+from retrieval_filters import source_name
+from resources import create_embedding_model, create_vector_store, embedding_signature, reset as reset_resources
+from utils.constant import (
+    CHROMA_PERSIST_DIR, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_LENGTH_UNIT,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS, EMBEDDING_CACHE_ENABLED, UPSERT_BATCH_SIZE, LEXICAL_INDEX_FILE_NAME,
+    DRIVE_DOWNLOAD_WORKERS, METRICS_TEXTFILE_PATH, VECTOR_STORE_BACKEND, DEDUP_ENABLED, DEDUP_INDEX_FILE_NAME,
+    DEDUP_CHUNK_THRESHOLD, DEDUP_SHINGLE_SIZE, DEDUP_NUM_PERM, DEDUP_BANDS, SHARD_BY, SHARD_COUNT,
+    DRY_RUN_SAMPLE_FILES, DRY_RUN_EMBED_SAMPLE_CHUNKS,
+)
 from logger_config import setup_logger
 
 log = logging.getLogger(__name__)
@@ -14,185 +39,587 @@ log = logging.getLogger(__name__)
 # ค่าคงที่ยังคงเดิม
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PDF_SOURCE_DIR = os.path.join(SCRIPT_DIR, "temp")
+GDRIVE_MANIFEST_FILE_NAME = "gdrive_index_manifest.json" # manifest ของไฟล์จาก Google Drive (key = file ID)
+# ค่าตั้งค่าอื่นๆ (Chroma, embedding, chunk) อยู่ใน utils/constant.py
 
-CHROMA_PERSIST_DIR = "chroma_db"
-CHROMA_COLLECTION_NAME = "pdf_collection"
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+def get_embedding_model(batch_size: int = EMBEDDING_BATCH_SIZE, num_threads: Optional[int] = EMBEDDING_THREADS,
+                        use_cache: bool = EMBEDDING_CACHE_ENABLED):
+    """
+    โหลด Embedding Model สำหรับการ index (ดู resources.create_embedding_model)
+    โดยค่าเริ่มต้นจะห่อด้วย cache บนดิสก์ เพื่อไม่ให้ข้อความเดิมถูก embed ซ้ำ
+    """
+    return create_embedding_model(batch_size=batch_size, num_threads=num_threads, use_cache=use_cache)
 
-def get_embedding_model(): # ฟังก์ชันนี้ยังคงเดิม
-    """โหลด Embedding Model."""
-    log.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}", extra={"markup": True})
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL_NAME,
-    )
-    log.info("Embedding model loaded.", extra={"markup": True})
-    return embeddings
 
-# def build_or_load_vector_store(...) # ฟังก์ชันนี้ยังคงเดิม (ตรวจสอบโค้ดจากคำตอบก่อนหน้านี้ของคุณ)
-# *** คัดลอกฟังก์ชัน build_or_load_vector_store จากคำตอบก่อนหน้านี้มาใส่ตรงนี้ ***
-# ให้แน่ใจว่าฟังก์ชันนี้รับ `chunks: List[Document]` และ `embedding_model`
-# (โค้ดของ build_or_load_vector_store จากคำตอบก่อนหน้าค่อนข้างยาว ผมขอละไว้เพื่อให้คำตอบนี้ไม่ยาวเกินไป
-# กรุณานำโค้ดส่วนนั้นมาใส่เองนะครับ)
-# ------ BEGIN COPIED build_or_load_vector_store ------
-def build_or_load_vector_store(chunks: List[Document] = None, embedding_model=None, force_rebuild: bool = False):
+def open_vector_store(embedding_model=None, force_rebuild: bool = False, persist_dir: str = CHROMA_PERSIST_DIR):
     """
-    สร้าง Vector Store ใหม่จาก Chunks หรือโหลด Vector Store ที่มีอยู่.
+    เปิด (หรือสร้างใหม่ถ้ายังไม่มี) vector store ตาม VECTOR_STORE_BACKEND ใน persist_dir สำหรับเขียนข้อมูล
+    ถ้า force_rebuild จะลบของเก่าทิ้งก่อน (persist_dir อื่นใช้สร้าง index version ใหม่ ดู index_worker.py)
     """
+    if force_rebuild and os.path.exists(persist_dir):
+        shutil.rmtree(persist_dir)
+        log.info(f"Removed old persist directory for rebuild: {persist_dir}", extra={"markup": True})
+        if persist_dir == CHROMA_PERSIST_DIR:
+            reset_resources("vector_store", "chroma_client") # handle เดิมชี้ไปที่ข้อมูลที่ถูกลบไปแล้ว
     if embedding_model is None:
         embedding_model = get_embedding_model()
+    return create_vector_store(embedding_model, persist_directory=persist_dir)
 
-    vector_store = None
-    if not force_rebuild and os.path.exists(CHROMA_PERSIST_DIR):
-        try:
-            log.info(f"Loading existing vector store from: {CHROMA_PERSIST_DIR}", extra={"markup": True})
-            vector_store = Chroma(
-                persist_directory=CHROMA_PERSIST_DIR,
-                embedding_function=embedding_model,
-                collection_name=CHROMA_COLLECTION_NAME
-            )
-            log.info(f"Vector store loaded. Collection: '{vector_store._collection.name}', Count: {vector_store._collection.count()}", extra={"markup": True})
-            # ถ้ามี chunks ใหม่และต้องการ add เข้าไปใน store ที่มีอยู่ (ไม่ใช่ force_rebuild)
-            if chunks and not force_rebuild:
-                 # ตรวจสอบว่า chunks ที่จะ add มี content จริงๆ
-                 valid_new_chunks = [chk for chk in chunks if hasattr(chk, 'page_content') and chk.page_content]
-                 if valid_new_chunks:
-                    log.info(f"Adding {len(valid_new_chunks)} new valid chunks to the existing vector store.", extra={"markup": True})
-                    vector_store.add_documents(documents=valid_new_chunks) # ไม่ต้องส่ง embedding model ซ้ำ
-                    vector_store.persist()
-                    log.info(f"Vector store updated and persisted. New count: {vector_store._collection.count()}", extra={"markup": True})
-                 else:
-                    log.warning("No valid new chunks to add to the existing vector store.", extra={"markup": True})
 
-        except Exception as e:
-            log.error(f"Error loading existing vector store: {e}. Will try to build new one if chunks are provided.", extra={"markup": True})
-            vector_store = None
-
-    if vector_store is None and chunks: # ถ้าโหลดไม่ได้ หรือ force_rebuild และมี chunks
-        # ตรวจสอบว่า chunks ที่จะใช้สร้าง store ใหม่ มี content จริงๆ
-        valid_chunks_for_new_store = [chk for chk in chunks if hasattr(chk, 'page_content') and chk.page_content]
-        if valid_chunks_for_new_store:
-            if force_rebuild and os.path.exists(CHROMA_PERSIST_DIR): # ถ้า force rebuild ให้ลบของเก่า
-                import shutil
-                shutil.rmtree(CHROMA_PERSIST_DIR)
-                log.info(f"Removed old persist directory for rebuild: {CHROMA_PERSIST_DIR}", extra={"markup": True})
-
-            log.info(f"Building new vector store with {len(valid_chunks_for_new_store)} valid chunks and persisting to: {CHROMA_PERSIST_DIR}", extra={"markup": True})
-            vector_store = Chroma.from_documents(
-                documents=valid_chunks_for_new_store,
-                embedding=embedding_model,
-                persist_directory=CHROMA_PERSIST_DIR,
-                collection_name=CHROMA_COLLECTION_NAME
-            )
-            vector_store.persist()
-            log.info(f"Vector store built and persisted. Count: {vector_store._collection.count()}", extra={"markup": True})
-        else:
-            log.warning("No valid chunks provided to build a new vector store.", extra={"markup": True})
-            vector_store = None # Ensure it's None if no valid chunks
+def open_lexical_index(vector_store, batch_size: int = UPSERT_BATCH_SIZE,
+                       persist_dir: str = CHROMA_PERSIST_DIR) -> LexicalIndex:
+    """
+    เปิด BM25 index ที่เก็บคู่กับ Chroma collection (ใน persist_dir จึงถูกลบไปพร้อมกันตอน rebuild)
+    ถ้า index ยังว่างแต่ collection มีข้อมูลอยู่แล้ว (สร้างก่อนมี lexical index) จะ backfill จาก collection ทีละหน้า
+    """
+    lexical_index = LexicalIndex(os.path.join(persist_dir, LEXICAL_INDEX_FILE_NAME))
+    collection = vector_store._collection
+    total = collection.count()
+    if len(lexical_index) == 0 and total:
+        log.info(f"Backfilling lexical index from {total} existing chunks...", extra={"markup": True})
+        for offset in range(0, total, batch_size):
+            page = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            lexical_index.add(page["ids"], page["documents"],
+                              [source_name(metadata or {}) for metadata in page["metadatas"]])
+    return lexical_index
 
-    elif vector_store is None and not chunks:
-            log.warning("No chunks provided and no existing vector store found or loadable.", extra={"markup": True})
 
-    return vector_store
-# ------ END COPIED build_or_load_vector_store ------
+def open_dedup_index(persist_dir: str = CHROMA_PERSIST_DIR) -> Optional[DedupIndex]:
+    """เปิด near-duplicate index (ใน persist_dir จึงถูกลบไปพร้อมกันตอน rebuild) หรือ None ถ้าปิด DEDUP_ENABLED."""
+    return DedupIndex(os.path.join(persist_dir, DEDUP_INDEX_FILE_NAME)) if DEDUP_ENABLED else None
 
 
-def process_gdrive_pdfs_and_build_store(gdrive_folder_id: str, force_rebuild: bool = False):
+def build_ann_index(vector_store):
     """
-    ประมวลผล PDF ทั้งหมดจาก Google Drive Folder ที่กำหนด และสร้าง/อัปเดต Vector Store.
+    compact store: train/อัปเดต IVF index และ PQ codebooks หลัง ingest (chunks ที่เพิ่มระหว่าง ingest ใช้ index เดิมไปก่อน)
+    Chroma สร้าง HNSW index ไปพร้อมกับ add จึงไม่ต้องทำอะไร
+    """
+    if isinstance(vector_store, ShardedVectorStore):
+        for store in vector_store.shards.values():
+            build_ann_index(store)
+    elif isinstance(vector_store, CompactVectorStore):
+        start = time.perf_counter()
+        vector_store.build_index()
+        log.info(f"Compact store index ready in {time.perf_counter() - start:.1f}s: "
+                 f"{vector_store._collection.memory_report()}", extra={"markup": True})
+
+
+def _log_ingest_stats(stats, vector_store, dedup_index: Optional[DedupIndex] = None):
+    log.info(
+        f"Ingestion finished in {stats.elapsed:.1f}s: {stats.files_indexed} file(s) indexed, "
+        f"{stats.files_failed} failed, {stats.chunks_upserted} chunks upserted in {stats.batches} batch(es)"
+        + (f", {stats.chunks_resumed} chunks resumed from an interrupted run" if stats.chunks_resumed else "")
+        + f". Collection count: {vector_store._collection.count()}",
+        extra={"markup": True}
+    )
+    if isinstance(vector_store, ShardedVectorStore):
+        log.info(f"Chunks per shard: {vector_store._collection.shard_counts()}", extra={"markup": True})
+    if dedup_index is not None:
+        totals = dedup_index.stats()
+        log.info(
+            f"Dedup: {stats.chunks_duplicate} near-duplicate chunk(s) skipped ({stats.dedup_ratio:.1%} of new chunks), "
+            f"{stats.documents_duplicate} near-duplicate document(s). Whole index: {totals['duplicate_chunks']} of "
+            f"{totals['canonical_chunks'] + totals['duplicate_chunks']} chunks deduplicated "
+            f"({totals['dedup_ratio']:.1%})",
+            extra={"markup": True}
+        )
+    if isinstance(vector_store.embeddings, CachedEmbeddings):
+        vector_store.embeddings.log_stats()
+    if METRICS_TEXTFILE_PATH:
+        METRICS.write_textfile(METRICS_TEXTFILE_PATH)
+        log.info(f"Ingestion metrics written to: {METRICS_TEXTFILE_PATH}", extra={"markup": True})
+
+
+def process_gdrive_pdfs_and_build_store(gdrive_folder_id: str, force_rebuild: bool = False,
+                                        workers: int = DEFAULT_INGEST_WORKERS,
+                                        batch_size: int = UPSERT_BATCH_SIZE,
+                                        download_workers: int = DRIVE_DOWNLOAD_WORKERS,
+                                        persist_dir: str = CHROMA_PERSIST_DIR, sync_result=None, embedding_model=None,
+                                        chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """
+    ประมวลผล PDF ทั้งหมดจาก Google Drive Folder ที่กำหนด และสร้าง/อัปเดต Vector Store แบบ incremental.
+    ไฟล์ถูก sync ลง cache ในเครื่องด้วย DriveSync (ดาวน์โหลดเฉพาะไฟล์ใหม่/ที่เปลี่ยน, download_workers ไฟล์พร้อมกัน)
+    แล้วใช้ manifest แยกของ Drive (key = file ID) เพื่อ index เฉพาะไฟล์ที่เนื้อหาเปลี่ยน
+    และลบ chunks ของไฟล์ที่ถูกลบออกจากโฟลเดอร์ (ส่ง sync_result มาได้ถ้า sync ไว้แล้ว เช่นใน index_worker.py)
     """
     log.info(f"--- Starting PDF processing from Google Drive Folder ID: {gdrive_folder_id} ---", extra={"markup": True})
-    # 1. ดึง Chunks ทั้งหมดจาก Google Drive
-    all_chunks, processed_files = get_all_document_chunks_from_gdrive(gdrive_folder_id)
+    if sync_result is None:
+        try:
+            sync_result = DriveSync(authenticate_google_drive, gdrive_folder_id, workers=download_workers).sync()
+        except Exception as e:
+            log.error(f"Google Drive sync failed: [bold red]{e}[/bold red]", extra={"markup": True})
+            return None
+
+    vector_store = open_vector_store(embedding_model, force_rebuild=force_rebuild, persist_dir=persist_dir)
+    lexical_index = open_lexical_index(vector_store, batch_size, persist_dir)
+    dedup_index = open_dedup_index(persist_dir)
+    manifest = IndexManifest.load(os.path.join(persist_dir, GDRIVE_MANIFEST_FILE_NAME),
+                                  get_index_settings(chunk_size, chunk_overlap))
+    if manifest.settings_changed:
+        delete_chunk_ids(vector_store, manifest.all_chunk_ids(), batch_size, lexical_index, dedup_index)
+        manifest.clear()
+        manifest.save()
 
-    if not all_chunks:
-        log.warning("No chunks were created from any PDF in Google Drive. Trying to load existing vector store if not forcing rebuild.", extra={"markup": True})
-        # ถ้าไม่มี chunks ใหม่ แต่ไม่ได้สั่ง force_rebuild ก็ยังสามารถลองโหลด store เก่าได้
-        return build_or_load_vector_store(chunks=None, force_rebuild=force_rebuild)
+    # 1. ลบ chunks ของไฟล์ที่ไม่อยู่ในโฟลเดอร์แล้ว (ไฟล์ที่แค่ดาวน์โหลดไม่สำเร็จยังเก็บ chunks เดิมไว้)
+    remote_ids = {drive_file.id for drive_file in sync_result.files}
+    removed_files = [key for key in manifest.keys() if key not in remote_ids]
+    for file_id in removed_files:
+        delete_chunk_ids(vector_store, manifest.remove(file_id), batch_size, lexical_index, dedup_index)
+    if removed_files:
+        manifest.save()
 
-    print(f"\nTotal {len(all_chunks)} chunks obtained from {len(processed_files)} PDF(s): {', '.join(processed_files)}")
-    if all_chunks:
-            print(f"Sample metadata of first chunk: {all_chunks[0].metadata}")
+    # 2. index เฉพาะไฟล์ที่ยังไม่เคย index หรือเนื้อหาเปลี่ยน (เทียบ md5/modifiedTime จาก Drive)
+    jobs, pending_files = [], {}
+    ingested_at = int(time.time())
+    for drive_file in sync_result.files:
+        file_path = sync_result.local_paths.get(drive_file.id)
+        entry = manifest.get(drive_file.id)
+        if not file_path or (entry and entry.get("complete", True) and entry.get("content_hash") == drive_file.version):
+            continue
+        if entry is None:
+            # chunks ที่ index ไว้ก่อนมี manifest (ID สร้างจากเนื้อหา) ต้องลบก่อน ไม่งั้นจะซ้ำกับ chunks ชุดใหม่
+            legacy_ids = vector_store._collection.get(where={"gdrive_file_id": drive_file.id}, include=[])["ids"]
+            delete_chunk_ids(vector_store, legacy_ids, batch_size, lexical_index, dedup_index)
+        jobs.append(PdfJob(
+            source_key=drive_file.id,
+            file_path=file_path,
+            metadata={"source_gdrive_pdf": drive_file.name, "gdrive_file_id": drive_file.id,
+                      "file_hash": drive_file.version, "ingested_at": ingested_at},
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            chunk_length_unit=CHUNK_LENGTH_UNIT,
+        ))
+        stat = os.stat(file_path)
+        pending_files[drive_file.id] = PendingFile(file_path, stat.st_size, stat.st_mtime, drive_file.version)
 
-    # 2. สร้างหรือโหลด Vector Store โดยใช้ Chunks ที่ได้มา
-    vector_store = build_or_load_vector_store(chunks=all_chunks, force_rebuild=force_rebuild)
+    log.info(
+        f"{len(jobs)} new/modified Drive PDF(s) to index with {workers} worker(s), "
+        f"{len(sync_result.files) - len(jobs)} unchanged or unavailable, {len(removed_files)} removed file(s) purged.",
+        extra={"markup": True}
+    )
+    results = iter_parsed_pdfs(jobs, workers=workers)
+    stats = run_ingest_pipeline(vector_store, results, manifest=manifest, pending_files=pending_files,
+                                batch_size=batch_size, lexical_index=lexical_index, dedup_index=dedup_index)
+    lexical_index.close()
+    build_ann_index(vector_store)
+    if stats.files_indexed or removed_files or force_rebuild:
+        write_index_version(persist_dir)
+    _log_ingest_stats(stats, vector_store, dedup_index)
+    if dedup_index is not None:
+        dedup_index.close()
     return vector_store
 
-def process_local_pdfs_and_build_store(pdf_directory: str, force_rebuild: bool = False):
+def get_index_settings(chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> dict:
+    """ค่าตั้งค่าที่มีผลต่อ chunk/embedding ถ้าค่าใดเปลี่ยน ต้อง index ใหม่ทั้งหมด."""
+    settings = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunk_length_unit": CHUNK_LENGTH_UNIT,
+        "chunker": CHUNKER_VERSION,
+        "embedding_model": embedding_signature(),
+    }
+    # backend อื่นที่ไม่ใช่ Chroma อยู่คนละที่เก็บ: การสลับ backend ต้อง index ใหม่
+    # (ไม่ใส่ key นี้เมื่อใช้ Chroma เพื่อให้ manifest ของ index เดิมยังใช้ได้)
+    if VECTOR_STORE_BACKEND != "chroma":
+        settings["vector_store"] = VECTOR_STORE_BACKEND
+    # chunks ของแต่ละไฟล์ต้องอยู่ใน shard ตามการแบ่งปัจจุบัน: เปลี่ยนวิธี/จำนวน shard ต้อง index ใหม่
+    if SHARD_BY:
+        settings["sharding"] = {"by": SHARD_BY, "count": SHARD_COUNT if SHARD_BY == "hash" else None}
+    # near-duplicates ไม่ถูกเก็บใน vector store: เปิด/ปิดหรือเปลี่ยนเกณฑ์ต้อง index ใหม่
+    if DEDUP_ENABLED:
+        settings["dedup"] = {"threshold": DEDUP_CHUNK_THRESHOLD, "shingle_size": DEDUP_SHINGLE_SIZE,
+                             "num_perm": DEDUP_NUM_PERM, "bands": DEDUP_BANDS}
+    return settings
+
+
+def list_pdf_files(pdf_directory: str) -> List[str]:
+    """
+    path ของ PDF ทั้งหมดใน pdf_directory รวมโฟลเดอร์ย่อย (สัมพันธ์กับ pdf_directory, ใช้ / คั่น) เรียงตามชื่อ
+    ไฟล์ชั้นบนสุดได้ชื่อไฟล์เฉยๆ เหมือนเดิม ส่วนโฟลเดอร์ย่อยใช้แบ่ง shard เมื่อ SHARD_BY = "folder"
+    """
+    pdf_files = []
+    for root, dirs, files in os.walk(pdf_directory):
+        dirs.sort()
+        relative = os.path.relpath(root, pdf_directory)
+        for name in files:
+            if name.endswith(".pdf"):
+                path = name if relative == "." else os.path.join(relative, name)
+                pdf_files.append(path.replace(os.sep, "/"))
+    return sorted(pdf_files)
+
+
+def plan_local_files(pdf_directory: str, manifest: IndexManifest) -> Tuple[List[str], List[str]]:
+    """
+    (ไฟล์ใหม่/แก้ไขที่ต้อง index, ไฟล์ที่ถูกลบ) ของ pdf_directory เทียบกับ manifest ด้วยเกณฑ์เดียวกับ
+    process_local_pdfs_and_build_store แต่ไม่แก้ manifest (ใช้ใน --dry-run และ index_worker.py)
+    ไฟล์ที่ mtime เปลี่ยนแต่เนื้อหาเหมือนเดิมไม่นับว่าเปลี่ยน ถ้าค่าตั้งค่าเปลี่ยน ทุกไฟล์ต้อง index ใหม่
+    """
+    pdf_files = list_pdf_files(pdf_directory)
+    if manifest.settings_changed:
+        return pdf_files, []
+    present = set(pdf_files)
+    removed = [key for key in manifest.keys() if key not in present]
+    changed = []
+    for pdf_file in pdf_files:
+        file_path = os.path.join(pdf_directory, pdf_file)
+        stat = os.stat(file_path)
+        if manifest.is_unchanged(pdf_file, stat.st_size, stat.st_mtime):
+            continue
+        entry = manifest.get(pdf_file)
+        if entry and entry.get("complete", True) and entry.get("content_hash") == compute_file_hash(file_path):
+            continue
+        changed.append(pdf_file)
+    return changed, removed
+
+
+def plan_drive_files(sync_result, manifest: IndexManifest, require_local: bool = True) -> Tuple[List[str], List[str]]:
+    """
+    เหมือน plan_local_files แต่เทียบผล sync ของ Drive folder กับ manifest ของ Drive (คืนค่า file ID)
+    require_local=False นับรวมไฟล์ที่ยังไม่มีสำเนาในเครื่องด้วย (ผลของ DriveSync.plan ตอน --dry-run)
+    """
+    if manifest.settings_changed:
+        return [drive_file.id for drive_file in sync_result.files
+                if not require_local or drive_file.id in sync_result.local_paths], []
+    remote_ids = {drive_file.id for drive_file in sync_result.files}
+    removed = [key for key in manifest.keys() if key not in remote_ids]
+    changed = []
+    for drive_file in sync_result.files:
+        entry = manifest.get(drive_file.id)
+        if (require_local and drive_file.id not in sync_result.local_paths) or (
+                entry and entry.get("complete", True) and entry.get("content_hash") == drive_file.version):
+            continue
+        changed.append(drive_file.id)
+    return changed, removed
+
+
+def process_local_pdfs_and_build_store(pdf_directory: str, force_rebuild: bool = False,
+                                       workers: int = DEFAULT_INGEST_WORKERS,
+                                       batch_size: int = UPSERT_BATCH_SIZE,
+                                       persist_dir: str = CHROMA_PERSIST_DIR, embedding_model=None,
+                                       chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
     """
-    ประมวลผล PDF ทั้งหมดใน Directory ที่กำหนด และสร้าง/อัปเดต Vector Store.
+    ประมวลผล PDF ใน Directory ที่กำหนด และสร้าง/อัปเดต Vector Store ใน persist_dir แบบ incremental.
+    ใช้ manifest เพื่อข้ามไฟล์ที่ไม่เปลี่ยน, แทนที่ chunks ของไฟล์ที่ถูกแก้ไข และลบ chunks ของไฟล์ที่ถูกลบออก
+    workers คือจำนวน process ที่ใช้ load + chunk PDF พร้อมกัน (1 = ทำทีละไฟล์)
+    chunks ถูก embed + upsert ทีละ batch_size และ manifest ถูก checkpoint ระหว่างทาง จึงรันต่อได้ถ้าถูกขัดจังหวะ
     """
-    all_chunks = []
     if not os.path.exists(pdf_directory):
         log.error(f"PDF source directory not found at '[bold red]{pdf_directory}[/bold red]'", extra={"markup": True})
         return None
 
-    pdf_files = [f for f in os.listdir(pdf_directory) if f.endswith(".pdf")]
-    if not pdf_files:
-        log.warning(f"No PDF files found in '[yellow]{pdf_directory}[/yellow]'", extra={"markup": True})
-        return build_or_load_vector_store(chunks=None, force_rebuild=force_rebuild)
-
+    pdf_files = list_pdf_files(pdf_directory)
     log.info(f"Found {len(pdf_files)} PDF(s) in '[yellow]{pdf_directory}[/yellow]'", extra={"markup": True})
+
+    vector_store = open_vector_store(embedding_model, force_rebuild=force_rebuild, persist_dir=persist_dir)
+    lexical_index = open_lexical_index(vector_store, batch_size, persist_dir)
+    dedup_index = open_dedup_index(persist_dir)
+    manifest = IndexManifest.load(os.path.join(persist_dir, MANIFEST_FILE_NAME),
+                                  get_index_settings(chunk_size, chunk_overlap))
+
+    # ถ้าค่าตั้งค่า chunk/embedding เปลี่ยน chunks เดิมทั้งหมดใช้ไม่ได้แล้ว
+    if manifest.settings_changed:
+        delete_chunk_ids(vector_store, manifest.all_chunk_ids(), batch_size, lexical_index, dedup_index)
+        manifest.clear()
+        manifest.save()
+
+    # 1. ลบ chunks ของไฟล์ที่ไม่มีอยู่ใน directory แล้ว
+    present = set(pdf_files)
+    removed_files = [key for key in manifest.keys() if key not in present]
+    for source_key in removed_files:
+        old_ids = manifest.remove(source_key)
+        delete_chunk_ids(vector_store, old_ids, batch_size, lexical_index, dedup_index)
+        log.info(f"Purged {len(old_ids)} chunks of removed file: [red]{source_key}[/red]", extra={"markup": True})
+    if removed_files:
+        manifest.save()
+
+    # 2. หาไฟล์ใหม่หรือไฟล์ที่ถูกแก้ไข (ไฟล์ที่ไม่เปลี่ยนจะถูกข้าม)
+    skipped = 0
+    jobs, pending_files = [], {}
+    ingested_at = int(time.time()) # ใช้กรองตามวันที่ index (ดู retrieval_filters.py)
     for pdf_file in pdf_files:
         file_path = os.path.join(pdf_directory, pdf_file)
-        log.info(f"\n--- Processing: {file_path} ---", extra={"markup": True})
-        loaded_docs = load_pdf(file_path)
-        if loaded_docs:
-            # เพิ่ม metadata ชื่อไฟล์เข้าไปในแต่ละ document ก่อน chunk
-            for doc in loaded_docs:
-                doc.metadata["source_pdf"] = pdf_file # เก็บชื่อไฟล์ PDF
-            document_chunks = chunk_documents(loaded_docs)
-            all_chunks.extend(document_chunks)
-
-    if not all_chunks:
-        log.warning("No chunks were created from any PDF. Vector store not built.", extra={"markup": True})
-        return build_or_load_vector_store(chunks=None, force_rebuild=force_rebuild)
-
-    log.info(f"\nTotal chunks from all PDFs: {len(all_chunks)}", extra={"markup": True})
-    if all_chunks:
-         log.info(f"Sample metadata of first chunk: {all_chunks[0].metadata}", extra={"markup": True})
-
-    # สร้างหรือโหลด Vector Store โดยใช้ Chunks ที่ได้มา
-    log.info(f"Found {len(pdf_files)} PDF(s) in '[yellow]{pdf_directory}[/yellow]'", extra={"markup": True})
-    vector_store = build_or_load_vector_store(chunks=all_chunks, force_rebuild=force_rebuild)
+        stat = os.stat(file_path)
+        if manifest.is_unchanged(pdf_file, stat.st_size, stat.st_mtime):
+            skipped += 1
+            continue
+
+        content_hash = compute_file_hash(file_path)
+        entry = manifest.get(pdf_file)
+        if entry and entry.get("complete", True) and entry.get("content_hash") == content_hash:
+            # mtime เปลี่ยนแต่เนื้อหาเหมือนเดิม -> อัปเดตแค่ stat
+            manifest.update(pdf_file, file_path, stat.st_size, stat.st_mtime, content_hash, entry["chunk_ids"])
+            manifest.save()
+            skipped += 1
+            continue
+
+        # เพิ่ม metadata ชื่อไฟล์เข้าไปในแต่ละ document ก่อน chunk
+        jobs.append(PdfJob(
+            source_key=pdf_file,
+            file_path=file_path,
+            metadata={"source_pdf": pdf_file, "file_hash": content_hash, "ingested_at": ingested_at},
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            chunk_length_unit=CHUNK_LENGTH_UNIT,
+        ))
+        pending_files[pdf_file] = PendingFile(file_path, stat.st_size, stat.st_mtime, content_hash)
+
+    log.info(
+        f"{len(jobs)} new/modified PDF(s) to index with {workers} worker(s), {skipped} unchanged file(s) skipped, "
+        f"{len(removed_files)} removed file(s) purged.",
+        extra={"markup": True}
+    )
+
+    # 3. load + chunk แบบขนาน แล้ว embed + upsert แบบ streaming ทีละ batch
+    results = iter_parsed_pdfs(jobs, workers=workers)
+    stats = run_ingest_pipeline(vector_store, results, manifest=manifest, pending_files=pending_files,
+                                batch_size=batch_size, lexical_index=lexical_index, dedup_index=dedup_index)
+    lexical_index.close()
+    build_ann_index(vector_store)
+    if stats.files_indexed or removed_files or force_rebuild:
+        # แจ้งส่วนอื่น (เช่น answer cache ของ RAGSystem) ว่าเนื้อหาใน collection เปลี่ยนแล้ว
+        write_index_version(persist_dir)
+    _log_ingest_stats(stats, vector_store, dedup_index)
+    if dedup_index is not None:
+        dedup_index.close()
     return vector_store
 
-if __name__ == '__main__':
-    # --- ส่วนนี้สำหรับการทดสอบ ---
-    # คุณจะต้องหา Folder ID ของ Google Drive ที่ต้องการดึง PDF
-    # GOOGLE_DRIVE_FOLDER_ID = "YOUR_GOOGLE_DRIVE_FOLDER_ID_HERE" # <--- แก้ไขตรงนี้!!!
-
-    # if GOOGLE_DRIVE_FOLDER_ID == "YOUR_GOOGLE_DRIVE_FOLDER_ID_HERE":
-    #     print("Please update 'GOOGLE_DRIVE_FOLDER_ID' in src/vector_store_builder.py with your actual Google Drive Folder ID.")
-    # else:
-    #     print("--- Building Vector Store (Indexing) from Google Drive PDFs ---")
-        # force_rebuild=True ถ้าต้องการสร้างฐานข้อมูลใหม่ทั้งหมดจาก PDF ใน GDrive
-        # force_rebuild=False จะพยายามโหลด store เก่าก่อน ถ้ามี chunks ใหม่จาก GDrive ก็จะ add เข้าไป (ถ้า logic ใน build_or_load_vector_store รองรับ)
-    # vs = process_gdrive_pdfs_and_build_store(gdrive_folder_id=GOOGLE_DRIVE_FOLDER_ID, force_rebuild=False)
 
+@dataclass
+class BuildEstimate:
+    """ผลประมาณการของ --dry-run (คำนวณจาก PDF ตัวอย่างที่ parse และ chunks ตัวอย่างที่ embed จริง)."""
+    files: int
+    bytes: int
+    sampled_files: int
+    estimated_chunks: int
+    parse_seconds: float
+    embed_seconds: float
+    workers: int
+
+    @property
+    def total_seconds(self) -> float:
+        # workers > 1: parse ใน process อื่นขนานไปกับการ embed (ดู run_ingest_pipeline) เวลารวมจึงเท่ากับขั้นที่ช้ากว่า
+        if self.workers > 1:
+            return max(self.parse_seconds, self.embed_seconds)
+        return self.parse_seconds + self.embed_seconds
+
+
+def _pick_samples(file_paths: List[str], count: int) -> List[str]:
+    """เลือก count ไฟล์กระจายตามขนาด (เล็กสุด .. ใหญ่สุด) ให้ตัวอย่างเป็นตัวแทนของทั้งชุด."""
+    by_size = sorted(file_paths, key=os.path.getsize)
+    if count <= 0 or not by_size:
+        return []
+    if count >= len(by_size):
+        return by_size
+    if count == 1:
+        return [by_size[len(by_size) // 2]]
+    return [by_size[round(i * (len(by_size) - 1) / (count - 1))] for i in range(count)]
+
+
+def estimate_build(file_paths: List[str], workers: int = DEFAULT_INGEST_WORKERS, embedding_model=None,
+                   chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                   sample_files: int = DRY_RUN_SAMPLE_FILES,
+                   embed_sample_chunks: int = DRY_RUN_EMBED_SAMPLE_CHUNKS,
+                   remote_sizes: Optional[List[int]] = None) -> BuildEstimate:
+    """
+    ประมาณจำนวน chunks และเวลา build ของ file_paths โดยไม่แตะ vector store
+    parse + chunk ไฟล์ตัวอย่างจริง (ไม่ใช้ page cache) แล้วขยายผลตามขนาดไฟล์รวม และ embed chunks ตัวอย่างเพื่อวัดความเร็ว
+    (ไม่ใช้ embedding cache) จึงเป็นค่าประมาณแบบ cold: build จริงที่ cache มีข้อมูลอยู่แล้วหรือมี chunks ซ้ำจะเร็วกว่านี้
+    embedding_model=None จะไม่วัดเวลา embed (embed_seconds = 0)
+    remote_sizes = ขนาดของไฟล์ที่จะถูก index แต่ยังไม่มีในเครื่อง (Drive) นับรวมในผลประมาณแต่ไม่ถูกใช้เป็นตัวอย่าง
+    """
+    remote_sizes = remote_sizes or []
+    sizes = {path: os.path.getsize(path) for path in file_paths}
+    total_bytes = sum(sizes.values()) + sum(remote_sizes)
+    file_count = len(file_paths) + len(remote_sizes)
+    samples = _pick_samples(file_paths, sample_files)
+    sample_bytes, sample_chunks, parse_elapsed = 0, [], 0.0
+    for path in samples:
+        result = parse_and_chunk_pdf(PdfJob(source_key=path, file_path=path, chunk_size=chunk_size,
+                                            chunk_overlap=chunk_overlap, chunk_length_unit=CHUNK_LENGTH_UNIT))
+        if result.error:
+            log.warning(f"Sample {path} could not be parsed: {result.error}")
+            continue
+        sample_bytes += sizes[path]
+        sample_chunks.extend(result.chunks)
+        parse_elapsed += result.elapsed
+
+    estimated_chunks, parse_seconds, embed_seconds = 0, 0.0, 0.0
+    if sample_bytes:
+        estimated_chunks = round(len(sample_chunks) * total_bytes / sample_bytes)
+        parse_seconds = parse_elapsed * total_bytes / sample_bytes / max(1, min(workers, file_count))
+    texts = [chunk.page_content for chunk in sample_chunks[:embed_sample_chunks]]
+    if embedding_model is not None and texts:
+        start = time.perf_counter()
+        embedding_model.embed_documents(texts)
+        embed_seconds = (time.perf_counter() - start) / len(texts) * estimated_chunks
+    return BuildEstimate(files=file_count, bytes=total_bytes, sampled_files=len(samples),
+                         estimated_chunks=estimated_chunks, parse_seconds=parse_seconds,
+                         embed_seconds=embed_seconds, workers=workers)
+
+
+def manifest_path(args) -> str:
+    """manifest ของ index ที่ CLI จะสร้าง/อัปเดต (local และ Google Drive แยกกัน)."""
+    return os.path.join(CHROMA_PERSIST_DIR, GDRIVE_MANIFEST_FILE_NAME if args.gdrive_folder_id else MANIFEST_FILE_NAME)
+
+
+def resolve_chunk_settings(args) -> Optional[str]:
+    """
+    เติม --chunk-size/--chunk-overlap ที่ไม่ได้ระบุ ด้วยค่าที่ index ปัจจุบันถูกสร้างไว้ (บันทึกใน manifest)
+    ค่าที่เลือกตอน build จึงเป็นค่าเริ่มต้นของ poe index ครั้งถัดไป (ไม่ index ใหม่ทั้งหมดโดยไม่ตั้งใจ)
+    --force-rebuild เริ่มจากค่าใน utils/constant.py และการระบุค่าที่ต่างจาก index ปัจจุบันต้องใช้คู่กับ --force-rebuild
+    (หรือ --dry-run เพื่อดูผลประมาณ) คืนค่าข้อความ error หรือ None
+    """
+    recorded = {} if args.force_rebuild else read_manifest_settings(manifest_path(args)) or {}
+    defaults = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+    changed = []
+    for key, default in defaults.items():
+        value = getattr(args, key)
+        if value is None:
+            setattr(args, key, recorded.get(key, default))
+        elif key in recorded and recorded[key] != value:
+            changed.append(f"--{key.replace('_', '-')} {value} (index uses {recorded[key]})")
+    if recorded and (args.chunk_size, args.chunk_overlap) != (CHUNK_SIZE, CHUNK_OVERLAP) and not changed:
+        log.info(f"Using the chunk settings of the existing index: chunk size {args.chunk_size}, "
+                 f"overlap {args.chunk_overlap} (run with --force-rebuild to use the defaults)")
+    if changed and not args.dry_run:
+        return (f"{', '.join(changed)} would re-index every file. "
+                "Add --force-rebuild to rebuild with the new settings, or --dry-run to estimate it first.")
+    if not 0 <= args.chunk_overlap < args.chunk_size:
+        return f"chunk overlap {args.chunk_overlap} must be between 0 and chunk size - 1 ({args.chunk_size})"
+    return None
+
+
+def plan_build(args, embedding_model=None) -> Optional[BuildEstimate]:
+    """--dry-run: แสดงไฟล์ที่จะถูก index/ลบ และประมาณจำนวน chunks กับเวลา build ด้วยค่าตั้งค่าที่ส่งมา."""
+    settings = get_index_settings(args.chunk_size, args.chunk_overlap)
+    remote_sizes = []
+    if args.gdrive_folder_id:
+        manifest = IndexManifest.load(manifest_path(args), settings)
+        # ลิสต์อย่างเดียว ไม่ดาวน์โหลด: ใช้ไฟล์ที่อยู่ใน download cache แล้วเป็นตัวอย่าง ส่วนไฟล์อื่นนับจากขนาดใน Drive
+        sync_result = DriveSync(authenticate_google_drive, args.gdrive_folder_id,
+                                workers=args.download_workers).plan()
+        total = len(sync_result.files)
+        if args.force_rebuild:
+            changed, removed = [f.id for f in sync_result.files], []
+        else:
+            changed, removed = plan_drive_files(sync_result, manifest, require_local=False)
+        sizes = {f.id: f.size for f in sync_result.files}
+        file_paths = [sync_result.local_paths[file_id] for file_id in changed if file_id in sync_result.local_paths]
+        remote_sizes = [sizes[file_id] for file_id in changed if file_id not in sync_result.local_paths]
+    else:
+        if not os.path.isdir(args.pdf_dir):
+            log.error(f"PDF source directory not found at '[bold red]{args.pdf_dir}[/bold red]'", extra={"markup": True})
+            return None
+        manifest = IndexManifest.load(manifest_path(args), settings)
+        total = len(list_pdf_files(args.pdf_dir))
+        changed, removed = (list_pdf_files(args.pdf_dir), []) if args.force_rebuild else plan_local_files(
+            args.pdf_dir, manifest)
+        file_paths = [os.path.join(args.pdf_dir, pdf_file) for pdf_file in changed]
+
+    reason = "force rebuild" if args.force_rebuild else "index settings changed" if manifest.settings_changed else None
+    log.info(f"Dry run: {len(changed)} of {total} PDF(s) would be indexed"
+             + (f" ({reason})" if reason else "") + f", {len(removed)} removed file(s) purged.",
+             extra={"markup": True})
+    if remote_sizes:
+        log.info(f"{len(remote_sizes)} of them are not in the Drive download cache yet "
+                 f"({sum(remote_sizes) / 1e6:.1f} MB to download); only cached files are sampled.")
+    estimate = estimate_build(file_paths, workers=args.workers, embedding_model=embedding_model,
+                              chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                              sample_files=args.sample_files, remote_sizes=remote_sizes)
+    log.info(
+        f"Estimated [bold]{estimate.estimated_chunks}[/bold] chunks from {estimate.bytes / 1e6:.1f} MB "
+        f"(sampled {estimate.sampled_files} file(s)); parse ~{estimate.parse_seconds:.0f}s with {args.workers} "
+        f"worker(s), embed ~{estimate.embed_seconds:.0f}s, total ~[bold]{estimate.total_seconds:.0f}s[/bold] "
+        f"(cold caches, excluding downloads).",
+        extra={"markup": True}
+    )
+    return estimate
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=f"Build or incrementally update the vector store in {CHROMA_PERSIST_DIR} from PDFs. "
+                    "Chunk size/overlap are recorded in the index manifest and reused by later runs; "
+                    "changing them requires --force-rebuild.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--pdf-dir", default=PDF_SOURCE_DIR, help="local PDF folder (default: src/temp)")
+    source.add_argument("--gdrive-folder-id", help="index a Google Drive folder instead of a local folder")
+    parser.add_argument("--force-rebuild", action="store_true",
+                        help="delete the existing index and build it from scratch")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only report the files to index and estimate chunk count and build time")
+    parser.add_argument("--workers", type=_positive_int, default=DEFAULT_INGEST_WORKERS,
+                        help="PDF parse/chunk processes")
+    parser.add_argument("--embedding-batch-size", type=_positive_int, default=EMBEDDING_BATCH_SIZE,
+                        help="texts per embedding model forward pass")
+    parser.add_argument("--upsert-batch-size", type=_positive_int, default=UPSERT_BATCH_SIZE,
+                        help="chunks per embed + upsert batch (also the manifest checkpoint interval)")
+    parser.add_argument("--chunk-size", type=_positive_int,
+                        help=f"chunk length in {CHUNK_LENGTH_UNIT} (default: the existing index's, else {CHUNK_SIZE})")
+    parser.add_argument("--chunk-overlap", type=int,
+                        help=f"overlap in {CHUNK_LENGTH_UNIT} (default: the existing index's, else {CHUNK_OVERLAP})")
+    parser.add_argument("--download-workers", type=_positive_int, default=DRIVE_DOWNLOAD_WORKERS,
+                        help="parallel Google Drive downloads")
+    parser.add_argument("--sample-files", type=int, default=DRY_RUN_SAMPLE_FILES,
+                        help="PDFs parsed for the --dry-run estimate")
+    args = parser.parse_args(argv)
+    if args.chunk_overlap is not None and not 0 <= args.chunk_overlap < (args.chunk_size or CHUNK_SIZE):
+        parser.error(f"--chunk-overlap must be between 0 and --chunk-size - 1, got {args.chunk_overlap}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI ของ poe index / poe reindex / poe index-plan คืนค่า exit code (0 = สำเร็จ)."""
+    args = parse_args(argv)
     # *** เรียกใช้การตั้งค่า logger เป็นอันดับแรก ***
     setup_logger()
 
+    if read_active_version():
+        # app อ่าน index จาก version ที่ active (ดู index_versions.py) ไม่ใช่ CHROMA_PERSIST_DIR
+        log.warning("An index version managed by the index worker is active; the app will not see this build. "
+                    "Use `poe index-worker --once` (add --force-rebuild to start from scratch) instead.")
+    error = resolve_chunk_settings(args)
+    if error:
+        log.error(error)
+        return 2
+
+    if args.dry_run:
+        # ไม่ใช้ embedding cache: วัดความเร็ว embed จริง ไม่ใช่ความเร็ว cache hit
+        embedding_model = get_embedding_model(batch_size=args.embedding_batch_size, use_cache=False)
+        return 0 if plan_build(args, embedding_model) is not None else 1
+
     log.info("--- [bold]Starting Vector Store Build Process[/bold] ---", extra={"markup": True})
+    embedding_model = get_embedding_model(batch_size=args.embedding_batch_size)
+    options = dict(force_rebuild=args.force_rebuild, workers=args.workers, batch_size=args.upsert_batch_size,
+                   embedding_model=embedding_model, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    if args.gdrive_folder_id:
+        vs = process_gdrive_pdfs_and_build_store(args.gdrive_folder_id, download_workers=args.download_workers,
+                                                 **options)
+    else:
+        vs = process_local_pdfs_and_build_store(args.pdf_dir, **options)
+    if vs is None:
+        log.error("Vector store could not be built or loaded.")
+        return 1
 
-    if not os.path.exists(PDF_SOURCE_DIR):
-         log.error(f"Directory not found: {PDF_SOURCE_DIR}")
-         log.warning("Please create a 'temp' folder inside your 'src' directory and add PDF files to it.")
+    log.info("[bold green]Vector Store Ready![/bold green]", extra={"markup": True})
+    # ทดสอบ similarity search (ใช้ log.debug() เพื่อแสดงข้อมูลที่ไม่ต้องการให้เห็นในโหมดปกติ)
+    sample_query = "What is Retrieval Augmented Generation?"
+    log.debug(f"Testing similarity search with query: '{sample_query}'")
+    results = vs.similarity_search(sample_query, k=2)
+    if results:
+        log.info("Top 2 similar chunks found:")
+        log.info(results[0])
     else:
-        vs = process_local_pdfs_and_build_store(pdf_directory=PDF_SOURCE_DIR, force_rebuild=False)
-
-        if vs:
-            log.info("[bold green]Vector Store Ready![/bold green]", extra={"markup": True})
-            # ... (ส่วนทดสอบ similarity search)
-            # สามารถใช้ log.debug() เพื่อแสดงข้อมูลที่ไม่ต้องการให้เห็นในโหมดปกติ
-            sample_query = "What is Retrieval Augmented Generation?"
-            log.debug(f"Testing similarity search with query: '{sample_query}'")
-            results = vs.similarity_search(sample_query, k=2)
-            if results:
-                # Rich สามารถแสดงผล list/dict สวยๆ ได้เลย
-                log.info("Top 2 similar chunks found:")
-                # แสดงผล result ที่ 1 แบบสวยๆ
-                log.info(results[0])
-            else:
-                 log.warning("No similar chunks found for the sample query.")
-        else:
-            log.error("Vector store could not be built or loaded.")
\ No newline at end of file
+        log.warning("No similar chunks found for the sample query.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,91 +1,245 @@
-import pandas as pd
-import plotly.express as px
-from sklearn.manifold import TSNE
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+import os
+import json
+import time
+import hashlib
+import argparse
+from typing import List, Optional, Tuple
+
 import numpy as np
 
-# --- ค่าคงที่ (ต้องตรงกับไฟล์ vector_store_builder.py) ---
-CHROMA_PERSIST_DIR = "chroma_db"
-CHROMA_COLLECTION_NAME = "pdf_collection"
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+import resources
+from index_manifest import read_index_version
+from index_versions import active_index_dir
+from retrieval_filters import source_name
+from utils.constant import (
+    VISUALIZE_MAX_POINTS, VISUALIZE_MIN_PER_SOURCE, VISUALIZE_METHOD, VISUALIZE_PCA_DIMS,
+    VISUALIZE_PAGE_SIZE, VISUALIZE_CACHE_DIR, VISUALIZE_OUTPUT_PATH,
+)
+
+METHODS = ("tsne", "umap", "pca")
+HOVER_CHARS = 200 # ความยาวข้อความที่แสดงตอนเอาเมาส์ไปชี้
+
+# pandas / plotly / scikit-learn / openTSNE / umap ถูก import เฉพาะในฟังก์ชันที่ใช้ (โหลดช้า และ openTSNE / umap เป็น optional)
 
-def visualize_vector_db():
+
+def scan_sources(collection, page_size: int = VISUALIZE_PAGE_SIZE) -> Tuple[List[str], np.ndarray, List[str]]:
     """
-    ดึงข้อมูลจาก ChromaDB, ลดมิติด้วย t-SNE, และสร้าง interactive plot ด้วย Plotly
+    pass แรก: ดึงเฉพาะ IDs + metadata ทีละหน้า (ไม่ดึง embeddings และข้อความ)
+    คืนค่า (chunk IDs, รหัสไฟล์ต้นทางของแต่ละแถว, ชื่อไฟล์ตามรหัส)
     """
-    print("Connecting to the vector store...")
-    # 1. โหลด Embedding model และเชื่อมต่อ ChromaDB
-    embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-    vector_store = Chroma(
-        persist_directory=CHROMA_PERSIST_DIR,
-        embedding_function=embedding_model,
-        collection_name=CHROMA_COLLECTION_NAME
-    )
+    ids, codes, names = [], [], {}
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids.extend(page["ids"])
+        codes.extend(names.setdefault(source_name(metadata or {}) or "N/A", len(names))
+                     for metadata in page["metadatas"])
+    return ids, np.asarray(codes, dtype=np.int32), list(names)
+
+
+def stratified_sample(strata: np.ndarray, max_points: int, min_per_stratum: int = VISUALIZE_MIN_PER_SOURCE,
+                      seed: int = 42) -> np.ndarray:
+    """
+    สุ่มแถว (indices เรียงจากน้อยไปมาก) ไม่เกิน max_points แบบ stratified ตามไฟล์ต้นทาง:
+    แต่ละไฟล์ได้จำนวนตามสัดส่วนขนาด แต่ไม่น้อยกว่า min_per_stratum (หรือทั้งไฟล์ถ้ามีน้อยกว่า)
+    ไฟล์เล็กๆ จึงยังเห็นบนกราฟ แม้ไฟล์ใหญ่ไม่กี่ไฟล์จะมี chunks เกือบทั้งหมด
+    """
+    if len(strata) <= max_points:
+        return np.arange(len(strata))
+    rng = np.random.default_rng(seed)
+    _, inverse, counts = np.unique(strata, return_inverse=True, return_counts=True)
+    floor = np.minimum(counts, min(min_per_stratum, max(1, max_points // len(counts))))
+    extra = counts - floor
+    quota = floor + np.floor(extra * max(max_points - floor.sum(), 0) / max(extra.sum(), 1)).astype(int)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    selected = [rng.choice(order[bounds[i]:bounds[i + 1]], size=quota[i], replace=False) for i in range(len(counts))]
+    return np.sort(np.concatenate(selected))
+
+
+def fetch_rows(collection, ids: List[str], include: List[str],
+               batch_size: int = VISUALIZE_PAGE_SIZE) -> Tuple[List[str], dict]:
+    """ดึงแถวตาม IDs ทีละ batch คืนค่า (IDs ที่ยังมีอยู่ เรียงตาม ids, {ชื่อ field: list})."""
+    found, rows = [], {key: [] for key in include}
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        page = collection.get(ids=batch, include=include)
+        position = {chunk_id: i for i, chunk_id in enumerate(page["ids"])} # get ตาม IDs ไม่รับประกันลำดับ
+        for chunk_id in batch:
+            if chunk_id in position:
+                found.append(chunk_id)
+                for key in include:
+                    rows[key].append(page[key][position[chunk_id]])
+    return found, rows
+
+
+def pca(embeddings: np.ndarray, components: int) -> np.ndarray:
+    """PCA ด้วย eigenvectors ของ covariance (dim x dim) ซึ่งเร็วกว่า SVD ของทั้ง matrix เมื่อจำนวนแถว >> dim."""
+    centered = embeddings - embeddings.mean(axis=0)
+    components = min(components, centered.shape[1])
+    _, eigenvectors = np.linalg.eigh(centered.T.astype(np.float64) @ centered)
+    return (centered @ eigenvectors[:, ::-1][:, :components]).astype(np.float32)
+
+
+def reduce_to_2d(embeddings: np.ndarray, method: str = VISUALIZE_METHOD, pca_dims: int = VISUALIZE_PCA_DIMS,
+                 seed: int = 42) -> np.ndarray:
+    """
+    ลดมิติเหลือ 2 มิติ: PCA เหลือ pca_dims ก่อน (ลดเวลาหา neighbors) แล้วตามด้วย
+    - "tsne": openTSNE (FFT-accelerated) ถ้าติดตั้งไว้ ไม่งั้น Barnes-Hut t-SNE ของ scikit-learn
+    - "umap": umap-learn (ต้องติดตั้งเพิ่ม)
+    - "pca": 2 principal components แรก (เร็วที่สุด แต่แยกกลุ่มได้น้อยกว่า)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown projection method: {method} (expected one of {', '.join(METHODS)})")
+    if method == "pca" or len(embeddings) < 4:
+        coords = pca(embeddings, 2)
+        return np.pad(coords, ((0, 0), (0, 2 - coords.shape[1])))
+    reduced = pca(embeddings, pca_dims)
+    if method == "umap":
+        try:
+            import umap
+        except ImportError as e:
+            raise ImportError("method 'umap' requires the umap-learn package") from e
+        return umap.UMAP(n_components=2, random_state=seed).fit_transform(reduced)
+
+    perplexity = min(30, len(reduced) - 1)
+    try:
+        from openTSNE import TSNE
+        return np.asarray(TSNE(perplexity=perplexity, n_jobs=-1, random_state=seed).fit(reduced))
+    except ImportError:
+        from sklearn.manifold import TSNE
+        return TSNE(n_components=2, perplexity=perplexity, method="barnes_hut", init="pca", n_jobs=-1,
+                    random_state=seed).fit_transform(reduced)
+
+
+def coordinates_cache_path(cache_dir: str, index_version: Optional[str], count: int, settings: dict) -> str:
+    """ไฟล์ cache ของพิกัด ขึ้นกับ index version (เปลี่ยนทุกครั้งที่ index) จำนวน chunks และค่าตั้งค่าการลดมิติ."""
+    raw = json.dumps({"index_version": index_version, "count": count, **settings}, sort_keys=True)
+    return os.path.join(cache_dir, f"coords_{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]}.npz")
+
+
+def compute_projection(collection, index_version: Optional[str], method: str = VISUALIZE_METHOD,
+                       max_points: int = VISUALIZE_MAX_POINTS, min_per_source: int = VISUALIZE_MIN_PER_SOURCE,
+                       pca_dims: int = VISUALIZE_PCA_DIMS, page_size: int = VISUALIZE_PAGE_SIZE, seed: int = 42,
+                       cache_dir: Optional[str] = VISUALIZE_CACHE_DIR) -> Tuple[List[str], np.ndarray, List[str], list]:
+    """
+    คืนค่า (chunk IDs, พิกัด 2D, documents, metadatas) ของจุดที่สุ่มมาไม่เกิน max_points
+    ถ้ามี cache ของ index version นี้แล้ว จะดึงแค่ข้อความ/metadata ของจุดเดิม (ไม่ต้องดึง embeddings และลดมิติใหม่)
+    cache_dir=None = ไม่ใช้ cache
+    """
+    settings = {"method": method, "max_points": max_points, "min_per_source": min_per_source, "pca_dims": pca_dims,
+                "seed": seed}
+    path = coordinates_cache_path(cache_dir, index_version, collection.count(), settings) if cache_dir else None
+    if path and os.path.exists(path):
+        with np.load(path) as cached:
+            ids, coords = cached["ids"].tolist(), cached["coords"]
+        print(f"Loaded {len(ids)} cached coordinates from {path}")
+        found, rows = fetch_rows(collection, ids, ["documents", "metadatas"], page_size)
+        position = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        return found, coords[[position[chunk_id] for chunk_id in found]], rows["documents"], rows["metadatas"]
+
+    start = time.perf_counter()
+    all_ids, strata, sources = scan_sources(collection, page_size)
+    sample = stratified_sample(strata, max_points, min_per_source, seed)
+    print(f"Scanned {len(all_ids)} chunks from {len(sources)} source(s) in {time.perf_counter() - start:.1f}s, "
+          f"sampled {len(sample)} points.")
+
+    start = time.perf_counter()
+    ids, rows = fetch_rows(collection, [all_ids[i] for i in sample], ["embeddings", "documents", "metadatas"],
+                           page_size)
+    embeddings = np.asarray(rows["embeddings"], dtype=np.float32)
+    print(f"Fetched {len(ids)} embeddings in {time.perf_counter() - start:.1f}s.")
+
+    start = time.perf_counter()
+    coords = reduce_to_2d(embeddings, method, pca_dims, seed)
+    print(f"Reduced {embeddings.shape[1]} -> 2 dimensions with {method} in {time.perf_counter() - start:.1f}s.")
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = path[:-len(".npz")] + ".tmp.npz"
+        np.savez(temp_path, ids=np.asarray(ids), coords=coords)
+        os.replace(temp_path, path)
+    return ids, coords, rows["documents"], rows["metadatas"]
+
+
+def write_output(ids: List[str], coords: np.ndarray, documents: List[str], metadatas: list, output_path: str,
+                 method: str = VISUALIZE_METHOD, show: bool = False):
+    """
+    เขียนผลลัพธ์ตามนามสกุลไฟล์: .html (Plotly scatter แบบ WebGL เปิดได้โดยไม่ต้องรัน Python), .parquet
+    (ต้องมี pyarrow หรือ fastparquet) หรือ .csv ถ้า show จะเปิดกราฟใน browser ด้วย (เฉพาะ .html)
+    """
+    import pandas as pd
 
-    print("Retrieving all data from the collection...")
-    # 2. ดึงข้อมูลทั้งหมด (embeddings, documents, metadatas) จาก collection
-    # นี่อาจใช้เวลาสักครู่ถ้ามีข้อมูลเยอะมาก
-    data = vector_store.get(include=["embeddings", "documents", "metadatas"])
-    
-    # ตรวจสอบว่ามีข้อมูลหรือไม่
-    if not data or not data.get('ids'):
-        print("No data found in the vector store collection.")
-        return
-
-    embeddings = np.array(data['embeddings'])
-    documents = data['documents']
-    metadatas = data['metadatas']
-    
-    print(f"Retrieved {len(documents)} data points.")
-    print("Performing t-SNE dimensionality reduction (this might take a while)...")
-    
-    # 3. ลดมิติข้อมูลจาก N มิติ เหลือ 2 มิติด้วย t-SNE
-    # perplexity ควรน้อยกว่าจำนวน sample (ปรับค่าได้)
-    n_samples = len(documents)
-    perplexity_value = min(30, n_samples - 1)
-
-    if n_samples <= 1:
-        print("Not enough data points to visualize.")
-        return
-        
-    tsne = TSNE(n_components=2, perplexity=perplexity_value, random_state=42, max_iter=300)
-    embeddings_2d = tsne.fit_transform(embeddings)
-
-    print("Data reduction complete. Preparing data for plotting...")
-    # 4. สร้าง DataFrame ด้วย Pandas เพื่อจัดการข้อมูล
     df = pd.DataFrame({
-        'x': embeddings_2d[:, 0],
-        'y': embeddings_2d[:, 1],
-        'document': documents,
-        'source': [meta.get('source_pdf', 'N/A') for meta in metadatas]
+        "chunk_id": ids,
+        "x": coords[:, 0],
+        "y": coords[:, 1],
+        "source": [source_name(meta or {}) or "N/A" for meta in metadatas],
+        "page": [(meta or {}).get("page") for meta in metadatas],
+        "document": documents,
     })
-    
-    # ตัดข้อความ document ให้สั้นลงเพื่อแสดงผลบน hover
-    df['hover_text'] = df['document'].apply(lambda x: x[:200] + "..." if len(x) > 200 else x)
-
-    print("Generating interactive plot with Plotly...")
-    # 5. สร้าง interactive scatter plot ด้วย Plotly
-    fig = px.scatter(
-        df,
-        x='x',
-        y='y',
-        color='source',  # แยกสีตามไฟล์ PDF ต้นฉบับ
-        hover_name='hover_text', # ข้อความที่จะแสดงเมื่อเอาเมาส์ไปชี้
-        title="2D Visualization of PDF Document Chunks (t-SNE)",
-        labels={'color': 'Source PDF'}
-    )
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension == ".parquet":
+        df.to_parquet(output_path, index=False)
+    elif extension == ".csv":
+        df.to_csv(output_path, index=False)
+    elif extension == ".html":
+        import plotly.express as px
+
+        # ตัดข้อความ document ให้สั้นลงเพื่อแสดงผลบน hover
+        df["hover_text"] = df["document"].str.slice(0, HOVER_CHARS)
+        fig = px.scatter(
+            df.drop(columns=["document"]),
+            x="x",
+            y="y",
+            color="source", # แยกสีตามไฟล์ PDF ต้นฉบับ
+            hover_name="hover_text",
+            hover_data={"page": True, "x": False, "y": False},
+            render_mode="webgl", # วาดหลายหมื่นจุดได้โดยไม่หน่วง browser
+            title=f"2D Visualization of PDF Document Chunks ({method}, {len(df)} points)",
+        )
+        fig.update_traces(marker=dict(size=4, opacity=0.7))
+        fig.update_layout(xaxis_title=f"{method} 1", yaxis_title=f"{method} 2", legend_title="Source PDF")
+        fig.write_html(output_path, include_plotlyjs="cdn")
+        if show:
+            fig.show()
+    else:
+        raise ValueError(f"Unsupported output format: {output_path} (use .html, .parquet or .csv)")
+
 
-    fig.update_traces(marker=dict(size=8, opacity=0.8))
-    fig.update_layout(
-        xaxis_title="t-SNE Component 1",
-        yaxis_title="t-SNE Component 2",
-        legend_title="Source PDF"
+def visualize_vector_db(output_path: str = VISUALIZE_OUTPUT_PATH, method: str = VISUALIZE_METHOD,
+                        max_points: int = VISUALIZE_MAX_POINTS, use_cache: bool = True, show: bool = False,
+                        page_size: int = VISUALIZE_PAGE_SIZE, seed: int = 42) -> Optional[str]:
+    """
+    ดึงข้อมูลจาก vector store ทีละหน้า, สุ่มแบบ stratified ตามไฟล์, ลดมิติ (PCA -> t-SNE/UMAP) แล้วเขียนไฟล์ผลลัพธ์
+    collection ขนาดหลักล้าน chunks ใช้เวลาระดับนาที เพราะดึง embeddings และลดมิติเฉพาะจุดที่สุ่มมา
+    คืนค่า path ของไฟล์ผลลัพธ์ (None ถ้าไม่มีข้อมูล)
+    """
+    persist_dir = active_index_dir()
+    print(f"Connecting to the vector store in {persist_dir}...")
+    # ไม่ต้องโหลด embedding model เพราะใช้ embeddings ที่เก็บไว้แล้ว
+    collection = resources.create_vector_store(embedding_model=None, persist_directory=persist_dir)._collection
+    if collection.count() == 0:
+        print("No data found in the vector store collection.")
+        return None
+
+    ids, coords, documents, metadatas = compute_projection(
+        collection, read_index_version(persist_dir), method=method, max_points=max_points,
+        page_size=page_size, seed=seed, cache_dir=VISUALIZE_CACHE_DIR if use_cache else None,
     )
-    
-    # 6. แสดงผลกราฟ
-    fig.show()
-    print("Plot generated. Your browser should open with the interactive visualization.")
+    write_output(ids, coords, documents, metadatas, output_path, method=method, show=show)
+    print(f"Visualization of {len(ids)} points written to {output_path}")
+    return output_path
+
 
 if __name__ == "__main__":
-    visualize_vector_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Project the vector store to 2D and write an HTML/Parquet/CSV map")
+    parser.add_argument("--output", default=VISUALIZE_OUTPUT_PATH, help="output file (.html, .parquet or .csv)")
+    parser.add_argument("--method", choices=METHODS, default=VISUALIZE_METHOD)
+    parser.add_argument("--max-points", type=int, default=VISUALIZE_MAX_POINTS)
+    parser.add_argument("--page-size", type=int, default=VISUALIZE_PAGE_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-cache", action="store_true", help="recompute coordinates even if cached")
+    parser.add_argument("--show", action="store_true", help="also open the HTML plot in a browser")
+    args = parser.parse_args()
+    visualize_vector_db(args.output, args.method, args.max_points, use_cache=not args.no_cache, show=args.show,
+                        page_size=args.page_size, seed=args.seed)
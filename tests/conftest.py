@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# โค้ดใน src/ import กันเองแบบ `from pdf_processing import ...` (รันจากในโฟลเดอร์ src)
+# จึงต้องเพิ่ม src เข้าไปใน sys.path เพื่อให้ test import module เหล่านั้นได้
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+class FakeEmbeddings:
+    """embedding = ความถี่ของตัวอักษร a-h (8 มิติ) ใช้ทดสอบโดยไม่ต้องโหลด model และจดข้อความที่ถูก embed."""
+
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(text.count(letter)) for letter in "abcdefgh"]
+
+
+@pytest.fixture
+def fake_embeddings():
+    return FakeEmbeddings()
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+from src.answer_cache import AnswerCache, normalize_query
+
+SOURCES = [{"page_content": "RAG combines retrieval and generation.", "metadata": {"source_pdf": "rag.pdf", "page": 0}}]
+
+
+def test_normalize_query():
+    """Test Case 1.1: คำถามเดียวกันที่พิมพ์ต่างกันเล็กน้อยต้อง normalize ได้เหมือนกัน."""
+    assert normalize_query("  What is RAG? ") == normalize_query("what is   rag")
+
+
+def test_exact_match_hit_and_persistence(tmp_path):
+    """Test Case 2.1: คำถามซ้ำต้องได้คำตอบจาก cache แม้จะสร้าง instance ใหม่ (หลัง restart)."""
+    path = str(tmp_path / "answers.sqlite")
+    AnswerCache(path).put("What is RAG?", "Retrieval Augmented Generation", SOURCES, index_version="v1")
+
+    cache = AnswerCache(path)
+    hit = cache.get("what is rag", index_version="v1")
+    assert hit["result"] == "Retrieval Augmented Generation"
+    assert hit["source_documents"] == SOURCES
+    assert hit["cached"] is True
+    assert cache.get("Something else?", index_version="v1") is None
+
+
+def test_index_version_change_invalidates(tmp_path):
+    """Test Case 2.2: เมื่อ builder index ข้อมูลใหม่ (version เปลี่ยน) คำตอบเดิมต้องใช้ไม่ได้."""
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"))
+    cache.put("What is RAG?", "old answer", SOURCES, index_version="v1")
+    assert cache.get("What is RAG?", index_version="v2") is None
+    assert cache.get("What is RAG?", index_version="v1") is None
+
+
+def test_ttl_expiry(tmp_path):
+    """Test Case 2.3: คำตอบที่เก่ากว่า TTL ต้องหมดอายุ."""
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"), ttl_seconds=60)
+    with patch("src.answer_cache.time.time", return_value=1000.0):
+        cache.put("What is RAG?", "answer", SOURCES)
+    with patch("src.answer_cache.time.time", return_value=1030.0):
+        assert cache.get("What is RAG?") is not None
+    with patch("src.answer_cache.time.time", return_value=1100.0):
+        assert cache.get("What is RAG?") is None
+
+
+def test_lru_eviction(tmp_path):
+    """Test Case 2.4: เกิน max_entries ต้องลบรายการที่ไม่ได้ใช้นานที่สุด."""
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"), ttl_seconds=None, max_entries=2)
+    with patch("src.answer_cache.time.time", return_value=1.0):
+        cache.put("q1", "a1", [])
+    with patch("src.answer_cache.time.time", return_value=2.0):
+        cache.put("q2", "a2", [])
+    with patch("src.answer_cache.time.time", return_value=3.0):
+        cache.get("q1") # q1 ถูกใช้ล่าสุด
+    with patch("src.answer_cache.time.time", return_value=4.0):
+        cache.put("q3", "a3", [])
+    assert cache.get("q2") is None
+    assert cache.get("q1")["result"] == "a1"
+    assert cache.get("q3")["result"] == "a3"
+
+
+def test_semantic_match(tmp_path):
+    """Test Case 3.1: คำถามที่ embedding คล้ายกันเกิน threshold ต้องได้คำตอบจาก cache."""
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"), similarity_threshold=0.95)
+    cache.put("What is RAG?", "answer", SOURCES, query_embedding=[1.0, 0.0, 0.0])
+    assert cache.get("Explain RAG", query_embedding=[0.99, 0.05, 0.0])["result"] == "answer"
+    assert cache.get("Unrelated question", query_embedding=[0.0, 1.0, 0.0]) is None
+
+
+def test_semantic_matrix_is_updated_in_place(tmp_path):
+    """
+    Test Case 3.2: put ต้องอัปเดต matrix เฉพาะแถวที่เปลี่ยน (ไม่อ่าน embeddings ทั้งหมดจาก SQLite ใหม่)
+    และหลังแทนที่/ลบตาม LRU matrix ต้องตรงกับที่โหลดใหม่จาก SQLite
+    """
+    path = str(tmp_path / "answers.sqlite")
+    cache = AnswerCache(path, ttl_seconds=None, max_entries=3, similarity_threshold=0.95)
+    embeddings = {f"q{i}": [float(i), 1.0, float(i % 3)] for i in range(6)}
+    with patch.object(AnswerCache, "_load_semantic_matrix", side_effect=AssertionError("full reload")):
+        for i, (query, embedding) in enumerate(embeddings.items()):
+            with patch("src.answer_cache.time.time", return_value=float(i)):
+                cache.put(query, f"answer {query}", [], query_embedding=embedding)
+        with patch("src.answer_cache.time.time", return_value=10.0):
+            cache.put("q4", "new answer", [], query_embedding=[9.0, 9.0, 9.0]) # แทนที่แถวเดิม
+            cache.put("q5", "no embedding", []) # คำตอบใหม่ไม่มี embedding ต้องไม่เหลือใน matrix
+
+    def rows(answer_cache):
+        matrix = answer_cache._semantic_matrix[:len(answer_cache._semantic_keys)]
+        return {key: matrix[i].tolist() for i, key in enumerate(answer_cache._semantic_keys)}
+
+    assert rows(cache) == rows(AnswerCache(path, similarity_threshold=0.95))
+    assert len(rows(cache)) == 2 and [9.0, 9.0, 9.0] in rows(cache).values()
+    assert cache.get("Explain q3", query_embedding=[3.0, 1.0, 0.0])["result"] == "answer q3"
@@ -0,0 +1,149 @@
+import json
+import asyncio
+import pytest
+import httpx
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from langchain.schema.document import Document
+
+import metrics
+from api_server import AsyncOllamaClient, QueryService, ServiceOverloaded, create_app
+
+MOCK_DOCS = [Document(page_content="RAG combines retrieval with generation.", metadata={"source_pdf": "rag.pdf", "page": 0})]
+
+
+def stub_ollama_handler(request: httpx.Request) -> httpx.Response:
+    """Stub LLM server ที่ตอบเหมือน Ollama /api/generate ทั้งแบบปกติและแบบ stream."""
+    payload = json.loads(request.content)
+    if payload["stream"]:
+        lines = [{"response": "RAG ", "done": False}, {"response": "is great.", "done": False}, {"response": "", "done": True}]
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+    return httpx.Response(200, json={"response": f"answer to: {payload['prompt']}", "done": True})
+
+
+@pytest.fixture
+def fake_rag_system():
+    system = MagicMock()
+    system.get_cached_answer.return_value = (None, None)
+    system.retrieve.return_value = MOCK_DOCS
+    system.build_prompt.side_effect = lambda query, docs: query
+    return system
+
+
+@pytest.fixture
+def client(fake_rag_system):
+    llm_client = AsyncOllamaClient(base_url="http://stub-ollama", transport=httpx.MockTransport(stub_ollama_handler))
+    with TestClient(create_app(rag_system=fake_rag_system, llm_client=llm_client)) as test_client:
+        yield test_client
+
+
+def test_ask(client, fake_rag_system):
+    """Test Case 1.1: /ask ต้องคืนคำตอบจาก LLM พร้อมแหล่งอ้างอิง."""
+    response = client.post("/ask", json={"query": "What is RAG?"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["result"] == "answer to: What is RAG?"
+    assert body["source_documents"][0]["metadata"]["source_pdf"] == "rag.pdf"
+    fake_rag_system.cache_answer.assert_called_once()
+
+
+def test_ask_empty_query(client):
+    """Test Case 1.2: คำถามว่างต้องได้ 400."""
+    assert client.post("/ask", json={"query": "  "}).status_code == 400
+
+
+def test_ask_stream(client):
+    """Test Case 1.3: /ask/stream ต้องส่ง sources, token และ done เป็น NDJSON."""
+    response = client.post("/ask/stream", json={"query": "What is RAG?"})
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["type"] == "sources"
+    assert [e["text"] for e in events if e["type"] == "token"] == ["RAG ", "is great."]
+    assert events[-1]["type"] == "done" and events[-1]["result"] == "RAG is great."
+    assert {"total_ms", "first_token_ms", "generate_ms"} <= set(events[-1]["timings"])
+
+
+def test_metrics_endpoint(client):
+    """Test Case 1.4: /metrics ต้องคืนเวลาของแต่ละขั้นตอนของคำถามที่ตอบไปแล้วใน Prometheus text format."""
+    client.post("/ask", json={"query": "What is RAG?"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'rag_stage_seconds_count{stage="generate"}' in response.text
+    assert 'rag_request_seconds_count{operation="api_answer",status="ok"}' in response.text
+
+
+def test_generation_concurrency_is_bounded(fake_rag_system):
+    """Test Case 2.1: จำนวนคำขอไปยัง LLM พร้อมกันต้องไม่เกิน max_concurrent_generations."""
+    active, peak = 0, 0
+
+    async def slow_handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return httpx.Response(200, json={"response": "ok", "done": True})
+
+    async def run():
+        llm_client = AsyncOllamaClient(base_url="http://stub-ollama", transport=httpx.MockTransport(slow_handler))
+        service = QueryService(fake_rag_system, llm_client, max_concurrent_generations=2)
+        results = await asyncio.gather(*(service.answer(f"q{i}") for i in range(6)))
+        await service.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert [r["result"] for r in results] == ["ok"] * 6
+    assert peak == 2
+
+
+def test_backpressure_and_timeout(fake_rag_system):
+    """Test Case 2.2: คิวเต็มต้อง raise ServiceOverloaded และคำถามที่ช้าเกินต้อง timeout."""
+    async def hanging_handler(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json={"response": "late", "done": True})
+
+    async def run():
+        llm_client = AsyncOllamaClient(base_url="http://stub-ollama", transport=httpx.MockTransport(hanging_handler))
+        service = QueryService(fake_rag_system, llm_client, max_pending_requests=1, request_timeout=0.1)
+        first = asyncio.create_task(service.answer("slow question"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ServiceOverloaded):
+            await service.answer("second question")
+        with pytest.raises(asyncio.TimeoutError):
+            await first
+        assert service.pending == 0
+        await service.aclose()
+
+    asyncio.run(run())
+
+
+def test_stream_is_rejected_before_the_response_starts(fake_rag_system):
+    """Test Case 2.3: /ask/stream ที่คิวเต็มต้องได้ 503 (ไม่ใช่ 200 แล้วตามด้วย error) และไม่ค้างที่ในคิว."""
+    llm_client = AsyncOllamaClient(base_url="http://stub-ollama", transport=httpx.MockTransport(stub_ollama_handler))
+    with TestClient(create_app(rag_system=fake_rag_system, llm_client=llm_client, max_pending_requests=0)) as client:
+        response = client.post("/ask/stream", json={"query": "What is RAG?"})
+        assert response.status_code == 503 and response.headers["retry-after"] == "1"
+        assert client.get("/health").json()["pending_requests"] == 0
+
+
+def test_stream_closed_early_finishes_trace_and_frees_slot(fake_rag_system):
+    """Test Case 2.4: client ที่ตัดการเชื่อมต่อกลาง stream ต้องปิด trace เป็น cancelled และคืนที่ในคิว."""
+    def cancelled():
+        return metrics.REGISTRY.histogram_count("rag_request_seconds", operation="api_stream", status="cancelled")
+
+    before = cancelled()
+
+    async def run():
+        llm_client = AsyncOllamaClient(base_url="http://stub-ollama", transport=httpx.MockTransport(stub_ollama_handler))
+        service = QueryService(fake_rag_system, llm_client)
+        release = service.admit()
+        events = service.stream("What is RAG?", release=release)
+        assert (await events.__anext__())["type"] == "sources"
+        await events.aclose()
+        assert service.pending == 0
+        release()
+        assert service.pending == 0
+        await service.aclose()
+
+    asyncio.run(run())
+    assert cancelled() == before + 1
@@ -0,0 +1,44 @@
+from benchmarks.bench_metrics import compare_results, percentile, summarize
+from benchmarks.synthetic_corpus import SyntheticCorpus
+from src.pdf_processing import load_pdf
+
+
+def test_synthetic_corpus_is_reproducible_and_parseable(tmp_path):
+    """Test Case 1.1: seed เดียวกันต้องได้ PDF ไบต์ต่อไบต์เหมือนกัน และ pdf_processing แกะข้อความได้ครบทุกหน้า."""
+    first = SyntheticCorpus(files=2, pages_per_file=3, seed=7).generate(str(tmp_path / "a"))
+    second = SyntheticCorpus(files=2, pages_per_file=3, seed=7).generate(str(tmp_path / "b"))
+    assert [open(path, "rb").read() for path in first] == [open(path, "rb").read() for path in second]
+
+    pages = load_pdf(first[1])
+    assert len(pages) == 3
+    assert pages[0].page_content.split()[:3] == SyntheticCorpus(2, 3, 7).page_lines(1, 0)[0].split()[:3]
+
+
+def test_synthetic_queries_come_from_corpus_text():
+    """Test Case 1.2: คำถามสร้างจากคำในหน้าของ corpus และสุ่มซ้ำได้ด้วย seed เดิม."""
+    corpus = SyntheticCorpus(files=3, pages_per_file=2, seed=1)
+    queries = corpus.queries(5)
+    assert queries == SyntheticCorpus(files=3, pages_per_file=2, seed=1).queries(5)
+    vocabulary = set(corpus.vocabulary) | {f"doc{i:05d}" for i in range(3)}
+    for query in queries:
+        words = query.removeprefix("What does the document say about ").rstrip("?").split()
+        assert words and set(words) <= vocabulary
+
+
+def test_summary_percentiles_and_throughput():
+    """Test Case 2.1: percentile แบบ interpolation และ throughput = items / เวลารวม."""
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    summary = summarize([0.1] * 99 + [1.0], items=400)
+    assert summary["p50_ms"] == 100.0 and summary["max_ms"] == 1000.0
+    assert summary["throughput"] == round(400 / (0.1 * 99 + 1.0), 3)
+
+
+def test_compare_flags_only_significant_regressions():
+    """Test Case 2.2: latency ที่เพิ่มหรือ throughput ที่ลดเกิน threshold คือ regression ยกเว้น stage ที่เร็วกว่า min_ms."""
+    baseline = {"stages": {"query/search": {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "throughput": 100.0},
+                           "query/generate": {"p50_ms": 0.02, "p95_ms": 0.03, "p99_ms": 0.03, "throughput": 5e4}}}
+    candidate = {"stages": {"query/search": {"p50_ms": 10.5, "p95_ms": 30.0, "p99_ms": 30.0, "throughput": 80.0},
+                            "query/generate": {"p50_ms": 0.04, "p95_ms": 0.06, "p99_ms": 0.06, "throughput": 2e4}}}
+    rows = compare_results(baseline, candidate, threshold=0.10, min_ms=0.5)
+    regressions = {(row["stage"], row["metric"]) for row in rows if row["regression"]}
+    assert regressions == {("query/search", "p95_ms"), ("query/search", "throughput")}
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from compact_store import CompactCollection, CompactVectorStore, where_to_sql
+from ingest_pipeline import upsert_chunks
+from query_batcher import query_collection
+from retrieval_filters import RetrievalFilters
+from langchain_core.documents import Document
+
+
+def clustered(rows=3000, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    return (centers[rng.integers(0, 20, rows)] + 0.2 * rng.normal(size=(rows, dim))).astype(np.float32)
+
+
+def fill(collection, vectors, batch=500):
+    for start in range(0, len(vectors), batch):
+        ids = [f"c{i}" for i in range(start, min(start + batch, len(vectors)))]
+        metadatas = [{"source_pdf": f"f{i % 3}.pdf", "page": i % 10} for i in range(start, start + len(ids))]
+        collection.upsert(ids, vectors[start:start + batch], [f"text {i}" for i in range(start, start + len(ids))],
+                          metadatas)
+
+
+def test_int8_search_matches_exact_ranking(tmp_path):
+    """Test Case 1.1: int8 + re-score ต้องได้อันดับและระยะ L2^2 เหมือน exact search."""
+    vectors = clustered()
+    collection = CompactCollection(str(tmp_path), quantization="int8", rescore_candidates=50)
+    fill(collection, vectors)
+    query = vectors[7] + 0.05
+    result = collection.query([query.tolist()], n_results=5)
+    exact = ((vectors - query) ** 2).sum(axis=1)
+    assert result["ids"][0] == [f"c{i}" for i in np.argsort(exact)[:5]]
+    assert result["distances"][0] == pytest.approx(np.sort(exact)[:5].tolist(), rel=1e-4)
+    assert result["documents"][0][0] == f"text {np.argmin(exact)}"
+
+
+def test_pq_with_ivf_keeps_recall_and_shrinks_memory(tmp_path):
+    """Test Case 1.2: PQ + IVF ต้องได้ recall@10 สูง และใช้ RAM ต่อ vector น้อยกว่า float32 หลายเท่า."""
+    vectors = clustered(rows=4000, dim=64)
+    collection = CompactCollection(str(tmp_path), quantization="pq", pq_subvectors=8, ivf_min_rows=1000,
+                                   ivf_probes=8, rescore_candidates=200)
+    fill(collection, vectors)
+    collection.build_index()
+    report = collection.memory_report()
+    assert report["ivf_lists"] > 0 and report["compression"] > 4
+
+    queries = vectors[:30] + 0.05
+    found = collection.query(queries.tolist(), n_results=10, include=[])["ids"]
+    recalls = []
+    for query, ids in zip(queries, found):
+        truth = {f"c{i}" for i in np.argsort(((vectors - query) ** 2).sum(axis=1))[:10]}
+        recalls.append(len(truth & set(ids)) / 10)
+    assert np.mean(recalls) >= 0.9
+
+
+def test_upsert_delete_get_and_reopen(tmp_path):
+    """Test Case 2.1: upsert ID เดิมต้องแทนที่, delete ต้องหายจากผลค้นหา และเปิดใหม่ต้องได้ข้อมูลเดิม."""
+    collection = CompactCollection(str(tmp_path))
+    fill(collection, clustered(rows=100))
+    collection.upsert(["c5"], [[9.0] * 16], ["replaced"], [{"source_pdf": "new.pdf"}])
+    collection.delete(ids=["c6"])
+    assert collection.count() == 99
+    assert collection.query([[9.0] * 16], n_results=1)["ids"] == [["c5"]]
+    assert collection.get(ids=["c5", "c6"])["documents"] == ["replaced"]
+
+    reopened = CompactCollection(str(tmp_path))
+    assert reopened.count() == 99
+    page = reopened.get(limit=10, offset=5, include=["metadatas"])
+    assert len(page["ids"]) == 10 and page["documents"] is None
+    assert reopened.get(where={"source_pdf": "new.pdf"}, include=["embeddings"])["embeddings"].tolist() == [[9.0] * 16]
+
+
+def test_retrieval_filters_are_applied(tmp_path):
+    """Test Case 2.2: where clause จาก RetrievalFilters ต้องกรองด้วย metadata ก่อนค้นหา vector."""
+    collection = CompactCollection(str(tmp_path))
+    vectors = clustered(rows=300)
+    fill(collection, vectors)
+    where = RetrievalFilters(source_pdfs=["f1.pdf"], page_min=2, page_max=4).to_chroma_where()
+    metadatas = collection.query([vectors[0].tolist()], n_results=20, where=where)["metadatas"][0]
+    assert metadatas and all(meta["source_pdf"] == "f1.pdf" and 2 <= meta["page"] <= 4 for meta in metadatas)
+    with pytest.raises(ValueError):
+        where_to_sql({"page": {"$regex": "x"}})
+
+
+def test_switching_quantization_reencodes_without_embedding(tmp_path):
+    """Test Case 2.3: เปิดด้วย quantization ใหม่แล้ว build_index ต้อง encode ใหม่จาก vectors float32 ที่เก็บไว้."""
+    vectors = clustered(rows=600)
+    fill(CompactCollection(str(tmp_path), quantization="int8"), vectors)
+    collection = CompactCollection(str(tmp_path), quantization="pq", pq_subvectors=4)
+    collection.build_index()
+    assert collection.memory_report()["quantization"] == "pq"
+    assert collection.query([vectors[3].tolist()], n_results=1)["ids"] == [["c3"]]
+
+
+def test_vector_store_works_with_ingest_and_query_helpers(tmp_path, fake_embeddings):
+    """Test Case 3.1: CompactVectorStore ต้องใช้กับ upsert_chunks, query_collection และ retriever ของ LangChain ได้."""
+    store = CompactVectorStore(str(tmp_path), fake_embeddings)
+    chunks = [Document(page_content=text, metadata={"source_pdf": "a.pdf"}) for text in ("aaa", "bbb", "abh")]
+    upsert_chunks(store, chunks, ["x", "y", "z"])
+    hits = query_collection(store._collection, [store.embeddings.embed_query("aab")], k=2)[0]
+    assert [doc.id for doc, _ in hits] == ["x", "z"]
+    retriever = store.as_retriever(search_kwargs={"k": 1})
+    assert retriever.invoke("bb")[0].page_content == "bbb"
@@ -0,0 +1,53 @@
+from langchain_core.documents import Document
+
+from src.context_assembly import (
+    assemble_context, drop_near_duplicates, estimate_tokens, fit_token_budget, merge_overlapping_chunks,
+)
+
+PAGE_TEXT = "Retrieval augmented generation grounds answers in documents. " * 10
+
+
+def chunk(start, end, page=0, source="a.pdf"):
+    return Document(page_content=PAGE_TEXT[start:end], metadata={"source_pdf": source, "page": page, "start_index": start})
+
+
+def test_merge_overlapping_chunks():
+    """Test Case 1.1: chunks ที่ซ้อนทับกันในหน้าเดียวกันต้องถูกรวมโดยไม่มีข้อความซ้ำ."""
+    docs = [chunk(100, 300), chunk(0, 150), chunk(400, 500), chunk(0, 150, page=1)]
+    merged = merge_overlapping_chunks(docs)
+    assert merged[0].page_content == PAGE_TEXT[0:300]
+    assert merged[0].metadata["start_index"] == 0
+    assert [doc.page_content for doc in merged[1:]] == [PAGE_TEXT[400:500], PAGE_TEXT[0:150]]
+
+
+def test_drop_near_duplicates():
+    """Test Case 1.2: chunk ที่เกือบเหมือนหรือถูกครอบอยู่ใน chunk ที่อันดับดีกว่าต้องถูกตัด."""
+    docs = [
+        Document(page_content="The pump must be serviced every 500 hours of operation."),
+        Document(page_content="The pump must be serviced every 500 hours of operation!"),
+        Document(page_content="serviced every 500 hours"),
+        Document(page_content="Chroma stores the embeddings on disk."),
+    ]
+    kept = drop_near_duplicates(docs)
+    assert [doc.page_content for doc in kept] == [docs[0].page_content, docs[3].page_content]
+
+
+def test_fit_token_budget():
+    """Test Case 1.3: context ต้องไม่เกิน token budget และ chunk สุดท้ายถูกตัดให้พอดี."""
+    docs = [Document(page_content="a" * 400), Document(page_content="b" * 400), Document(page_content="c" * 400)]
+    selected = fit_token_budget(docs, max_tokens=150)
+    assert sum(estimate_tokens(doc.page_content) for doc in selected) <= 150
+    assert [doc.page_content[0] for doc in selected] == ["a", "b"]
+
+
+def test_estimate_tokens_thai():
+    """Test Case 1.4: ภาษาไทยนับ ~2 ตัวอักษรต่อ token."""
+    assert estimate_tokens("สวัสดีครับ") == 5
+    assert estimate_tokens("hello world!") == 3
+
+
+def test_assemble_context_reduces_tokens():
+    """Test Case 2.1: chunks ที่มี overlap 200 ตัวอักษรต้องถูกรวมจนจำนวน tokens ลดลง."""
+    docs = [chunk(0, 300), chunk(100, 400), chunk(200, 500)]
+    assembled = assemble_context(docs, max_tokens=None)
+    assert [doc.page_content for doc in assembled] == [PAGE_TEXT[0:500]]
@@ -0,0 +1,124 @@
+from functools import partial
+
+from langchain_core.documents import Document
+
+from compact_store import CompactVectorStore
+from dedup import DedupIndex, MinHasher
+from hybrid_retrieval import HybridRetriever
+from index_manifest import IndexManifest
+from ingest_pipeline import PendingFile, delete_chunk_ids, run_ingest_pipeline
+from lexical_index import LexicalIndex
+from parallel_ingest import PdfJob, PdfResult
+from qa_system import IndexComponents, RAGSystem, search_vectors
+from retrieval_filters import RetrievalFilters
+
+PARAGRAPH = ("The maintenance schedule requires inspecting the pump seals every six months and replacing "
+             "the filter cartridge whenever the pressure drop exceeds the limit in table four. ")
+BOILERPLATE = "Confidential. Copyright 2024 Example Corp. All rights reserved. Do not distribute. " * 3
+THAI = "ระบบค้นหาเอกสารภาษาไทยที่ไม่มีการเว้นวรรคระหว่างคำและต้องตัดให้ถูกต้อง" * 4
+
+
+def pdf_result(source_key, texts, file_hash):
+    job = PdfJob(source_key=source_key, file_path=source_key, metadata={"source_pdf": source_key,
+                                                                        "file_hash": file_hash})
+    chunks = [Document(page_content=text, metadata={"source_pdf": source_key, "page": i, "start_index": 0})
+              for i, text in enumerate(texts)]
+    return PdfResult(job=job, chunks=chunks)
+
+
+def ingest(store, manifest, dedup_index, results):
+    pending = {result.job.source_key: PendingFile(result.job.file_path, 1, 1.0, result.job.metadata["file_hash"])
+               for result in results}
+    return run_ingest_pipeline(store, results, manifest=manifest, pending_files=pending, batch_size=2,
+                               dedup_index=dedup_index)
+
+
+def test_minhash_estimates_similarity():
+    """Test Case 1.1: ข้อความที่แก้คำเดียวต้อง similarity สูง ข้อความคนละเรื่อง (รวมภาษาไทย) ต้องต่ำ."""
+    hasher = MinHasher()
+    original = hasher.signature(PARAGRAPH * 3)
+    assert hasher.similarity(original, hasher.signature((PARAGRAPH * 3).replace("six", "seven", 1))) > 0.9
+    assert hasher.similarity(original, hasher.signature("  " + (PARAGRAPH * 3).upper())) == 1.0
+    assert hasher.similarity(original, hasher.signature(BOILERPLATE)) < 0.2
+    assert hasher.similarity(hasher.signature(THAI), hasher.signature(BOILERPLATE)) < 0.2
+
+
+def test_register_chunk_returns_canonical_and_is_idempotent(tmp_path):
+    """Test Case 1.2: chunk ที่ซ้ำต้องได้ canonical ID, ส่วน chunk ที่ห้ามใช้ (exclude) หรือบันทึกซ้ำต้องได้ผลเดิม."""
+    index = DedupIndex(str(tmp_path / "dedup.sqlite"))
+    assert index.register_chunk(Document(page_content=PARAGRAPH), "a0", "a.pdf") is None
+    assert index.register_chunk(Document(page_content=PARAGRAPH.replace("six", "6")), "b0", "b.pdf") == "a0"
+    assert index.register_chunk(Document(page_content=PARAGRAPH), "c0", "c.pdf", exclude={"a0"}) is None
+    assert index.register_chunk(Document(page_content=PARAGRAPH), "b0", "b.pdf") == "a0"
+    assert index.duplicates_of(["a0"])["a0"][0]["canonical_chunk_id"] == "a0"
+    assert index.stats()["duplicate_chunks"] == 1
+
+
+def test_pipeline_skips_duplicates_and_promotes_on_delete(tmp_path, fake_embeddings):
+    """
+    Test Case 2.1: revision ของไฟล์เดิมและหน้า boilerplate ต้องไม่ถูก embed ซ้ำ, manifest ต้องมี chunk IDs ครบ
+    และเมื่อลบไฟล์ต้นฉบับ duplicate ต้องถูก promote ขึ้นมาใน vector store แทน
+    """
+    store = CompactVectorStore(str(tmp_path / "compact"), fake_embeddings)
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), {})
+    dedup_index = DedupIndex(str(tmp_path / "dedup.sqlite"))
+    results = [
+        pdf_result("v1.pdf", [PARAGRAPH * 2, BOILERPLATE, THAI], "h1"),
+        pdf_result("v2.pdf", [PARAGRAPH * 2 + "Revised.", BOILERPLATE, THAI], "h2"),
+        pdf_result("other.pdf", ["A different document about invoices and billing cycles. " * 3, BOILERPLATE], "h3"),
+    ]
+    stats = ingest(store, manifest, dedup_index, results)
+
+    assert stats.chunks_upserted == 4 and stats.chunks_duplicate == 4
+    assert stats.documents_duplicate == 1 and stats.dedup_ratio == 0.5
+    assert len(fake_embeddings.texts) == 4 and store._collection.count() == 4
+    assert len(manifest.get("v2.pdf")["chunk_ids"]) == 3
+
+    delete_chunk_ids(store, manifest.remove("v1.pdf"), dedup_index=dedup_index)
+    remaining = store.get(include=["documents", "metadatas"])
+    assert store._collection.count() == 4
+    assert sorted(meta["source_pdf"] for meta in remaining["metadatas"]) == ["other.pdf", "v2.pdf", "v2.pdf",
+                                                                             "v2.pdf"]
+    assert all("canonical_chunk_id" not in meta for meta in remaining["metadatas"])
+    # boilerplate ของ other.pdf ต้องชี้ไปที่ canonical ตัวใหม่ (จาก v2.pdf)
+    boilerplate_id = next(chunk_id for chunk_id, text in zip(remaining["ids"], remaining["documents"])
+                          if text == BOILERPLATE)
+    assert [meta["source_pdf"] for meta in dedup_index.duplicates_of([boilerplate_id])[boilerplate_id]] == [
+        "other.pdf"]
+
+
+def test_filters_and_document_list_include_duplicate_files(tmp_path, fake_embeddings):
+    """
+    Test Case 3.1: ไฟล์ที่ทุก chunk เป็น duplicate ของไฟล์อื่น ต้องยังอยู่ในรายชื่อเอกสาร และค้นหาด้วย filter
+    เฉพาะไฟล์นั้นได้ (ทั้ง vector และ hybrid) โดยได้ metadata ของไฟล์นั้นเอง
+    """
+    store = CompactVectorStore(str(tmp_path / "compact"), fake_embeddings)
+    lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    dedup_path = str(tmp_path / "dedup.sqlite")
+    dedup_index = DedupIndex(dedup_path)
+    results = [pdf_result("a.pdf", [PARAGRAPH * 2, THAI], "h1"), pdf_result("b.pdf", [PARAGRAPH * 2, THAI], "h2"),
+               pdf_result("other.pdf", [BOILERPLATE], "h3")]
+    run_ingest_pipeline(store, results, batch_size=2, lexical_index=lexical_index, dedup_index=dedup_index)
+    dedup_index.close()
+    lexical_index.close()
+    assert sorted(meta["source_pdf"] for meta in store.get()["metadatas"]) == ["a.pdf", "a.pdf", "other.pdf"]
+
+    system = RAGSystem.__new__(RAGSystem)
+    system.reranker = None
+    system._install_index(IndexComponents(str(tmp_path), store, None, None, None, 5,
+                                          DedupIndex(dedup_path, read_only=True)))
+    assert system.list_documents() == ["a.pdf", "b.pdf", "other.pdf"]
+    docs = system.retrieve("pump seals", RetrievalFilters(source_pdfs=["b.pdf"]))
+    assert sorted((doc.metadata["source_pdf"], doc.metadata["page"]) for doc in docs) == [("b.pdf", 0), ("b.pdf", 1)]
+    docs = system.retrieve("pump seals", RetrievalFilters(source_pdfs=["b.pdf"], page_min=1))
+    assert [(doc.metadata["source_pdf"], doc.metadata["page"]) for doc in docs] == [("b.pdf", 1)]
+
+    hybrid_retriever = HybridRetriever(partial(search_vectors, store, None, 5),
+                                       LexicalIndex(str(tmp_path / "lexical.sqlite"), read_only=True),
+                                       store._collection, k=4, lexical_k=5, vector_k=5)
+    system._install_index(IndexComponents(str(tmp_path), store, None, hybrid_retriever, None, 5,
+                                          DedupIndex(dedup_path, read_only=True)))
+    assert system.list_documents() == ["a.pdf", "b.pdf", "other.pdf"]
+    docs = system.retrieve("pump seals", RetrievalFilters(source_pdfs=["b.pdf"]))
+    assert docs and {doc.metadata["source_pdf"] for doc in docs} == {"b.pdf"}
+    assert "pump seals" in docs[0].page_content
@@ -0,0 +1,138 @@
+import hashlib
+from unittest.mock import MagicMock, patch
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from src.drive_sync import DriveSync, list_folder_pdfs
+
+
+def drive_item(file_id: str, content: bytes) -> dict:
+    return {"id": file_id, "name": f"{file_id}.pdf", "md5Checksum": hashlib.md5(content).hexdigest(),
+            "modifiedTime": "2026-01-01T00:00:00Z", "size": str(len(content))}
+
+
+def make_fake_drive(contents: dict, pages: int = 1):
+    """
+    Drive service ปลอม (MagicMock แบบเดียวกับ test_pdf_processor.py)
+    files().list แบ่งผลลัพธ์เป็น pages หน้า และ get_media คืน request ที่จำว่าขอไฟล์ไหน
+    """
+    service = MagicMock()
+    items = [drive_item(file_id, content) for file_id, content in contents.items()]
+    per_page = max(1, -(-len(items) // pages))
+    responses = []
+    for i in range(0, max(len(items), 1), per_page):
+        response = {"files": items[i:i + per_page]}
+        if i + per_page < len(items):
+            response["nextPageToken"] = f"page-{i + per_page}"
+        responses.append(response)
+    service.files.return_value.list.return_value.execute.side_effect = responses
+    service.files.return_value.get_media.side_effect = lambda fileId: {"file_id": fileId}
+    service.changes.return_value.getStartPageToken.return_value.execute.return_value = {"startPageToken": "t1"}
+    return service
+
+
+def fake_downloader(contents: dict, failures: dict = None):
+    """MediaIoBaseDownload ปลอม: เขียนเนื้อหาไฟล์ลง file handle (หรือ raise error ตามจำนวนใน failures)."""
+    failures = failures if failures is not None else {}
+
+    def factory(fh, request, chunksize):
+        downloader = MagicMock()
+
+        def next_chunk(num_retries=0):
+            file_id = request["file_id"]
+            if failures.get(file_id):
+                failures[file_id] -= 1
+                raise HttpError(resp=MagicMock(status=503, reason="Unavailable"), content=b"try later")
+            fh.write(contents[file_id])
+            return MagicMock(), True
+        downloader.next_chunk.side_effect = next_chunk
+        return downloader
+    return factory
+
+
+def test_list_folder_pdfs_follows_pagination():
+    """Test Case 1.1: ต้องไล่ nextPageToken จนครบทุกหน้า."""
+    contents = {f"f{i}": b"%PDF" for i in range(5)}
+    service = make_fake_drive(contents, pages=3)
+    files = list_folder_pdfs(service, "folder")
+    assert [f.id for f in files] == list(contents)
+    assert service.files.return_value.list.call_args_list[1].kwargs["pageToken"] == "page-2"
+
+
+def test_sync_downloads_only_new_or_changed_files(tmp_path):
+    """Test Case 2.1: รอบแรกดาวน์โหลดทุกไฟล์ รอบถัดไปดาวน์โหลดเฉพาะไฟล์ที่ md5 เปลี่ยน และลบไฟล์ที่หายไป."""
+    contents = {"a": b"%PDF a", "b": b"%PDF b", "c": b"%PDF c"}
+    with patch("src.drive_sync.MediaIoBaseDownload", side_effect=fake_downloader(contents)):
+        first = DriveSync(lambda: make_fake_drive(contents), "folder", cache_dir=str(tmp_path), workers=3).sync()
+        assert sorted(first.downloaded) == ["a", "b", "c"]
+        assert open(first.local_paths["b"], "rb").read() == b"%PDF b"
+
+        changed = {"a": b"%PDF a", "b": b"%PDF b v2"}
+        contents.update(changed)
+        sync = DriveSync(lambda: make_fake_drive(changed), "folder", cache_dir=str(tmp_path), workers=3)
+        sync._has_changes_since = lambda token: True
+        second = sync.sync()
+
+    assert second.downloaded == ["b"]
+    assert second.removed == ["c"]
+    assert open(second.local_paths["b"], "rb").read() == b"%PDF b v2"
+    assert not (tmp_path / "folder" / "c.pdf").exists()
+
+
+def test_sync_retries_transient_errors_and_resumes(tmp_path):
+    """Test Case 2.2: error ชั่วคราวต้องถูก retry ส่วนไฟล์ที่ล้มเหลวจะถูกดาวน์โหลดต่อในรอบถัดไป."""
+    contents = {"a": b"%PDF a", "b": b"%PDF b"}
+    failures = {"a": 1, "b": 10}
+    with patch("src.drive_sync.MediaIoBaseDownload", side_effect=fake_downloader(contents, failures)):
+        first = DriveSync(lambda: make_fake_drive(contents), "folder", cache_dir=str(tmp_path),
+                          max_retries=2, backoff_seconds=0).sync()
+        assert first.downloaded == ["a"] and first.failed == ["b"]
+        assert not (tmp_path / "folder" / "b.pdf.part").exists()
+
+        failures["b"] = 0
+        second = DriveSync(lambda: make_fake_drive(contents), "folder", cache_dir=str(tmp_path),
+                           max_retries=2, backoff_seconds=0).sync()
+    assert second.downloaded == ["b"]
+    assert set(second.local_paths) == {"a", "b"}
+
+
+def test_sync_skips_listing_when_drive_reports_no_changes(tmp_path):
+    """Test Case 2.3: ถ้า changes API ไม่มีการเปลี่ยนแปลง ต้องไม่ลิสต์โฟลเดอร์และไม่ดาวน์โหลดอะไรเลย."""
+    contents = {"a": b"%PDF a"}
+    with patch("src.drive_sync.MediaIoBaseDownload", side_effect=fake_downloader(contents)):
+        DriveSync(lambda: make_fake_drive(contents), "folder", cache_dir=str(tmp_path)).sync()
+
+    service = make_fake_drive(contents)
+    service.changes.return_value.list.return_value.execute.return_value = {"changes": [], "newStartPageToken": "t2"}
+    result = DriveSync(lambda: service, "folder", cache_dir=str(tmp_path)).sync()
+
+    service.files.return_value.list.assert_not_called()
+    assert result.downloaded == [] and list(result.local_paths) == ["a"]
+
+
+def test_sync_raises_on_listing_error(tmp_path):
+    """Test Case 2.4: error ที่ไม่ใช่ error ชั่วคราวตอนลิสต์โฟลเดอร์ต้องถูก raise ต่อ."""
+    service = make_fake_drive({})
+    service.files.return_value.list.return_value.execute.side_effect = HttpError(
+        resp=MagicMock(status=404, reason="Not Found"), content=b"Folder not found"
+    )
+    with pytest.raises(HttpError):
+        DriveSync(lambda: service, "missing", cache_dir=str(tmp_path)).sync()
+
+
+def test_plan_lists_without_downloading(tmp_path):
+    """Test Case 2.5: plan (--dry-run) ต้องลิสต์โฟลเดอร์อย่างเดียว ไม่ดาวน์โหลด ไม่ลบ cache และไม่แก้ state."""
+    contents = {"a": b"%PDF a", "b": b"%PDF b"}
+    with patch("src.drive_sync.MediaIoBaseDownload", side_effect=fake_downloader(contents)):
+        DriveSync(lambda: make_fake_drive(contents), "folder", cache_dir=str(tmp_path)).sync()
+    state = (tmp_path / "folder" / "sync_state.json").read_text()
+
+    changed = {"a": b"%PDF a", "c": b"%PDF c"}
+    with patch("src.drive_sync.MediaIoBaseDownload") as downloader:
+        plan = DriveSync(lambda: make_fake_drive(changed), "folder", cache_dir=str(tmp_path)).plan()
+    downloader.assert_not_called()
+    assert [f.id for f in plan.files] == ["a", "c"]
+    assert list(plan.local_paths) == ["a"] and plan.removed == ["b"] and not plan.downloaded
+    assert (tmp_path / "folder" / "b.pdf").exists() and not (tmp_path / "folder" / "c.pdf").exists()
+    assert (tmp_path / "folder" / "sync_state.json").read_text() == state
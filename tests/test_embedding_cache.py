@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+
+from src.embedding_cache import CachedEmbeddings, normalize_text
+
+
+def make_inner():
+    """Embeddings model จำลอง: vector = [ความยาวข้อความ, 1.0]."""
+    inner = MagicMock()
+    inner.embed_documents.side_effect = lambda texts: [[float(len(t)), 1.0] for t in texts]
+    inner.embed_query.side_effect = lambda text: [float(len(text)), 0.0]
+    return inner
+
+
+def test_normalize_text_collapses_whitespace():
+    """Test Case 1.1: whitespace ที่ต่างกันต้องได้ข้อความเดียวกัน."""
+    assert normalize_text("  Hello \n\n world ") == "Hello world"
+
+
+def test_duplicate_texts_are_embedded_once(tmp_path):
+    """Test Case 2.1: ข้อความซ้ำใน batch เดียวกันต้องถูกส่งเข้า model ครั้งเดียว."""
+    inner = make_inner()
+    cache = CachedEmbeddings(inner, "model-a", cache_path=str(tmp_path / "cache.sqlite"))
+
+    vectors = cache.embed_documents(["header", "body", "header"])
+
+    assert vectors == [[6.0, 1.0], [4.0, 1.0], [6.0, 1.0]]
+    inner.embed_documents.assert_called_once_with(["header", "body"])
+    assert cache.misses == 2
+    assert cache.hits == 1
+
+
+def test_cache_persists_across_instances(tmp_path):
+    """Test Case 2.2: การ index รอบถัดไปต้องอ่าน vector จาก cache บนดิสก์โดยไม่เรียก model."""
+    cache_path = str(tmp_path / "cache.sqlite")
+    CachedEmbeddings(make_inner(), "model-a", cache_path=cache_path).embed_documents(["page footer"])
+
+    inner = make_inner()
+    cache = CachedEmbeddings(inner, "model-a", cache_path=cache_path)
+    assert cache.embed_documents(["page   footer"]) == [[11.0, 1.0]]
+    inner.embed_documents.assert_not_called()
+    assert cache.hit_rate == 1.0
+
+
+def test_cache_is_keyed_by_model_signature(tmp_path):
+    """Test Case 2.3: เปลี่ยน model ต้องไม่ใช้ vector เก่าใน cache."""
+    cache_path = str(tmp_path / "cache.sqlite")
+    CachedEmbeddings(make_inner(), "model-a", cache_path=cache_path).embed_documents(["text"])
+
+    inner = make_inner()
+    CachedEmbeddings(inner, "model-b", cache_path=cache_path).embed_documents(["text"])
+    inner.embed_documents.assert_called_once_with(["text"])
+
+
+def test_float16_storage(tmp_path):
+    """Test Case 2.4: เก็บแบบ float16 แล้วอ่านกลับมาต้องได้ค่าใกล้เคียงเดิม."""
+    cache_path = str(tmp_path / "cache.sqlite")
+    CachedEmbeddings(make_inner(), "model-a", cache_path=cache_path, dtype="float16").embed_documents(["abc"])
+    cache = CachedEmbeddings(make_inner(), "model-a", cache_path=cache_path)
+    assert cache.embed_documents(["abc"]) == [[3.0, 1.0]]
@@ -0,0 +1,33 @@
+from unittest.mock import MagicMock
+from langchain_core.documents import Document
+
+from src.hybrid_retrieval import HybridRetriever, reciprocal_rank_fusion, weighted_score_fusion
+
+
+def test_reciprocal_rank_fusion():
+    """Test Case 1.1: item ที่อยู่อันดับต้นของทั้งสองรายการต้องได้คะแนนสูงสุด."""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+    assert fused[0][0] == "b"
+    assert {item for item, _ in fused} == {"a", "b", "c", "d"}
+
+
+def test_weighted_score_fusion():
+    """Test Case 1.2: คะแนนถูก normalize ก่อนถ่วงน้ำหนัก."""
+    fused = weighted_score_fusion([[("a", -0.2), ("b", -0.9)], [("b", 12.0), ("c", 3.0)]], [0.3, 0.7])
+    assert [item for item, _ in fused] == ["b", "a", "c"]
+
+
+def test_hybrid_retriever_fetches_lexical_only_hits():
+    """Test Case 2.1: chunk ที่เจอจาก BM25 อย่างเดียวต้องถูกดึงเนื้อหาจาก collection."""
+    vector_hits = [(Document(id="v1", page_content="vector hit"), 0.3)]
+    lexical_index = MagicMock()
+    lexical_index.search.return_value = [("l1", 7.5), ("gone", 1.0)]
+    collection = MagicMock()
+    collection.get.return_value = {"ids": ["l1"], "documents": ["exact XK-4410"], "metadatas": [{"page": 2}]}
+
+    retriever = HybridRetriever(lambda query, where: vector_hits, lexical_index, collection, k=3, lexical_k=5)
+    docs = retriever.invoke("XK-4410")
+
+    assert [doc.id for doc in docs] == ["v1", "l1"]
+    assert docs[1].metadata == {"page": 2}
+    collection.get.assert_called_once_with(ids=["l1", "gone"], where=None, include=["documents", "metadatas"])
@@ -0,0 +1,58 @@
+from src import index_manifest
+from src.index_manifest import IndexManifest, compute_file_hash, make_chunk_id
+
+SETTINGS = {"chunk_size": 1000, "chunk_overlap": 200, "embedding_model": "all-MiniLM-L6-v2"}
+
+
+def test_make_chunk_id_is_deterministic():
+    """Test Case 1.1: ID ของ chunk ต้องเหมือนเดิมทุกครั้งสำหรับ input เดิม."""
+    assert make_chunk_id("a.pdf", "hash1", 0) == make_chunk_id("a.pdf", "hash1", 0)
+    assert make_chunk_id("a.pdf", "hash1", 0) != make_chunk_id("a.pdf", "hash1", 1)
+    # ไฟล์ที่เนื้อหาเหมือนกันแต่ชื่อต่างกันต้องได้ ID ต่างกัน
+    assert make_chunk_id("a.pdf", "hash1", 0) != make_chunk_id("b.pdf", "hash1", 0)
+
+
+def test_compute_file_hash_changes_with_content(tmp_path):
+    """Test Case 1.2: hash ต้องเปลี่ยนเมื่อเนื้อหาไฟล์เปลี่ยน."""
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 first")
+    first = compute_file_hash(str(pdf_path))
+    pdf_path.write_bytes(b"%PDF-1.4 second")
+    assert compute_file_hash(str(pdf_path)) != first
+
+
+def test_manifest_round_trip(tmp_path):
+    """Test Case 2.1: บันทึกแล้วโหลดกลับมาต้องได้ข้อมูลเดิม."""
+    manifest_path = str(tmp_path / index_manifest.MANIFEST_FILE_NAME)
+    manifest = IndexManifest.load(manifest_path, SETTINGS)
+    manifest.update("doc.pdf", "/tmp/doc.pdf", 10, 123.0, "abc", ["id1", "id2"])
+    manifest.save()
+
+    reloaded = IndexManifest.load(manifest_path, SETTINGS)
+    assert not reloaded.settings_changed
+    assert reloaded.is_unchanged("doc.pdf", 10, 123.0)
+    assert not reloaded.is_unchanged("doc.pdf", 11, 123.0)
+    assert reloaded.remove("doc.pdf") == ["id1", "id2"]
+    assert reloaded.keys() == []
+
+
+def test_manifest_detects_settings_change(tmp_path):
+    """Test Case 2.2: ถ้า chunk_size เปลี่ยน manifest ต้องแจ้งว่าต้อง index ใหม่."""
+    manifest_path = str(tmp_path / index_manifest.MANIFEST_FILE_NAME)
+    manifest = IndexManifest.load(manifest_path, SETTINGS)
+    manifest.update("doc.pdf", "/tmp/doc.pdf", 10, 123.0, "abc", ["id1"])
+    manifest.save()
+
+    reloaded = IndexManifest.load(manifest_path, dict(SETTINGS, chunk_size=500))
+    assert reloaded.settings_changed
+    # chunk IDs เดิมยังต้องอ่านได้ เพื่อนำไปลบออกจาก vector store
+    assert reloaded.all_chunk_ids() == ["id1"]
+
+
+def test_manifest_corrupted_file_starts_empty(tmp_path):
+    """Test Case 2.3: ไฟล์ manifest เสียต้องไม่ทำให้ระบบล่ม."""
+    manifest_path = tmp_path / index_manifest.MANIFEST_FILE_NAME
+    manifest_path.write_text("{not json")
+    manifest = IndexManifest.load(str(manifest_path), SETTINGS)
+    assert manifest.keys() == []
+    assert not manifest.settings_changed
@@ -0,0 +1,160 @@
+import os
+import time
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+import index_worker
+import qa_system
+from index_manifest import IndexManifest, MANIFEST_FILE_NAME, compute_file_hash, read_index_version
+from index_versions import active_index_dir, activate_version, create_version_dir, list_versions, prune_versions
+from index_worker import IndexWorker
+from qa_system import IndexComponents, RAGSystem
+from vector_store_builder import get_index_settings, list_pdf_files
+
+
+def fake_build(builds):
+    """builder จำลอง: บันทึก manifest ของไฟล์ทั้งหมดและเขียนรายชื่อไฟล์ที่ index ไว้ใน persist_dir."""
+    def build(pdf_directory, persist_dir, **kwargs):
+        builds.append(persist_dir)
+        manifest = IndexManifest.load(os.path.join(persist_dir, MANIFEST_FILE_NAME), get_index_settings())
+        manifest.clear()
+        for pdf_file in list_pdf_files(pdf_directory):
+            path = os.path.join(pdf_directory, pdf_file)
+            stat = os.stat(path)
+            manifest.update(pdf_file, path, stat.st_size, stat.st_mtime, compute_file_hash(path), [pdf_file])
+        manifest.save()
+        with open(os.path.join(persist_dir, "indexed.txt"), "a", encoding="utf-8") as f:
+            f.write(",".join(manifest.keys()) + "\n")
+    return build
+
+
+def test_versions_activate_and_prune(tmp_path):
+    """Test Case 1.1: pointer ชี้ version ที่ activate ล่าสุด และ prune เหลือ version ที่ active กับ version ก่อนหน้า."""
+    versions_dir = str(tmp_path / "versions")
+    assert active_index_dir(versions_dir, default="legacy") == "legacy"
+    paths = []
+    for i in range(3):
+        paths.append(create_version_dir(versions_dir))
+        (tmp_path / "versions" / os.path.basename(paths[-1]) / "data.txt").write_text(str(i))
+        activate_version(paths[-1], versions_dir)
+        time.sleep(0.01)
+    failed_build = create_version_dir(versions_dir, copy_from=paths[-1])
+    assert (tmp_path / "versions" / os.path.basename(failed_build) / "data.txt").read_text() == "2"
+    assert active_index_dir(versions_dir) == paths[-1]
+
+    removed = prune_versions(versions_dir, keep=2)
+    assert sorted(removed) == sorted([os.path.basename(paths[0]), os.path.basename(failed_build)])
+    assert list_versions(versions_dir) == [os.path.basename(paths[1]), os.path.basename(paths[2])]
+    with pytest.raises(ValueError):
+        activate_version(str(tmp_path / "elsewhere"), versions_dir)
+
+
+def test_worker_builds_copy_only_when_sources_change(tmp_path, monkeypatch):
+    """
+    Test Case 2.1: worker build version ใหม่จากสำเนาของ version ที่ active เฉพาะเมื่อไฟล์เปลี่ยน,
+    version ใหม่มี index version stamp ใหม่ และ build ที่ล้มเหลวต้องไม่เปลี่ยน version ที่ active
+    """
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    (pdf_dir / "a.pdf").write_bytes(b"%PDF a")
+    builds = []
+    monkeypatch.setattr(index_worker, "process_local_pdfs_and_build_store", fake_build(builds))
+    versions_dir = str(tmp_path / "versions")
+    worker = IndexWorker(str(pdf_dir), versions_dir=versions_dir, embedding_model=object())
+
+    first = worker.run_once()
+    assert active_index_dir(versions_dir) == first and builds == [first]
+    assert worker.run_once() is None
+
+    # mtime เปลี่ยนแต่เนื้อหาเดิม -> ไม่ build ใหม่
+    os.utime(pdf_dir / "a.pdf", (time.time() + 10, time.time() + 10))
+    assert worker.run_once() is None
+
+    (pdf_dir / "b.pdf").write_bytes(b"%PDF b")
+    second = worker.run_once()
+    assert active_index_dir(versions_dir) == second and second != first
+    assert (tmp_path / "versions" / os.path.basename(second) / "indexed.txt").read_text().splitlines() == [
+        "a.pdf", "a.pdf,b.pdf"]
+    assert read_index_version(second) != read_index_version(first)
+
+    (pdf_dir / "a.pdf").unlink()
+    monkeypatch.setattr(index_worker, "process_local_pdfs_and_build_store", MagicMock(side_effect=RuntimeError))
+    with pytest.raises(RuntimeError):
+        worker.run_once()
+    assert active_index_dir(versions_dir) == second
+    assert list_versions(versions_dir) == [os.path.basename(first), os.path.basename(second)]
+
+
+def components(persist_dir, docs):
+    retriever = MagicMock()
+    retriever.invoke.side_effect = lambda query: docs
+    vector_store = MagicMock()
+    vector_store._collection.query.return_value = {"ids": [[]], "documents": [[]], "metadatas": [[]],
+                                                   "distances": [[]]}
+    return IndexComponents(persist_dir, vector_store, retriever, None, None, 5)
+
+
+def test_reload_index_swaps_without_blocking_queries(monkeypatch):
+    """
+    Test Case 3.1: ระหว่างเปิด index ใหม่ (ช้า) คำถามยังตอบจาก index เดิมได้ทันที หลังสลับต้องใช้ index ใหม่
+    และ resource ของ index เดิมถูกปิดหลัง grace period
+    """
+    system = RAGSystem.__new__(RAGSystem)
+    system.reranker = None
+    system._index_lock = threading.Lock()
+    old = components("v1", ["old"])
+    old.close = MagicMock()
+    system._install_index(old)
+
+    opening = threading.Event()
+
+    def slow_open(persist_dir):
+        opening.set()
+        time.sleep(0.3)
+        return components(persist_dir, ["new"])
+
+    monkeypatch.setattr(system, "_open_index", slow_open)
+    monkeypatch.setattr(qa_system, "INDEX_SWAP_GRACE_SECONDS", 0.05)
+    reloader = threading.Thread(target=system.reload_index, args=("v2",))
+    reloader.start()
+    assert opening.wait(1)
+    start = time.perf_counter()
+    assert system.retrieve("q") == ["old"]
+    assert time.perf_counter() - start < 0.2
+    reloader.join()
+
+    assert system.index_dir == "v2" and system.retrieve("q") == ["new"]
+    assert system.reload_index("v2") is False
+    time.sleep(0.2)
+    old.close.assert_called_once()
+
+
+def test_question_uses_one_index_during_swap(tmp_path, monkeypatch):
+    """
+    Test Case 3.2: คำถามที่ index ถูกสลับระหว่างกำลังตอบต้องใช้ index เดิมทุกขั้นตอน
+    และคำตอบต้องถูก cache ด้วย version stamp ของ index ที่ใช้ตอบจริง
+    """
+    from langchain_core.documents import Document
+    from langchain.prompts import PromptTemplate
+    from answer_cache import AnswerCache
+
+    monkeypatch.setattr(qa_system, "read_index_version", lambda persist_dir: persist_dir)
+    system = RAGSystem.__new__(RAGSystem)
+    system.reranker = None
+    system.llm = MagicMock()
+    system.llm.invoke.return_value = "answer"
+    system.prompt = PromptTemplate(template="{context}\nQ: {question}", input_variables=["context", "question"])
+    system.answer_cache = AnswerCache(str(tmp_path / "answers.sqlite"), similarity_threshold=0.99)
+    new = components("v2", [Document(page_content="new", metadata={})])
+    old = components("v1", [Document(page_content="old", metadata={})])
+    # index ถูกสลับระหว่าง embed คำถามเพื่อค้น answer cache (ก่อน retrieve)
+    old.vector_store.embeddings.embed_query.side_effect = lambda query: (system._install_index(new), [1.0, 0.0])[1]
+    system._install_index(old)
+
+    response = system.answer_question("q")
+    assert [doc.page_content for doc in response["source_documents"]] == ["old"]
+    assert system.index_dir == "v2"
+    assert system.answer_cache.get("q", "v1")["result"] == "answer"
+    assert system.answer_cache.get("q", "v2") is None
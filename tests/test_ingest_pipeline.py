@@ -0,0 +1,78 @@
+import pytest
+from langchain_core.documents import Document
+
+from compact_store import CompactVectorStore
+from index_manifest import IndexManifest, make_chunk_id
+from ingest_pipeline import PendingFile, run_ingest_pipeline
+from lexical_index import LexicalIndex
+from parallel_ingest import PdfJob, PdfResult
+
+SETTINGS = {"chunk_size": 100}
+
+
+class FailingStore:
+    """ห่อ vector store ให้ upsert ครั้งที่ fail_on เขียนลง store แล้วจึง raise (เช่น timeout หลังเขียนสำเร็จ)."""
+
+    def __init__(self, store, fail_on: int):
+        self.store = store
+        self.embeddings = store.embeddings
+        self.fail_on = fail_on
+        self.calls = 0
+
+    def add_documents(self, documents, ids):
+        self.calls += 1
+        self.store.add_documents(documents=documents, ids=ids)
+        if self.calls == self.fail_on:
+            raise RuntimeError("connection lost")
+
+    def delete(self, ids):
+        self.store.delete(ids=ids)
+
+
+def make_results():
+    results = []
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        job = PdfJob(name, name, metadata={"source_pdf": name, "file_hash": f"hash-{name}"})
+        chunks = [Document(page_content=f"{name} chunk {i} " * 5, metadata={"source_pdf": name, "page": i})
+                  for i in range(5)]
+        results.append(PdfResult(job=job, chunks=chunks))
+    return results
+
+
+def run(store, manifest_path, lexical_index=None):
+    """index ไฟล์ที่ยังไม่เสร็จ (ข้ามไฟล์ที่ complete แล้วเหมือน vector_store_builder)."""
+    manifest = IndexManifest.load(manifest_path, SETTINGS)
+    results = [result for result in make_results() if not manifest.is_unchanged(result.job.source_key, 1, 1.0)]
+    pending = {result.job.source_key: PendingFile(result.job.file_path, 1, 1.0, result.job.metadata["file_hash"])
+               for result in results}
+    return run_ingest_pipeline(store, results, manifest=manifest, pending_files=pending, batch_size=2,
+                               checkpoint_every=1, lexical_index=lexical_index)
+
+
+def test_resume_after_failure_commits_same_chunks_without_orphans(tmp_path, fake_embeddings):
+    """
+    Test Case 1.1: ถ้า store ล้มเหลวกลางทาง (หลัง checkpoint ไปแล้ว 3 batch) การรันใหม่ต้องทำต่อจาก checkpoint
+    ได้ chunk IDs เดียวกับการรันที่ไม่ถูกขัดจังหวะ ไม่มี chunks ค้างใน store ที่ manifest ไม่รู้จัก และทุกไฟล์ complete
+    """
+    manifest_path = str(tmp_path / "manifest.json")
+    store = CompactVectorStore(str(tmp_path / "store"), fake_embeddings)
+    lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    with pytest.raises(RuntimeError, match="connection lost"):
+        run(FailingStore(store, fail_on=4), manifest_path, lexical_index)
+    interrupted = IndexManifest.load(manifest_path, SETTINGS)
+    assert interrupted.get("a.pdf")["complete"] and not interrupted.get("b.pdf")["complete"]
+    assert len(interrupted.all_chunk_ids()) == 6
+
+    stats = run(store, manifest_path, lexical_index)
+    assert stats.chunks_resumed == 1 and stats.chunks_upserted == 9 and stats.files_indexed == 2
+
+    manifest = IndexManifest.load(manifest_path, SETTINGS)
+    expected = {make_chunk_id(name, f"hash-{name}", i) for name in ("a.pdf", "b.pdf", "c.pdf") for i in range(5)}
+    assert set(manifest.all_chunk_ids()) == expected and len(manifest.all_chunk_ids()) == 15
+    assert all(manifest.get(name)["complete"] for name in manifest.keys())
+    assert set(store.get(include=[])["ids"]) == expected and store._collection.count() == 15
+    assert len(lexical_index) == 15
+
+    clean = CompactVectorStore(str(tmp_path / "clean"), fake_embeddings)
+    run(clean, str(tmp_path / "clean_manifest.json"))
+    assert set(clean.get(include=[])["ids"]) == expected
@@ -0,0 +1,62 @@
+import math
+
+import pytest
+
+from src.lexical_index import LexicalIndex, tokenize
+
+
+def test_tokenize_identifiers_and_thai():
+    """Test Case 1.1: รหัสต้องถูกเก็บทั้งก้อนและแยกส่วน ภาษาไทยต้องเป็น character bigrams."""
+    assert tokenize("Part AB-1234") == ["part", "ab-1234", "ab", "1234"]
+    assert tokenize("สวัสดี") == ["สว", "วั", "ัส", "สด", "ดี"]
+
+
+def test_bm25_ranks_exact_identifier_first(tmp_path):
+    """Test Case 2.1: chunk ที่มีรหัสตรงกับคำถามต้องได้อันดับแรก."""
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    index.add(
+        ["c1", "c2", "c3"],
+        ["The pump uses seal kit XK-4410.", "The pump manual covers maintenance.", "ปั๊มน้ำรุ่นใหม่ประหยัดไฟ"],
+    )
+    results = index.search("Which seal kit is XK-4410?", k=2)
+    assert results[0][0] == "c1"
+    assert index.search("ปั๊มน้ำ", k=1)[0][0] == "c3"
+    assert index.search("nothing matches", k=3) == []
+
+
+def test_upsert_delete_and_read_only_reopen(tmp_path):
+    """Test Case 2.2: add ซ้ำต้องทับของเดิม, delete ต้องลบออก และเปิดแบบ read-only ได้หลังปิด."""
+    path = str(tmp_path / "lexical.sqlite")
+    index = LexicalIndex(path)
+    index.add(["c1", "c2"], ["alpha beta", "gamma"])
+    index.add(["c1"], ["delta"])
+    index.delete(["c2"])
+    assert len(index) == 1
+    index.close()
+
+    reader = LexicalIndex(path, read_only=True)
+    assert reader.search("alpha") == []
+    assert reader.search("delta")[0][0] == "c1"
+
+
+def test_source_prefilter_and_listing(tmp_path):
+    """Test Case 2.3: ค้นหาเฉพาะไฟล์ที่เลือกได้ และแสดงรายชื่อไฟล์พร้อมจำนวน chunks."""
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    index.add(["c1", "c2", "c3"], ["pump seal", "pump manual", "pump wiring"], ["a.pdf", "b.pdf", "b.pdf"])
+    assert {chunk_id for chunk_id, _ in index.search("pump", k=5, sources=["b.pdf"])} == {"c2", "c3"}
+    assert index.list_sources() == [("a.pdf", 1), ("b.pdf", 2)]
+
+
+def test_common_terms_are_skipped(tmp_path):
+    """
+    Test Case 2.4: คำที่อยู่ในเกิน max_df_ratio ของ chunks ต้องไม่ถูกใช้คิดคะแนน (ไม่ดึง posting list ที่ยาว)
+    ยกเว้นเมื่อทุกคำในคำถามเป็นแบบนั้น และคะแนนต้องเท่ากับสูตร BM25
+    """
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"), max_df_ratio=0.5)
+    index.add(["c1", "c2", "c3", "c4"], ["pump seal seal", "pump manual", "pump wiring", "pump filter"])
+    results = index.search("pump seal", k=4)
+    assert [chunk_id for chunk_id, _ in results] == ["c1"]
+    idf = math.log(1 + (4 - 1 + 0.5) / (1 + 0.5))
+    norm = 1.5 * (1 - 0.75 + 0.75 * 3 / 2.25)
+    assert results[0][1] == pytest.approx(idf * 2 * 2.5 / (2 + norm))
+    assert {chunk_id for chunk_id, _ in index.search("pump", k=4)} == {"c1", "c2", "c3", "c4"}
@@ -0,0 +1,86 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+
+import metrics
+from metrics import MetricsRegistry, NOOP_TRACE, format_timings, span, start_trace, use_trace
+from query_batcher import QueryBatcher
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.REGISTRY.reset()
+    yield
+    metrics.REGISTRY.enabled = True
+    metrics.REGISTRY.reset()
+
+
+def test_render_prometheus_counters_and_histograms():
+    """Test Case 1.1: ต้อง render เป็น Prometheus text format พร้อม HELP/TYPE, labels และ cumulative buckets."""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc("rag_queries_total", operation="answer")
+    registry.inc("rag_queries_total", 2, operation="answer")
+    registry.observe("rag_stage_seconds", 0.05, stage="embed")
+    registry.observe("rag_stage_seconds", 0.5, stage="embed")
+    text = registry.render_prometheus()
+    assert "# TYPE rag_queries_total counter" in text
+    assert 'rag_queries_total{operation="answer"} 3' in text
+    assert "# TYPE rag_stage_seconds histogram" in text
+    assert 'rag_stage_seconds_bucket{stage="embed",le="0.1"} 1' in text
+    assert 'rag_stage_seconds_bucket{stage="embed",le="1.0"} 2' in text
+    assert 'rag_stage_seconds_bucket{stage="embed",le="+Inf"} 2' in text
+    assert 'rag_stage_seconds_count{stage="embed"} 2' in text
+
+
+def test_write_textfile(tmp_path):
+    """Test Case 1.2: write_textfile ต้องเขียนไฟล์ .prom ที่มีเนื้อหาเดียวกับ render_prometheus."""
+    registry = MetricsRegistry()
+    registry.inc("ingest_chunks_total", 5)
+    path = tmp_path / "metrics" / "ingest.prom"
+    registry.write_textfile(str(path))
+    assert path.read_text(encoding="utf-8") == registry.render_prometheus()
+
+
+def test_trace_records_spans_counts_and_registry():
+    """Test Case 2.1: span() ในโค้ดชั้นล่างต้องถูกบันทึกลง trace ปัจจุบันและ histogram ของ registry."""
+    trace = start_trace("answer")
+    with use_trace(trace):
+        with span("retrieve"):
+            time.sleep(0.01)
+        metrics.count("chunks_retrieved", 4)
+    timings = trace.finish()
+    assert timings["retrieve_ms"] >= 10 and timings["total_ms"] >= timings["retrieve_ms"]
+    assert timings["chunks_retrieved"] == 4
+    assert metrics.REGISTRY.counter_value("rag_queries_total", operation="answer") == 1
+    assert metrics.REGISTRY.counter_value("rag_chunks_retrieved_total") == 4
+    assert metrics.REGISTRY.histogram_count("rag_stage_seconds", stage="retrieve") == 1
+    assert metrics.REGISTRY.histogram_count("rag_request_seconds", operation="answer", status="ok") == 1
+    assert format_timings(timings).startswith("total ")
+
+
+def test_disabled_metrics_are_noop():
+    """Test Case 2.2: เมื่อปิด metrics ต้องได้ NOOP_TRACE, ไม่มี timings และ registry ว่างเปล่า."""
+    metrics.REGISTRY.enabled = False
+    trace = start_trace("answer")
+    assert trace is NOOP_TRACE
+    with use_trace(trace):
+        with span("retrieve"):
+            pass
+        metrics.count("cache_hits")
+    assert trace.finish() is None
+    assert metrics.REGISTRY.render_prometheus() == "\n"
+
+
+def test_query_batcher_stages_reach_trace():
+    """Test Case 3.1: เวลารอคิว, embed และ vector_search ที่วัดใน thread ของ QueryBatcher ต้องกลับมาอยู่ใน trace ของผู้ถาม."""
+    vector_store = MagicMock()
+    vector_store.embeddings.embed_documents.side_effect = lambda texts: [[1.0] for _ in texts]
+    vector_store._collection.query.side_effect = lambda query_embeddings, n_results, where, include: {
+        "ids": [["a"]], "documents": [["doc"]], "metadatas": [[{}]], "distances": [[0.1]],
+    }
+    batcher = QueryBatcher(vector_store, k=1, max_wait_ms=1)
+    trace = start_trace("answer")
+    with use_trace(trace):
+        batcher.search("q")
+    timings = trace.finish()
+    assert {"queue_wait_ms", "embed_ms", "vector_search_ms"} <= set(timings)
@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+import parallel_ingest
+from benchmarks.synthetic_corpus import SyntheticCorpus
+from parallel_ingest import PdfJob, iter_parsed_pdfs, parse_and_chunk_pdf
+
+
+def parse_or_fail(job):
+    """parse_and_chunk_pdf ที่ทำให้ worker process ล่ม (crash.pdf) หรือค้าง (hang.pdf) ตามชื่อไฟล์."""
+    if job.source_key == "crash.pdf":
+        os._exit(1)
+    if job.source_key == "hang.pdf":
+        time.sleep(60)
+    return parse_and_chunk_pdf(job)
+
+
+@pytest.fixture
+def good_jobs(tmp_path):
+    paths = SyntheticCorpus(files=3, pages_per_file=1, seed=2).generate(str(tmp_path / "pdfs"))
+    return [PdfJob(os.path.basename(path), path, chunk_size=500, chunk_overlap=50) for path in paths]
+
+
+def run(jobs, **kwargs) -> dict:
+    results = {result.job.source_key: result for result in iter_parsed_pdfs(jobs, workers=2, **kwargs)}
+    assert len(results) == len(jobs)
+    return results
+
+
+def assert_good_files_parsed(results, good_jobs):
+    for job in good_jobs:
+        assert results[job.source_key].error is None and results[job.source_key].chunks
+
+
+def test_corrupt_file_does_not_stop_other_files(tmp_path, good_jobs):
+    """Test Case 1.1: PDF ที่เสียต้องได้ผลเป็น error ส่วนไฟล์อื่นใน pool เดียวกันต้องได้ chunks ครบ."""
+    corrupt = tmp_path / "corrupt.pdf"
+    corrupt.write_bytes(b"%PDF-1.4\nthis is not a pdf\n")
+    results = run([good_jobs[0], PdfJob("corrupt.pdf", str(corrupt)), *good_jobs[1:]])
+    assert results["corrupt.pdf"].error and not results["corrupt.pdf"].chunks
+    assert_good_files_parsed(results, good_jobs)
+
+
+def test_timed_out_file_is_skipped(monkeypatch, good_jobs):
+    """Test Case 1.2: ไฟล์ที่ค้างเกิน file_timeout ต้องถูกข้าม (worker ถูกปิด) และไฟล์อื่นยังได้ผลลัพธ์."""
+    monkeypatch.setattr(parallel_ingest, "parse_and_chunk_pdf", parse_or_fail)
+    start = time.monotonic()
+    results = run([PdfJob("hang.pdf", "hang.pdf"), *good_jobs], file_timeout=3)
+    assert results["hang.pdf"].error == "timed out after 3s"
+    assert_good_files_parsed(results, good_jobs)
+    assert time.monotonic() - start < 30
+
+
+def test_worker_crash_only_skips_the_crashing_file(monkeypatch, good_jobs):
+    """
+    Test Case 1.3: ไฟล์ที่ทำให้ worker ล่มต้องถูกข้ามหลังลองใหม่ครบ ส่วนไฟล์ที่อยู่ใน pool เดียวกันตอนล่ม
+    ต้องถูกรันใหม่และได้ผลลัพธ์ (ไม่ถูกนับว่าเป็นสาเหตุ)
+    """
+    monkeypatch.setattr(parallel_ingest, "parse_and_chunk_pdf", parse_or_fail)
+    monkeypatch.setattr(parallel_ingest, "MAX_POOL_RESTARTS_PER_FILE", 1)
+    results = run([good_jobs[0], PdfJob("crash.pdf", "crash.pdf"), *good_jobs[1:]])
+    assert results["crash.pdf"].error == "worker process crashed"
+    assert_good_files_parsed(results, good_jobs)
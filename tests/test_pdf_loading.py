@@ -0,0 +1,84 @@
+import io
+import mmap
+from unittest.mock import patch
+
+from src.page_cache import PageTextCache
+from src.pdf_processing import iter_chunks, iter_pdf_pages, load_pdf
+
+
+def make_pdf(pages):
+    """สร้าง PDF จริงขนาดเล็ก (1 บรรทัดข้อความต่อหน้า) พร้อม xref ที่ถูกต้อง."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    out, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode()
+    return out
+
+
+PDF_BYTES = make_pdf(["Hello page one", "Hello page two"])
+
+
+def test_load_pdf_from_path_uses_page_metadata(tmp_path):
+    """Test Case 1.1: โหลดจาก path ได้ 1 Document ต่อหน้า พร้อม metadata แบบเดียวกับ PyPDFLoader."""
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(PDF_BYTES)
+    docs = load_pdf(str(pdf_path))
+    assert [doc.page_content for doc in docs] == ["Hello page one", "Hello page two"]
+    assert docs[1].metadata == {"source": str(pdf_path), "page": 1, "page_label": "2", "total_pages": 2}
+
+
+def test_load_pdf_from_buffers_without_temp_files(tmp_path):
+    """Test Case 1.2: bytes, file object และ mmap ต้องให้ผลเหมือนกับการโหลดจาก path."""
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(PDF_BYTES)
+    with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        from_mmap = load_pdf(mapped, source_name="doc.pdf")
+    from_bytes = load_pdf(PDF_BYTES, source_name="doc.pdf")
+    from_file_object = load_pdf(io.BytesIO(PDF_BYTES), source_name="doc.pdf")
+    assert from_mmap == from_bytes == from_file_object
+    assert from_bytes[0].metadata["source"] == "doc.pdf"
+
+
+def test_iter_pdf_pages_is_lazy_and_bad_input_returns_empty():
+    """Test Case 1.3: iter_pdf_pages yield ทีละหน้า และ PDF ที่เสียต้องคืน list ว่างแทนการ raise."""
+    pages = iter_pdf_pages(PDF_BYTES)
+    assert next(pages).page_content == "Hello page one"
+    assert load_pdf(b"not a pdf") == []
+
+
+def test_page_cache_skips_extraction_on_rechunk(tmp_path):
+    """Test Case 2.1: ไฟล์ที่ extract ครบแล้วต้องอ่านจาก page cache (ไม่เปิด PDF) และ chunk ใหม่ด้วยค่าอื่นได้."""
+    cache = PageTextCache(str(tmp_path / "pages.sqlite"), write_batch_size=1)
+    first = list(iter_pdf_pages(PDF_BYTES, "doc.pdf", file_hash="h1", page_cache=cache))
+    assert cache.total_pages("h1") == 2
+
+    with patch("src.pdf_processing.PdfReader", side_effect=AssertionError("PDF should not be parsed again")):
+        cached = list(iter_pdf_pages(b"", "doc.pdf", file_hash="h1", page_cache=cache))
+    assert cached == first
+
+    chunks = list(iter_chunks(iter(cached), chunk_size=5, chunk_overlap=0))
+    assert [chunk.page_content for chunk in chunks[:3]] == ["Hello", "page", "one"]
+    assert chunks[3].metadata["page"] == 1 and chunks[3].metadata["start_index"] == 0
+
+
+def test_incomplete_extraction_is_not_served_from_cache(tmp_path):
+    """Test Case 2.2: ถ้า extract ไม่ครบทุกหน้า ไฟล์นั้นต้องไม่ถูกนับว่าอยู่ใน cache."""
+    cache = PageTextCache(str(tmp_path / "pages.sqlite"), write_batch_size=1)
+    pages = iter_pdf_pages(PDF_BYTES, "doc.pdf", file_hash="h1", page_cache=cache)
+    next(pages)
+    pages.close()
+    assert cache.total_pages("h1") is None
@@ -1,6 +1,4 @@
 import pytest
-import os
-import io
 from unittest.mock import patch, MagicMock, mock_open # mock_open สำหรับ token/credentials
 
 # สมมติว่าโค้ดของคุณอยู่ใน src/pdf_processor.py
@@ -102,8 +100,9 @@ def test_list_pdfs_from_drive_folder_success(mock_gdrive_service):
 
     mock_gdrive_service.files.return_value.list.assert_called_once_with(
         q=f"'{folder_id}' in parents and mimeType='application/pdf' and trashed=false",
-        pageSize=100,
-        fields="nextPageToken, files(id, name)"
+        pageSize=1000,
+        fields="nextPageToken, files(id, name, md5Checksum, modifiedTime, size)",
+        pageToken=None,
     )
     assert len(pdf_files) == 1
     assert pdf_files[0] == ('fake_pdf_id_1', 'sample_test_rag_gdrive.pdf')
@@ -127,43 +126,30 @@ def test_list_pdfs_from_drive_folder_api_error(mock_gdrive_service):
     assert len(pdf_files) == 0 # ควรจะคืนค่า list ว่างเมื่อเกิด error
 
 # --- Test File Downloading ---
-@patch('src.pdf_processor.io.BytesIO') # Mock BytesIO
 @patch('src.pdf_processor.MediaIoBaseDownload') # Mock MediaIoBaseDownload
-@patch('src.pdf_processor.os.makedirs') # Mock os.makedirs
-def test_download_pdf_from_drive_success(mock_makedirs, mock_media_downloader_class, mock_bytes_io_class, mock_gdrive_service, tmp_path):
-    """Test Case 3.1: การดาวน์โหลด PDF ที่ถูกต้อง."""
-    # Monkeypatch TEMP_PDF_DIR ให้ใช้ tmp_path ของ pytest เพื่อความสะอาด
-    # โดยปกติแล้วไม่ควรแก้ไข global variable ของ module อื่นโดยตรงในเทส
-    # แต่เพื่อความง่ายสำหรับโครงสร้างโค้ดเดิม
+def test_download_pdf_from_drive_success(mock_media_downloader_class, mock_gdrive_service, tmp_path):
+    """Test Case 3.1: การดาวน์โหลด PDF ที่ถูกต้อง (เขียนลงดิสก์ตรงๆ ไม่พักไว้ใน BytesIO)."""
     with patch('src.pdf_processor.TEMP_PDF_DIR', str(tmp_path)):
         file_id = "fake_pdf_id_1"
         file_name = "test_download.pdf"
         expected_local_path = tmp_path / file_name
 
-        # Mock MediaIoBaseDownload
-        mock_downloader_instance = MagicMock()
-        # ทำให้ next_chunk() คืนค่า (status, done=True) ในครั้งเดียว
-        mock_downloader_instance.next_chunk.return_value = (MagicMock(progress=lambda: 1.0), True)
-        mock_media_downloader_class.return_value = mock_downloader_instance
+        # MediaIoBaseDownload ปลอม: เขียนเนื้อหา PDF ลง file handle ที่ได้รับใน next_chunk() ครั้งเดียว
+        def fake_downloader(fh, request, chunksize):
+            downloader = MagicMock()
+            def next_chunk(num_retries=0):
+                fh.write(MOCK_PDF_CONTENT_BYTES)
+                return MagicMock(progress=lambda: 1.0), True
+            downloader.next_chunk.side_effect = next_chunk
+            return downloader
+        mock_media_downloader_class.side_effect = fake_downloader
 
-        # Mock BytesIO
-        mock_fh = MagicMock(spec=io.BytesIO)
-        mock_fh.read.return_value = MOCK_PDF_CONTENT_BYTES # เนื้อหา PDF จำลอง
-        mock_bytes_io_class.return_value = mock_fh
-
-        # Mock open for writing the downloaded file
-        m_open = mock_open()
-        with patch('src.pdf_processor.open', m_open):
-            local_file_path = pdf_processor.download_pdf_from_drive(mock_gdrive_service, file_id, file_name)
+        local_file_path = pdf_processor.download_pdf_from_drive(mock_gdrive_service, file_id, file_name)
 
         mock_gdrive_service.files.return_value.get_media.assert_called_once_with(fileId=file_id)
-        mock_media_downloader_class.assert_called_once() # ตรวจสอบว่าถูกเรียกด้วย fh และ request
-        mock_fh.seek.assert_called_once_with(0)
-        m_open.assert_called_once_with(expected_local_path, 'wb')
-        m_open().write.assert_called_once_with(MOCK_PDF_CONTENT_BYTES)
+        mock_media_downloader_class.assert_called_once()
         assert local_file_path == str(expected_local_path)
-        # os.makedirs ไม่ควรถูกเรียกถ้า tmp_path (ซึ่งแทน TEMP_PDF_DIR) มีอยู่แล้ว
-        # แต่ถ้าโค้ด pdf_processor เช็คและสร้าง TEMP_PDF_DIR เสมอ ก็อาจจะต้อง mock_makedirs.assert_called_once_with(str(tmp_path))
+        assert expected_local_path.read_bytes() == MOCK_PDF_CONTENT_BYTES
 
 
 # --- Test End-to-End PDF Processing from GDrive (Mocked) ---
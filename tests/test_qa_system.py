@@ -0,0 +1,102 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain.prompts import PromptTemplate
+from langchain.schema.document import Document
+
+import metrics
+import qa_system
+from qa_system import IndexComponents, RAGSystem
+
+MOCK_DOCS = [
+    Document(page_content="RAG combines retrieval with generation.", metadata={"source_pdf": "rag.pdf", "page": 0}),
+    Document(page_content="Chroma stores the embeddings.", metadata={"source_pdf": "rag.pdf", "page": 1}),
+]
+
+
+@pytest.fixture
+def rag_system():
+    """สร้าง RAGSystem โดยไม่โหลด model จริง (mock retriever และ LLM)."""
+    system = RAGSystem.__new__(RAGSystem)
+    retriever = MagicMock()
+    retriever.invoke.return_value = MOCK_DOCS
+    system._install_index(IndexComponents("chroma_db", MagicMock(), retriever, None, None, 5))
+    system.llm = MagicMock()
+    system.llm.invoke.return_value = "RAG is retrieval augmented generation."
+    system.llm.stream.return_value = iter(["RAG ", "is ", "retrieval."])
+    system.prompt = PromptTemplate(template="{context}\nQ: {question}", input_variables=["context", "question"])
+    system.answer_cache = None
+    system.reranker = None
+    with patch("qa_system.read_index_version", return_value="v1"):
+        yield system
+
+
+def test_answer_question(rag_system):
+    """Test Case 1.1: answer_question ต้องคืนค่า query, result และ source_documents."""
+    response = rag_system.answer_question("What is RAG?")
+    assert response["result"] == "RAG is retrieval augmented generation."
+    assert response["source_documents"] == MOCK_DOCS
+    prompt = rag_system.llm.invoke.call_args[0][0]
+    assert "RAG combines retrieval with generation." in prompt
+    assert "Q: What is RAG?" in prompt
+
+
+def test_answer_question_empty_query(rag_system):
+    """Test Case 1.2: คำถามว่างต้องคืนค่า error."""
+    assert "error" in rag_system.answer_question("")
+
+
+def test_stream_answer_yields_sources_then_tokens(rag_system):
+    """Test Case 2.1: stream_answer ต้องส่ง sources ก่อน แล้วตามด้วย token ทีละส่วน."""
+    events = list(rag_system.stream_answer("What is RAG?"))
+    assert events[0] == {"type": "sources", "source_documents": MOCK_DOCS}
+    assert [e["text"] for e in events if e["type"] == "token"] == ["RAG ", "is ", "retrieval."]
+    assert events[-1]["type"] == "done" and events[-1]["result"] == "RAG is retrieval."
+    assert events[-1]["timings"]["completion_tokens"] == 3
+
+
+def test_stream_answer_error(rag_system):
+    """Test Case 2.2: ถ้า LLM error ต้องได้ event error แทนการ raise."""
+    rag_system.llm.stream.side_effect = RuntimeError("Ollama is not running")
+    events = list(rag_system.stream_answer("What is RAG?"))
+    assert events[-1] == {"type": "error", "error": "Ollama is not running"}
+
+
+def test_stream_answer_closed_early_finishes_trace(rag_system):
+    """Test Case 2.3: ผู้เรียกที่หยุดอ่าน stream กลางทาง (close generator) ต้องทำให้ trace ถูกปิดเป็น cancelled."""
+    before = metrics.REGISTRY.histogram_count("rag_request_seconds", operation="stream", status="cancelled")
+    events = rag_system.stream_answer("What is RAG?")
+    assert next(events)["type"] == "sources"
+    events.close()
+    assert metrics.REGISTRY.histogram_count("rag_request_seconds", operation="stream", status="cancelled") == before + 1
+
+
+def test_answer_cache_hit_skips_llm(rag_system, tmp_path):
+    """Test Case 3.1: คำถามซ้ำต้องตอบจาก cache โดยไม่เรียก retriever และ LLM อีก."""
+    rag_system.answer_cache = qa_system.AnswerCache(str(tmp_path / "answers.sqlite"))
+    rag_system.answer_question("What is RAG?")
+    rag_system.current_index().retriever.invoke.reset_mock()
+    rag_system.llm.invoke.reset_mock()
+
+    response = rag_system.answer_question("what is rag")
+    assert response["cached"] is True
+    assert response["source_documents"][0].metadata["source_pdf"] == "rag.pdf"
+    rag_system.current_index().retriever.invoke.assert_not_called()
+    rag_system.llm.invoke.assert_not_called()
+
+
+def test_filters_scope_retrieval_and_skip_cache(rag_system, tmp_path):
+    """Test Case 4.1: คำถามที่มี filters ต้องค้นด้วย where ของ Chroma และไม่ใช้ answer cache."""
+    rag_system.answer_cache = qa_system.AnswerCache(str(tmp_path / "answers.sqlite"))
+    rag_system.current_index().vector_store._collection.query.return_value = {
+        "ids": [["c1"]], "documents": [["RAG combines retrieval with generation."]],
+        "metadatas": [[{"source_pdf": "rag.pdf", "page": 0}]], "distances": [[0.1]],
+    }
+    filters = qa_system.RetrievalFilters(source_pdfs=["rag.pdf"])
+
+    response = rag_system.answer_question("What is RAG?", filters)
+
+    assert response["source_documents"][0].id == "c1"
+    where = rag_system.current_index().vector_store._collection.query.call_args.kwargs["where"]
+    assert where == filters.to_chroma_where()
+    rag_system.current_index().retriever.invoke.assert_not_called()
+    assert rag_system.answer_cache.get("What is RAG?", "v1") is None
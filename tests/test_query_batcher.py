@@ -0,0 +1,76 @@
+import threading
+import pytest
+from unittest.mock import MagicMock
+
+from src.query_batcher import QueryBatcher
+
+
+def make_vector_store():
+    """Vector store ปลอม: embedding = [ความยาวคำถาม] และ collection คืน document ตามลำดับ query."""
+    vector_store = MagicMock()
+    vector_store.embeddings.embed_documents.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    vector_store._collection.query.side_effect = lambda query_embeddings, n_results, where, include: {
+        "ids": [[f"id-{vector[0]:.0f}-{i}" for i in range(n_results)] for vector in query_embeddings],
+        "documents": [[f"doc for {vector[0]:.0f}"] * n_results for vector in query_embeddings],
+        "metadatas": [[{"source_pdf": "a.pdf"}] * n_results for _ in query_embeddings],
+        "distances": [[0.1] * n_results for _ in query_embeddings],
+    }
+    return vector_store
+
+
+def test_single_query():
+    """Test Case 1.1: query เดียวต้องได้ k documents และ embedding ของตัวเอง."""
+    vector_store = make_vector_store()
+    batcher = QueryBatcher(vector_store, k=2, max_wait_ms=1)
+    docs = batcher.search("abc")
+    assert [doc.page_content for doc in docs] == ["doc for 3", "doc for 3"]
+    assert docs[0].metadata == {"source_pdf": "a.pdf"}
+    assert batcher.embed("abcd") == [4.0]
+
+
+def test_concurrent_queries_are_batched():
+    """Test Case 1.2: query ที่เข้ามาพร้อมกันต้องถูก embed และค้นหาใน batch เดียวกัน และได้ผลของตัวเองกลับไป."""
+    vector_store = make_vector_store()
+    batcher = QueryBatcher(vector_store, k=1, max_wait_ms=200, max_batch_size=8)
+    queries = ["q" * n for n in range(1, 9)]
+    results = {}
+    barrier = threading.Barrier(len(queries))
+
+    def worker(query):
+        barrier.wait()
+        results[query] = batcher.search(query)
+
+    threads = [threading.Thread(target=worker, args=(q,)) for q in queries]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results[q][0].page_content == f"doc for {len(q)}" for q in queries)
+    assert vector_store.embeddings.embed_documents.call_count < len(queries)
+    assert batcher.average_batch_size > 1
+
+
+def test_errors_propagate_to_callers():
+    """Test Case 1.3: ถ้า embedding error ทุก caller ใน batch ต้องได้ exception."""
+    vector_store = make_vector_store()
+    vector_store.embeddings.embed_documents.side_effect = RuntimeError("model crashed")
+    batcher = QueryBatcher(vector_store, k=1, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        batcher.search("abc")
+
+
+def test_queries_after_close_do_not_restart_worker():
+    """Test Case 1.4: หลัง close คำถามที่ยังถือ batcher เดิมอยู่ต้องได้ผลลัพธ์โดยไม่มี worker thread ใหม่เกิดขึ้น."""
+    vector_store = make_vector_store()
+    batcher = QueryBatcher(vector_store, k=1, max_wait_ms=1)
+    batcher.search("abc")
+    worker = batcher._worker
+    batcher.close()
+    worker.join(1)
+    assert not worker.is_alive()
+    threads_before = threading.active_count()
+
+    assert batcher.search("abcd")[0].page_content == "doc for 4"
+    assert batcher.embed("ab") == [2.0]
+    assert batcher._worker is None and threading.active_count() == threads_before
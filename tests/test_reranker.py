@@ -0,0 +1,28 @@
+from unittest.mock import MagicMock
+from langchain_core.documents import Document
+
+from src.reranker import CrossEncoderReranker, adaptive_cutoff
+
+DOCS = [Document(page_content=text) for text in ["weather today", "pump seal kit XK-4410", "pump manual", "recipes"]]
+
+
+def test_adaptive_cutoff():
+    """Test Case 1.1: คำถามง่ายที่มี chunk เด่นอันเดียวต้องใช้ chunk น้อย และต้องเก็บอย่างน้อย 1 อัน."""
+    assert adaptive_cutoff([0.98, 0.15, 0.12], top_n=5, min_score=0.1, relative_cutoff=0.3) == 1
+    assert adaptive_cutoff([0.8, 0.7, 0.6, 0.5], top_n=3, min_score=0.1, relative_cutoff=0.3) == 3
+    assert adaptive_cutoff([0.05, 0.01], top_n=5, min_score=0.1, relative_cutoff=0.3) == 1
+    assert adaptive_cutoff([], top_n=5, min_score=0.1, relative_cutoff=0.3) == 0
+
+
+def test_rerank_orders_by_cross_encoder_score():
+    """Test Case 2.1: ต้องเรียงตามคะแนนของ cross-encoder, predict แบบ batch ครั้งเดียว และบันทึก latency."""
+    model = MagicMock()
+    model.predict.return_value = [-3.0, 4.0, 1.5, -5.0] # logits
+    reranker = CrossEncoderReranker(model, batch_size=8, top_n=3, min_score=0.1, relative_cutoff=0.3)
+
+    ranked = reranker.rerank("XK-4410 seal kit", DOCS)
+
+    assert [doc.page_content for doc in ranked] == ["pump seal kit XK-4410", "pump manual"]
+    model.predict.assert_called_once()
+    assert model.predict.call_args.kwargs["batch_size"] == 8
+    assert reranker.calls == 1 and reranker.last_latency >= 0
@@ -0,0 +1,30 @@
+from src.retrieval_filters import RetrievalFilters, source_name
+
+
+def test_empty_filters():
+    """Test Case 1.1: ไม่มีเงื่อนไข = ไม่มี where clause."""
+    assert RetrievalFilters().to_chroma_where() is None
+    assert RetrievalFilters(source_pdfs=[]).is_empty()
+
+
+def test_single_condition_is_not_wrapped():
+    """Test Case 1.2: เงื่อนไขเดียวไม่ต้องห่อด้วย $and (Chroma ไม่รับ $and ที่มีเงื่อนไขเดียว)."""
+    assert RetrievalFilters(gdrive_file_ids=["id_1"]).to_chroma_where() == {"gdrive_file_id": {"$in": ["id_1"]}}
+
+
+def test_combined_conditions():
+    """Test Case 1.3: ชื่อไฟล์ต้องตรงกับทั้ง source_pdf และ source_gdrive_pdf และรวมช่วงหน้า/วันที่ด้วย $and."""
+    where = RetrievalFilters(source_pdfs=["a.pdf"], page_min=2, page_max=5, ingested_after=100).to_chroma_where()
+    assert where == {"$and": [
+        {"$or": [{"source_pdf": {"$in": ["a.pdf"]}}, {"source_gdrive_pdf": {"$in": ["a.pdf"]}}]},
+        {"page": {"$gte": 2}},
+        {"page": {"$lte": 5}},
+        {"ingested_at": {"$gte": 100}},
+    ]}
+
+
+def test_source_name():
+    """Test Case 2.1: ชื่อไฟล์มาจาก source_pdf หรือ source_gdrive_pdf."""
+    assert source_name({"source_pdf": "a.pdf"}) == "a.pdf"
+    assert source_name({"source_gdrive_pdf": "b.pdf", "gdrive_file_id": "x"}) == "b.pdf"
+    assert source_name({}) is None
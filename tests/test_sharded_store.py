@@ -0,0 +1,97 @@
+from langchain_core.documents import Document
+
+from compact_store import CompactVectorStore
+from conftest import FakeEmbeddings
+from ingest_pipeline import delete_chunk_ids, upsert_chunks
+from query_batcher import query_collection
+from sharded_store import ShardedVectorStore, shard_name
+from vector_store_builder import list_pdf_files
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+
+
+def corpus(files=12, chunks_per_file=5):
+    docs, ids = [], []
+    for f in range(files):
+        for c in range(chunks_per_file):
+            text = " ".join(WORDS[(f * 3 + c * 5 + i) % len(WORDS)] for i in range(f % 4 + c + 1))
+            folder = ["hr", "finance", ""][f % 3]
+            docs.append(Document(page_content=text, metadata={
+                "source_pdf": f"{folder}/file{f}.pdf" if folder else f"file{f}.pdf", "page": c}))
+            ids.append(f"f{f}-c{c}")
+    return docs, ids
+
+
+def sharded(tmp_path, shard_by="hash"):
+    embeddings = FakeEmbeddings()
+    return ShardedVectorStore(str(tmp_path / "shards"), embeddings,
+                              lambda path: CompactVectorStore(path, embeddings), shard_by=shard_by, shard_count=3)
+
+
+def test_shard_name_routes_documents():
+    """Test Case 1.1: chunks ของไฟล์เดียวกันอยู่ shard เดียวกันเสมอ และโหมด folder ใช้โฟลเดอร์ย่อยเป็นชื่อ shard."""
+    assert shard_name({"source_pdf": "a.pdf", "page": 1}, "hash", 4) == shard_name({"source_pdf": "a.pdf"}, "hash", 4)
+    assert len({shard_name({"source_pdf": f"f{i}.pdf"}, "hash", 4) for i in range(50)}) == 4
+    assert shard_name({"source_pdf": "hr/2024 plans/a.pdf"}, "folder", 0) == "hr_2024_plans"
+    assert shard_name({"gdrive_file_id": "x"}, "folder", 0) == "root"
+
+
+def test_fan_out_search_matches_single_collection(tmp_path, fake_embeddings):
+    """Test Case 2.1: top-k ที่รวมจากทุก shard ต้องเหมือนค้นใน collection เดียว (รวมเมื่อมี metadata filter)."""
+    docs, ids = corpus()
+    single = CompactVectorStore(str(tmp_path / "single"), fake_embeddings)
+    store = sharded(tmp_path)
+    upsert_chunks(single, docs, ids)
+    upsert_chunks(store, docs, ids)
+    assert len(store.shards) == 3 and store._collection.count() == len(docs)
+    assert sum(store._collection.shard_counts().values()) == len(docs)
+
+    queries = [fake_embeddings.embed_query(text) for text in ("alpha bravo", "hotel golf golf", "delta")]
+    for where in (None, {"page": {"$gte": 2}}):
+        expected = query_collection(single._collection, queries, 7, where)
+        actual = query_collection(store._collection, queries, 7, where)
+        for expected_hits, actual_hits in zip(expected, actual):
+            assert [round(distance, 4) for _, distance in actual_hits] == [
+                round(distance, 4) for _, distance in expected_hits]
+            assert {doc.id for doc, _ in actual_hits} <= set(ids)
+
+
+def test_paged_get_delete_and_reopen(tmp_path):
+    """Test Case 2.2: get แบบแบ่งหน้าต้องได้ทุกแถวครั้งเดียว, delete ลบจากทุก shard และเปิดใหม่ต้องเจอ shards เดิม."""
+    docs, ids = corpus()
+    store = sharded(tmp_path, shard_by="folder")
+    upsert_chunks(store, docs, ids)
+    assert sorted(store.shards) == ["finance", "hr", "root"]
+
+    paged = []
+    for offset in range(0, store._collection.count(), 7):
+        paged.extend(store._collection.get(include=[], limit=7, offset=offset)["ids"])
+    assert sorted(paged) == sorted(ids)
+    assert len(store.get(where={"page": 0}, include=["metadatas"])["ids"]) == 12
+
+    delete_chunk_ids(store, ids[:10])
+    reopened = sharded(tmp_path, shard_by="folder")
+    assert sorted(reopened.shards) == ["finance", "hr", "root"]
+    assert sorted(reopened.get(include=[])["ids"]) == sorted(ids[10:])
+    assert reopened.similarity_search("alpha", k=3)
+
+
+def test_paged_get_with_ids_filter(tmp_path):
+    """Test Case 2.3: get แบบแบ่งหน้าพร้อม ids (และ where) ต้องได้แถวที่ตรงเงื่อนไขครบ ไม่ข้ามและไม่ซ้ำ."""
+    docs, ids = corpus()
+    store = sharded(tmp_path)
+    upsert_chunks(store, docs, ids)
+    wanted = ids[::3]
+    for where, expected in ((None, wanted), ({"page": {"$gte": 2}}, [i for i in wanted if int(i[-1]) >= 2])):
+        paged = []
+        for offset in range(0, len(wanted), 4):
+            paged.extend(store._collection.get(ids=wanted, where=where, include=[], limit=4, offset=offset)["ids"])
+        assert len(paged) == len(expected) and sorted(paged) == sorted(expected)
+
+
+def test_list_pdf_files_includes_subfolders(tmp_path):
+    """Test Case 3.1: PDF ในโฟลเดอร์ย่อยต้องถูกพบ (path แบบสัมพันธ์) และไฟล์ชั้นบนสุดยังใช้ชื่อไฟล์เฉยๆ."""
+    (tmp_path / "hr").mkdir()
+    for name in ("b.pdf", "a.pdf", "notes.txt", "hr/c.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF")
+    assert list_pdf_files(str(tmp_path)) == ["a.pdf", "b.pdf", "hr/c.pdf"]
@@ -0,0 +1,71 @@
+import re
+
+import pytest
+from langchain_core.documents import Document
+
+from src.text_chunker import THAI_COMBINING, THAI_LEADING_VOWELS, TextChunker
+
+ENGLISH = ("Retrieval augmented generation combines search with a language model. " * 40
+           + "\n\nA second paragraph follows here.\nWith a new line and more words to split. " * 20)
+THAI = "ระบบค้นหาเอกสารภาษาไทยที่ไม่มีการเว้นวรรคระหว่างคำและต้องตัดให้ถูกต้องแม้ไม่มีช่องว่าง" * 30
+
+
+def test_chunks_fit_size_and_map_back_to_start_index():
+    """Test Case 1.1: ทุก chunk ยาวไม่เกิน chunk_size และ text[start_index:] ต้องตรงกับเนื้อหาของ chunk."""
+    for text in (ENGLISH, THAI):
+        chunks = list(TextChunker(200, 40).split_text(text))
+        assert len(chunks) > 1
+        for start, chunk in chunks:
+            assert 0 < len(chunk) <= 200
+            assert text[start:start + len(chunk)] == chunk
+
+
+def test_consecutive_chunks_overlap_and_cover_text():
+    """Test Case 1.2: chunk ถัดไปเริ่มก่อนจุดจบของ chunk ก่อนหน้า (overlap) และไม่มีข้อความหายระหว่าง chunk."""
+    chunks = list(TextChunker(200, 40).split_text(ENGLISH))
+    for (start, chunk), (next_start, _) in zip(chunks, chunks[1:]):
+        assert start < next_start < start + len(chunk)
+    assert chunks[-1][0] + len(chunks[-1][1]) == len(ENGLISH.rstrip())
+
+
+def test_prefers_paragraph_and_word_boundaries():
+    """Test Case 1.3: ข้อความภาษาอังกฤษต้องไม่ถูกตัดกลางคำ."""
+    words = set(re.findall(r"\w+", ENGLISH))
+    for _, chunk in TextChunker(120, 0).split_text(ENGLISH):
+        assert set(re.findall(r"\w+", chunk)) <= words
+
+
+def test_thai_never_splits_inside_a_cluster():
+    """Test Case 1.4: ข้อความไทยที่ไม่เว้นวรรคต้องไม่ขึ้นต้น chunk ด้วยสระบน/ล่าง/วรรณยุกต์ และไม่จบด้วยสระหน้า."""
+    for overlap in (0, 30):
+        for _, chunk in TextChunker(100, overlap).split_text(THAI):
+            assert chunk[0] not in THAI_COMBINING
+            assert chunk[-1] not in THAI_LEADING_VOWELS
+
+
+def test_split_documents_keeps_metadata_per_page():
+    """Test Case 1.5: metadata ของหน้าถูกคัดลอกไปทุก chunk พร้อม start_index โดยไม่แก้ dict ของหน้าเดิม."""
+    page = Document(page_content="Hello page one", metadata={"source": "a.pdf", "page": 0})
+    chunks = list(TextChunker(5, 0).split_documents([page]))
+    assert [chunk.page_content for chunk in chunks] == ["Hello", "page", "one"]
+    assert [chunk.metadata["start_index"] for chunk in chunks] == [0, 6, 11]
+    assert chunks[0].metadata["source"] == "a.pdf" and page.metadata == {"source": "a.pdf", "page": 0}
+
+
+def test_token_mode_counts_tokens_instead_of_characters():
+    """Test Case 1.6: เมื่อส่ง token_offsets มา chunk_size นับเป็นจำนวน token (ที่นี่ 1 คำ = 1 token)."""
+    def word_offsets(text):
+        return [match.start() for match in re.finditer(r"\S+", text)]
+
+    text = " ".join(f"word{i}" for i in range(50))
+    chunks = list(TextChunker(10, 2, token_offsets=word_offsets).split_text(text))
+    assert all(len(chunk.split()) <= 10 for _, chunk in chunks)
+    assert chunks[0][1].split()[-2:] == chunks[1][1].split()[:2]
+
+
+def test_invalid_sizes_raise():
+    """Test Case 1.7: chunk_overlap ต้องน้อยกว่า chunk_size."""
+    with pytest.raises(ValueError):
+        TextChunker(100, 100)
+    with pytest.raises(ValueError):
+        TextChunker(0, 0)
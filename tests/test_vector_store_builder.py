@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+import vector_store_builder
+from benchmarks.synthetic_corpus import SyntheticCorpus
+from drive_sync import DriveFile, SyncResult
+from index_manifest import IndexManifest, MANIFEST_FILE_NAME
+from parallel_ingest import PdfJob, parse_and_chunk_pdf
+from vector_store_builder import (
+    estimate_build, get_index_settings, main, parse_args, plan_build, resolve_chunk_settings
+)
+
+
+def test_parse_args_defaults_and_validation():
+    """
+    Test Case 1.1: ค่า chunk ที่ไม่ระบุยังว่างไว้ (เติมจาก index ปัจจุบันทีหลัง), overlap ต้องน้อยกว่า chunk size
+    และเลือกแหล่ง PDF ได้ทางเดียว
+    """
+    args = parse_args([])
+    assert args.pdf_dir == vector_store_builder.PDF_SOURCE_DIR and args.gdrive_folder_id is None
+    assert (args.chunk_size, args.chunk_overlap) == (None, None)
+    assert not args.force_rebuild and not args.dry_run
+    for argv in (["--chunk-size", "100", "--chunk-overlap", "100"], ["--workers", "0"],
+                 ["--pdf-dir", "x", "--gdrive-folder-id", "y"]):
+        with pytest.raises(SystemExit):
+            parse_args(argv)
+
+
+def test_estimate_build_scales_sampled_files(tmp_path, fake_embeddings):
+    """Test Case 2.1: ประมาณจำนวน chunks จากไฟล์ตัวอย่างได้ใกล้เคียงของจริง และ embed แค่ chunks ตัวอย่าง."""
+    paths = SyntheticCorpus(files=6, pages_per_file=2, seed=3).generate(str(tmp_path))
+    actual = sum(len(parse_and_chunk_pdf(PdfJob(path, path, chunk_size=500, chunk_overlap=50)).chunks)
+                 for path in paths)
+    estimate = estimate_build(paths, workers=2, embedding_model=fake_embeddings, chunk_size=500, chunk_overlap=50,
+                              sample_files=2, embed_sample_chunks=5)
+    assert estimate.files == 6 and estimate.sampled_files == 2
+    assert abs(estimate.estimated_chunks - actual) <= 0.2 * actual
+    assert len(fake_embeddings.texts) == 5
+    assert estimate.embed_seconds > 0 and estimate.total_seconds == max(estimate.parse_seconds, estimate.embed_seconds)
+    assert estimate_build([], embedding_model=fake_embeddings).estimated_chunks == 0
+
+
+def test_main_passes_build_options_and_dry_run_does_not_build(tmp_path, monkeypatch, fake_embeddings):
+    """Test Case 3.1: --force-rebuild และค่าปรับแต่งถูกส่งถึง builder ส่วน --dry-run ต้องไม่เรียก builder."""
+    monkeypatch.chdir(tmp_path)
+    pdf_dir = tmp_path / "pdfs"
+    SyntheticCorpus(files=2, pages_per_file=1, seed=1).generate(str(pdf_dir))
+    monkeypatch.setattr(vector_store_builder, "get_embedding_model", lambda **kwargs: fake_embeddings)
+    calls = []
+
+    def fake_build(pdf_directory, **kwargs):
+        calls.append((pdf_directory, kwargs))
+        return None
+
+    monkeypatch.setattr(vector_store_builder, "process_local_pdfs_and_build_store", fake_build)
+    assert main(["--pdf-dir", str(pdf_dir), "--dry-run", "--workers", "1", "--chunk-size", "300"]) == 0
+    assert calls == [] and fake_embeddings.texts
+    assert not (tmp_path / vector_store_builder.CHROMA_PERSIST_DIR).exists()
+
+    assert main(["--pdf-dir", str(pdf_dir), "--force-rebuild", "--workers", "3", "--upsert-batch-size", "50",
+                 "--chunk-size", "300", "--chunk-overlap", "30"]) == 1
+    assert calls == [(str(pdf_dir), {"force_rebuild": True, "workers": 3, "batch_size": 50,
+                                     "embedding_model": fake_embeddings, "chunk_size": 300, "chunk_overlap": 30})]
+
+
+def test_chunk_settings_follow_the_existing_index(tmp_path, monkeypatch, fake_embeddings):
+    """
+    Test Case 3.2: รันโดยไม่ระบุ --chunk-size ต้องใช้ค่าที่ index ปัจจุบันถูกสร้างไว้ (ไม่ index ใหม่ทั้งหมด)
+    ระบุค่าที่ต่างจาก index ต้องถูกปฏิเสธ เว้นแต่มี --force-rebuild (ซึ่งเริ่มจากค่าใน constant)
+    """
+    monkeypatch.chdir(tmp_path)
+    manifest_file = os.path.join(vector_store_builder.CHROMA_PERSIST_DIR, MANIFEST_FILE_NAME)
+    IndexManifest(manifest_file, get_index_settings(300, 30)).save()
+    monkeypatch.setattr(vector_store_builder, "get_embedding_model", lambda **kwargs: fake_embeddings)
+    calls = []
+    monkeypatch.setattr(vector_store_builder, "process_local_pdfs_and_build_store",
+                        lambda pdf_directory, **kwargs: calls.append(kwargs))
+
+    main(["--pdf-dir", str(tmp_path)])
+    assert (calls[-1]["chunk_size"], calls[-1]["chunk_overlap"]) == (300, 30)
+    assert not IndexManifest.load(manifest_file, get_index_settings(300, 30)).settings_changed
+
+    assert main(["--pdf-dir", str(tmp_path), "--chunk-size", "500"]) == 2 and len(calls) == 1
+    main(["--pdf-dir", str(tmp_path), "--chunk-size", "500", "--force-rebuild"])
+    assert (calls[-1]["chunk_size"], calls[-1]["chunk_overlap"]) == (500, vector_store_builder.CHUNK_OVERLAP)
+    main(["--pdf-dir", str(tmp_path), "--force-rebuild"])
+    assert (calls[-1]["chunk_size"], calls[-1]["chunk_overlap"]) == (vector_store_builder.CHUNK_SIZE,
+                                                                      vector_store_builder.CHUNK_OVERLAP)
+
+    args = parse_args(["--pdf-dir", str(tmp_path), "--chunk-overlap", "400", "--dry-run"])
+    assert "chunk overlap 400" in resolve_chunk_settings(args)
+
+
+def test_drive_dry_run_lists_without_downloading(tmp_path, monkeypatch, fake_embeddings):
+    """Test Case 3.3: --dry-run ของ Drive ต้องไม่ดาวน์โหลด: ใช้ไฟล์ใน cache เป็นตัวอย่าง และนับไฟล์อื่นจากขนาดใน Drive."""
+    monkeypatch.chdir(tmp_path)
+    cached_path = SyntheticCorpus(files=1, pages_per_file=1, seed=4).generate(str(tmp_path / "cache"))[0]
+
+    class PlanOnlyDriveSync:
+        def __init__(self, service_factory, folder_id, workers):
+            pass
+
+        def plan(self):
+            return SyncResult(files=[DriveFile("cached", "a.pdf", "m1", size=os.path.getsize(cached_path)),
+                                     DriveFile("remote", "b.pdf", "m2", size=5000)],
+                              local_paths={"cached": cached_path})
+
+        def sync(self):
+            raise AssertionError("a dry run must not download")
+
+    monkeypatch.setattr(vector_store_builder, "DriveSync", PlanOnlyDriveSync)
+    args = parse_args(["--gdrive-folder-id", "folder", "--dry-run", "--workers", "1"])
+    assert resolve_chunk_settings(args) is None
+    estimate = plan_build(args, fake_embeddings)
+    assert estimate.files == 2 and estimate.sampled_files == 1
+    assert estimate.bytes == os.path.getsize(cached_path) + 5000 and estimate.estimated_chunks > 0
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import visualize_db
+from compact_store import CompactCollection
+from visualize_db import compute_projection, reduce_to_2d, stratified_sample
+
+
+def fill(collection, sizes, dim=16, seed=0):
+    """สร้าง collection ที่แต่ละไฟล์เป็น cluster ของตัวเอง sizes = {ชื่อไฟล์: จำนวน chunks}."""
+    rng = np.random.default_rng(seed)
+    row = 0
+    for name, size in sizes.items():
+        center = rng.normal(size=dim) * 5
+        vectors = (center + rng.normal(size=(size, dim))).astype(np.float32)
+        ids = [f"c{row + i}" for i in range(size)]
+        collection.upsert(ids, vectors, [f"{name} chunk {i}" for i in range(size)],
+                          [{"source_pdf": name, "page": i} for i in range(size)])
+        row += size
+
+
+def test_stratified_sample_keeps_small_sources():
+    """Test Case 1.1: จำนวนรวมไม่เกิน max_points, ไฟล์เล็กได้อย่างน้อย min_per_stratum และไฟล์ใหญ่ได้ตามสัดส่วน."""
+    strata = np.repeat([0, 1, 2], [9000, 990, 10])
+    sample = stratified_sample(strata, max_points=1000, min_per_stratum=20)
+    counts = np.bincount(strata[sample], minlength=3)
+    assert len(sample) <= 1000 and len(np.unique(sample)) == len(sample)
+    assert counts[2] == 10 and counts[1] >= 20 and counts[0] > 7 * counts[1]
+    assert np.all(np.diff(sample) > 0)
+    assert len(stratified_sample(strata[:500], max_points=1000)) == 500
+
+
+def test_reduce_to_2d_pca_separates_clusters():
+    """Test Case 1.2: โหมด pca (numpy ล้วน) ต้องได้ 2 มิติ และแยก cluster ที่อยู่ห่างกันออกจากกัน."""
+    rng = np.random.default_rng(0)
+    vectors = np.concatenate([rng.normal(size=(100, 32)), rng.normal(size=(100, 32)) + 10]).astype(np.float32)
+    coords = reduce_to_2d(vectors, "pca")
+    assert coords.shape == (200, 2)
+    assert abs(coords[:100, 0].mean() - coords[100:, 0].mean()) > 10
+    with pytest.raises(ValueError):
+        reduce_to_2d(vectors, "spectral")
+
+
+def test_projection_is_sampled_paged_and_cached(tmp_path, monkeypatch):
+    """
+    Test Case 2.1: ดึงข้อมูลทีละหน้าแล้วสุ่มไม่เกิน max_points, ครั้งที่สองของ index version เดิมต้องใช้ cache
+    (ไม่ลดมิติใหม่) และเมื่อ index version เปลี่ยนต้องคำนวณใหม่
+    """
+    collection = CompactCollection(str(tmp_path / "compact"))
+    fill(collection, {"big.pdf": 600, "small.pdf": 5})
+    cache_dir = str(tmp_path / "cache")
+    kwargs = dict(method="pca", max_points=100, min_per_source=5, page_size=64, cache_dir=cache_dir)
+
+    ids, coords, documents, metadatas = compute_projection(collection, "v1", **kwargs)
+    assert len(ids) == len(coords) == len(documents) <= 100
+    assert sum(meta["source_pdf"] == "small.pdf" for meta in metadatas) == 5
+    assert all(doc.startswith(meta["source_pdf"]) for doc, meta in zip(documents, metadatas))
+
+    calls = []
+    original = visualize_db.reduce_to_2d
+    monkeypatch.setattr(visualize_db, "reduce_to_2d", lambda *args: calls.append(args) or original(*args))
+    cached_ids, cached_coords, _, _ = compute_projection(collection, "v1", **kwargs)
+    assert cached_ids == ids and np.allclose(cached_coords, coords) and not calls
+
+    compute_projection(collection, "v2", **kwargs)
+    assert len(calls) == 1